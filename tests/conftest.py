@@ -0,0 +1,10 @@
+"""
+Configuração dos testes unitários: as partes puras de ``validador_regras.core``
+rodam sem QGIS (o psycopg2 é carregado só quando usado).
+"""
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
@@ -0,0 +1,88 @@
+"""Testes da chave e do registro de pools de conexão."""
+import pytest
+
+from validador_regras.core.catalog_cache import connection_id
+from validador_regras.core.connection_pool import PoolTimeoutError, close_all_pools, get_pool, pool_key
+
+CONNECTION = {
+    'name': 'producao', 'host': 'db', 'port': '5432', 'database': 'bdgex',
+    'username': 'u', 'password': 's3cret', 'sslmode': 'require',
+}
+
+
+class FakeConnection:
+    closed = False
+
+    def close(self):
+        self.closed = True
+
+    def rollback(self):
+        pass
+
+
+@pytest.fixture(autouse=True)
+def _no_pools():
+    close_all_pools()
+    yield
+    close_all_pools()
+
+
+def test_pool_key_ignores_port_type_and_empty_fields():
+    same = dict(CONNECTION, port=5432, service=None, authcfg='')
+    assert pool_key(same, False) == pool_key(CONNECTION, False)
+
+
+@pytest.mark.parametrize("field, value", [
+    ('password', 'nova'),
+    ('sslmode', 'disable'),
+    ('host', 'db2'),
+    ('username', 'v'),
+])
+def test_pool_key_changes_with_any_field(field, value):
+    assert pool_key(dict(CONNECTION, **{field: value}), False) != pool_key(CONNECTION, False)
+
+
+def test_pool_key_separates_notice_sessions():
+    assert pool_key(CONNECTION, True) != pool_key(CONNECTION, False)
+
+
+def test_pool_key_does_not_expose_password():
+    key = pool_key(CONNECTION, False)
+    assert key[0] == 'producao'
+    assert all('s3cret' not in str(part) for part in key)
+
+
+def test_get_pool_reuses_pool_of_same_key():
+    key = pool_key(CONNECTION, False)
+    assert get_pool(key, FakeConnection) is get_pool(key, FakeConnection)
+
+
+def test_get_pool_closes_pools_of_edited_connection():
+    old_key = pool_key(CONNECTION, False)
+    old_notices_key = pool_key(CONNECTION, True)
+    other_key = pool_key(dict(CONNECTION, name='homologacao'), False)
+    old_pool = get_pool(old_key, FakeConnection)
+    old_notices_pool = get_pool(old_notices_key, FakeConnection)
+    other_pool = get_pool(other_key, FakeConnection)
+    idle = old_pool.acquire()
+    old_pool.release(idle)
+
+    new_pool = get_pool(pool_key(dict(CONNECTION, password='nova'), False), FakeConnection)
+
+    assert new_pool is not old_pool
+    assert idle.closed
+    for pool in (old_pool, old_notices_pool):
+        with pytest.raises(PoolTimeoutError):
+            pool.acquire(timeout=0)
+    assert get_pool(other_key, FakeConnection) is other_pool
+    assert get_pool(old_key, FakeConnection) is not old_pool
+
+
+def test_connection_id_uses_only_public_fields():
+    conn_id = connection_id(CONNECTION)
+
+    assert 's3cret' not in conn_id
+    assert conn_id == "producao||db|5432|bdgex|u"
+    assert connection_id(dict(CONNECTION, password='nova')) == conn_id
+    assert connection_id(dict(CONNECTION, port=5432)) == conn_id
+    assert connection_id(dict(CONNECTION, database='outro')) != conn_id
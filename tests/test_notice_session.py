@@ -0,0 +1,27 @@
+"""Testes do protocolo de progresso por RAISE NOTICE (parse_progress)."""
+import pytest
+
+from validador_regras.core.notice_session import parse_progress
+
+
+@pytest.mark.parametrize("message, expected", [
+    ("progress: 3/10 regra E", (3, 10, "regra E")),
+    ("NOTICE:  progress: 3/10 regra E\n", (3, 10, "regra E")),
+    ("progresso 7 / 20", (7, 20, "")),
+    ("PROGRESS=1/1 fim", (1, 1, "fim")),
+    ("progress: 15/10 além do total", (10, 10, "além do total")),
+    ("progress: 0/5", (0, 5, "")),
+])
+def test_parse_progress(message, expected):
+    assert parse_progress(message) == expected
+
+
+@pytest.mark.parametrize("message", [
+    "NOTICE:  tabela criada",
+    "progress: 3 de 10",
+    "progress: 1/0",
+    "sem progress: 1/2",
+    "",
+])
+def test_parse_progress_ignores_other_messages(message):
+    assert parse_progress(message) is None
@@ -0,0 +1,186 @@
+"""Testes do cache de resultados (descarte LRU, persistência e chaves)."""
+import json
+
+import pytest
+
+from validador_regras.core.result_cache import ResultCache
+
+CONNECTION = {'host': 'db', 'port': 5432, 'database': 'bdgex', 'username': 'u', 'password': 's3cret'}
+
+
+class FakeCursor:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, query, params=None):
+        self.conn.executed.append((query, params))
+
+    def fetchone(self):
+        return self.conn.results.pop(0)
+
+
+class FakeConnection:
+    """Conexão que devolve, em ordem, as linhas de cada fetchone()."""
+
+    def __init__(self, *results):
+        self.results = list(results)
+        self.executed = []
+        self.rollbacks = 0
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def rollback(self):
+        self.rollbacks += 1
+
+
+def _fingerprint(overloads=1, signature="val.fn()", code="c1", stats_reset="r1",
+                 counters="val.a:1:0:0:16400", review_tables=None):
+    return (overloads, signature, code, stats_reset, counters, review_tables)
+
+
+def _key(*results, connection=CONNECTION):
+    conn = FakeConnection(*results)
+    key = ResultCache.compute_key(conn, connection, "val", "fn")
+    assert conn.rollbacks == 1
+    return key
+
+
+# LRU e persistência
+
+def test_get_marks_entry_as_recent():
+    cache = ResultCache(max_entries=2)
+    cache.put("a", 1, [], 0.1)
+    cache.put("b", 2, [], 0.1)
+    assert cache.get("a")["row_count"] == 1
+
+    cache.put("c", 3, [], 0.1)
+
+    assert cache.get("b") is None
+    assert cache.get("a") is not None and cache.get("c") is not None
+
+
+def test_evicts_oldest_by_total_size():
+    rows = [["x" * 1000]]
+    entry_size = len(json.dumps({'row_count': 0, 'preview_rows': rows, 'elapsed': 0.1, 'created_at': 0.0}))
+    cache = ResultCache(max_entries=100, max_bytes=entry_size * 2 + entry_size // 2)
+    for key in ("a", "b", "c"):
+        cache.put(key, 0, rows, 0.1)
+
+    assert cache.get("a") is None
+    assert cache.get("b") is not None and cache.get("c") is not None
+
+
+def test_put_replaces_entry_without_double_counting():
+    cache = ResultCache(max_entries=10)
+    cache.put("a", 1, [["x" * 50]], None)
+    cache.put("a", 2, [["x" * 50]], None)
+
+    assert cache.get("a")["row_count"] == 2
+    assert list(cache._sizes) == ["a"]
+    assert cache._total_bytes == cache._sizes["a"]
+
+
+def test_invalidate_and_clear():
+    cache = ResultCache()
+    cache.put("a", 1, [], None)
+    cache.put("b", 1, [], None)
+
+    cache.invalidate("a")
+    assert cache.get("a") is None and cache.get("b") is not None
+
+    cache.clear()
+    assert cache.get("b") is None
+    assert cache._total_bytes == 0
+
+
+def test_persists_entries_and_order(tmp_path):
+    path = str(tmp_path / "cache" / "results.json")
+    cache = ResultCache(path, max_entries=2)
+    cache.put("a", 1, [(1, "x")], 0.5)
+    cache.put("b", 2, [], 0.5)
+    cache.get("a")
+
+    reloaded = ResultCache(path, max_entries=2)
+    assert reloaded.get("a")["preview_rows"] == [["1", "x"]]
+
+    # "b" continua sendo a menos recente depois de recarregar
+    reloaded.put("c", 3, [], 0.5)
+    assert ResultCache(path).get("b") is None
+
+
+def test_corrupt_file_is_ignored(tmp_path):
+    path = tmp_path / "results.json"
+    path.write_text("{not json")
+    cache = ResultCache(str(path))
+
+    assert cache.get("a") is None
+    cache.put("a", 1, [], None)
+    assert ResultCache(str(path)).get("a") is not None
+
+
+# Chaves
+
+def test_compute_key_is_stable():
+    assert _key(_fingerprint()) == _key(_fingerprint())
+
+
+@pytest.mark.parametrize("change", [
+    {'signature': "val.fn(integer DEFAULT 1)"},
+    {'code': "c2"},
+    {'stats_reset': "r2"},
+    {'counters': "val.a:2:0:0:16400"},
+    {'counters': "val.a:1:0:0:16401"},
+])
+def test_compute_key_changes_with_fingerprint(change):
+    assert _key(_fingerprint(**change)) != _key(_fingerprint())
+
+
+def test_compute_key_changes_with_server_not_password():
+    other_server = dict(CONNECTION, host='db2')
+    other_password = dict(CONNECTION, password='outra')
+
+    assert _key(_fingerprint(), connection=other_server) != _key(_fingerprint())
+    assert _key(_fingerprint(), connection=other_password) == _key(_fingerprint())
+
+
+@pytest.mark.parametrize("overloads", [0, 2])
+def test_compute_key_skips_missing_or_ambiguous_function(overloads):
+    assert _key(_fingerprint(overloads=overloads)) is None
+
+
+def test_compute_key_skips_missing_review_table():
+    review = ["aux_revisao_e", "aux_revisao_o"]
+    assert _key(_fingerprint(review_tables=review), ("val.aux_revisao_e",), (True,), (None,)) is None
+
+
+def test_compute_key_skips_empty_review_table():
+    review = ["aux_revisao_e"]
+    assert _key(_fingerprint(review_tables=review), ("val.aux_revisao_e",), (False,)) is None
+
+
+def test_compute_key_with_filled_review_tables():
+    review = ["aux_revisao_e"]
+    key = _key(_fingerprint(review_tables=review), ("val.aux_revisao_e",), (True,))
+
+    assert key is not None
+    # As tabelas de revisão não mudam a chave, só decidem se há cache
+    assert key == _key(_fingerprint())
+
+
+def test_compute_tables_key_depends_on_identity_and_counters():
+    def key(identity, counters):
+        conn = FakeConnection(("r1", counters))
+        result = ResultCache.compute_tables_key(conn, CONNECTION, identity, [("val", "a"), ("val", "b")])
+        assert conn.executed[-1][1] == (["val", "val"], ["a", "b"])
+        return result
+
+    assert key("E|a|b", "val.a:1") == key("E|a|b", "val.a:1")
+    assert key("E|a|b", "val.a:1") != key("O|a|b", "val.a:1")
+    assert key("E|a|b", "val.a:1") != key("E|a|b", "val.a:2")
@@ -0,0 +1,137 @@
+"""Testes do SQL gerado pelas regras (ordem dos parâmetros e convenção bbox)."""
+import re
+
+import pytest
+
+pytest.importorskip("psycopg2")
+
+from validador_regras.core.dbapi import sql  # noqa: E402
+from validador_regras.core.rule_engine import RuleBatch, RuleUnit, SpatialRule  # noqa: E402
+
+BBOX = (0.0, 10.0, 100.0, 110.0, 4674)
+
+
+def _flatten(composable) -> str:
+    """Texto do Composable sem conexão (sql.Composable.as_string exige uma)."""
+    if isinstance(composable, sql.Composed):
+        return "".join(_flatten(part) for part in composable.seq)
+    if isinstance(composable, sql.SQL):
+        return composable.string
+    if isinstance(composable, sql.Identifier):
+        return ".".join('"' + part.replace('"', '""') + '"' for part in composable.strings)
+    if isinstance(composable, sql.Literal):
+        return _literal(composable.wrapped)
+    if isinstance(composable, sql.Placeholder):
+        return "%s"
+    raise TypeError(composable)
+
+
+def _literal(value) -> str:
+    if isinstance(value, str):
+        return "'" + value.replace("'", "''") + "'"
+    return str(value)
+
+
+def render(query, params) -> str:
+    """Substitui cada ``%s`` pelo parâmetro da mesma posição, como o psycopg2."""
+    parts = re.split(r"(%%|%s)", _flatten(query))
+    placeholders = sum(1 for part in parts if part == "%s")
+    assert placeholders == len(params)
+    values = iter(params)
+    return "".join(
+        _literal(next(values)) if part == "%s" else "%" if part == "%%" else part
+        for part in parts
+    )
+
+
+def _unit(key, source_code=None, target_code=None, attribute_rule=None, rule_type="E", srid=4674):
+    rule = SpatialRule("spatial_rules", rule_type, "edificacao", "via", source_code, target_code, attribute_rule)
+    return RuleUnit("val", rule, key, ("geom", srid), ("geom", srid))
+
+
+def test_batch_params_follow_placeholders():
+    batch = RuleBatch([
+        _unit("k1", source_code="S1", target_code="T2"),
+        _unit("k2", source_code="S2", target_code="T1", attribute_rule="a.nome LIKE 'Av%'"),
+        _unit("k3", source_code="S1", target_code="T1"),
+    ])
+
+    text = render(*batch.build_insert())
+
+    assert "SELECT r.rule_key, r.rule_table, 'E', 'edificacao', r.source_code, 'via', r.target_code" in text
+    assert (
+        "bool_or(a.\"codigo\" = 'T2') AS \"m0\", "
+        "bool_or(a.\"codigo\" = 'T1' AND (a.nome LIKE 'Av%')) AS \"m1\", "
+        "bool_or(a.\"codigo\" = 'T1') AS \"m2\""
+    ) in text
+    assert "a.\"codigo\" IN ('T1', 'T2') AND ST_Intersects(b.\"geom\", a.\"geom\")" in text
+    assert (
+        "VALUES ('k1', 'spatial_rules', 'S1', 'T2', b.\"codigo\" = 'S1', coalesce(m.\"m0\", false)), "
+        "('k2', 'spatial_rules', 'S2', 'T1', b.\"codigo\" = 'S2', coalesce(m.\"m1\", false)), "
+        "('k3', 'spatial_rules', 'S1', 'T1', b.\"codigo\" = 'S1', coalesce(m.\"m2\", false))"
+    ) in text
+    assert text.endswith("WHERE b.\"codigo\" IN ('S1', 'S2')")
+    assert "ON r.applies AND NOT r.matched" in text
+
+
+def test_batch_with_integer_codes():
+    batch = RuleBatch([_unit("k1", source_code=2, target_code=10), _unit("k2", source_code=1, target_code=10)])
+
+    text = render(*batch.build_insert())
+
+    assert "a.\"codigo\" IN (10)" in text
+    assert "bool_or(a.\"codigo\" = 10) AS \"m0\"" in text
+    assert "('k1', 'spatial_rules', 2, 10, b.\"codigo\" = 2, " in text
+    assert text.endswith("WHERE b.\"codigo\" IN (1, 2)")
+
+
+def test_batch_without_codes_skips_code_filters():
+    batch = RuleBatch([
+        _unit("k1", rule_type="O"),
+        _unit("k2", source_code="S1", target_code="T1", rule_type="O"),
+    ])
+
+    query, params = batch.build_insert()
+    text = render(query, params)
+
+    assert params[:3] == ["O", "edificacao", "via"]
+    assert "count(*) > 0 AS \"m0\"" in text
+    assert " IN (" not in text
+    assert "('k1', 'spatial_rules', None, None, true, coalesce(m.\"m0\", false))" in text
+    assert "ON r.applies AND r.matched WHERE true" in text
+
+
+def test_batch_bbox_params_come_last():
+    batch = RuleBatch([_unit("k1", source_code="S1"), _unit("k2", source_code="S2")])
+
+    query, params = batch.build_insert(BBOX)
+    text = render(query, params)
+
+    assert params[-10:] == [0.0, 10.0, 100.0, 110.0, 4674, 4674, 0.0, 100.0, 10.0, 110.0]
+    assert text.endswith(
+        "WHERE b.\"codigo\" IN ('S1', 'S2') AND "
+        "b.\"geom\" && ST_Transform(ST_MakeEnvelope(0.0, 10.0, 100.0, 110.0, 4674), 4674) AND "
+        "ST_X(ST_PointOnSurface(b.\"geom\")) >= 0.0 AND ST_X(ST_PointOnSurface(b.\"geom\")) < 100.0 AND "
+        "ST_Y(ST_PointOnSurface(b.\"geom\")) >= 10.0 AND ST_Y(ST_PointOnSurface(b.\"geom\")) < 110.0"
+    )
+
+
+def test_bbox_in_other_srid_compares_in_bbox_srid():
+    unit = _unit("k1", srid=31983)
+
+    condition, params = unit._in_bbox(sql.Identifier("geom"), 31983, BBOX)
+    text = render(condition, params)
+
+    assert "\"geom\" && ST_Transform(ST_MakeEnvelope(0.0, 10.0, 100.0, 110.0, 4674), 31983)" in text
+    assert "ST_X(ST_Transform(ST_PointOnSurface(\"geom\"), 4674)) >= 0.0" in text
+    assert "ST_Y(ST_Transform(ST_PointOnSurface(\"geom\"), 4674)) < 110.0" in text
+
+
+def test_unit_params_follow_placeholders():
+    unit = _unit("k1", source_code="S1", target_code="T1", attribute_rule="a.tipo = 'x'")
+
+    text = render(*unit.build_insert(BBOX))
+
+    assert "SELECT 'k1', 'spatial_rules', 'E', 'edificacao', 'S1', 'via', 'T1', b.\"id\"::text" in text
+    assert "WHERE b.\"codigo\" = 'S1' AND b.\"geom\" && " in text
+    assert "a.\"codigo\" = 'T1' AND ST_Intersects(b.\"geom\", a.\"geom\") AND (a.tipo = 'x')" in text
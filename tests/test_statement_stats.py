@@ -0,0 +1,79 @@
+"""Testes do relatório de pg_stat_statements (StatementStatsCollector.report)."""
+from validador_regras.core.statement_stats import StatementStatsCollector, StatsSnapshot
+
+
+def _snapshot(statements=None, tables=None, warnings=None):
+    return StatsSnapshot(statements or {}, tables or {}, warnings or [])
+
+
+def test_report_subtracts_counters():
+    before = _snapshot({1: ("SELECT 1", 10, 100.0, 10, 50, 5)})
+    after = _snapshot({1: ("SELECT 1", 14, 180.0, 30, 90, 7)})
+
+    [statement] = StatementStatsCollector().report(before, after).statements
+
+    assert (statement.queryid, statement.calls, statement.total_time) == (1, 4, 80.0)
+    assert (statement.rows, statement.shared_blks_hit, statement.shared_blks_read) == (20, 40, 2)
+    assert statement.mean_time == 20.0
+
+
+def test_report_keeps_only_statements_called_during_execution():
+    before = _snapshot({1: ("a", 3, 9.0, 0, 0, 0), 2: ("b", 1, 1.0, 0, 0, 0)})
+    after = _snapshot({1: ("a", 3, 9.0, 0, 0, 0), 2: ("b", 2, 3.0, 0, 0, 0), 3: ("c", 1, 0.5, 1, 0, 0)})
+
+    report = StatementStatsCollector().report(before, after)
+
+    assert [s.queryid for s in report.statements] == [2, 3]
+    assert report.statements[1].calls == 1
+
+
+def test_report_uses_current_values_after_reset():
+    before = _snapshot({1: ("a", 100, 5000.0, 100, 100, 100)})
+    after = _snapshot({1: ("a", 2, 30.0, 4, 6, 8)})
+
+    [statement] = StatementStatsCollector().report(before, after).statements
+
+    assert (statement.calls, statement.total_time, statement.rows) == (2, 30.0, 4)
+    assert (statement.shared_blks_hit, statement.shared_blks_read) == (6, 8)
+
+
+def test_report_orders_by_total_time_and_limits_top_n():
+    after = _snapshot({queryid: (f"q{queryid}", 1, float(queryid), 0, 0, 0) for queryid in range(1, 8)})
+
+    report = StatementStatsCollector(top_n=3).report(_snapshot(), after)
+
+    assert [s.queryid for s in report.statements] == [7, 6, 5]
+
+
+def test_report_tables_by_disk_reads():
+    before = _snapshot(tables={'val.a': (10, 10, 0, 0), 'val.b': (0, 0, 0, 0), 'val.c': (5, 5, 5, 5)})
+    after = _snapshot(tables={
+        'val.a': (12, 500, 0, 0),    # 2 lidos
+        'val.b': (0, 10, 9, 10),     # 9 lidos
+        'val.c': (5, 5, 5, 5),       # sem acesso
+        'val.d': (2, 0, 0, 1000),    # 2 lidos, mais blocos que a
+    })
+
+    tables = StatementStatsCollector().report(before, after).tables
+
+    assert [t.table for t in tables] == ['val.b', 'val.d', 'val.a']
+    assert (tables[2].heap_blks_read, tables[2].heap_blks_hit, tables[2].blocks) == (2, 490, 492)
+
+
+def test_report_ignores_negative_table_deltas():
+    before = _snapshot(tables={'val.a': (100, 100, 100, 100)})
+    after = _snapshot(tables={'val.a': (1, 2, 150, 100)})
+
+    [table] = StatementStatsCollector().report(before, after).tables
+
+    assert (table.heap_blks_read, table.heap_blks_hit, table.idx_blks_read, table.idx_blks_hit) == (0, 0, 50, 0)
+
+
+def test_report_merges_warnings_without_repeating():
+    before = _snapshot(warnings=["sem track=all", "sem extensão"])
+    after = _snapshot(warnings=["sem extensão", "outro"])
+
+    report = StatementStatsCollector().report(before, after)
+
+    assert report.warnings == ["sem track=all", "sem extensão", "outro"]
+    assert report.format_lines()[:3] == report.warnings
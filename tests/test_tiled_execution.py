@@ -0,0 +1,90 @@
+"""Testes da grade de tiles (TilePlanner._grid e Tile.split)."""
+import itertools
+
+import pytest
+
+from validador_regras.core.tiled_execution import Tile, TilePlanner
+
+
+def _area(tile):
+    return (tile.xmax - tile.xmin) * (tile.ymax - tile.ymin)
+
+
+def _overlap(a, b):
+    width = min(a.xmax, b.xmax) - max(a.xmin, b.xmin)
+    height = min(a.ymax, b.ymax) - max(a.ymin, b.ymin)
+    return max(0.0, width) * max(0.0, height)
+
+
+def _owner(tiles, x, y):
+    """Tiles donos do ponto pela convenção bbox (bordas máximas excluídas)."""
+    return [t for t in tiles if t.xmin <= x < t.xmax and t.ymin <= y < t.ymax]
+
+
+@pytest.mark.parametrize("extent, features, target, max_tiles", [
+    (Tile(0, 0, 100, 100), 1_000_000, 50_000, 256),
+    (Tile(0, 0, 200, 100), 10 ** 9, 1, 256),
+    (Tile(-180, -90, 180, 90), 123_457, 10_000, 64),
+    (Tile(0, 0, 4, 1), 5, 1, 5),
+    (Tile(0, 0, 1000, 1), 3, 1, 3),
+    (Tile(0, 0, 1, 1000), 7, 1, 256),
+    (Tile(10, 10, 10, 10), 500, 1, 16),
+])
+def test_grid_covers_extent_without_overlap(extent, features, target, max_tiles):
+    tiles = TilePlanner(target_features_per_tile=target, max_tiles=max_tiles)._grid(extent, features)
+
+    assert 1 <= len(tiles) <= max_tiles
+    for a, b in itertools.combinations(tiles, 2):
+        assert _overlap(a, b) == pytest.approx(0.0, abs=1e-9)
+    if _area(extent):
+        assert sum(_area(t) for t in tiles) == pytest.approx(_area(extent))
+
+
+def test_grid_outer_edges_match_extent_exactly():
+    extent = Tile(0.1, 0.2, 0.7, 1.3)
+    tiles = TilePlanner(target_features_per_tile=1, max_tiles=9)._grid(extent, 9)
+
+    assert min(t.xmin for t in tiles) == extent.xmin
+    assert min(t.ymin for t in tiles) == extent.ymin
+    # Sem erro de arredondamento na última coluna/linha
+    assert max(t.xmax for t in tiles) == extent.xmax
+    assert max(t.ymax for t in tiles) == extent.ymax
+
+
+def test_grid_neighbours_share_edges():
+    tiles = TilePlanner(target_features_per_tile=1, max_tiles=12)._grid(Tile(0, 0, 0.3, 0.4), 12)
+    xs = {t.xmin for t in tiles} | {t.xmax for t in tiles}
+    ys = {t.ymin for t in tiles} | {t.ymax for t in tiles}
+
+    # Cada borda interna é o xmax de um tile e o xmin do vizinho, com o mesmo float
+    for tile in tiles:
+        assert tile.xmax in xs and tile.ymax in ys
+        if tile.xmax != 0.3:
+            assert any(other.xmin == tile.xmax for other in tiles)
+        if tile.ymax != 0.4:
+            assert any(other.ymin == tile.ymax for other in tiles)
+
+
+def test_grid_single_tile_when_few_features():
+    extent = Tile(0, 0, 10, 10)
+    assert TilePlanner(target_features_per_tile=100)._grid(extent, 99) == [Tile(0, 0, 10, 10)]
+
+
+def test_grid_interior_points_have_one_owner():
+    tiles = TilePlanner(target_features_per_tile=1, max_tiles=16)._grid(Tile(0, 0, 8, 8), 16)
+    for x, y in [(0, 0), (2, 2), (4, 3.999), (3.5, 6), (7.9, 0.1)]:
+        assert len(_owner(tiles, x, y)) == 1
+
+
+def test_split_quadrants_partition_tile():
+    tile = Tile(0, 0, 10, 6, depth=1)
+    children = tile.split()
+
+    assert len(children) == 4
+    assert all(child.depth == 2 for child in children)
+    assert sum(_area(child) for child in children) == pytest.approx(_area(tile))
+    for a, b in itertools.combinations(children, 2):
+        assert _overlap(a, b) == 0
+    # O ponto central pertence a um único quadrante
+    assert _owner(children, 5, 3) == [Tile(5, 3, 10, 6, 2)]
+    assert {(c.xmax, c.ymax) for c in children} >= {(10, 6)}
@@ -0,0 +1,466 @@
+"""
+/***************************************************************************
+ Validador de Regras PostGis
+                                 A QGIS plugin
+ 2ºCGEO
+                              -------------------
+        begin                : 2025-07-16
+        git sha              : $Format:%H$
+        copyright            : (C) 2025 by Godinho, Alvarez, Perrut
+        email                : estevezcodando@gmail.com
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+"""
+import argparse
+import fnmatch
+import json
+import logging
+import os
+import sys
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+EXIT_OK = 0
+EXIT_FINDINGS = 1
+EXIT_USAGE = 2
+EXIT_FAILED = 3
+EXIT_CONNECTION = 4
+EXIT_INTERRUPTED = 130
+
+EPILOG = """\
+exemplo:
+  python -m validador_regras.cli --service producao --schema validacao 'ICIS_*'
+  python -m validador_regras.cli --service producao --schema validacao --rules 'E:*'
+
+A senha segue as regras da libpq (PGPASSWORD, ~/.pgpass ou pg_service.conf).
+
+códigos de saída:
+  0    todas as funções executadas, nenhuma inconsistência apontada
+  1    alguma função apontou inconsistências (linhas com valor verdadeiro)
+  2    argumentos inválidos
+  3    alguma função falhou (erro SQL ou tempo limite) ou a exportação falhou
+  4    falha de conexão ou nenhuma função encontrada
+  130  interrompido (Ctrl+C)
+"""
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="python -m validador_regras.cli",
+        description="Executa funções de validação PostGIS e emite os resultados em JSON.",
+        epilog=EPILOG,
+        formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    connection = parser.add_argument_group("conexão (parâmetros da libpq)")
+    connection.add_argument("--service", help="Serviço do pg_service.conf")
+    connection.add_argument("--host")
+    connection.add_argument("--port")
+    connection.add_argument("--dbname")
+    connection.add_argument("--user")
+    connection.add_argument("--sslmode")
+    connection.add_argument("--name", help="Nome da conexão nos resultados (padrão: serviço ou host/banco)")
+
+    parser.add_argument("--schema", required=True, help="Schema das funções de validação")
+    parser.add_argument(
+        "functions", nargs="*", default=["*"],
+        help="Nomes ou padrões glob das funções (padrão: todas as executáveis sem argumentos)"
+    )
+    parser.add_argument(
+        "--rules", action="store_true",
+        help="Executa as regras das tabelas spatial_rules* (uma por linha) em vez das funções; "
+             "os padrões filtram as chaves das regras (tipo:base(código)->alvo(código))"
+    )
+    parser.add_argument(
+        "--batch", action="store_true",
+        help="Com --rules, avalia numa só junção espacial as regras do mesmo tipo e par base/alvo"
+    )
+    parser.add_argument("--code-column", default="codigo", help="Coluna do código da feição (com --rules)")
+    parser.add_argument("--id-column", default="id", help="Coluna identificadora da feição (com --rules)")
+    parser.add_argument(
+        "--preflight", action="store_true",
+        help="Verifica antes índices espaciais, estatísticas e tuplas mortas das tabelas base/alvo"
+    )
+    parser.add_argument(
+        "--preflight-fix", action="store_true",
+        help="Como --preflight, criando os índices (CONCURRENTLY) e executando ANALYZE onde preciso"
+    )
+    parser.add_argument(
+        "--export-dir",
+        help="Ao final, exporta as tabelas aux_revisao_* do schema para esta pasta (uma camada por arquivo)"
+    )
+    parser.add_argument(
+        "--export-format", choices=["gpkg", "parquet"], default="gpkg",
+        help="Formato de --export-dir: GeoPackage (requer GDAL) ou GeoParquet (requer pyarrow)"
+    )
+    parser.add_argument(
+        "--metrics-file",
+        help="Grava ao final as métricas de desempenho neste arquivo (coletor textfile do node exporter, *.prom)"
+    )
+    parser.add_argument(
+        "--metrics-format", choices=["prometheus", "openmetrics"], default="prometheus",
+        help="Formato de --metrics-file (padrão: texto do Prometheus)"
+    )
+    parser.add_argument(
+        "--trace-file",
+        help="Grava a linha do tempo da execução (Chrome Trace Event, abrir em ui.perfetto.dev ou chrome://tracing)"
+    )
+    parser.add_argument(
+        "--statement-stats", type=int, metavar="N", default=0,
+        help="Inclui no JSON as N instruções e tabelas mais custosas de cada função "
+             "(pg_stat_statements/pg_statio_user_tables; use -j 1 para números sem mistura)"
+    )
+    parser.add_argument(
+        "--history",
+        help="Registra cada execução neste histórico SQLite (o mesmo arquivo do plugin pode ser usado) "
+             "e inclui no JSON as execuções muito mais lentas que o habitual"
+    )
+    parser.add_argument(
+        "--regression-factor", type=float, default=3.0,
+        help="Com --history, quantas vezes a mediana do histórico caracteriza uma regressão (padrão: 3)"
+    )
+    parser.add_argument(
+        "--profile-dir",
+        help="Executa as funções com auto_explain (EXPLAIN ANALYZE das instruções internas), guarda os perfis "
+             "nesta pasta e inclui no JSON os problemas de plano e as mudanças desde o perfil anterior"
+    )
+    parser.add_argument("--retries", type=int, default=0, help="Novas tentativas após erro transitório")
+    parser.add_argument("-j", "--jobs", type=int, default=4, help="Execuções simultâneas (padrão: 4)")
+    parser.add_argument("--timeout", type=float, help="Tempo limite de cada função, em segundos")
+    parser.add_argument("-o", "--output", default="-", help="Arquivo JSON de saída (padrão: stdout)")
+    parser.add_argument("--list", action="store_true", help="Apenas lista as funções selecionadas")
+    parser.add_argument(
+        "--ignore-findings", action="store_true",
+        help="Não usa o código de saída 1 quando há inconsistências"
+    )
+    parser.add_argument("-v", "--verbose", action="store_true", help="Mostra o andamento em stderr")
+    return parser
+
+
+def connection_info_from_args(args) -> Dict[str, str]:
+    """Monta o dicionário de conexão usado pelos serviços do plugin."""
+    name = args.name or args.service or f"{args.host or 'localhost'}/{args.dbname or ''}"
+    return {
+        'name': name,
+        'host': args.host,
+        'port': args.port,
+        'database': args.dbname,
+        'username': args.user,
+        'password': None,
+        'service': args.service,
+        'sslmode': args.sslmode,
+    }
+
+
+def select_functions(available: List[str], patterns: List[str]) -> List[str]:
+    """Filtra as funções pelos padrões glob, na ordem dos padrões."""
+    selected = []
+    for pattern in patterns:
+        selected.extend(name for name in available if fnmatch.fnmatchcase(name, pattern))
+    return list(dict.fromkeys(selected))
+
+
+def _iso(moment: datetime) -> str:
+    return moment.isoformat(timespec="seconds")
+
+
+def _write_output(path: str, document: Dict):
+    text = json.dumps(document, ensure_ascii=False, indent=2, default=str)
+    if path == "-":
+        sys.stdout.write(text + "\n")
+    else:
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+
+
+def _run_preflight(args, connection_info, connection_service, advisor, targets, log) -> List[Dict]:
+    """Verifica (e opcionalmente corrige) as tabelas antes da execução."""
+    try:
+        with connection_service.connection(connection_info) as conn:
+            if args.rules:
+                tables = advisor.unit_tables(targets)
+                pairs = advisor.unit_pairs(targets)
+            else:
+                tables = advisor.discover_function_tables(conn, args.schema, targets)
+                pairs = advisor.discover_pairs(conn, args.schema, tables)
+            issues = advisor.inspect(conn, tables) + advisor.inspect_pairs(conn, args.schema, pairs)
+    except Exception as e:
+        print(f"Verificação prévia não concluída: {e}", file=sys.stderr)
+        return []
+
+    for issue in issues:
+        print(f"{issue.table}: {issue.detail}. Impacto: {issue.impact}.", file=sys.stderr)
+
+    fixed = {}
+    if args.preflight_fix:
+        for issue, success, message in advisor.fix(connection_info, issues, args.jobs, connection_service):
+            fixed[id(issue)] = success
+            log(message)
+
+    return [
+        {
+            'table': issue.table,
+            'kind': issue.kind,
+            'detail': issue.detail,
+            'impact': issue.impact,
+            'fixed': fixed.get(id(issue), False),
+        }
+        for issue in issues
+    ]
+
+
+def _export_review_tables(args, connection_info, connection_service, log) -> List[Dict]:
+    """Exporta as tabelas aux_revisao_* do schema em paralelo (uma por arquivo)."""
+    from .core.csv_export import list_review_tables
+    from .core.layer_export import LayerExporter, export_layers
+
+    try:
+        with connection_service.connection(connection_info) as conn:
+            tables = [table for table, _ in list_review_tables(conn, args.schema)]
+        os.makedirs(args.export_dir, exist_ok=True)
+        exporters = [
+            LayerExporter(
+                connection_info, args.schema, table,
+                os.path.join(args.export_dir, f"{table}.{args.export_format}"),
+                connection_service=connection_service
+            )
+            for table in tables
+        ]
+        log(f"Exportando {len(exporters)} tabela(s) aux_revisao_* para {args.export_dir}...")
+        export_layers(exporters, args.jobs)
+    except Exception as e:
+        print(f"Exportação não concluída: {e}", file=sys.stderr)
+        return []
+
+    return [
+        {
+            'table': exporter.source_name,
+            'file': exporter.file_path,
+            'rows': exporter.rows_written,
+            'elapsed': round(exporter.elapsed, 3) if exporter.elapsed is not None else None,
+            'error': exporter.error_message,
+        }
+        for exporter in exporters
+    ]
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = build_parser().parse_args(argv)
+    if args.jobs < 1:
+        print("--jobs deve ser pelo menos 1", file=sys.stderr)
+        return EXIT_USAGE
+    if args.batch and not args.rules:
+        print("--batch exige --rules", file=sys.stderr)
+        return EXIT_USAGE
+    if args.profile_dir and args.rules:
+        print("--profile-dir não se aplica a --rules", file=sys.stderr)
+        return EXIT_USAGE
+    if args.retries < 0:
+        print("--retries não pode ser negativo", file=sys.stderr)
+        return EXIT_USAGE
+
+    # Fora do QGIS os logs do núcleo vão para o módulo logging
+    logging.basicConfig(
+        level=logging.INFO if args.verbose else logging.WARNING,
+        format="%(asctime)s %(levelname)s %(name)s: %(message)s",
+        stream=sys.stderr
+    )
+
+    from .core.database_service import DatabaseConnectionService, FunctionService
+    from .core.suite_runner import SuiteRunner
+    from .core.rule_engine import RuleEngine, RuleEngineConfig, RuleSuiteRunner
+    from .core.batch_execution import STATUS_SUCCESS, STATUS_ERROR
+    from .core.connection_pool import close_all_pools
+    from .core.preflight import PreflightAdvisor
+
+    def log(message: str):
+        if args.verbose:
+            print(message, file=sys.stderr, flush=True)
+
+    if args.trace_file:
+        from .core.tracing import get_tracer
+        get_tracer().enable()
+
+    connection_info = connection_info_from_args(args)
+    connection_service = DatabaseConnectionService()
+    engine = None
+    preflight = []
+    exports = []
+    try:
+        try:
+            if args.rules:
+                config = RuleEngineConfig(code_column=args.code_column, id_column=args.id_column)
+                engine = RuleEngine(connection_info, args.schema, config, connection_service)
+                units = {unit.key: unit for unit in engine.load_units()}
+                available = list(units)
+            else:
+                with connection_service.connection(connection_info) as conn:
+                    functions = FunctionService(connection_service).list_functions(conn, args.schema)
+                available = [function['name'] for function in functions]
+        except Exception as e:
+            kind = "regras" if args.rules else "funções"
+            print(f"Falha ao listar {kind} de '{args.schema}': {e}", file=sys.stderr)
+            return EXIT_CONNECTION
+
+        names = select_functions(available, args.functions)
+        if not names:
+            kind = "regra" if args.rules else "função"
+            print(f"Nenhuma {kind} de '{args.schema}' corresponde a {args.functions}", file=sys.stderr)
+            return EXIT_CONNECTION
+
+        # Funções: um item por sobrecarga (nome e argumentos de identidade)
+        targets = names if engine is not None else [
+            (function['name'], function['signature'])
+            for name in names for function in functions if function['name'] == name
+        ]
+
+        if args.list:
+            for target in targets:
+                print(target if isinstance(target, str) else f"{target[0]}({target[1]})")
+            return EXIT_OK
+
+        def on_item_finished(item):
+            detail = f" - {item.error_message}" if item.error_message else ""
+            log(f"{args.schema}.{item.key}: {item.status} "
+                f"({item.elapsed or 0:.1f}s, {item.findings} inconsistência(s)){detail}")
+
+        options = dict(
+            max_workers=args.jobs,
+            statement_timeout=int(args.timeout * 1000) if args.timeout else None,
+            on_item_finished=on_item_finished,
+            notice_callback=lambda function, message: log(f"{function}: {message}"),
+            retries=args.retries
+        )
+        if args.statement_stats > 0:
+            from .core.statement_stats import StatementStatsCollector
+            options['statement_stats'] = StatementStatsCollector(args.statement_stats)
+        if args.history:
+            from .core.execution_history import ExecutionHistory
+            try:
+                options['history'] = ExecutionHistory(args.history, regression_factor=args.regression_factor)
+            except Exception as e:
+                print(f"Não foi possível abrir o histórico {args.history}: {e}", file=sys.stderr)
+                return EXIT_USAGE
+        if args.preflight or args.preflight_fix:
+            preflight = _run_preflight(
+                args, connection_info, connection_service, PreflightAdvisor(),
+                [units[name] for name in names] if engine is not None else names, log
+            )
+
+        if engine is not None:
+            selected = [units[name] for name in names]
+            if args.batch:
+                selected = engine.batch_units(selected)
+            try:
+                engine.prepare(selected)
+            except Exception as e:
+                print(f"Falha ao preparar as tabelas aux_revisao_* de '{args.schema}': {e}", file=sys.stderr)
+                return EXIT_CONNECTION
+            runner = RuleSuiteRunner(engine, selected, **options)
+        elif args.profile_dir:
+            from .core.plan_profile import ProfileStore, ProfileSuiteRunner
+            runner = ProfileSuiteRunner(
+                connection_info, args.schema, targets, profile_store=ProfileStore(args.profile_dir), **options
+            )
+        else:
+            runner = SuiteRunner(connection_info, args.schema, targets, **options)
+        log(f"Executando {len(targets)} função(ões) de '{args.schema}' com {args.jobs} em paralelo...")
+
+        started_at = datetime.now(timezone.utc)
+        summary = runner.run()
+        finished_at = datetime.now(timezone.utc)
+
+        if args.export_dir and not runner.interrupted:
+            exports = _export_review_tables(args, connection_info, connection_service, log)
+
+        if args.metrics_file:
+            from .core.metrics import get_registry
+            try:
+                get_registry().write_textfile(args.metrics_file, openmetrics=args.metrics_format == "openmetrics")
+            except OSError as e:
+                print(f"Não foi possível gravar as métricas em {args.metrics_file}: {e}", file=sys.stderr)
+        if args.trace_file:
+            try:
+                get_tracer().write(args.trace_file)
+            except OSError as e:
+                print(f"Não foi possível gravar a linha do tempo em {args.trace_file}: {e}", file=sys.stderr)
+    finally:
+        close_all_pools()
+
+    def profile_of(item) -> Optional[Dict]:
+        executor = getattr(runner, 'profiles', {}).get(item.key)
+        if executor is None or executor.profile is None:
+            return None
+        return dict(executor.profile.to_dict(), diff=executor.plan_diff)
+
+    def regression_of(item) -> Optional[Dict]:
+        if item.regression is None:
+            return None
+        baseline = item.regression.baseline
+        return {
+            'elapsed': round(item.regression.elapsed, 3),
+            'factor': item.regression.factor,
+            'runs': baseline.count,
+            'p50': round(baseline.p50, 3),
+            'p95': round(baseline.p95, 3),
+            'max': round(baseline.maximum, 3),
+        }
+
+    document = {
+        'connection': connection_info['name'],
+        'schema': args.schema,
+        'started_at': _iso(started_at),
+        'finished_at': _iso(finished_at),
+        'elapsed': round(summary.elapsed, 3),
+        'mode': ('rules-batch' if args.batch else 'rules') if args.rules else 'functions',
+        'jobs': args.jobs,
+        'statement_timeout': args.timeout,
+        'interrupted': runner.interrupted,
+        'preflight': preflight,
+        'exports': exports,
+        'summary': {
+            'total': len(summary.items),
+            'succeeded': summary.succeeded,
+            'failed': summary.failed,
+            'cancelled': summary.cancelled,
+            'with_findings': sum(1 for item in summary.items if item.findings),
+            'findings': sum(item.findings for item in summary.items),
+        },
+        'results': [
+            {
+                'function': item.function_name,
+                'signature': item.signature,
+                'status': item.status,
+                'elapsed': round(item.elapsed, 3) if item.elapsed is not None else None,
+                'row_count': item.row_count,
+                'findings': item.findings,
+                'timed_out': item.timed_out,
+                'attempts': item.attempts,
+                'error': item.error_message,
+                'statements': item.statement_report.to_dict() if item.statement_report is not None else None,
+                'profile': profile_of(item),
+                'regression': regression_of(item),
+            }
+            for item in summary.items
+        ],
+    }
+    _write_output(args.output, document)
+
+    if runner.interrupted:
+        return EXIT_INTERRUPTED
+    if any(item.status == STATUS_ERROR for item in summary.items) or any(export['error'] for export in exports):
+        return EXIT_FAILED
+    if not args.ignore_findings and any(item.findings for item in summary.items if item.status == STATUS_SUCCESS):
+        return EXIT_FINDINGS
+    return EXIT_OK
+
+
+if __name__ == "__main__":
+    sys.exit(main())
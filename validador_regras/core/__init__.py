@@ -20,4 +20,69 @@
  *                                                                         *
  ***************************************************************************/
 """
+import importlib
+from typing import Callable, Dict
 
+# Classes públicas do núcleo, importadas só quando usadas: importar o pacote
+# não carrega QGIS, Qt nem o driver do banco.
+_EXPORTS = {
+    'DatabaseConnectionService': '.database_service',
+    'SchemaService': '.database_service',
+    'FunctionService': '.database_service',
+    'FunctionExecutor': '.function_executor',
+    'SuiteRunner': '.suite_runner',
+    'ResultCache': '.result_cache',
+    'CatalogCache': '.catalog_cache',
+    'CatalogService': '.catalog_cache',
+    'ChangeTrackingService': '.incremental_validation',
+    'IncrementalExecutor': '.incremental_validation',
+    'TilePlanner': '.tiled_execution',
+    'RuleEngine': '.rule_engine',
+    'RuleUnit': '.rule_engine',
+    'PreflightAdvisor': '.preflight',
+    'CsvExporter': '.csv_export',
+    'LayerExporter': '.layer_export',
+    'MetricsRegistry': '.metrics',
+    'ExecutionHistory': '.execution_history',
+    'Tracer': '.tracing',
+    'get_tracer': '.tracing',
+    'ProfileExecutor': '.plan_profile',
+    'LogLevel': '.logger',
+    'log_message': '.logger',
+    'set_logger': '.logger',
+    'set_settings': '.settings',
+    # Dependem do QGIS/Qt
+    'FunctionExecutionTask': '.tasks',
+    'IncrementalExecutionTask': '.tasks',
+    'TilePlanningTask': '.tasks',
+    'CatalogRefreshTask': '.tasks',
+    'PreflightTask': '.tasks',
+    'PreflightFixTask': '.tasks',
+    'ReviewTablesTask': '.tasks',
+    'CsvExportTask': '.tasks',
+    'LayerExportTask': '.tasks',
+    'ProfileExecutionTask': '.tasks',
+    'BackendCanceller': '.tasks',
+    'BatchExecutionController': '.controllers',
+    'TiledExecutionController': '.controllers',
+}
+
+
+def lazy_getattr(module_name: str, exports: Dict[str, str]) -> Callable:
+    """
+    Cria o ``__getattr__`` (PEP 562) de um módulo que reexporta, sob demanda,
+    nomes definidos em outros módulos do núcleo.
+
+    Args:
+        module_name: Nome do módulo que reexporta (para a mensagem de erro)
+        exports: Nome -> módulo relativo ao núcleo onde está definido
+    """
+    def __getattr__(name):
+        if name in exports:
+            return getattr(importlib.import_module(exports[name], __name__), name)
+        raise AttributeError(f"module {module_name!r} has no attribute {name!r}")
+    return __getattr__
+
+
+__getattr__ = lazy_getattr(__name__, _EXPORTS)
+__all__ = list(_EXPORTS)
@@ -0,0 +1,106 @@
+"""
+/***************************************************************************
+ Validador de Regras PostGis
+                                 A QGIS plugin
+ 2ºCGEO
+                              -------------------
+        begin                : 2025-07-16
+        git sha              : $Format:%H$
+        copyright            : (C) 2025 by Godinho, Alvarez, Perrut
+        email                : estevezcodando@gmail.com
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+"""
+import time
+from typing import Dict, Optional, Tuple
+
+from . import lazy_getattr
+
+
+def _backend_state(cur, pid: int) -> Optional[str]:
+    cur.execute("SELECT state FROM pg_stat_activity WHERE pid = %s", (pid,))
+    row = cur.fetchone()
+    return row[0] if row else None
+
+
+def _backend_active(cur, pid: int) -> bool:
+    return _backend_state(cur, pid) == 'active'
+
+
+def _wait_until_idle(cur, pid: int, timeout: float, poll_interval: float) -> bool:
+    deadline = time.monotonic() + timeout
+    while True:
+        if not _backend_active(cur, pid):
+            return True
+        if time.monotonic() >= deadline:
+            return False
+        time.sleep(poll_interval)
+
+
+def cancel_backend(
+    connection_info: Dict[str, str],
+    pid: int,
+    grace_period: float = 5.0,
+    terminate_timeout: float = 10.0,
+    poll_interval: float = 0.2
+) -> Tuple[bool, str]:
+    """
+    Interrompe no servidor a consulta de um backend, por uma conexão de controle.
+
+    Primeiro pede ``pg_cancel_backend``; se o backend continuar ativo após
+    ``grace_period`` segundos, encerra a sessão com ``pg_terminate_backend``.
+
+    Um backend ``idle in transaction`` ainda não foi interrompido: está entre
+    duas instruções da execução e a próxima (a chamada da função) pode
+    começar a seguir. Ele é acompanhado por até ``grace_period`` segundos,
+    até encerrar a transação ou iniciar a instrução, que então é cancelada.
+
+    Args:
+        connection_info: Informações da conexão
+        pid: PID do backend a interromper
+        grace_period: Espera após o cancelamento antes de encerrar a sessão
+        terminate_timeout: Espera máxima pela confirmação do encerramento
+        poll_interval: Intervalo entre consultas a pg_stat_activity
+
+    Returns:
+        (True se o servidor confirmou que a consulta não está mais ativa, mensagem)
+    """
+    from .database_service import DatabaseConnectionService
+
+    conn = DatabaseConnectionService().create_dbapi_connection(connection_info, connect_timeout=10)
+    try:
+        conn.autocommit = True
+        with conn.cursor() as cur:
+            deadline = time.monotonic() + grace_period
+            state = _backend_state(cur, pid)
+            while state == 'idle in transaction' and time.monotonic() < deadline:
+                time.sleep(poll_interval)
+                state = _backend_state(cur, pid)
+            if state == 'idle in transaction':
+                return False, f"Backend {pid} continua com a transação aberta; cancelamento não confirmado."
+            if state != 'active':
+                return True, f"Backend {pid} já não executava consultas."
+
+            cur.execute("SELECT pg_cancel_backend(%s)", (pid,))
+            if _wait_until_idle(cur, pid, grace_period, poll_interval):
+                return True, f"Consulta do backend {pid} cancelada no servidor (pg_cancel_backend)."
+
+            cur.execute("SELECT pg_terminate_backend(%s)", (pid,))
+            if _wait_until_idle(cur, pid, terminate_timeout, poll_interval):
+                return True, f"Sessão do backend {pid} encerrada no servidor (pg_terminate_backend)."
+
+            return False, f"Backend {pid} continua ativo após pg_terminate_backend."
+    finally:
+        conn.close()
+
+
+# Classes que dependem do QGIS/Qt, carregadas só quando pedidas
+__getattr__ = lazy_getattr(__name__, {'BackendCanceller': '.tasks'})
@@ -0,0 +1,142 @@
+"""
+/***************************************************************************
+ Validador de Regras PostGis
+                                 A QGIS plugin
+ 2ºCGEO
+                              -------------------
+        begin                : 2025-07-16
+        git sha              : $Format:%H$
+        copyright            : (C) 2025 by Godinho, Alvarez, Perrut
+        email                : estevezcodando@gmail.com
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+"""
+import time
+from dataclasses import dataclass, field
+from typing import List, Optional, Tuple, Union
+
+from . import lazy_getattr
+
+# Estados possíveis de cada função do lote
+STATUS_PENDING = "pendente"
+STATUS_RUNNING = "executando"
+STATUS_SUCCESS = "sucesso"
+STATUS_ERROR = "erro"
+STATUS_CANCELLED = "cancelada"
+
+
+@dataclass
+class BatchItemResult:
+    """
+    Estado e tempo de execução de uma função dentro de um lote.
+    """
+    function_name: str
+    status: str = STATUS_PENDING
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    row_count: int = 0
+    error_message: Optional[str] = None
+    cache_hit: bool = False
+    # Linhas do resultado com algum valor verdadeiro (inconsistências apontadas)
+    findings: int = 0
+    timed_out: bool = False
+    # Tentativas feitas (novas tentativas só após erros transitórios)
+    attempts: int = 0
+    # StatementReport da última tentativa, quando o lote coleta pg_stat_statements
+    statement_report: Optional[object] = None
+    # Regression quando o histórico apontou lentidão fora do comum
+    regression: Optional[object] = None
+    # Argumentos de identidade (pg_get_function_identity_arguments) da sobrecarga
+    signature: Optional[str] = None
+
+    @property
+    def key(self) -> str:
+        """Identificador do item no lote: sobrecargas de mesmo nome não se confundem."""
+        if self.signature is None:
+            return self.function_name
+        return f"{self.function_name}({self.signature})"
+
+    @property
+    def elapsed(self) -> Optional[float]:
+        if self.started_at is None:
+            return None
+        end = self.finished_at if self.finished_at is not None else time.monotonic()
+        return end - self.started_at
+
+
+def batch_items(functions: List[Union[str, Tuple[str, str]]]) -> List[BatchItemResult]:
+    """
+    Itens de um lote, sem repetições.
+
+    Args:
+        functions: Nomes ou pares (nome, argumentos de identidade); use os
+            pares quando houver sobrecargas
+    """
+    items = {}
+    for function in functions:
+        if isinstance(function, str):
+            item = BatchItemResult(function)
+        else:
+            item = BatchItemResult(function[0], signature=function[1])
+        items.setdefault(item.key, item)
+    return list(items.values())
+
+
+@dataclass
+class BatchSummary:
+    """
+    Resumo agregado de um lote de execuções.
+    """
+    schema_name: str
+    items: List[BatchItemResult] = field(default_factory=list)
+    elapsed: float = 0.0
+
+    def count(self, status: str) -> int:
+        return sum(1 for item in self.items if item.status == status)
+
+    @property
+    def succeeded(self) -> int:
+        return self.count(STATUS_SUCCESS)
+
+    @property
+    def failed(self) -> int:
+        return self.count(STATUS_ERROR)
+
+    @property
+    def cancelled(self) -> int:
+        return self.count(STATUS_CANCELLED)
+
+    def format_lines(self) -> List[str]:
+        """
+        Formata o resumo em linhas de texto para o log.
+
+        Returns:
+            Lista de linhas, uma por função, seguida do total
+        """
+        lines = []
+        for item in self.items:
+            elapsed = f"{item.elapsed:.1f}s" if item.elapsed is not None else "-"
+            detail = f" - {item.error_message}" if item.error_message else ""
+            if item.cache_hit:
+                detail += " [cache]"
+            lines.append(
+                f"  {self.schema_name}.{item.key}: {item.status} "
+                f"({elapsed}, {item.row_count} registro(s)){detail}"
+            )
+        lines.append(
+            f"Lote finalizado em {self.elapsed:.1f}s: {self.succeeded} sucesso(s), "
+            f"{self.failed} erro(s), {self.cancelled} cancelada(s) de {len(self.items)} função(ões)."
+        )
+        return lines
+
+
+# Classes que dependem do QGIS/Qt, carregadas só quando pedidas
+__getattr__ = lazy_getattr(__name__, {'BatchExecutionController': '.controllers'})
@@ -0,0 +1,223 @@
+"""
+/***************************************************************************
+ Validador de Regras PostGis
+                                 A QGIS plugin
+ 2ºCGEO
+                              -------------------
+        begin                : 2025-07-16
+        git sha              : $Format:%H$
+        copyright            : (C) 2025 by Godinho, Alvarez, Perrut
+        email                : estevezcodando@gmail.com
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+"""
+import json
+import os
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from . import lazy_getattr
+from .logger import log_message, LogLevel
+
+# Tokens de mudança: hash de (oid, xmin) das linhas do catálogo. Qualquer
+# CREATE/ALTER/DROP/GRANT reescreve a linha e altera o xmin.
+_SCHEMAS_TOKEN_SQL = r"""
+SELECT md5(COALESCE(string_agg(oid::text || ':' || xmin::text, ',' ORDER BY oid), ''))
+FROM pg_namespace
+WHERE nspname <> 'information_schema' AND nspname NOT LIKE 'pg\_%'
+"""
+
+_FUNCTIONS_TOKEN_SQL = """
+SELECT md5(COALESCE(string_agg(p.oid::text || ':' || p.xmin::text, ',' ORDER BY p.oid), ''))
+FROM pg_proc p
+JOIN pg_namespace n ON n.oid = p.pronamespace
+WHERE n.nspname = %s
+"""
+
+
+def connection_id(connection_info: Dict[str, str]) -> str:
+    """
+    Identificador estável da conexão configurada, gravado em disco: só com
+    campos não secretos (nunca a senha, nem um resumo dela).
+    """
+    return "|".join(str(connection_info.get(field) or "") for field in (
+        'name', 'service', 'host', 'port', 'database', 'username'
+    ))
+
+
+class CatalogCache:
+    """
+    Cache local do catálogo (schemas e funções) por conexão.
+    Responsabilidade única: guardar em disco as últimas listas lidas do banco,
+    junto do token de mudança que as validou, para preencher o diálogo sem
+    esperar pelo servidor.
+    """
+
+    def __init__(self, file_path: Optional[str] = None):
+        self.file_path = file_path
+        self._data: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+        self._load()
+
+    @staticmethod
+    def schemas_token(conn) -> str:
+        with conn.cursor() as cur:
+            cur.execute(_SCHEMAS_TOKEN_SQL)
+            return cur.fetchone()[0]
+
+    @staticmethod
+    def functions_token(conn, schema_name: str) -> str:
+        with conn.cursor() as cur:
+            cur.execute(_FUNCTIONS_TOKEN_SQL, (schema_name,))
+            return cur.fetchone()[0]
+
+    def get_schemas(self, connection_info: Dict[str, str]) -> Optional[Tuple[str, List[str]]]:
+        """Retorna (token, schemas) guardados ou None."""
+        return self._get(connection_id(connection_info), 'schemas')
+
+    def put_schemas(self, connection_info: Dict[str, str], token: str, schemas: List[str]):
+        self._put(connection_id(connection_info), 'schemas', token, schemas)
+
+    def get_functions(self, connection_info: Dict[str, str], schema_name: str) -> Optional[Tuple[str, List[Dict]]]:
+        """Retorna (token, funções) guardados para o schema ou None."""
+        return self._get(connection_id(connection_info), f"functions:{schema_name}")
+
+    def put_functions(self, connection_info: Dict[str, str], schema_name: str, token: str, functions: List[Dict]):
+        self._put(connection_id(connection_info), f"functions:{schema_name}", token, functions)
+
+    def clear(self, connection_info: Optional[Dict[str, str]] = None):
+        """Descarta o cache de uma conexão (ou de todas)."""
+        with self._lock:
+            if connection_info is None:
+                self._data.clear()
+            else:
+                self._data.pop(connection_id(connection_info), None)
+            self._save()
+
+    def _get(self, conn_id: str, key: str):
+        with self._lock:
+            entry = self._data.get(conn_id, {}).get(key)
+            if entry is None:
+                return None
+            return entry['token'], entry['items']
+
+    def _put(self, conn_id: str, key: str, token: str, items: list):
+        with self._lock:
+            entry = self._data.setdefault(conn_id, {}).get(key)
+            if entry is not None and entry['token'] == token and entry['items'] == items:
+                return
+            self._data[conn_id][key] = {'token': token, 'items': items, 'updated_at': time.time()}
+            self._save()
+
+    def _load(self):
+        if not self.file_path or not os.path.exists(self.file_path):
+            return
+        try:
+            with open(self.file_path, 'r') as f:
+                data = json.load(f)
+            # Descarta identificadores de outro formato (versões que gravavam um resumo da senha)
+            self._data = {key: value for key, value in data.items() if key.count("|") == 5}
+        except (OSError, ValueError, AttributeError) as e:
+            log_message(f"Cache de catálogo ignorado ({self.file_path}): {e}", LogLevel.WARNING)
+
+    def _save(self):
+        if not self.file_path:
+            return
+        try:
+            os.makedirs(os.path.dirname(self.file_path), exist_ok=True)
+            tmp_path = f"{self.file_path}.tmp"
+            with open(tmp_path, 'w') as f:
+                json.dump(self._data, f)
+            os.replace(tmp_path, self.file_path)
+        except OSError as e:
+            log_message(f"Erro ao gravar cache de catálogo: {e}", LogLevel.WARNING)
+
+
+class CatalogService:
+    """
+    Leitura do catálogo com revalidação por token.
+    Responsabilidade única: consultar o token de mudança e só reler schemas
+    ou funções do banco quando ele difere do guardado no CatalogCache.
+    """
+
+    def __init__(self, connection_service, schema_service, function_service, cache: CatalogCache):
+        self.connection_service = connection_service
+        self.schema_service = schema_service
+        self.function_service = function_service
+        self.cache = cache
+
+    def refresh_schemas(self, connection_info: Dict[str, str], timeout: float = None) -> Tuple[List[str], bool]:
+        """
+        Revalida a lista de schemas da conexão.
+
+        Args:
+            connection_info: Informações da conexão
+            timeout: Tempo máximo (s) de espera pelo pool e de cada consulta
+
+        Returns:
+            (schemas, True se a lista mudou em relação ao cache)
+
+        Raises:
+            psycopg2.Error: em caso de falha de conexão ou consulta
+        """
+        cached = self.cache.get_schemas(connection_info)
+        with self.connection_service.connection(connection_info, timeout=timeout) as conn:
+            self._set_timeout(conn, timeout)
+            token = self.cache.schemas_token(conn)
+            if cached is not None and cached[0] == token:
+                return cached[1], False
+            schemas = self.schema_service.list_schemas(conn)
+
+        self.cache.put_schemas(connection_info, token, schemas)
+        return schemas, cached is None or cached[1] != schemas
+
+    def refresh_functions(
+        self,
+        connection_info: Dict[str, str],
+        schema_name: str,
+        timeout: float = None
+    ) -> Tuple[List[Dict], bool]:
+        """
+        Revalida a lista de funções executáveis do schema.
+
+        Args:
+            connection_info: Informações da conexão
+            schema_name: Schema a listar
+            timeout: Tempo máximo (s) de espera pelo pool e de cada consulta
+
+        Returns:
+            (funções, True se a lista mudou em relação ao cache)
+
+        Raises:
+            psycopg2.Error: em caso de falha de conexão ou consulta
+        """
+        cached = self.cache.get_functions(connection_info, schema_name)
+        with self.connection_service.connection(connection_info, timeout=timeout) as conn:
+            self._set_timeout(conn, timeout)
+            token = self.cache.functions_token(conn, schema_name)
+            if cached is not None and cached[0] == token:
+                return cached[1], False
+            functions = self.function_service.list_functions(conn, schema_name)
+
+        self.cache.put_functions(connection_info, schema_name, token, functions)
+        return functions, cached is None or cached[1] != functions
+
+    @staticmethod
+    def _set_timeout(conn, timeout: Optional[float]):
+        if timeout:
+            # Vale até o fim da transação, desfeita ao devolver a conexão ao pool
+            with conn.cursor() as cur:
+                cur.execute("SET LOCAL statement_timeout = %s", (int(timeout * 1000),))
+
+
+# Classes que dependem do QGIS/Qt, carregadas só quando pedidas
+__getattr__ = lazy_getattr(__name__, {'CatalogRefreshTask': '.tasks'})
@@ -0,0 +1,278 @@
+"""
+/***************************************************************************
+ Validador de Regras PostGis
+                                 A QGIS plugin
+ 2ºCGEO
+                              -------------------
+        begin                : 2025-07-16
+        git sha              : $Format:%H$
+        copyright            : (C) 2025 by Godinho, Alvarez, Perrut
+        email                : estevezcodando@gmail.com
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+"""
+import hashlib
+import json
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Callable, Dict, Tuple
+
+from .dbapi import psycopg2
+from .logger import log_message, LogLevel
+from .metrics import POOL_WAIT, stage_timer
+
+
+class PoolTimeoutError(Exception):
+    """Nenhuma conexão do pool ficou livre dentro do tempo limite."""
+
+
+class ConnectionPool:
+    """
+    Pool de conexões psycopg2 de uma conexão configurada.
+    Responsabilidade única: reaproveitar sessões abertas entre consultas de
+    catálogo e execuções, evitando o custo de TCP+TLS+autenticação a cada uso.
+
+    Thread-safe: as tasks do QGIS pegam e devolvem conexões das suas threads.
+    """
+
+    def __init__(
+        self,
+        factory: Callable[[], object],
+        name: str = "",
+        min_size: int = 1,
+        max_size: int = 16,
+        idle_timeout: float = 300.0,
+        health_check_after: float = 30.0,
+        acquire_timeout: float = 120.0
+    ):
+        self.factory = factory
+        self.name = name
+        self.min_size = max(0, min_size)
+        self.max_size = max(1, max_size, self.min_size)
+        self.idle_timeout = idle_timeout
+        self.health_check_after = health_check_after
+        self.acquire_timeout = acquire_timeout
+
+        # (conexão, instante em que foi devolvida)
+        self._idle = deque()
+        self._size = 0
+        self._closed = False
+        self._condition = threading.Condition()
+
+    @property
+    def size(self) -> int:
+        """Quantidade de conexões abertas (livres + emprestadas)."""
+        return self._size
+
+    @property
+    def idle_count(self) -> int:
+        return len(self._idle)
+
+    def acquire(self, timeout: float = None):
+        """
+        Empresta uma conexão, abrindo uma nova se o pool ainda não está cheio.
+
+        Raises:
+            PoolTimeoutError: se nenhuma conexão ficou livre a tempo
+            psycopg2.Error: se não foi possível abrir uma nova conexão
+        """
+        timeout = self.acquire_timeout if timeout is None else timeout
+        started = time.monotonic()
+        deadline = started + timeout
+
+        while True:
+            with self._condition:
+                if self._closed:
+                    raise PoolTimeoutError(f"Pool '{self.name}' encerrado")
+
+                if self._idle:
+                    conn, released_at = self._idle.pop()
+                elif self._size < self.max_size:
+                    self._size += 1
+                    conn, released_at = None, None
+                else:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise PoolTimeoutError(
+                            f"Nenhuma conexão livre no pool '{self.name}' após {timeout:.0f}s "
+                            f"({self.max_size} em uso)"
+                        )
+                    self._condition.wait(remaining)
+                    continue
+
+            if conn is None:
+                POOL_WAIT.observe(time.monotonic() - started, pool=self.name)
+                return self._open()
+
+            if self._healthy(conn, released_at):
+                POOL_WAIT.observe(time.monotonic() - started, pool=self.name)
+                return conn
+            self._discard(conn)
+
+    def release(self, conn, discard: bool = False):
+        """
+        Devolve uma conexão ao pool.
+
+        Args:
+            conn: Conexão emprestada por acquire()
+            discard: Fecha a conexão em vez de reaproveitá-la (por exemplo,
+                quando a sessão teve configurações alteradas)
+        """
+        if not discard and not conn.closed:
+            try:
+                # Encerra qualquer transação deixada aberta
+                conn.rollback()
+            except psycopg2.Error:
+                discard = True
+
+        if discard or conn.closed or self._closed:
+            self._discard(conn)
+            return
+
+        with self._condition:
+            self._idle.append((conn, time.monotonic()))
+            self._condition.notify()
+        self.prune()
+
+    @contextmanager
+    def connection(self, timeout: float = None):
+        """
+        Empresta uma conexão pelo escopo do bloco ``with``.
+        Conexões que falharam por erro de rede são descartadas.
+        """
+        conn = self.acquire(timeout)
+        discard = False
+        try:
+            yield conn
+        except (psycopg2.OperationalError, psycopg2.InterfaceError):
+            discard = True
+            raise
+        finally:
+            self.release(conn, discard=discard)
+
+    def warm_up(self):
+        """Abre conexões até ``min_size`` (chamado em segundo plano)."""
+        while True:
+            with self._condition:
+                if self._closed or self._size >= self.min_size:
+                    return
+                self._size += 1
+            try:
+                conn = self._open()
+            except psycopg2.Error as e:
+                log_message(f"Falha ao pré-abrir conexão do pool '{self.name}': {e}", LogLevel.WARNING)
+                return
+            self.release(conn)
+
+    def prune(self):
+        """Fecha as conexões ociosas há mais de ``idle_timeout``, mantendo ``min_size``."""
+        expired = []
+        now = time.monotonic()
+        with self._condition:
+            while (
+                self._idle
+                and self._size - len(expired) > self.min_size
+                and now - self._idle[0][1] > self.idle_timeout
+            ):
+                expired.append(self._idle.popleft()[0])
+        for conn in expired:
+            self._discard(conn)
+
+    def close(self):
+        """Fecha todas as conexões livres; as emprestadas são fechadas ao voltar."""
+        with self._condition:
+            self._closed = True
+            idle = [conn for conn, _ in self._idle]
+            self._idle.clear()
+            self._condition.notify_all()
+        for conn in idle:
+            self._discard(conn)
+
+    def _open(self):
+        try:
+            with stage_timer("connect"):
+                return self.factory()
+        except Exception:
+            with self._condition:
+                self._size -= 1
+                self._condition.notify()
+            raise
+
+    def _healthy(self, conn, released_at: float) -> bool:
+        if conn.closed:
+            return False
+        if time.monotonic() - released_at < self.health_check_after:
+            return True
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def _discard(self, conn):
+        try:
+            conn.close()
+        except psycopg2.Error:
+            pass
+        with self._condition:
+            self._size -= 1
+            self._condition.notify()
+
+
+_pools: Dict[Tuple, ConnectionPool] = {}
+_pools_lock = threading.Lock()
+
+
+def pool_key(connection_info: Dict[str, str], notices: bool) -> Tuple:
+    """
+    Chave do pool: nome e resumo (SHA-256) de todos os dados da conexão.
+
+    Editar qualquer campo (inclusive senha e sslmode) gera outro pool, e a
+    senha não fica exposta na chave.
+    """
+    # Normaliza tipos (porta int/str) e campos vazios antes de resumir
+    fields = {key: str(value) for key, value in connection_info.items() if value not in (None, '')}
+    digest = hashlib.sha256(json.dumps(fields, sort_keys=True).encode('utf-8')).hexdigest()
+    return (connection_info.get('name'), digest, notices)
+
+
+def get_pool(key: Tuple, factory: Callable[[], object], **options) -> ConnectionPool:
+    """
+    Retorna (criando se preciso) o pool registrado com a chave.
+
+    Ao criar o pool de uma conexão nomeada, fecha os pools da mesma conexão
+    com dados anteriores à edição (sessões emprestadas fecham ao voltar).
+    """
+    stale = []
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            if key[0]:
+                stale = [other for other in _pools if other[0] == key[0] and other[1] != key[1]]
+            pool = ConnectionPool(factory, name=str(key[0]), **options)
+            _pools[key] = pool
+        stale = [_pools.pop(other) for other in stale]
+    for old_pool in stale:
+        old_pool.close()
+    return pool
+
+
+def close_all_pools():
+    """Fecha todos os pools (descarregamento do plugin)."""
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.close()
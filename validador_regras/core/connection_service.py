@@ -20,7 +20,7 @@
  ***************************************************************************/
 """
 from typing import List, Optional
-from qgis.core import QgsMessageLog, Qgis
+from .logger import log_message, LogLevel
 from .interfaces import IConnectionRepository, IConnectionTester
 from .connection_config import ConnectionConfig
 
@@ -38,25 +38,37 @@ class ConnectionService:
     def add_connection(self, config: ConnectionConfig):
         try:
             self._repository.add(config)
-            QgsMessageLog.logMessage(f"Conexão \"{config.name}\" adicionada com sucesso.", "ConnectionManager", Qgis.Info)
+            log_message(
+                f"Conexão \"{config.name}\" adicionada com sucesso.",
+                LogLevel.INFO, "ConnectionManager"
+            )
         except ValueError as e:
-            QgsMessageLog.logMessage(f"Erro ao adicionar conexão \"{config.name}\": {e}", "ConnectionManager", Qgis.Critical)
+            log_message(
+                f"Erro ao adicionar conexão \"{config.name}\": {e}",
+                LogLevel.CRITICAL, "ConnectionManager"
+            )
             raise
 
     def update_connection(self, config: ConnectionConfig):
         try:
             self._repository.update(config)
-            QgsMessageLog.logMessage(f"Conexão \"{config.name}\" atualizada com sucesso.", "ConnectionManager", Qgis.Info)
+            log_message(
+                f"Conexão \"{config.name}\" atualizada com sucesso.",
+                LogLevel.INFO, "ConnectionManager"
+            )
         except ValueError as e:
-            QgsMessageLog.logMessage(f"Erro ao atualizar conexão \"{config.name}\": {e}", "ConnectionManager", Qgis.Critical)
+            log_message(
+                f"Erro ao atualizar conexão \"{config.name}\": {e}",
+                LogLevel.CRITICAL, "ConnectionManager"
+            )
             raise
 
     def delete_connection(self, name: str):
         try:
             self._repository.delete(name)
-            QgsMessageLog.logMessage(f"Conexão \"{name}\" removida com sucesso.", "ConnectionManager", Qgis.Info)
+            log_message(f"Conexão \"{name}\" removida com sucesso.", LogLevel.INFO, "ConnectionManager")
         except ValueError as e:
-            QgsMessageLog.logMessage(f"Erro ao remover conexão \"{name}\": {e}", "ConnectionManager", Qgis.Critical)
+            log_message(f"Erro ao remover conexão \"{name}\": {e}", LogLevel.CRITICAL, "ConnectionManager")
             raise
 
     def test_connection(self, config: ConnectionConfig) -> bool:
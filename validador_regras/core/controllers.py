@@ -0,0 +1,343 @@
+"""
+/***************************************************************************
+ Validador de Regras PostGis
+                                 A QGIS plugin
+ 2ºCGEO
+                              -------------------
+        begin                : 2025-07-16
+        git sha              : $Format:%H$
+        copyright            : (C) 2025 by Godinho, Alvarez, Perrut
+        email                : estevezcodando@gmail.com
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+"""
+import threading
+import time
+from collections import deque
+from typing import Dict, List, Optional, Tuple, Union
+
+from qgis.core import QgsApplication
+from PyQt5.QtCore import QObject, pyqtSignal
+
+from .logger import log_message, LogLevel
+from .batch_execution import (
+    BatchSummary, batch_items,
+    STATUS_PENDING, STATUS_RUNNING, STATUS_SUCCESS, STATUS_ERROR, STATUS_CANCELLED
+)
+from .tiled_execution import Tile, TilePlan, TiledExecutionSummary
+from .tasks import FunctionExecutionTask
+
+
+class BatchExecutionController(QObject):
+    """
+    Controlador de execução em lote de funções de validação.
+    Responsabilidade única: manter no máximo N FunctionExecutionTask simultâneas
+    no gerenciador de tasks do QGIS, cada uma com sua própria sessão no banco.
+    """
+
+    itemStarted = pyqtSignal(object)
+    itemFinished = pyqtSignal(object)
+    batchFinished = pyqtSignal(object)
+
+    def __init__(
+        self,
+        connection_info: Dict[str, str],
+        schema_name: str,
+        function_names: List[Union[str, Tuple[str, str]]],
+        max_concurrent: int = 4,
+        cache=None,
+        force_refresh: bool = False,
+        history=None,
+        parent=None
+    ):
+        super().__init__(parent)
+        self.connection_info = connection_info
+        self.schema_name = schema_name
+        self.max_concurrent = max(1, int(max_concurrent))
+        self.cache = cache
+        self.force_refresh = force_refresh
+        self.history = history
+        # Por item (nome e argumentos): sobrecargas de mesmo nome têm itens próprios
+        self.items = {item.key: item for item in batch_items(function_names)}
+        self._pending = deque(self.items)
+        self._running: Dict[str, FunctionExecutionTask] = {}
+        self._started_at = None
+        self._cancellers = []
+        self._cancelled = False
+        self._finished = False
+
+    @property
+    def completed_count(self) -> int:
+        return sum(
+            1 for item in self.items.values()
+            if item.status not in (STATUS_PENDING, STATUS_RUNNING)
+        )
+
+    @property
+    def is_running(self) -> bool:
+        return self._started_at is not None and not self._finished
+
+    def start(self):
+        """Inicia o lote, preenchendo as vagas disponíveis do pool."""
+        self._started_at = time.monotonic()
+        log_message(
+            f"Iniciando lote de {len(self.items)} função(ões) em '{self.schema_name}' "
+            f"com até {self.max_concurrent} execução(ões) simultânea(s)",
+            LogLevel.INFO
+        )
+        self._fill_slots()
+
+    def cancel(self):
+        """Cancela as tasks em execução e descarta as pendentes."""
+        self._cancelled = True
+        while self._pending:
+            item = self.items[self._pending.popleft()]
+            item.status = STATUS_CANCELLED
+        for task in list(self._running.values()):
+            task.cancel()
+            self._track_canceller(task)
+        self._check_finished()
+
+    def _track_canceller(self, task: FunctionExecutionTask):
+        """Aguarda a confirmação do servidor antes de dar o lote por encerrado."""
+        if task.server_canceller is not None:
+            self._cancellers.append(task.server_canceller)
+            task.server_canceller.finished.connect(lambda *_: self._check_finished())
+
+    def _fill_slots(self):
+        while not self._cancelled and self._pending and len(self._running) < self.max_concurrent:
+            self._launch(self._pending.popleft())
+        self._check_finished()
+
+    def _launch(self, key: str):
+        item = self.items[key]
+        task = FunctionExecutionTask(
+            self.connection_info,
+            self.schema_name,
+            item.function_name,
+            cache=self.cache,
+            force_refresh=self.force_refresh,
+            history=self.history
+        )
+        task.taskCompleted.connect(lambda t=task, k=key: self._on_task_done(k, t, True))
+        task.taskTerminated.connect(lambda t=task, k=key: self._on_task_done(k, t, False))
+        self._running[key] = task
+
+        item.status = STATUS_RUNNING
+        item.started_at = time.monotonic()
+        self.itemStarted.emit(item)
+
+        QgsApplication.taskManager().addTask(task)
+
+    def _on_task_done(self, key: str, task: FunctionExecutionTask, success: bool):
+        if self._running.pop(key, None) is None:
+            return
+
+        item = self.items[key]
+        item.finished_at = time.monotonic()
+        if task.elapsed is not None:
+            # Usa o tempo medido na própria task (exclui espera na fila)
+            item.started_at = item.finished_at - task.elapsed
+        if success:
+            item.status = STATUS_SUCCESS
+            item.row_count = task.row_count
+            item.cache_hit = task.cache_hit
+            item.regression = task.regression
+        elif task.isCanceled():
+            item.status = STATUS_CANCELLED
+        else:
+            item.status = STATUS_ERROR
+            item.error_message = task.error_message or "Erro desconhecido"
+        self.itemFinished.emit(item)
+
+        self._fill_slots()
+
+    def _check_finished(self):
+        if self._finished or self._running or (self._pending and not self._cancelled):
+            return
+        if any(canceller.is_pending for canceller in self._cancellers):
+            return
+        self._finished = True
+        summary = BatchSummary(
+            schema_name=self.schema_name,
+            items=list(self.items.values()),
+            elapsed=time.monotonic() - (self._started_at or time.monotonic())
+        )
+        log_message(
+            f"Lote em '{self.schema_name}' finalizado: {summary.succeeded} sucesso(s), "
+            f"{summary.failed} erro(s), {summary.cancelled} cancelada(s)",
+            LogLevel.INFO
+        )
+        self.batchFinished.emit(summary)
+
+
+class TiledExecutionController(QObject):
+    """
+    Controlador de execução de uma validação por tiles.
+    Responsabilidade única: executar a função uma vez por tile, em paralelo,
+    dividindo recursivamente os tiles que estouram o tempo limite e
+    reunindo a contagem e a amostra dos resultados.
+
+    Pela convenção bbox cada feição pertence a um único tile (o que contém
+    seu ponto de referência, bordas máximas excluídas), então os resultados
+    dos tiles não se repetem e não precisam ser comparados entre si.
+    """
+
+    PREVIEW_LIMIT = 10
+
+    tileFinished = pyqtSignal(object, bool)
+    executionFinished = pyqtSignal(object)
+
+    def __init__(
+        self,
+        connection_info: Dict[str, str],
+        schema_name: str,
+        function_name: str,
+        plan: TilePlan,
+        max_concurrent: int = 4,
+        time_budget: Optional[float] = 300.0,
+        max_depth: int = 3,
+        parent=None
+    ):
+        super().__init__(parent)
+        self.connection_info = connection_info
+        self.schema_name = schema_name
+        self.function_name = function_name
+        self.plan = plan
+        self.max_concurrent = max(1, int(max_concurrent))
+        self.time_budget = time_budget
+        self.max_depth = max_depth
+        self.summary = TiledExecutionSummary(schema_name, function_name, tiles_total=len(plan.tiles))
+
+        self._pending = deque(plan.tiles)
+        self._running: Dict[int, Tuple[Tile, FunctionExecutionTask]] = {}
+        # Linhas de cada tile em execução: só entram no resumo se o tile terminar
+        # (um tile que estoura o tempo é refeito pelos filhos, que repetem as linhas)
+        self._tile_rows: Dict[int, Tuple[int, list]] = {}
+        self._rows_lock = threading.Lock()
+        self._started_at = None
+        self._cancellers = []
+        self._cancelled = False
+        self._finished = False
+
+    @property
+    def completed_count(self) -> int:
+        return self.summary.tiles_succeeded + self.summary.tiles_failed
+
+    @property
+    def is_running(self) -> bool:
+        return self._started_at is not None and not self._finished
+
+    def start(self):
+        """Inicia a execução dos tiles."""
+        self._started_at = time.monotonic()
+        log_message(
+            f"Executando {self.schema_name}.{self.function_name} em {len(self._pending)} tile(s) "
+            f"(SRID {self.plan.srid}, até {self.max_concurrent} simultâneo(s))",
+            LogLevel.INFO
+        )
+        self._fill_slots()
+
+    def cancel(self):
+        """Cancela os tiles em execução e descarta os pendentes."""
+        self._cancelled = True
+        self.summary.cancelled = True
+        self._pending.clear()
+        for _, task in list(self._running.values()):
+            task.cancel()
+            self._track_canceller(task)
+        self._check_finished()
+
+    def _track_canceller(self, task: FunctionExecutionTask):
+        """Aguarda a confirmação do servidor antes de dar a execução por encerrada."""
+        if task.server_canceller is not None:
+            self._cancellers.append(task.server_canceller)
+            task.server_canceller.finished.connect(lambda *_: self._check_finished())
+
+    def _fill_slots(self):
+        while not self._cancelled and self._pending and len(self._running) < self.max_concurrent:
+            self._launch(self._pending.popleft())
+        self._check_finished()
+
+    def _launch(self, tile: Tile):
+        # No nível máximo de subdivisão o tile roda sem tempo limite
+        timeout = None
+        if self.time_budget and tile.depth < self.max_depth:
+            timeout = int(self.time_budget * 1000)
+
+        task = FunctionExecutionTask(
+            self.connection_info,
+            self.schema_name,
+            self.function_name,
+            bbox=(tile.xmin, tile.ymin, tile.xmax, tile.ymax, self.plan.srid),
+            statement_timeout=timeout
+        )
+        task.add_chunk_consumer(lambda offset, rows, t=id(task): self._collect_chunk(t, rows))
+        task.taskCompleted.connect(lambda t=task: self._on_task_done(t, True))
+        task.taskTerminated.connect(lambda t=task: self._on_task_done(t, False))
+        self._running[id(task)] = (tile, task)
+
+        QgsApplication.taskManager().addTask(task)
+
+    def _collect_chunk(self, task_id: int, rows: list):
+        """Consumidor de blocos (thread da task) que soma as linhas e guarda a amostra do tile."""
+        with self._rows_lock:
+            count, preview = self._tile_rows.get(task_id, (0, []))
+            missing = self.PREVIEW_LIMIT - len(preview)
+            if missing > 0:
+                preview.extend(rows[:missing])
+            self._tile_rows[task_id] = (count + len(rows), preview)
+
+    def _on_task_done(self, task: FunctionExecutionTask, success: bool):
+        entry = self._running.pop(id(task), None)
+        if entry is None:
+            return
+        tile = entry[0]
+        with self._rows_lock:
+            count, preview = self._tile_rows.pop(id(task), (0, []))
+
+        if success:
+            self.summary.tiles_succeeded += 1
+            self.summary.row_count += count
+            missing = self.PREVIEW_LIMIT - len(self.summary.preview_rows)
+            if missing > 0:
+                self.summary.preview_rows.extend(preview[:missing])
+        elif task.timed_out and not self._cancelled:
+            # Estourou o tempo limite: divide em quatro e reenfileira
+            children = tile.split()
+            self.summary.tiles_split += 1
+            self.summary.tiles_total += len(children) - 1
+            self._pending.extendleft(reversed(children))
+            log_message(
+                f"Tile {tile.label()} excedeu {self.time_budget:.0f}s; dividido em {len(children)}",
+                LogLevel.INFO
+            )
+        elif not task.isCanceled():
+            self.summary.tiles_failed += 1
+            self.summary.errors.append(f"{tile.label()}: {task.error_message or 'Erro desconhecido'}")
+
+        self.tileFinished.emit(tile, success)
+        self._fill_slots()
+
+    def _check_finished(self):
+        if self._finished or self._running or (self._pending and not self._cancelled):
+            return
+        if any(canceller.is_pending for canceller in self._cancellers):
+            return
+        self._finished = True
+        self.summary.elapsed = time.monotonic() - (self._started_at or time.monotonic())
+        log_message(
+            f"Execução por tiles de {self.schema_name}.{self.function_name} finalizada: "
+            f"{self.summary.tiles_succeeded}/{self.summary.tiles_total} tile(s), "
+            f"{self.summary.row_count} registro(s)",
+            LogLevel.INFO
+        )
+        self.executionFinished.emit(self.summary)
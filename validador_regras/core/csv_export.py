@@ -0,0 +1,267 @@
+"""
+/***************************************************************************
+ Validador de Regras PostGis
+                                 A QGIS plugin
+ 2ºCGEO
+                              -------------------
+        begin                : 2025-07-16
+        git sha              : $Format:%H$
+        copyright            : (C) 2025 by Godinho, Alvarez, Perrut
+        email                : estevezcodando@gmail.com
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+"""
+import gzip
+import importlib.util
+import os
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+from .dbapi import psycopg2, sql
+from .logger import log_message, LogLevel
+from .metrics import BYTES_FETCHED, ROWS_FETCHED, record_stage
+
+COMPRESSION_NONE = None
+COMPRESSION_GZIP = "gzip"
+COMPRESSION_ZSTD = "zstd"
+
+_EXTENSIONS = {'.gz': COMPRESSION_GZIP, '.zst': COMPRESSION_ZSTD}
+
+
+def compression_for_path(path: str) -> Optional[str]:
+    """Compressão deduzida da extensão do arquivo (``.gz``, ``.zst``)."""
+    return _EXTENSIONS.get(os.path.splitext(path)[1].lower(), COMPRESSION_NONE)
+
+
+def zstd_available() -> bool:
+    """O pacote opcional ``zstandard`` está instalado."""
+    return importlib.util.find_spec('zstandard') is not None
+
+
+def list_review_tables(conn, schema_name: str) -> List[Tuple[str, int]]:
+    """
+    Lista as tabelas de revisão (``aux_revisao_*``) do schema.
+
+    Returns:
+        Lista de (tabela, linhas estimadas)
+    """
+    with conn.cursor() as cur:
+        cur.execute(
+            r"""
+            SELECT c.relname, GREATEST(c.reltuples, 0)::bigint
+            FROM pg_class c
+            JOIN pg_namespace n ON n.oid = c.relnamespace
+            WHERE n.nspname = %s AND c.relkind IN ('r', 'p', 'v', 'm')
+              AND c.relname LIKE 'aux\_revisao\_%%'
+            ORDER BY c.relname
+            """,
+            (schema_name,)
+        )
+        return cur.fetchall()
+
+
+class _CountingWriter:
+    """
+    Arquivo de destino do COPY: conta bytes e linhas e, quando a exportação
+    é cancelada, pede o cancelamento da consulta e descarta o restante.
+    """
+
+    def __init__(self, target, conn, exporter: 'CsvExporter'):
+        self._target = target
+        self._conn = conn
+        self._exporter = exporter
+        self._cancel_sent = False
+
+    def write(self, data):
+        if self._exporter.is_canceled():
+            if not self._cancel_sent:
+                self._cancel_sent = True
+                self._conn.cancel()
+            return len(data)
+
+        if isinstance(data, str):
+            data = data.encode('utf-8')
+        self._target.write(data)
+        self._exporter._advance(len(data), data.count(b"\n"))
+        return len(data)
+
+
+class CsvExporter:
+    """
+    Exportação de uma tabela de revisão para CSV.
+    Responsabilidade única: transmitir o resultado de ``COPY ... TO STDOUT``
+    direto para o arquivo, em memória constante, com compressão opcional
+    (gzip ou zstd) aplicada durante a escrita.
+
+    Geometrias saem em EWKT. O arquivo é escrito com o sufixo ``.part`` e só
+    recebe o nome final quando a exportação termina com sucesso.
+
+    Quem exporta define os ganchos ``is_canceled`` e ``progress_callback``
+    (bytes recebidos, linhas escritas, linhas estimadas), chamados na
+    thread que executa ``export()``.
+    """
+
+    # Intervalo mínimo entre avisos de progresso, em segundos
+    PROGRESS_INTERVAL = 0.25
+
+    def __init__(
+        self,
+        connection_info: Dict[str, str],
+        schema_name: str,
+        table_name: str,
+        file_path: str,
+        compression: Optional[str] = None,
+        compression_level: Optional[int] = None,
+        connection_service=None
+    ):
+        """
+        Args:
+            connection_info: Informações da conexão
+            schema_name: Schema da tabela
+            table_name: Tabela (ou visão) a exportar
+            file_path: Arquivo de destino
+            compression: ``gzip``, ``zstd`` ou None (padrão: pela extensão)
+            compression_level: Nível de compressão (padrão da biblioteca se None)
+        """
+        if connection_service is None:
+            from .database_service import DatabaseConnectionService
+            connection_service = DatabaseConnectionService()
+        self.connection_service = connection_service
+        self.connection_info = connection_info
+        self.schema_name = schema_name
+        self.table_name = table_name
+        self.file_path = file_path
+        self.compression = compression if compression is not None else compression_for_path(file_path)
+        self.compression_level = compression_level
+        self.bytes_read = 0
+        self.rows_written = 0
+        self.estimated_rows = 0
+        self.error_message = None
+        self.elapsed = None
+        self._last_progress = 0.0
+
+        self.is_canceled: Callable[[], bool] = lambda: False
+        self.progress_callback: Optional[Callable[[int, int, int], None]] = None
+
+    def build_query(self, conn) -> "sql.Composed":
+        """Monta o COPY com as colunas da tabela, convertendo geometrias para EWKT."""
+        with conn.cursor() as cur:
+            cur.execute(
+                """
+                SELECT a.attname, t.typname
+                FROM pg_attribute a
+                JOIN pg_type t ON t.oid = a.atttypid
+                WHERE a.attrelid = to_regclass(%s) AND a.attnum > 0 AND NOT a.attisdropped
+                ORDER BY a.attnum
+                """,
+                (sql.Identifier(self.schema_name, self.table_name).as_string(conn),)
+            )
+            columns = cur.fetchall()
+        if not columns:
+            raise ValueError(f"Tabela {self.schema_name}.{self.table_name} não encontrada")
+
+        fields = []
+        for name, type_name in columns:
+            column = sql.Identifier(name)
+            if type_name in ('geometry', 'geography'):
+                fields.append(sql.SQL("ST_AsEWKT({0}) AS {0}").format(column))
+            else:
+                fields.append(column)
+
+        return sql.SQL("COPY (SELECT {} FROM {}.{}) TO STDOUT WITH (FORMAT csv, HEADER true)").format(
+            sql.SQL(", ").join(fields), sql.Identifier(self.schema_name), sql.Identifier(self.table_name)
+        )
+
+    def _open_target(self, path: str):
+        if self.compression == COMPRESSION_GZIP:
+            level = 6 if self.compression_level is None else self.compression_level
+            return gzip.open(path, 'wb', compresslevel=level)
+        if self.compression == COMPRESSION_ZSTD:
+            try:
+                import zstandard
+            except ImportError:
+                raise RuntimeError("Compressão zstd requer o pacote 'zstandard' (pip install zstandard)")
+            level = 3 if self.compression_level is None else self.compression_level
+            raw = open(path, 'wb')
+            return zstandard.ZstdCompressor(level=level).stream_writer(raw, closefd=True)
+        return open(path, 'wb')
+
+    def _advance(self, num_bytes: int, lines: int):
+        self.bytes_read += num_bytes
+        # A primeira linha é o cabeçalho; campos com quebra de linha tornam a contagem aproximada
+        self.rows_written = max(0, self.rows_written + lines - (1 if self.bytes_read == num_bytes else 0))
+        now = time.monotonic()
+        if self.progress_callback is not None and now - self._last_progress >= self.PROGRESS_INTERVAL:
+            self._last_progress = now
+            self.progress_callback(self.bytes_read, self.rows_written, self.estimated_rows)
+
+    def export(self) -> bool:
+        """
+        Exporta a tabela.
+
+        Returns:
+            True se o arquivo foi gravado; em caso de falha ou cancelamento,
+            ``error_message`` explica o motivo e nenhum arquivo parcial fica
+        """
+        started = time.monotonic()
+        part_path = f"{self.file_path}.part"
+        try:
+            with self.connection_service.connection(self.connection_info) as conn:
+                with conn.cursor() as cur:
+                    cur.execute(
+                        "SELECT GREATEST(reltuples, 0)::bigint FROM pg_class WHERE oid = to_regclass(%s)",
+                        (sql.Identifier(self.schema_name, self.table_name).as_string(conn),)
+                    )
+                    row = cur.fetchone()
+                    self.estimated_rows = row[0] if row else 0
+
+                    query = self.build_query(conn)
+                    target = self._open_target(part_path)
+                    try:
+                        cur.copy_expert(query, _CountingWriter(target, conn, self))
+                    finally:
+                        target.close()
+                    if cur.rowcount is not None and cur.rowcount >= 0:
+                        self.rows_written = cur.rowcount
+                conn.rollback()
+
+            if self.is_canceled():
+                raise psycopg2.extensions.QueryCanceledError("Exportação cancelada")
+            os.replace(part_path, self.file_path)
+
+            self.elapsed = time.monotonic() - started
+            record_stage("export", started, file=self.file_path, rows=self.rows_written)
+            ROWS_FETCHED.inc(self.rows_written, source="csv_export")
+            BYTES_FETCHED.inc(self.bytes_read, source="csv_export")
+            if self.progress_callback is not None:
+                self.progress_callback(self.bytes_read, self.rows_written, self.estimated_rows)
+            log_message(
+                f"{self.schema_name}.{self.table_name} exportada para {self.file_path} "
+                f"({self.rows_written} linha(s), {self.elapsed:.1f}s)",
+                LogLevel.INFO
+            )
+            return True
+
+        except Exception as e:
+            self.elapsed = time.monotonic() - started
+            if self.is_canceled():
+                self.error_message = "Exportação cancelada"
+            else:
+                self.error_message = str(e)
+                log_message(
+                    f"Erro ao exportar {self.schema_name}.{self.table_name}: {e}",
+                    LogLevel.CRITICAL
+                )
+            try:
+                os.remove(part_path)
+            except OSError:
+                pass
+            return False
@@ -19,12 +19,18 @@
  *                                                                         *
  ***************************************************************************/
 """
-from typing import List, Dict, Optional, Tuple
-from qgis.core import (
-    QgsSettings, QgsDataSourceUri, QgsProviderRegistry, 
-    QgsMessageLog, Qgis, QgsTask, QgsApplication
-)
-from PyQt5.QtCore import QObject, pyqtSignal
+import threading
+from contextlib import contextmanager
+from typing import Callable, List, Dict, Optional
+
+from . import lazy_getattr
+from .dbapi import psycopg2
+from .logger import log_message, LogLevel
+from .metrics import stage_timer
+from .settings import get_settings
+from .interfaces import ISettingsStore
+from .notice_session import NoticeSession
+from .connection_pool import ConnectionPool, get_pool, pool_key
 
 class DatabaseConnectionService:
     """
@@ -34,10 +40,25 @@ class DatabaseConnectionService:
     
     SETTINGS_GROUP = "PostgreSQL/connections"
     DEFAULT_CONNECTION_KEY = "validador_regras/default_connection"
+    POOL_MIN_SIZE_KEY = "validador_regras/pool_min_size"
+    POOL_MAX_SIZE_KEY = "validador_regras/pool_max_size"
+    POOL_IDLE_TIMEOUT_KEY = "validador_regras/pool_idle_timeout_s"
+    CATALOG_TIMEOUT_KEY = "validador_regras/catalog_timeout_s"
+    DEFAULT_CATALOG_TIMEOUT = 15
+    
+    # Valores de sslmode gravados pelo QGIS (enum QgsDataSourceUri::SslMode) -> libpq
+    SSLMODE_TO_LIBPQ = {
+        '0': 'prefer', 'SslPrefer': 'prefer',
+        '1': 'disable', 'SslDisable': 'disable',
+        '2': 'allow', 'SslAllow': 'allow',
+        '3': 'require', 'SslRequire': 'require',
+        '4': 'verify-ca', 'SslVerifyCa': 'verify-ca',
+        '5': 'verify-full', 'SslVerifyFull': 'verify-full',
+    }
     
-    def __init__(self):
-        self.settings = QgsSettings()
-        self.provider_registry = QgsProviderRegistry.instance()
+    def __init__(self, settings: ISettingsStore = None):
+        # QgsSettings dentro do QGIS; fora dele, configurações em memória
+        self.settings = settings or get_settings()
     
     def get_default_connection_info(self) -> Optional[Dict[str, str]]:
         """
@@ -50,22 +71,7 @@ class DatabaseConnectionService:
         if not default_name:
             return None
         
-        self.settings.beginGroup(f"{self.SETTINGS_GROUP}/{default_name}")
-        
-        try:
-            connection_info = {
-                'name': default_name,
-                'host': self.settings.value('host', ''),
-                'port': self.settings.value('port', '5432'),
-                'database': self.settings.value('database', ''),
-                'username': self.settings.value('username', ''),
-                'password': self.settings.value('password', ''),
-                'service': self.settings.value('service', ''),
-                'sslmode': self.settings.value('sslmode', 'prefer'),
-            }
-            return connection_info
-        finally:
-            self.settings.endGroup()
+        return self._read_connection(default_name)
     
     def get_all_connections(self) -> List[Dict[str, str]]:
         """
@@ -74,33 +80,25 @@ class DatabaseConnectionService:
         Returns:
             Lista de dicionários com informações das conexões
         """
-        connections = []
-        self.settings.beginGroup(self.SETTINGS_GROUP)
-        
-        try:
-            connection_names = self.settings.childGroups()
-            for name in connection_names:
-                self.settings.beginGroup(name)
-                connection_info = {
-                    'name': name,
-                    'host': self.settings.value('host', ''),
-                    'port': self.settings.value('port', '5432'),
-                    'database': self.settings.value('database', ''),
-                    'username': self.settings.value('username', ''),
-                    'password': self.settings.value('password', ''),
-                    'service': self.settings.value('service', ''),
-                    'sslmode': self.settings.value('sslmode', 'prefer'),
-                }
-                connections.append(connection_info)
-                self.settings.endGroup()
-        finally:
-            self.settings.endGroup()
-        
-        return connections
+        return [self._read_connection(name) for name in self.settings.child_groups(self.SETTINGS_GROUP)]
+    
+    def _read_connection(self, name: str) -> Dict[str, str]:
+        group = f"{self.SETTINGS_GROUP}/{name}"
+        return {
+            'name': name,
+            'host': self.settings.value(f"{group}/host", ''),
+            'port': self.settings.value(f"{group}/port", '5432'),
+            'database': self.settings.value(f"{group}/database", ''),
+            'username': self.settings.value(f"{group}/username", ''),
+            'password': self.settings.value(f"{group}/password", ''),
+            'service': self.settings.value(f"{group}/service", ''),
+            'sslmode': self.settings.value(f"{group}/sslmode", 'prefer'),
+        }
     
     def create_connection(self, connection_info: Dict[str, str]):
         """
         Cria uma conexão de banco de dados usando QgsDataSourceUri.
+        Disponível apenas dentro do QGIS.
         
         Args:
             connection_info: Dicionário com informações da conexão
@@ -109,6 +107,8 @@ class DatabaseConnectionService:
             Objeto de conexão ou None se falhou
         """
         try:
+            from qgis.core import QgsDataSourceUri, QgsProviderRegistry
+            
             uri = QgsDataSourceUri()
             uri.setConnection(
                 connection_info.get('host', ''),
@@ -125,19 +125,126 @@ class DatabaseConnectionService:
                 uri.setParam('sslmode', connection_info['sslmode'])
             
             # Cria conexão usando o provider PostgreSQL
-            provider = self.provider_registry.providerMetadata('postgres')
+            provider = QgsProviderRegistry.instance().providerMetadata('postgres')
             if provider:
                 return provider.createConnection(uri.uri(), {})
             
             return None
             
         except Exception as e:
-            QgsMessageLog.logMessage(
-                f"Erro ao criar conexão: {e}", 
-                "ValidadorRegras", 
-                Qgis.Critical
-            )
+            log_message(f"Erro ao criar conexão: {e}", LogLevel.CRITICAL)
             return None
+    
+    def create_dbapi_connection(
+        self,
+        connection_info: Dict[str, str],
+        connect_timeout: int = 30,
+        notice_callback: Callable[[str], None] = None,
+        notices: bool = False
+    ):
+        """
+        Cria uma conexão psycopg2 com os mesmos dados da conexão do QGIS.
+        Usada onde a API de provider do QGIS não basta (cursores no servidor,
+        PID do backend, mensagens NOTICE).
+        
+        Args:
+            connection_info: Dicionário com informações da conexão
+            connect_timeout: Tempo máximo de conexão em segundos
+            notice_callback: Se informado, recebe cada mensagem NOTICE assim
+                que chega do servidor (a conexão é uma NoticeSession)
+            notices: Cria uma NoticeSession mesmo sem callback (o callback
+                pode ser definido depois em ``notice_callback``)
+            
+        Returns:
+            Conexão psycopg2 (fora de autocommit)
+            
+        Raises:
+            psycopg2.Error: se a conexão falhar
+        """
+        params = {
+            'host': connection_info.get('host'),
+            'port': connection_info.get('port'),
+            'dbname': connection_info.get('database'),
+            'user': connection_info.get('username'),
+            'password': connection_info.get('password'),
+            'service': connection_info.get('service'),
+        }
+        sslmode = connection_info.get('sslmode')
+        if sslmode:
+            params['sslmode'] = self.SSLMODE_TO_LIBPQ.get(str(sslmode), str(sslmode))
+        
+        params = {key: value for key, value in params.items() if value}
+        if notice_callback is not None or notices:
+            conn = psycopg2.connect(
+                connect_timeout=connect_timeout,
+                application_name='ValidadorRegras',
+                async_=1,
+                **params
+            )
+            return NoticeSession(conn, notice_callback)
+        
+        return psycopg2.connect(
+            connect_timeout=connect_timeout,
+            application_name='ValidadorRegras',
+            **params
+        )
+    
+    def get_pool(self, connection_info: Dict[str, str], notices: bool = False) -> ConnectionPool:
+        """
+        Retorna o pool de conexões psycopg2 da conexão, compartilhado por todo o plugin.
+        
+        Args:
+            connection_info: Dicionário com informações da conexão
+            notices: Pool de NoticeSession (execuções com captura de NOTICE)
+                em vez de conexões síncronas comuns
+        """
+        return get_pool(
+            pool_key(connection_info, notices),
+            lambda: self.create_dbapi_connection(connection_info, notices=notices),
+            min_size=int(self.settings.value(self.POOL_MIN_SIZE_KEY, 1)),
+            max_size=int(self.settings.value(self.POOL_MAX_SIZE_KEY, 16)),
+            idle_timeout=float(self.settings.value(self.POOL_IDLE_TIMEOUT_KEY, 300))
+        )
+    
+    @contextmanager
+    def connection(self, connection_info: Dict[str, str], notices: bool = False, timeout: float = None):
+        """
+        Empresta uma conexão do pool pelo escopo do bloco ``with``.
+        
+        Args:
+            connection_info: Dicionário com informações da conexão
+            notices: Usa o pool de NoticeSession
+            timeout: Espera máxima por uma conexão livre (padrão do pool se None)
+        
+        Raises:
+            psycopg2.Error: se não foi possível conectar
+            PoolTimeoutError: se o pool está esgotado
+        """
+        with self.get_pool(connection_info, notices).connection(timeout) as conn:
+            yield conn
+    
+    def catalog_timeout(self, connection_info: Dict[str, str]) -> float:
+        """
+        Tempo máximo (s) de uma leitura de catálogo na conexão.
+        
+        Lido de ``validador_regras/catalog_timeout_s/<nome da conexão>``; se
+        ausente, do valor global ``validador_regras/catalog_timeout_s``.
+        """
+        default = self.settings.value(self.CATALOG_TIMEOUT_KEY, self.DEFAULT_CATALOG_TIMEOUT)
+        value = self.settings.value(f"{self.CATALOG_TIMEOUT_KEY}/{connection_info.get('name')}", default)
+        try:
+            return max(1.0, float(value))
+        except (TypeError, ValueError):
+            return float(self.DEFAULT_CATALOG_TIMEOUT)
+    
+    def warm_up(self, connection_info: Dict[str, str]):
+        """
+        Abre em segundo plano as conexões mínimas dos pools da conexão, para
+        que a primeira consulta não pague o handshake.
+        """
+        pools = [self.get_pool(connection_info), self.get_pool(connection_info, notices=True)]
+        for pool in pools:
+            threading.Thread(target=pool.warm_up, name=f"pool-warmup-{pool.name}", daemon=True).start()
 
 
 class SchemaService:
@@ -160,35 +267,38 @@ class SchemaService:
             Lista de nomes de schemas
         """
         try:
-            conn = self.connection_service.create_connection(connection_info)
-            if not conn:
-                return []
-            
-            query = """
-                SELECT schema_name 
-                FROM information_schema.schemata 
-                WHERE schema_name NOT IN ('information_schema', 'pg_catalog', 'pg_toast')
-                ORDER BY schema_name
-            """
-            
-            result = conn.executeSql(query)
-            schemas = [row[0] for row in result]
+            with self.connection_service.connection(connection_info) as conn:
+                schemas = self.list_schemas(conn)
             
-            QgsMessageLog.logMessage(
-                f"Encontrados {len(schemas)} schemas na conexão '{connection_info['name']}'", 
-                "ValidadorRegras", 
-                Qgis.Info
+            log_message(
+                f"Encontrados {len(schemas)} schemas na conexão '{connection_info['name']}'",
+                LogLevel.INFO
             )
             
             return schemas
             
         except Exception as e:
-            QgsMessageLog.logMessage(
-                f"Erro ao listar schemas: {e}", 
-                "ValidadorRegras", 
-                Qgis.Critical
-            )
+            log_message(f"Erro ao listar schemas: {e}", LogLevel.CRITICAL)
             return []
+    
+    def list_schemas(self, conn) -> List[str]:
+        """
+        Lista os schemas acessíveis usando uma conexão já aberta.
+        
+        Raises:
+            psycopg2.Error: em caso de erro na consulta
+        """
+        query = r"""
+            SELECT nspname
+            FROM pg_namespace
+            WHERE nspname <> 'information_schema'
+              AND nspname NOT LIKE 'pg\_%'
+              AND has_schema_privilege(oid, 'USAGE')
+            ORDER BY nspname
+        """
+        with stage_timer("catalog"), conn.cursor() as cur:
+            cur.execute(query)
+            return [row[0] for row in cur.fetchall()]
 
 class FunctionService:
     """
@@ -200,170 +310,168 @@ class FunctionService:
         # Se quem instanciar não passar um DatabaseConnectionService, criamos um interno
         self.connection_service = connection_service or DatabaseConnectionService()
 
-    def get_functions(self, connection_info: Dict[str, str], schema_name: str) -> List[Dict[str, str]]:
-        conn = self.connection_service.create_connection(connection_info)
-        if not conn:
-            QgsMessageLog.logMessage(
-                "[FunctionService] sem conexão", "ValidadorRegras", Qgis.Critical
-            )
-            return []
+    # Uma única consulta ao catálogo: funções, assinatura e parâmetros.
+    # Funções de extensões (PostGIS etc.), agregações, procedures e funções de
+    # trigger ficam de fora; exige PostgreSQL 11+ (pg_proc.prokind).
+    FUNCTIONS_SQL = """
+        SELECT
+            n.nspname,
+            p.proname,
+            p.oid,
+            pg_get_function_identity_arguments(p.oid),
+            pg_get_function_arguments(p.oid),
+            pg_get_function_result(p.oid),
+            p.provolatile,
+            p.proparallel,
+            p.pronargs,
+            p.pronargdefaults,
+            p.pronargs > 0 AND t0.typname = 'geometry',
+            COALESCE((
+                SELECT json_agg(json_build_object(
+                           'name', a.name,
+                           'type', format_type(a.type, NULL),
+                           'mode', COALESCE(a.mode, 'i'),
+                           'position', a.position
+                       ) ORDER BY a.position)
+                FROM unnest(
+                         COALESCE(p.proallargtypes, p.proargtypes::oid[]),
+                         p.proargnames,
+                         p.proargmodes
+                     ) WITH ORDINALITY AS a(type, name, mode, position)
+            ), '[]'::json)
+        FROM pg_proc p
+        JOIN pg_namespace n ON n.oid = p.pronamespace
+        LEFT JOIN pg_type t0 ON t0.oid = p.proargtypes[0]
+        WHERE p.prokind = 'f'
+          AND p.prorettype NOT IN ('trigger'::regtype, 'event_trigger'::regtype)
+          AND n.nspname NOT IN ('information_schema', 'pg_catalog', 'pg_toast')
+          AND n.nspname NOT LIKE 'pg\\_%%'
+          AND NOT EXISTS (
+              SELECT 1 FROM pg_depend d
+              WHERE d.classid = 'pg_proc'::regclass AND d.objid = p.oid AND d.deptype = 'e'
+          )
+          AND (%(schema)s::text IS NULL OR n.nspname = %(schema)s)
+          AND (%(oid)s::oid IS NULL OR p.oid = %(oid)s)
+          AND (%(parameterized)s OR p.pronargs = p.pronargdefaults)
+          AND has_function_privilege(p.oid, 'EXECUTE')
+        ORDER BY n.nspname, p.proname, p.oid
+    """
 
-        # Monta a SQL incluindo o schema diretamente na string
-        sql = f"""
-            SELECT r.routine_name, r.data_type
-            FROM information_schema.routines AS r
-            WHERE r.routine_schema = '{schema_name}'
-              AND r.routine_type = 'FUNCTION'
-            ORDER BY r.routine_name
+    VOLATILITY = {'i': 'IMMUTABLE', 's': 'STABLE', 'v': 'VOLATILE'}
+    PARALLEL = {'s': 'SAFE', 'r': 'RESTRICTED', 'u': 'UNSAFE'}
+    PARAMETER_MODES = {'i': 'IN', 'o': 'OUT', 'b': 'INOUT', 'v': 'VARIADIC', 't': 'TABLE'}
+
+    def get_functions(
+        self,
+        connection_info: Dict[str, str],
+        schema_name: Optional[str] = None,
+        include_parameterized: bool = False
+    ) -> List[Dict]:
+        """
+        Lista as funções de um schema (ou de todos) numa única consulta a
+        pg_proc/pg_namespace.
+        
+        Por padrão retorna apenas as funções executáveis sem argumentos, isto
+        é, cujos parâmetros de entrada têm todos valor padrão. Entram aí as
+        funções com área de validação (primeiro parâmetro ``geometry DEFAULT
+        NULL``), marcadas com ``region_aware``.
+        
+        Args:
+            connection_info: Informações da conexão
+            schema_name: Schema a listar; None lista todos os schemas
+            include_parameterized: Inclui também funções com argumentos obrigatórios
+            
+        Returns:
+            Lista de dicionários com name, schema, oid, signature, arguments,
+            return_type, volatility, parallel, required_args, region_aware e
+            parameters
         """
         try:
-            rows = list(conn.executeSql(sql))  # sem segundo argumento
-            QgsMessageLog.logMessage(
-                f"[DEBUG] routines retornou {len(rows)} linhas", "ValidadorRegras", Qgis.Info
+            with self.connection_service.connection(connection_info) as conn:
+                functions = self.list_functions(conn, schema_name, include_parameterized)
+            log_message(
+                f"[FunctionService] {len(functions)} funções listadas"
+                f"{f' no schema {schema_name}' if schema_name else ''}",
+                LogLevel.INFO
             )
-            return [{'name': n, 'return_type': r or 'void'} for n, r in rows]
+            return functions
         except Exception as e:
-            QgsMessageLog.logMessage(
-                f"[DEBUG] erro ao listar routines: {e}", "ValidadorRegras", Qgis.Critical
-            )
+            log_message(f"[FunctionService] erro ao listar funções: {e}", LogLevel.CRITICAL)
             return []
 
-
-    def _has_parameters(self, conn, schema_name: str, specific_name: str) -> bool:
-        """
-        Retorna True se a função tiver parâmetros IN ou INOUT.
+    def get_function_parameters(self, connection_info: Dict[str, str], schema_name: str, function_oid: int) -> List[Dict]:
         """
-        sql = """
-            SELECT COUNT(*)
-            FROM information_schema.parameters
-            WHERE specific_schema = ?
-              AND specific_name = ?
-              AND parameter_mode IN ('IN','INOUT')
+        Obtém os parâmetros de entrada (IN, INOUT e VARIADIC) de uma função.
+        
+        Args:
+            connection_info: Informações da conexão
+            schema_name: Schema da função
+            function_oid: OID da função (chave ``oid`` de get_functions)
         """
         try:
-            row = next(conn.executeSql(sql, [schema_name, specific_name]), (0,))
-            return row[0] > 0
+            with self.connection_service.connection(connection_info) as conn:
+                functions = self._query_functions(conn, schema_name, function_oid, True)
+            return functions[0]['parameters'] if functions else []
         except Exception as e:
-            QgsMessageLog.logMessage(
-                f"[FunctionService] erro ao verificar parâmetros: {e}",
-                "ValidadorRegras", Qgis.Critical
-            )
-            # Em caso de erro, assume que há parâmetros (evita listar funções com erro)
-            return True
-
-    def get_function_parameters(self, connection_info: Dict[str, str], schema_name: str, specific_name: str) -> List[Dict[str, str]]:
-        """
-        Obtém os parâmetros de uma função específica usando specific_name.
-        """
-        conn = self.connection_service.create_connection(connection_info)
-        if not conn:
+            log_message(f"[FunctionService] erro ao carregar parâmetros: {e}", LogLevel.CRITICAL)
             return []
 
-        sql = """
-            SELECT
-                parameter_name,
-                data_type,
-                parameter_mode,
-                ordinal_position
-            FROM information_schema.parameters
-            WHERE specific_schema = ?
-              AND specific_name = ?
-            ORDER BY ordinal_position
+    def list_functions(self, conn, schema_name: Optional[str] = None, include_parameterized: bool = False) -> List[Dict]:
         """
-        try:
-            params = []
-            for name, dtype, mode, pos in conn.executeSql(sql, [schema_name, specific_name]):
-                if mode in ('IN', 'INOUT'):
-                    params.append({
-                        'name': name or f'param_{pos}',
-                        'type': dtype,
-                        'mode': mode,
-                        'position': pos
-                    })
-            return params
-        except Exception as e:
-            QgsMessageLog.logMessage(
-                f"[FunctionService] erro ao carregar parâmetros: {e}",
-                "ValidadorRegras", Qgis.Critical
-            )
-            return []
-
-
-class FunctionExecutionTask(QgsTask):
-    """
-    Task para execução de funções em background.
-    Responsabilidade única: executar funções sem bloquear a interface.
-    """
-    
-    def __init__(self, connection_info: Dict[str, str], schema_name: str, function_name: str, parameters: List = None):
-        super().__init__(f"Executando função {schema_name}.{function_name}", QgsTask.CanCancel)
-        self.connection_info = connection_info
-        self.schema_name = schema_name
-        self.function_name = function_name
-        self.parameters = parameters or []
-        self.result = None
-        self.error_message = None
-    
-    def run(self) -> bool:
-        try:
-            conn = DatabaseConnectionService().create_connection(self.connection_info)
-            if not conn:
-                self.error_message = "Falha ao conectar com o banco de dados"
-                return False
+        Igual a get_functions, usando uma conexão já aberta.
+        
+        Raises:
+            psycopg2.Error: em caso de erro na consulta
+        """
+        return self._query_functions(conn, schema_name, None, include_parameterized)
 
-            # Se houver parâmetros, injeta-os na SQL
-            if self.parameters:
-                # Escapa cada valor (ex.: strings entre aspas simples)
-                vals = []
-                for v in self.parameters:
-                    if isinstance(v, str):
-                        valor_escapado = v.replace("'", "''")
-                        vals.append("'" + valor_escapado + "'")
-                    else:
-                        vals.append(str(v))
-                args = ", ".join(vals)
-                query = f"SELECT {self.schema_name}.{self.function_name}({args})"
-                # sem binding
-                result = conn.executeSql(query)
-            else:
-                # sem parâmetros, SQL simples
-                query = f"SELECT {self.schema_name}.{self.function_name}()"
-                result = conn.executeSql(query)
+    def _query_functions(
+        self,
+        conn,
+        schema_name: Optional[str],
+        function_oid: Optional[int],
+        include_parameterized: bool
+    ) -> List[Dict]:
+        params = {'schema': schema_name, 'oid': function_oid, 'parameterized': include_parameterized}
+        with stage_timer("catalog"), conn.cursor() as cur:
+            cur.execute(self.FUNCTIONS_SQL, params)
+            rows = cur.fetchall()
+        return [self._function_from_row(row) for row in rows]
 
-            self.result = list(result)
-            QgsMessageLog.logMessage(
-                f"Função {self.schema_name}.{self.function_name} executada com sucesso",
-                "ValidadorRegras", Qgis.Info
-            )
-            return True
+    def _function_from_row(self, row) -> Dict:
+        (schema, name, oid, signature, arguments, return_type, volatility,
+         parallel, nargs, ndefaults, region_aware, raw_parameters) = row
 
-        except Exception as e:
-            self.error_message = str(e)
-            QgsMessageLog.logMessage(
-                f"Erro ao executar função {self.schema_name}.{self.function_name}: {e}",
-                "ValidadorRegras", Qgis.Critical
-            )
-            return False
-    
-    def finished(self, result: bool):
-        """
-        Callback chamado quando a task termina.
-        
-        Args:
-            result: True se executada com sucesso, False caso contrário
-        """
-        if result:
-            QgsMessageLog.logMessage(
-                f"Task de execução da função {self.schema_name}.{self.function_name} concluída", 
-                "ValidadorRegras", 
-                Qgis.Info
-            )
-        else:
-            QgsMessageLog.logMessage(
-                f"Task de execução da função {self.schema_name}.{self.function_name} falhou: {self.error_message}", 
-                "ValidadorRegras", 
-                Qgis.Critical
-            )
+        # Os ndefaults últimos parâmetros de entrada têm valor padrão
+        parameters = []
+        inputs = 0
+        for raw in raw_parameters:
+            mode = self.PARAMETER_MODES.get(raw['mode'], raw['mode'])
+            if mode not in ('IN', 'INOUT', 'VARIADIC'):
+                continue
+            parameters.append({
+                'name': raw['name'] or f"param_{raw['position']}",
+                'type': raw['type'],
+                'mode': mode,
+                'position': raw['position'],
+                'has_default': inputs >= nargs - ndefaults,
+            })
+            inputs += 1
 
+        return {
+            'name': name,
+            'schema': schema,
+            'oid': oid,
+            'signature': signature,
+            'arguments': arguments,
+            'return_type': return_type or 'void',
+            'volatility': self.VOLATILITY.get(volatility, volatility),
+            'parallel': self.PARALLEL.get(parallel, parallel),
+            'required_args': nargs - ndefaults,
+            'region_aware': bool(region_aware),
+            'parameters': parameters,
+        }
 
 
+# Classes que dependem do QGIS/Qt, carregadas só quando pedidas
+__getattr__ = lazy_getattr(__name__, {'FunctionExecutionTask': '.tasks'})
@@ -0,0 +1,54 @@
+"""
+/***************************************************************************
+ Validador de Regras PostGis
+                                 A QGIS plugin
+ 2ºCGEO
+                              -------------------
+        begin                : 2025-07-16
+        git sha              : $Format:%H$
+        copyright            : (C) 2025 by Godinho, Alvarez, Perrut
+        email                : estevezcodando@gmail.com
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+"""
+import importlib
+
+# Acesso ao driver PostgreSQL.
+#
+# O núcleo fala DB-API 2.0 no dialeto do psycopg2 (cursores nomeados,
+# psycopg2.sql, conexões assíncronas). O módulo só é importado no primeiro
+# uso, de modo que importar o núcleo não carrega o driver:
+#
+#     from .dbapi import psycopg2, sql
+
+
+class LazyModule:
+    """Representa um módulo que só é importado no primeiro acesso a um atributo."""
+
+    def __init__(self, module_name: str):
+        self._module_name = module_name
+        self._module = None
+
+    def _load(self):
+        if self._module is None:
+            self._module = importlib.import_module(self._module_name)
+        return self._module
+
+    def __getattr__(self, name):
+        return getattr(self._load(), name)
+
+    def __repr__(self):
+        state = "carregado" if self._module is not None else "não carregado"
+        return f"<módulo {self._module_name} ({state})>"
+
+
+psycopg2 = LazyModule("psycopg2")
+sql = LazyModule("psycopg2.sql")
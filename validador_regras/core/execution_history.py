@@ -0,0 +1,213 @@
+"""
+/***************************************************************************
+ Validador de Regras PostGis
+                                 A QGIS plugin
+ 2ºCGEO
+                              -------------------
+        begin                : 2025-07-16
+        git sha              : $Format:%H$
+        copyright            : (C) 2025 by Godinho, Alvarez, Perrut
+        email                : estevezcodando@gmail.com
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+"""
+import json
+import math
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+from .logger import log_message, LogLevel
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS executions (
+    id INTEGER PRIMARY KEY,
+    connection TEXT NOT NULL,
+    database TEXT NOT NULL,
+    schema_name TEXT NOT NULL,
+    function_name TEXT NOT NULL,
+    mode TEXT NOT NULL,
+    parameters TEXT,
+    started_at REAL NOT NULL,
+    finished_at REAL NOT NULL,
+    elapsed REAL NOT NULL,
+    outcome TEXT NOT NULL,
+    row_count INTEGER NOT NULL,
+    error TEXT,
+    server_stats TEXT,
+    regression INTEGER NOT NULL DEFAULT 0
+);
+-- Percentis e máximo lidos direto do índice (ORDER BY elapsed LIMIT 1 OFFSET k)
+CREATE INDEX IF NOT EXISTS executions_runtime_idx
+    ON executions (connection, schema_name, function_name, mode, outcome, elapsed);
+CREATE INDEX IF NOT EXISTS executions_started_idx ON executions (started_at);
+"""
+
+_RUNTIME_FILTER = """
+    FROM executions
+    WHERE connection = ? AND schema_name = ? AND function_name = ? AND mode = ? AND outcome = 'success'
+"""
+
+
+@dataclass
+class RuntimeStats:
+    """Tempos (s) das execuções bem-sucedidas de uma função."""
+    count: int
+    p50: float
+    p95: float
+    maximum: float
+
+    def format(self) -> str:
+        return (f"mediana {self.p50:.1f}s, p95 {self.p95:.1f}s, máximo {self.maximum:.1f}s "
+                f"em {self.count} execução(ões)")
+
+
+@dataclass
+class Regression:
+    """Execução mais lenta que ``factor`` vezes a mediana do histórico."""
+    elapsed: float
+    baseline: RuntimeStats
+    factor: float
+
+    def format(self) -> str:
+        return (f"{self.elapsed:.1f}s, {self.elapsed / self.baseline.p50:.1f}x a mediana do histórico "
+                f"({self.baseline.format()})")
+
+
+class ExecutionHistory:
+    """
+    Histórico local (SQLite) de todas as execuções.
+    Responsabilidade única: guardar conexão, schema, função, parâmetros,
+    início/fim, linhas, erro e estatísticas do servidor de cada execução, e
+    responder pelos tempos típicos (mediana, p95, máximo) de cada função.
+
+    Os tempos são comparados só entre execuções do mesmo modo (completa,
+    incremental, perfil), pois cada um tem custo próprio; desfechos do
+    cache, erros e cancelamentos ficam registrados mas não entram nos
+    percentis. Uma execução é marcada como regressão quando leva mais que
+    ``regression_factor`` vezes a mediana das ``min_samples`` ou mais
+    execuções anteriores. Registros com mais de ``keep_days`` dias são
+    apagados ao abrir o histórico.
+
+    Pode ser usado por várias threads (e processos: QGIS e CLI) ao mesmo tempo.
+    """
+
+    def __init__(self, file_path: str, regression_factor: float = 3.0, min_samples: int = 5, keep_days: int = 365):
+        """
+        Args:
+            file_path: Arquivo SQLite (criado se não existir)
+            regression_factor: Quantas vezes a mediana caracteriza uma regressão
+            min_samples: Execuções anteriores necessárias para apontar regressão
+            keep_days: Dias de histórico mantidos (0 mantém tudo)
+        """
+        os.makedirs(os.path.dirname(os.path.abspath(file_path)), exist_ok=True)
+        self.file_path = file_path
+        self.regression_factor = regression_factor
+        self.min_samples = max(1, min_samples)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(file_path, timeout=10, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode = WAL")
+            self._conn.executescript(_SCHEMA)
+            if keep_days:
+                self._conn.execute("DELETE FROM executions WHERE started_at < ?", (time.time() - keep_days * 86400,))
+
+    @staticmethod
+    def _database(connection_info: Dict[str, str]) -> str:
+        return (f"{connection_info.get('host', '')}:{connection_info.get('port', '')}/"
+                f"{connection_info.get('database', '')}")
+
+    def runtime_stats(
+        self,
+        connection: str,
+        schema_name: str,
+        function_name: str,
+        mode: str = "full"
+    ) -> Optional[RuntimeStats]:
+        """Mediana, p95 e máximo das execuções bem-sucedidas; None sem histórico."""
+        key = (connection, schema_name, function_name, mode)
+        with self._lock:
+            count = self._conn.execute(f"SELECT COUNT(*) {_RUNTIME_FILTER}", key).fetchone()[0]
+            if not count:
+                return None
+
+            def percentile(fraction: float) -> float:
+                # Posto mais próximo, lido do índice
+                offset = max(0, math.ceil(fraction * count) - 1)
+                return self._conn.execute(
+                    f"SELECT elapsed {_RUNTIME_FILTER} ORDER BY elapsed LIMIT 1 OFFSET ?", key + (offset,)
+                ).fetchone()[0]
+
+            return RuntimeStats(count, percentile(0.5), percentile(0.95), percentile(1.0))
+
+    def connection_key(self, connection_info: Dict[str, str]) -> str:
+        """Conexão como registrada no histórico (nome, ou servidor e banco)."""
+        return connection_info.get('name') or self._database(connection_info)
+
+    def record(self, executor, outcome: str, mode: str = "full") -> Optional[Regression]:
+        """
+        Registra a execução de um ``FunctionExecutor`` já concluído.
+
+        Args:
+            executor: Executor da função
+            outcome: Desfecho (success, cache, timeout, cancelled, error)
+            mode: Modo da execução (full, tile, incremental, profile...)
+
+        Returns:
+            Regression se a execução foi bem-sucedida e muito mais lenta que o histórico
+        """
+        connection = self.connection_key(executor.connection_info)
+        elapsed = executor.elapsed or 0.0
+
+        regression = None
+        if outcome == "success":
+            baseline = self.runtime_stats(connection, executor.schema_name, executor.function_name, mode)
+            if (baseline is not None and baseline.count >= self.min_samples and baseline.p50 > 0
+                    and elapsed > self.regression_factor * baseline.p50):
+                regression = Regression(elapsed, baseline, self.regression_factor)
+
+        parameters = list(executor.parameters)
+        if executor.bbox is not None:
+            parameters = {'bbox': list(executor.bbox), 'parameters': parameters}
+        report = executor.statement_report
+        finished_at = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                """
+                INSERT INTO executions (connection, database, schema_name, function_name, mode, parameters,
+                                        started_at, finished_at, elapsed, outcome, row_count, error,
+                                        server_stats, regression)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                (
+                    connection, self._database(executor.connection_info), executor.schema_name,
+                    executor.function_name, mode, json.dumps(parameters, default=str),
+                    finished_at - elapsed, finished_at, elapsed, outcome, executor.row_count,
+                    executor.error_message, json.dumps(report.to_dict()) if report is not None else None,
+                    int(regression is not None),
+                )
+            )
+        return regression
+
+    def record_safely(self, executor, outcome: str, mode: str = "full") -> Optional[Regression]:
+        """Como ``record``, mas uma falha no histórico não afeta a execução."""
+        try:
+            return self.record(executor, outcome, mode)
+        except sqlite3.Error as e:
+            log_message(f"Não foi possível registrar a execução no histórico: {e}", LogLevel.WARNING)
+            return None
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
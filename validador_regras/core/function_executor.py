@@ -0,0 +1,379 @@
+"""
+/***************************************************************************
+ Validador de Regras PostGis
+                                 A QGIS plugin
+ 2ºCGEO
+                              -------------------
+        begin                : 2025-07-16
+        git sha              : $Format:%H$
+        copyright            : (C) 2025 by Godinho, Alvarez, Perrut
+        email                : estevezcodando@gmail.com
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+"""
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+from .dbapi import psycopg2, sql
+from .logger import log_message, LogLevel
+from .metrics import FUNCTION_DURATION, ROWS_FETCHED, record_stage
+from .tracing import get_tracer
+
+from .result_stream import DEFAULT_CHUNK_SIZE, stream_query
+from .notice_session import parse_progress
+
+# SQLSTATE de falhas que costumam passar numa nova tentativa
+_TRANSIENT_SQLSTATES = {'40001', '40P01', '55P03', '57P01'}
+
+
+def _is_transient(error: Exception) -> bool:
+    if isinstance(error, (psycopg2.OperationalError, psycopg2.InterfaceError)):
+        return not isinstance(error, psycopg2.extensions.QueryCanceledError)
+    return getattr(error, 'pgcode', None) in _TRANSIENT_SQLSTATES
+
+
+class FunctionExecutor:
+    """
+    Execução de uma função de validação, sem dependência de Qt.
+    Responsabilidade única: chamar a função numa sessão do pool, ler o
+    resultado em blocos e registrar contagem, amostra, tempos e erros.
+    
+    O resultado é lido por um cursor no servidor, em blocos de ``chunk_size``
+    linhas, entregues aos consumidores registrados com ``add_chunk_consumer``;
+    o executor guarda apenas a contagem de linhas e uma amostra das primeiras
+    ``PREVIEW_LIMIT`` linhas.
+    
+    Convenção bbox: quando ``bbox`` é informado, a função é chamada com um
+    primeiro argumento ``geometry`` igual a
+    ``ST_MakeEnvelope(xmin, ymin, xmax, ymax, srid)`` e deve validar apenas as
+    feições cujo ponto de referência cai dentro do retângulo, com as bordas
+    máximas excluídas (xmin <= x < xmax, ymin <= y < ymax): assim tiles
+    vizinhos nunca validam a mesma feição.
+    
+    Com um ``ResultCache``, chamadas sem argumentos consultam antes o cache
+    (chave: assinatura e código da função e das auxiliares do schema +
+    contadores de modificação das tabelas dos schemas que ela toca);
+    num acerto o executor devolve o desfecho guardado sem executar a função,
+    a menos que ``force_refresh`` seja verdadeiro.
+    
+    Com um ``StatementStatsCollector`` em ``statement_stats``, o executor lê
+    ``pg_stat_statements``/``pg_statio_user_tables`` antes e depois da
+    chamada e guarda em ``statement_report`` as instruções e tabelas mais
+    custosas da execução.
+    
+    Com um ``ExecutionHistory`` em ``history``, toda execução (inclusive as
+    do cache e as que falharam) é registrada ao terminar; ``regression``
+    indica quando ela foi muito mais lenta que as anteriores.
+    
+    Quem executa define os ganchos:
+    
+    - ``is_canceled``: consultado entre as etapas e a cada bloco lido
+    - ``notice_callback``: mensagens NOTICE que não são de progresso
+    - ``progress_callback``: (percentual, feitos, total, descrição) a partir
+      das mensagens ``progress: feitos/total descrição``
+    
+    Todos são chamados na thread que executa ``execute()``.
+    """
+    
+    PREVIEW_LIMIT = 10
+    
+    def __init__(
+        self,
+        connection_info: Dict[str, str],
+        schema_name: str,
+        function_name: str,
+        parameters: List = None,
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+        bbox: Optional[Tuple[float, float, float, float, int]] = None,
+        statement_timeout: Optional[int] = None,
+        cache=None,
+        force_refresh: bool = False,
+        statement_stats=None,
+        history=None,
+        connection_service=None
+    ):
+        if connection_service is None:
+            from .database_service import DatabaseConnectionService
+            connection_service = DatabaseConnectionService()
+        self.connection_service = connection_service
+        self.connection_info = connection_info
+        self.schema_name = schema_name
+        self.function_name = function_name
+        self.parameters = parameters or []
+        self.chunk_size = chunk_size
+        self.bbox = bbox
+        self.statement_timeout = statement_timeout
+        self.timed_out = False
+        # Falha de conexão, deadlock ou serialização: pode dar certo numa nova tentativa
+        self.transient_error = False
+        self.cache = cache
+        self.force_refresh = force_refresh
+        self.cache_hit = False
+        # StatementStatsCollector: relatório das instruções mais custosas em statement_report
+        self.statement_stats = statement_stats
+        self.statement_report = None
+        # ExecutionHistory: cada execução é registrada; regression indica lentidão fora do comum
+        self.history = history
+        self.regression = None
+        self.backend_pid = None
+        self.progress_reported = False
+        self._last_progress = None
+        self.row_count = 0
+        self.preview_rows = []
+        self.error_message = None
+        self.started_at = None
+        self.finished_at = None
+        self._chunk_consumers: List[Callable[[int, list], None]] = []
+        
+        self.is_canceled: Callable[[], bool] = lambda: False
+        self.notice_callback: Optional[Callable[[str], None]] = None
+        self.progress_callback: Optional[Callable[[int, int, int, str], None]] = None
+    
+    def add_chunk_consumer(self, consumer: Callable[[int, list], None]):
+        """
+        Registra um consumidor chamado a cada bloco lido.
+        
+        Args:
+            consumer: Função que recebe (índice da primeira linha, linhas)
+        """
+        self._chunk_consumers.append(consumer)
+    
+    @property
+    def elapsed(self) -> Optional[float]:
+        """
+        Tempo de execução em segundos, ou None se ainda não executou.
+        """
+        if self.started_at is None:
+            return None
+        end = self.finished_at if self.finished_at is not None else time.monotonic()
+        return end - self.started_at
+    
+    def execute(self) -> bool:
+        """
+        Executa a função.
+        
+        Returns:
+            True se executada com sucesso (ou obtida do cache); em caso de
+            falha ou cancelamento, ``error_message`` explica o motivo
+        """
+        self.started_at = time.monotonic()
+        success = False
+        try:
+            success = self._run()
+            return success
+        finally:
+            self.finished_at = time.monotonic()
+            outcome = self._outcome(success)
+            FUNCTION_DURATION.observe(self.elapsed, outcome=outcome)
+            get_tracer().complete(
+                f"{self.schema_name}.{self.function_name}", "function", self.started_at, self.finished_at,
+                outcome=outcome, rows=self.row_count
+            )
+            if self.history is not None:
+                self.regression = self.history.record_safely(self, outcome, self.history_mode())
+    
+    def _outcome(self, success: bool) -> str:
+        """Desfecho da execução para as métricas."""
+        if success:
+            return "cache" if self.cache_hit else "success"
+        if self.timed_out:
+            return "timeout"
+        return "cancelled" if self.is_canceled() else "error"
+    
+    def history_mode(self) -> str:
+        """Modo da execução no histórico: só execuções do mesmo modo têm tempos comparáveis."""
+        return "tile" if self.bbox is not None else "full"
+    
+    def _build_query(self) -> Tuple["sql.Composable", List]:
+        """Monta a chamada da função com os parâmetros como binding."""
+        args = [sql.Placeholder()] * len(self.parameters)
+        params = list(self.parameters)
+        if self.bbox is not None:
+            args.insert(0, sql.SQL("ST_MakeEnvelope(%s, %s, %s, %s, %s)"))
+            params = list(self.bbox) + params
+        
+        query = sql.SQL("SELECT {}.{}({})").format(
+            sql.Identifier(self.schema_name),
+            sql.Identifier(self.function_name),
+            sql.SQL(", ").join(args)
+        )
+        return query, params
+    
+    @property
+    def _discard_session(self) -> bool:
+        """Sessões que tiveram configurações alteradas não voltam ao pool."""
+        return False
+    
+    def _cacheable(self) -> bool:
+        """Só chamadas sem argumentos têm o desfecho determinado pelos dados."""
+        return self.cache is not None and not self.parameters and self.bbox is None
+    
+    def _cache_key(self, conn) -> Optional[str]:
+        """Chave do desfecho no cache; None quando não pode ser calculada."""
+        return self.cache.compute_key(conn, self.connection_info, self.schema_name, self.function_name)
+    
+    def _load_from_cache(self, key: str) -> bool:
+        entry = self.cache.get(key)
+        if entry is None:
+            return False
+        self.cache_hit = True
+        self.row_count = entry['row_count']
+        self.preview_rows = [tuple(row) for row in entry['preview_rows']]
+        return True
+    
+    def _before_execute(self, conn) -> bool:
+        """
+        Ponto de extensão executado na mesma transação, antes da chamada.
+        
+        Returns:
+            False para não chamar a função (a transação ainda é confirmada)
+        """
+        return True
+    
+    def _after_execute(self, conn):
+        """Ponto de extensão executado na mesma transação, antes do commit."""
+        pass
+    
+    def _on_notice(self, message: str):
+        """Trata as mensagens NOTICE recebidas durante a execução."""
+        progress = parse_progress(message)
+        if progress is None:
+            if self.notice_callback is not None:
+                self.notice_callback(message)
+            return
+        
+        done, total, label = progress
+        percent = int(done * 100 / total)
+        # Evita inundar quem acompanha: só repassa mudanças visíveis
+        if (percent, label) == self._last_progress:
+            return
+        self._last_progress = (percent, label)
+        self.progress_reported = True
+        if self.progress_callback is not None:
+            self.progress_callback(percent, done, total, label)
+    
+    def _consume_chunk(self, rows: list):
+        offset = self.row_count
+        self.row_count += len(rows)
+        
+        missing = self.PREVIEW_LIMIT - len(self.preview_rows)
+        if missing > 0:
+            self.preview_rows.extend(rows[:missing])
+        
+        for consumer in self._chunk_consumers:
+            consumer(offset, rows)
+    
+    def _run(self) -> bool:
+        try:
+            pool = self.connection_service.get_pool(self.connection_info, notices=True)
+            try:
+                conn = pool.acquire()
+            except Exception as e:
+                self.error_message = f"Falha ao conectar com o banco de dados: {e}"
+                self.transient_error = True
+                return False
+            conn.notice_callback = self._on_notice
+
+            cache_key = None
+            try:
+                self.backend_pid = conn.get_backend_pid()
+                if self.is_canceled():
+                    self.error_message = "Execução cancelada"
+                    return False
+                
+                if self._cacheable():
+                    cache_key = self._cache_key(conn)
+                    if cache_key and not self.force_refresh and self._load_from_cache(cache_key):
+                        log_message(
+                            f"Resultado de {self.schema_name}.{self.function_name} obtido do cache",
+                            LogLevel.INFO
+                        )
+                        return True
+                
+                if self.statement_timeout:
+                    with conn.cursor() as cur:
+                        cur.execute("SET LOCAL statement_timeout = %s", (int(self.statement_timeout),))
+                
+                stats_before = None
+                if self._before_execute(conn):
+                    if self.statement_stats is not None:
+                        stats_before = self.statement_stats.begin(conn)
+                    query, params = self._build_query()
+                    # Cancelamento durante a preparação: o backend está ocioso e não
+                    # haveria consulta para o servidor interromper
+                    if self.is_canceled():
+                        conn.rollback()
+                        self.error_message = "Execução cancelada"
+                        return False
+                    # execute: até o primeiro bloco (a função roda no primeiro FETCH); fetch: o restante
+                    query_started = time.monotonic()
+                    first_chunk_at = None
+                    for rows in stream_query(conn, query, params, self.chunk_size):
+                        if first_chunk_at is None:
+                            first_chunk_at = time.monotonic()
+                            record_stage("execute", query_started, first_chunk_at)
+                        ROWS_FETCHED.inc(len(rows), source="function")
+                        self._consume_chunk(rows)
+                        if self.is_canceled():
+                            conn.rollback()
+                            self.error_message = "Execução cancelada"
+                            return False
+                    if first_chunk_at is None:
+                        record_stage("execute", query_started)
+                    else:
+                        record_stage("fetch", first_chunk_at, rows=self.row_count)
+                    self._after_execute(conn)
+                # A função pode gravar tabelas de revisão (aux_revisao_*)
+                conn.commit()
+                
+                if stats_before is not None:
+                    self.statement_report = self.statement_stats.finish(conn, stats_before)
+                    conn.rollback()
+                
+                if cache_key:
+                    self.cache.put(cache_key, self.row_count, self.preview_rows, self.elapsed)
+            except Exception:
+                if not conn.closed:
+                    # Sessão encerrada por pg_terminate_backend já não aceita rollback
+                    try:
+                        conn.rollback()
+                    except psycopg2.Error:
+                        pass
+                raise
+            finally:
+                self.backend_pid = None
+                conn.notice_callback = None
+                pool.release(conn, discard=self._discard_session)
+
+            log_message(
+                f"Função {self.schema_name}.{self.function_name} executada com sucesso "
+                f"({self.row_count} registro(s))",
+                LogLevel.INFO
+            )
+            return True
+
+        except psycopg2.extensions.QueryCanceledError as e:
+            self.timed_out = bool(self.statement_timeout) and not self.is_canceled()
+            self.error_message = str(e)
+            log_message(
+                f"Execução de {self.schema_name}.{self.function_name} interrompida: {e}",
+                LogLevel.WARNING
+            )
+            return False
+
+        except Exception as e:
+            self.error_message = str(e)
+            self.transient_error = _is_transient(e)
+            log_message(
+                f"Erro ao executar função {self.schema_name}.{self.function_name}: {e}",
+                LogLevel.CRITICAL
+            )
+            return False
@@ -0,0 +1,394 @@
+"""
+/***************************************************************************
+ Validador de Regras PostGis
+                                 A QGIS plugin
+ 2ºCGEO
+                              -------------------
+        begin                : 2025-07-16
+        git sha              : $Format:%H$
+        copyright            : (C) 2025 by Godinho, Alvarez, Perrut
+        email                : estevezcodando@gmail.com
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+"""
+from typing import Dict, List, Optional, Tuple
+
+from . import lazy_getattr
+from .database_service import FunctionService
+from .dbapi import sql
+from .logger import log_message, LogLevel
+from .function_executor import FunctionExecutor
+from .tiled_execution import TilePlanner
+
+CONTROL_SCHEMA = "validador"
+
+_INSTALL_SQL = f"""
+CREATE SCHEMA IF NOT EXISTS {CONTROL_SCHEMA};
+
+CREATE TABLE IF NOT EXISTS {CONTROL_SCHEMA}.change_log (
+    id bigserial PRIMARY KEY,
+    schema_name text NOT NULL,
+    table_name text NOT NULL,
+    op char(1) NOT NULL,
+    geom_bbox geometry,
+    changed_at timestamptz NOT NULL DEFAULT now(),
+    -- Transação que gravou a alteração: a marca d'água é um xmin de snapshot,
+    -- não o maior id (ids menores podem ser confirmados depois de lidos)
+    txid bigint NOT NULL DEFAULT txid_current()
+);
+CREATE INDEX IF NOT EXISTS change_log_table_txid_idx
+    ON {CONTROL_SCHEMA}.change_log (schema_name, table_name, txid);
+
+CREATE TABLE IF NOT EXISTS {CONTROL_SCHEMA}.validation_runs (
+    schema_name text NOT NULL,
+    function_name text NOT NULL,
+    last_xmin bigint,
+    finished_at timestamptz NOT NULL DEFAULT now(),
+    PRIMARY KEY (schema_name, function_name)
+);
+
+CREATE OR REPLACE FUNCTION {CONTROL_SCHEMA}.log_change() RETURNS trigger
+LANGUAGE plpgsql AS $$
+DECLARE
+    g geometry;
+BEGIN
+    -- TG_ARGV[0]: nome da coluna geométrica da tabela monitorada
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        EXECUTE format('SELECT ST_Envelope(($1).%I)', TG_ARGV[0]) USING OLD INTO g;
+        INSERT INTO {CONTROL_SCHEMA}.change_log (schema_name, table_name, op, geom_bbox)
+        VALUES (TG_TABLE_SCHEMA, TG_TABLE_NAME, left(TG_OP, 1), g);
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        EXECUTE format('SELECT ST_Envelope(($1).%I)', TG_ARGV[0]) USING NEW INTO g;
+        INSERT INTO {CONTROL_SCHEMA}.change_log (schema_name, table_name, op, geom_bbox)
+        VALUES (TG_TABLE_SCHEMA, TG_TABLE_NAME, left(TG_OP, 1), g);
+    END IF;
+    RETURN NULL;
+END;
+$$;
+"""
+
+TRIGGER_NAME = "validador_change_log"
+
+
+class ChangeTrackingService:
+    """
+    Serviço de rastreamento de alterações das tabelas base/alvo.
+    Responsabilidade única: manter o change-log (alimentado por trigger) e a
+    marca d'água da última validação bem-sucedida de cada função.
+
+    A marca d'água é o ``xmin`` do snapshot da execução: todas as transações
+    anteriores a ele já terminaram, então cada alteração cai em exatamente
+    uma janela ``[xmin anterior, xmin atual)``, mesmo quando uma transação
+    concorrente confirma depois da leitura. Alterações de transações ainda
+    abertas ficam para a execução seguinte.
+    """
+
+    # Espera máxima pelos bloqueios das tabelas monitoradas durante a instalação
+    INSTALL_LOCK_TIMEOUT = "10s"
+
+    def install(self, conn, tables: List[Tuple[str, str, str]]):
+        """
+        Cria (de forma idempotente) o schema de controle e os triggers.
+
+        Roda numa transação própria e curta, confirmada ao final: CREATE
+        TRIGGER bloqueia a escrita nas tabelas até o commit, então ``conn``
+        não deve ser a conexão da validação. Se outra transação segurar a
+        tabela por mais de ``INSTALL_LOCK_TIMEOUT``, a instalação falha em vez
+        de enfileirar (e travar) as edições dos usuários.
+
+        Args:
+            conn: Conexão psycopg2 dedicada à instalação
+            tables: Lista de (schema, tabela, coluna geométrica)
+        """
+        with conn, conn.cursor() as cur:
+            cur.execute("SET LOCAL lock_timeout = %s", (self.INSTALL_LOCK_TIMEOUT,))
+            cur.execute(_INSTALL_SQL)
+            for schema_name, table_name, geom_column in tables:
+                cur.execute(
+                    sql.SQL("DROP TRIGGER IF EXISTS {} ON {}.{}").format(
+                        sql.Identifier(TRIGGER_NAME), sql.Identifier(schema_name), sql.Identifier(table_name)
+                    )
+                )
+                cur.execute(
+                    sql.SQL(
+                        "CREATE TRIGGER {} AFTER INSERT OR UPDATE OR DELETE ON {}.{} "
+                        "FOR EACH ROW EXECUTE PROCEDURE {}.log_change({})"
+                    ).format(
+                        sql.Identifier(TRIGGER_NAME),
+                        sql.Identifier(schema_name),
+                        sql.Identifier(table_name),
+                        sql.Identifier(CONTROL_SCHEMA),
+                        sql.Literal(geom_column)
+                    )
+                )
+
+    def untracked_tables(self, conn, tables: List[Tuple[str, str, str]]) -> List[Tuple[str, str, str]]:
+        """Retorna as tabelas que ainda não possuem o trigger de rastreamento."""
+        with conn.cursor() as cur:
+            cur.execute(
+                """
+                SELECT n.nspname, c.relname
+                FROM pg_trigger t
+                JOIN pg_class c ON c.oid = t.tgrelid
+                JOIN pg_namespace n ON n.oid = c.relnamespace
+                WHERE t.tgname = %s
+                """,
+                (TRIGGER_NAME,)
+            )
+            tracked = set(cur.fetchall())
+        return [table for table in tables if (table[0], table[1]) not in tracked]
+
+    def last_watermark(self, conn, schema_name: str, function_name: str) -> Optional[int]:
+        """Marca d'água da última execução bem-sucedida, ou None se nunca executada."""
+        with conn.cursor() as cur:
+            cur.execute(
+                f"SELECT last_xmin FROM {CONTROL_SCHEMA}.validation_runs "
+                "WHERE schema_name = %s AND function_name = %s",
+                (schema_name, function_name)
+            )
+            row = cur.fetchone()
+        return row[0] if row else None
+
+    def current_watermark(self, conn) -> int:
+        """``xmin`` do snapshot atual: as transações abaixo dele já foram confirmadas ou desfeitas."""
+        with conn.cursor() as cur:
+            cur.execute("SELECT txid_snapshot_xmin(txid_current_snapshot())")
+            return cur.fetchone()[0]
+
+    def dirty_area(
+        self,
+        conn,
+        tables: List[Tuple[str, str, str]],
+        srid: int,
+        after_xmin: int,
+        until_xmin: int,
+        neighbour_distance: float = 0.0
+    ) -> Tuple[int, Optional[str]]:
+        """
+        Calcula a área a revalidar: envelopes das feições alteradas, expandidos
+        por ``neighbour_distance``, unidos aos envelopes das feições vizinhas
+        que os intersectam.
+
+        Returns:
+            (quantidade de alterações, área em EWKB hexadecimal ou None)
+        """
+        table_filter = sql.SQL(" OR ").join(
+            sql.SQL("(schema_name = {} AND table_name = {})").format(sql.Literal(s), sql.Literal(t))
+            for s, t, _ in tables
+        )
+        neighbours = sql.SQL(" UNION ALL ").join(
+            sql.SQL(
+                "SELECT ST_Transform(ST_Envelope(t.{geom}), {srid}) AS g "
+                "FROM {schema}.{table} t JOIN changes c "
+                "ON t.{geom} && ST_Transform(c.g, Find_SRID({s}, {t}, {g}))"
+            ).format(
+                geom=sql.Identifier(geom), srid=sql.Literal(srid),
+                schema=sql.Identifier(s), table=sql.Identifier(t),
+                s=sql.Literal(s), t=sql.Literal(t), g=sql.Literal(geom)
+            )
+            for s, t, geom in tables
+        )
+        query = sql.SQL(
+            """
+            WITH changes AS (
+                SELECT ST_Expand(ST_Transform(geom_bbox, {srid}), {distance}) AS g
+                FROM {control}.change_log
+                WHERE txid >= %s AND txid < %s AND geom_bbox IS NOT NULL AND ({tables})
+            ), area AS (
+                SELECT g FROM changes
+                UNION ALL
+                {neighbours}
+            )
+            SELECT (SELECT count(*) FROM changes), ST_AsEWKB(ST_Multi(ST_Union(g)))
+            FROM area
+            """
+        ).format(
+            srid=sql.Literal(srid),
+            distance=sql.Literal(float(neighbour_distance)),
+            control=sql.Identifier(CONTROL_SCHEMA),
+            tables=table_filter,
+            neighbours=neighbours
+        )
+        with conn.cursor() as cur:
+            cur.execute(query, (after_xmin, until_xmin))
+            count, area = cur.fetchone()
+        return count, bytes(area).hex() if area is not None else None
+
+    def review_tables(self, conn, schema_name: str, function_name: str) -> List[Tuple[str, str, int]]:
+        """
+        Tabelas de revisão (``aux_revisao_*``) do schema citadas no código da
+        função: as que ela grava.
+
+        Returns:
+            Lista de (tabela, coluna geométrica, SRID)
+        """
+        with conn.cursor() as cur:
+            cur.execute(
+                """
+                SELECT DISTINCT g.f_table_name::text, g.f_geometry_column::text, g.srid
+                FROM geometry_columns g
+                JOIN pg_proc p ON p.prosrc ~* ('\\m' || g.f_table_name || '\\M')
+                JOIN pg_namespace n ON n.oid = p.pronamespace
+                WHERE g.f_table_schema = %s AND g.f_table_name LIKE 'aux\\_revisao\\_%%'
+                  AND n.nspname = %s AND p.proname = %s
+                """,
+                (schema_name, schema_name, function_name)
+            )
+            return cur.fetchall()
+
+    def purge_area(self, conn, schema_name: str, tables: List[Tuple[str, str, int]], area_ewkb: str) -> Dict[str, int]:
+        """
+        Remove das tabelas de revisão da função os erros que a execução
+        incremental vai substituir: os de feições cujo ponto de referência
+        (``ST_PointOnSurface``) cai na área, a mesma regra que decide o que a
+        função revalida. Erros de outras funções e os de feições apenas
+        encostadas na área ficam.
+
+        Args:
+            tables: Tabelas de revisão da função (ver ``review_tables``)
+
+        Returns:
+            Quantidade de linhas removidas por tabela
+        """
+        removed = {}
+        with conn.cursor() as cur:
+            for table_name, geom_column, srid in tables:
+                cur.execute(
+                    sql.SQL(
+                        "WITH a AS (SELECT ST_Transform(%s::geometry, %s) AS g) "
+                        "DELETE FROM {}.{} t USING a "
+                        "WHERE t.{geom} && a.g AND ST_Intersects(ST_PointOnSurface(t.{geom}), a.g)"
+                    ).format(sql.Identifier(schema_name), sql.Identifier(table_name), geom=sql.Identifier(geom_column)),
+                    (area_ewkb, srid)
+                )
+                removed[table_name] = cur.rowcount
+        return removed
+
+    def mark_run(self, conn, schema_name: str, function_name: str, watermark: int):
+        """Registra a marca d'água e descarta alterações já vistas por todas as funções."""
+        with conn.cursor() as cur:
+            cur.execute(
+                f"""
+                INSERT INTO {CONTROL_SCHEMA}.validation_runs (schema_name, function_name, last_xmin)
+                VALUES (%s, %s, %s)
+                ON CONFLICT (schema_name, function_name)
+                DO UPDATE SET last_xmin = EXCLUDED.last_xmin, finished_at = now()
+                """,
+                (schema_name, function_name, watermark)
+            )
+            cur.execute(
+                f"DELETE FROM {CONTROL_SCHEMA}.change_log "
+                f"WHERE txid < (SELECT min(last_xmin) FROM {CONTROL_SCHEMA}.validation_runs)"
+            )
+
+
+class IncrementalExecutor(FunctionExecutor):
+    """
+    Executor de validação incremental.
+    Responsabilidade única: revalidar apenas a área das feições alteradas
+    desde a última execução bem-sucedida da função.
+
+    Usa a mesma convenção da execução por tiles: a função recebe como
+    primeiro argumento a área a validar (``geometry``); ``NULL`` significa
+    validar tudo, o que acontece na primeira execução.
+    """
+
+    def __init__(
+        self,
+        connection_info: Dict[str, str],
+        schema_name: str,
+        function_name: str,
+        neighbour_distance: float = 0.0,
+        **kwargs
+    ):
+        super().__init__(connection_info, schema_name, function_name, **kwargs)
+        self.neighbour_distance = neighbour_distance
+        self.tracking = ChangeTrackingService()
+        self.region = None
+        self.change_count = 0
+        self.full_run = False
+        self.purged = {}
+        self._watermark = 0
+
+    def _cacheable(self) -> bool:
+        return False
+
+    def history_mode(self) -> str:
+        # A primeira execução valida tudo: comparável às execuções completas
+        return "full" if self.full_run else "incremental"
+
+    def _build_query(self):
+        query = sql.SQL("SELECT {}.{}({})").format(
+            sql.Identifier(self.schema_name),
+            sql.Identifier(self.function_name),
+            sql.SQL(", ").join([sql.SQL("%s::geometry")] + [sql.Placeholder()] * len(self.parameters))
+        )
+        return query, [self.region] + list(self.parameters)
+
+    def _before_execute(self, conn) -> bool:
+        functions = FunctionService(self.connection_service).list_functions(conn, self.schema_name)
+        if not any(f['name'] == self.function_name and f['region_aware'] for f in functions):
+            raise RuntimeError(
+                "A função não recebe a área de validação (primeiro parâmetro geometry DEFAULT NULL): "
+                "validação incremental indisponível"
+            )
+        tables = TilePlanner().discover_tables(conn, self.schema_name, self.function_name)
+        if not tables:
+            raise RuntimeError("Nenhuma tabela geométrica base/alvo encontrada para a função")
+
+        untracked = self.tracking.untracked_tables(conn, tables)
+        if untracked:
+            # Conexão à parte: os bloqueios do CREATE TRIGGER não podem durar a execução inteira
+            install_conn = self.connection_service.create_dbapi_connection(self.connection_info)
+            try:
+                self.tracking.install(install_conn, untracked)
+            finally:
+                install_conn.close()
+            log_message(f"Rastreamento de alterações instalado em {len(untracked)} tabela(s)", LogLevel.INFO)
+
+        last_xmin = self.tracking.last_watermark(conn, self.schema_name, self.function_name)
+        self._watermark = self.tracking.current_watermark(conn)
+        review_tables = self.tracking.review_tables(conn, self.schema_name, self.function_name)
+
+        if last_xmin is None or untracked or not review_tables:
+            # Sem histórico confiável (ou sem saber onde a função grava os erros,
+            # o que impede substituí-los por área): valida tudo e passa a rastrear
+            if not review_tables:
+                log_message(
+                    f"Nenhuma tabela aux_revisao_* citada no código de {self.function_name}: validação completa",
+                    LogLevel.WARNING
+                )
+            self.full_run = True
+            self.region = None
+            return True
+
+        with conn.cursor() as cur:
+            cur.execute("SELECT Find_SRID(%s, %s, %s)", tables[0])
+            srid = cur.fetchone()[0]
+
+        self.change_count, self.region = self.tracking.dirty_area(
+            conn, tables, srid, last_xmin, self._watermark, self.neighbour_distance
+        )
+        if self.region is None:
+            # Nada mudou: apenas avança a marca d'água
+            self.tracking.mark_run(conn, self.schema_name, self.function_name, self._watermark)
+            return False
+
+        self.purged = self.tracking.purge_area(conn, self.schema_name, review_tables, self.region)
+        return True
+
+    def _after_execute(self, conn):
+        self.tracking.mark_run(conn, self.schema_name, self.function_name, self._watermark)
+
+
+# Classes que dependem do QGIS/Qt, carregadas só quando pedidas
+__getattr__ = lazy_getattr(__name__, {'IncrementalExecutionTask': '.tasks'})
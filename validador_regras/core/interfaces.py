@@ -70,3 +70,23 @@ class IValidationRule(ABC):
         pass
 
 
+
+
+class ILogger(ABC):
+    @abstractmethod
+    def log(self, message: str, level: int, tag: str):
+        pass
+
+
+class ISettingsStore(ABC):
+    @abstractmethod
+    def value(self, key: str, default=None):
+        pass
+
+    @abstractmethod
+    def set_value(self, key: str, value):
+        pass
+
+    @abstractmethod
+    def child_groups(self, group: str) -> List[str]:
+        pass
@@ -0,0 +1,528 @@
+"""
+/***************************************************************************
+ Validador de Regras PostGis
+                                 A QGIS plugin
+ 2ºCGEO
+                              -------------------
+        begin                : 2025-07-16
+        git sha              : $Format:%H$
+        copyright            : (C) 2025 by Godinho, Alvarez, Perrut
+        email                : estevezcodando@gmail.com
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+"""
+import datetime
+import decimal
+import importlib.util
+import json
+import os
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional
+
+from .dbapi import sql
+from .logger import log_message, LogLevel
+from .metrics import ROWS_FETCHED, record_stage
+from .result_stream import DEFAULT_CHUNK_SIZE, stream_query
+
+FORMAT_GPKG = "gpkg"
+FORMAT_PARQUET = "parquet"
+
+_FORMAT_EXTENSIONS = {'.gpkg': FORMAT_GPKG, '.parquet': FORMAT_PARQUET, '.geoparquet': FORMAT_PARQUET}
+_GEOMETRY_TYPES = ('geometry', 'geography')
+
+
+def format_for_path(path: str) -> Optional[str]:
+    """Formato deduzido da extensão do arquivo (``.gpkg``, ``.parquet``)."""
+    return _FORMAT_EXTENSIONS.get(os.path.splitext(path)[1].lower())
+
+
+def format_available(export_format: str) -> bool:
+    """A biblioteca do formato (GDAL/OGR ou pyarrow) está instalada."""
+    module = 'osgeo' if export_format == FORMAT_GPKG else 'pyarrow'
+    return importlib.util.find_spec(module) is not None
+
+
+@dataclass
+class ExportColumn:
+    """
+    Coluna do resultado exportado. Geometrias trazem SRID e tipo do typmod
+    (0 e None quando a coluna não é restrita).
+    """
+    name: str
+    type_name: str
+    srid: int = 0
+    geometry_type: Optional[str] = None
+
+    @property
+    def is_geometry(self) -> bool:
+        return self.type_name in _GEOMETRY_TYPES
+
+
+def _split_typmod(geometry_type: Optional[str]):
+    """``MultiPolygonZ`` -> (``MULTIPOLYGON``, True); genérico -> ('', False)."""
+    name = (geometry_type or '').upper()
+    base = name.rstrip('ZM')
+    if base == 'GEOMETRY':
+        return '', False
+    return base, 'Z' in name[len(base):]
+
+
+def _plain(value):
+    """Valores sem tipo nativo nos formatos de saída viram texto."""
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, ensure_ascii=False, default=str)
+    return str(value)
+
+
+class _GeoPackageWriter:
+    """Grava os blocos numa camada GeoPackage via OGR, uma transação por bloco."""
+
+    def __init__(self, path: str, layer_name: str, columns: List[ExportColumn], geometry: Optional[ExportColumn]):
+        from osgeo import gdal, ogr, osr
+        self._gdal = gdal
+        self._ogr = ogr
+        self._osr = osr
+        self.path = path
+        self.layer_name = layer_name
+        self.columns = columns
+        self.geometry = geometry
+        self._dataset = None
+        self._layer = None
+        self._definition = None
+
+    def _field_type(self, column: ExportColumn):
+        ogr = self._ogr
+        types = {
+            'int2': ogr.OFTInteger, 'int4': ogr.OFTInteger, 'int8': ogr.OFTInteger64,
+            'float4': ogr.OFTReal, 'float8': ogr.OFTReal, 'numeric': ogr.OFTReal,
+            'bool': ogr.OFTInteger, 'date': ogr.OFTDate,
+            'timestamp': ogr.OFTDateTime, 'timestamptz': ogr.OFTDateTime,
+        }
+        return types.get(column.type_name, ogr.OFTString)
+
+    def _geometry_type(self) -> int:
+        ogr = self._ogr
+        if self.geometry is None:
+            return ogr.wkbNone
+        base, has_z = _split_typmod(self.geometry.geometry_type)
+        names = {
+            'POINT': ogr.wkbPoint, 'LINESTRING': ogr.wkbLineString, 'POLYGON': ogr.wkbPolygon,
+            'MULTIPOINT': ogr.wkbMultiPoint, 'MULTILINESTRING': ogr.wkbMultiLineString,
+            'MULTIPOLYGON': ogr.wkbMultiPolygon, 'GEOMETRYCOLLECTION': ogr.wkbGeometryCollection,
+        }
+        geometry_type = names.get(base, ogr.wkbUnknown)
+        return ogr.GT_SetZ(geometry_type) if has_z else geometry_type
+
+    def open(self, srid: int):
+        ogr = self._ogr
+        driver = ogr.GetDriverByName("GPKG")
+        if driver is None:
+            raise RuntimeError("Driver GPKG indisponível no GDAL")
+        self._dataset = driver.CreateDataSource(self.path)
+        if self._dataset is None:
+            raise RuntimeError(f"Não foi possível criar {self.path}: {self._gdal.GetLastErrorMsg()}")
+
+        srs = None
+        if self.geometry is not None and srid:
+            srs = self._osr.SpatialReference()
+            if srs.ImportFromEPSG(int(srid)) != 0:
+                srs = None
+        options = [f"GEOMETRY_NAME={self.geometry.name}"] if self.geometry is not None else []
+        self._layer = self._dataset.CreateLayer(self.layer_name, srs, self._geometry_type(), options)
+        if self._layer is None:
+            raise RuntimeError(f"Não foi possível criar a camada {self.layer_name}")
+
+        for column in self.columns:
+            if column is self.geometry:
+                continue
+            field = ogr.FieldDefn(column.name, self._field_type(column))
+            if column.type_name == 'bool':
+                field.SetSubType(ogr.OFSTBoolean)
+            self._layer.CreateField(field)
+        self._definition = self._layer.GetLayerDefn()
+
+    def write(self, rows: List[tuple]):
+        ogr = self._ogr
+        self._layer.StartTransaction()
+        for row in rows:
+            feature = ogr.Feature(self._definition)
+            field_index = 0
+            for column, value in zip(self.columns, row):
+                if column is self.geometry:
+                    if value is not None:
+                        feature.SetGeometryDirectly(ogr.CreateGeometryFromWkb(bytes(value)))
+                    continue
+                if value is not None:
+                    if column.is_geometry:
+                        # Demais colunas geométricas seguem como WKT
+                        value = ogr.CreateGeometryFromWkb(bytes(value)).ExportToWkt()
+                    elif isinstance(value, bool):
+                        value = int(value)
+                    elif isinstance(value, decimal.Decimal):
+                        value = float(value)
+                    elif isinstance(value, (datetime.date, datetime.datetime)):
+                        value = value.isoformat()
+                    elif not isinstance(value, (int, float, str)):
+                        value = _plain(value)
+                    feature.SetField(field_index, value)
+                field_index += 1
+            if self._layer.CreateFeature(feature) != 0:
+                self._layer.RollbackTransaction()
+                raise RuntimeError(f"Falha ao gravar feição em {self.layer_name}")
+        self._layer.CommitTransaction()
+
+    def close(self):
+        self._layer = None
+        self._dataset = None
+
+
+class _GeoParquetWriter:
+    """
+    Grava os blocos em GeoParquet (geometria em WKB, metadados ``geo`` 1.0.0)
+    via pyarrow, um grupo de linhas por bloco.
+    """
+
+    def __init__(self, path: str, layer_name: str, columns: List[ExportColumn], geometry: Optional[ExportColumn]):
+        import pyarrow
+        import pyarrow.parquet
+        self._pa = pyarrow
+        self._pq = pyarrow.parquet
+        self.path = path
+        self.columns = columns
+        self.geometry = geometry
+        self._schema = None
+        self._writer = None
+
+    def _arrow_type(self, column: ExportColumn):
+        pa = self._pa
+        if column.is_geometry:
+            return pa.binary()
+        types = {
+            'int2': pa.int16(), 'int4': pa.int32(), 'int8': pa.int64(),
+            'float4': pa.float32(), 'float8': pa.float64(), 'numeric': pa.float64(),
+            'bool': pa.bool_(), 'date': pa.date32(), 'bytea': pa.binary(),
+            'timestamp': pa.timestamp('us'), 'timestamptz': pa.timestamp('us', tz='UTC'),
+        }
+        return types.get(column.type_name, pa.string())
+
+    @staticmethod
+    def _crs(srid: int):
+        """PROJJSON do SRID (GDAL ou pyproj); None indica CRS desconhecido."""
+        if not srid:
+            return None
+        try:
+            from osgeo import osr
+            srs = osr.SpatialReference()
+            if srs.ImportFromEPSG(int(srid)) == 0:
+                return json.loads(srs.ExportToPROJJSON())
+        except Exception:
+            pass
+        try:
+            from pyproj import CRS
+            return CRS.from_epsg(int(srid)).to_json_dict()
+        except Exception:
+            return None
+
+    def _geometry_types(self, column: ExportColumn) -> List[str]:
+        base, has_z = _split_typmod(column.geometry_type)
+        names = {
+            'POINT': "Point", 'LINESTRING': "LineString", 'POLYGON': "Polygon",
+            'MULTIPOINT': "MultiPoint", 'MULTILINESTRING': "MultiLineString",
+            'MULTIPOLYGON': "MultiPolygon", 'GEOMETRYCOLLECTION': "GeometryCollection",
+        }
+        name = names.get(base)
+        if name is None:
+            return []
+        return [f"{name} Z" if has_z else name]
+
+    def open(self, srid: int):
+        pa = self._pa
+        fields = [pa.field(column.name, self._arrow_type(column)) for column in self.columns]
+        metadata = None
+        if self.geometry is not None:
+            geo = {
+                'version': "1.0.0",
+                'primary_column': self.geometry.name,
+                'columns': {
+                    column.name: {
+                        'encoding': "WKB",
+                        'geometry_types': self._geometry_types(column),
+                        'crs': self._crs(column.srid or (srid if column is self.geometry else 0)),
+                    }
+                    for column in self.columns if column.is_geometry
+                },
+            }
+            metadata = {b'geo': json.dumps(geo).encode('utf-8')}
+        self._schema = pa.schema(fields, metadata=metadata)
+        self._writer = self._pq.ParquetWriter(self.path, self._schema)
+
+    def _values(self, column: ExportColumn, values) -> list:
+        if column.is_geometry or column.type_name == 'bytea':
+            return [bytes(v) if v is not None else None for v in values]
+        if column.type_name == 'numeric':
+            return [float(v) if v is not None else None for v in values]
+        if self._arrow_type(column) == self._pa.string():
+            return [v if v is None or isinstance(v, str) else _plain(v) for v in values]
+        return list(values)
+
+    def write(self, rows: List[tuple]):
+        pa = self._pa
+        arrays = [
+            pa.array(self._values(column, values), type=field.type)
+            for column, field, values in zip(self.columns, self._schema, zip(*rows))
+        ]
+        self._writer.write_table(pa.Table.from_arrays(arrays, schema=self._schema))
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+
+_WRITERS = {FORMAT_GPKG: _GeoPackageWriter, FORMAT_PARQUET: _GeoParquetWriter}
+
+
+class LayerExporter:
+    """
+    Exportação de uma camada de erros para GeoPackage ou GeoParquet.
+    Responsabilidade única: ler uma tabela (``aux_revisao_*``) ou o resultado
+    de uma função por um cursor no servidor e gravá-lo em blocos de
+    ``chunk_size`` linhas, sem carregar a camada inteira em memória.
+
+    As geometrias chegam do servidor em WKB (``ST_AsBinary``); a primeira
+    coluna geométrica é a geometria da camada. O SRID vem do typmod da coluna
+    ou, se ela não for restrita, da primeira geometria lida. O arquivo é
+    escrito com o sufixo ``.part`` antes da extensão e só recebe o nome final
+    quando a exportação termina com sucesso.
+
+    GeoPackage requer o GDAL (``osgeo``), presente no QGIS; GeoParquet
+    requer ``pyarrow``.
+
+    Quem exporta define os ganchos ``is_canceled`` (consultado a cada bloco)
+    e ``progress_callback`` (linhas gravadas, linhas estimadas).
+    """
+
+    def __init__(
+        self,
+        connection_info: Dict[str, str],
+        schema_name: str,
+        source_name: str,
+        file_path: str,
+        export_format: Optional[str] = None,
+        function: bool = False,
+        layer_name: Optional[str] = None,
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+        connection_service=None
+    ):
+        """
+        Args:
+            connection_info: Informações da conexão
+            schema_name: Schema da tabela ou função
+            source_name: Tabela ou função (sem argumentos) a exportar
+            file_path: Arquivo de destino
+            export_format: ``gpkg`` ou ``parquet`` (padrão: pela extensão)
+            function: ``source_name`` é uma função; o resultado é lido com
+                ``SELECT * FROM função()`` (a função é executada)
+            layer_name: Nome da camada no GeoPackage (padrão: ``source_name``)
+            chunk_size: Linhas por bloco
+        """
+        if connection_service is None:
+            from .database_service import DatabaseConnectionService
+            connection_service = DatabaseConnectionService()
+        export_format = export_format or format_for_path(file_path)
+        if export_format not in _WRITERS:
+            raise ValueError(f"Formato de exportação não suportado: {file_path}")
+        self.connection_service = connection_service
+        self.connection_info = connection_info
+        self.schema_name = schema_name
+        self.source_name = source_name
+        self.file_path = file_path
+        self.export_format = export_format
+        self.function = function
+        self.layer_name = layer_name or source_name
+        self.chunk_size = chunk_size
+        self.columns: List[ExportColumn] = []
+        self.rows_written = 0
+        self.estimated_rows = 0
+        self.error_message = None
+        self.elapsed = None
+
+        self.is_canceled: Callable[[], bool] = lambda: False
+        self.progress_callback: Optional[Callable[[int, int], None]] = None
+
+    @property
+    def source(self) -> str:
+        suffix = "()" if self.function else ""
+        return f"{self.schema_name}.{self.source_name}{suffix}"
+
+    def _source_query(self) -> "sql.Composed":
+        if self.function:
+            return sql.SQL("SELECT * FROM {}.{}()").format(
+                sql.Identifier(self.schema_name), sql.Identifier(self.source_name)
+            )
+        return sql.SQL("SELECT * FROM {}.{}").format(sql.Identifier(self.schema_name), sql.Identifier(self.source_name))
+
+    def describe(self, conn) -> List[ExportColumn]:
+        """
+        Colunas do resultado, lidas de uma visão temporária sobre a consulta
+        (criar a visão não executa a função).
+        """
+        view = f"validador_export_{uuid.uuid4().hex[:12]}"
+        with conn.cursor() as cur:
+            cur.execute(
+                sql.SQL("CREATE TEMP VIEW {} AS ").format(sql.Identifier(view)) + self._source_query()
+            )
+            cur.execute(
+                """
+                SELECT a.attname, t.typname,
+                       CASE WHEN t.typname IN ('geometry', 'geography') AND a.atttypmod > 0
+                            THEN postgis_typmod_srid(a.atttypmod) ELSE 0 END,
+                       CASE WHEN t.typname IN ('geometry', 'geography') AND a.atttypmod > 0
+                            THEN postgis_typmod_type(a.atttypmod) END
+                FROM pg_attribute a
+                JOIN pg_type t ON t.oid = a.atttypid
+                WHERE a.attrelid = to_regclass(%s) AND a.attnum > 0 AND NOT a.attisdropped
+                ORDER BY a.attnum
+                """,
+                (sql.Identifier(view).as_string(conn),)
+            )
+            rows = cur.fetchall()
+            cur.execute(sql.SQL("DROP VIEW {}").format(sql.Identifier(view)))
+        return [ExportColumn(name, type_name, srid or 0, geometry_type) for name, type_name, srid, geometry_type in rows]
+
+    def _select_query(self, geometry: Optional[ExportColumn]) -> "sql.Composed":
+        fields = []
+        for column in self.columns:
+            identifier = sql.Identifier(column.name)
+            if column.is_geometry:
+                fields.append(sql.SQL("ST_AsBinary({0}) AS {0}").format(identifier))
+            else:
+                fields.append(identifier)
+        if geometry is not None and not geometry.srid:
+            # SRID da coluna não restrita, lido da primeira geometria
+            fields.append(sql.SQL("ST_SRID({})").format(sql.Identifier(geometry.name)))
+        return sql.SQL("SELECT {} FROM ({}) AS fonte").format(sql.SQL(", ").join(fields), self._source_query())
+
+    def _part_path(self) -> str:
+        stem, extension = os.path.splitext(self.file_path)
+        return f"{stem}.part{extension}"
+
+    def export(self) -> bool:
+        """
+        Exporta a camada.
+
+        Returns:
+            True se o arquivo foi gravado; em caso de falha ou cancelamento,
+            ``error_message`` explica o motivo e nenhum arquivo parcial fica
+        """
+        started = time.monotonic()
+        part_path = self._part_path()
+        writer = None
+        try:
+            if not format_available(self.export_format):
+                library = "GDAL (osgeo)" if self.export_format == FORMAT_GPKG else "pyarrow"
+                raise RuntimeError(f"A exportação para {self.export_format} requer o pacote {library}")
+            if os.path.exists(part_path):
+                os.remove(part_path)
+            with self.connection_service.connection(self.connection_info) as conn:
+                self.columns = self.describe(conn)
+                if not self.columns:
+                    raise ValueError(f"{self.source} não encontrada ou sem colunas")
+                geometry = next((column for column in self.columns if column.is_geometry), None)
+                trailing_srid = geometry is not None and not geometry.srid
+
+                if not self.function:
+                    with conn.cursor() as cur:
+                        cur.execute(
+                            "SELECT GREATEST(reltuples, 0)::bigint FROM pg_class WHERE oid = to_regclass(%s)",
+                            (sql.Identifier(self.schema_name, self.source_name).as_string(conn),)
+                        )
+                        row = cur.fetchone()
+                        self.estimated_rows = row[0] if row else 0
+
+                writer = _WRITERS[self.export_format](part_path, self.layer_name, self.columns, geometry)
+                for rows in stream_query(conn, self._select_query(geometry), None, self.chunk_size,
+                                         cursor_name="validador_export"):
+                    if self.is_canceled():
+                        raise RuntimeError("Exportação cancelada")
+                    srid = geometry.srid if geometry is not None else 0
+                    if trailing_srid:
+                        srid = srid or next((row[-1] for row in rows if row[-1]), 0)
+                        rows = [row[:-1] for row in rows]
+                    if self.rows_written == 0:
+                        writer.open(srid)
+                    writer.write(rows)
+                    self.rows_written += len(rows)
+                    if self.progress_callback is not None:
+                        self.progress_callback(self.rows_written, self.estimated_rows)
+
+                if self.rows_written == 0:
+                    # Camada vazia: o arquivo ainda leva a estrutura das colunas
+                    writer.open(geometry.srid if geometry is not None else 0)
+                # A função exportada pode gravar tabelas de revisão (aux_revisao_*)
+                conn.commit()
+
+            writer.close()
+            writer = None
+            os.replace(part_path, self.file_path)
+            self.elapsed = time.monotonic() - started
+            record_stage("export", started, file=self.file_path, rows=self.rows_written)
+            ROWS_FETCHED.inc(self.rows_written, source=f"{self.export_format}_export")
+            log_message(
+                f"{self.source} exportada para {self.file_path} ({self.rows_written} feição(ões), {self.elapsed:.1f}s)",
+                LogLevel.INFO
+            )
+            return True
+
+        except Exception as e:
+            self.elapsed = time.monotonic() - started
+            if self.is_canceled():
+                self.error_message = "Exportação cancelada"
+            else:
+                self.error_message = str(e)
+                log_message(f"Erro ao exportar {self.source}: {e}", LogLevel.CRITICAL)
+            if writer is not None:
+                try:
+                    writer.close()
+                except Exception:
+                    pass
+            try:
+                os.remove(part_path)
+            except OSError:
+                pass
+            return False
+
+
+def export_layers(exporters: List[LayerExporter], max_workers: int = 4) -> List[bool]:
+    """
+    Exporta várias camadas em paralelo, cada uma com sua conexão e seu arquivo.
+
+    Args:
+        exporters: Exportações a executar
+        max_workers: Exportações simultâneas
+
+    Returns:
+        Resultado de ``export()`` de cada exportação, na ordem recebida
+
+    Raises:
+        ValueError: se duas exportações gravam o mesmo arquivo
+    """
+    paths = [os.path.abspath(exporter.file_path) for exporter in exporters]
+    if len(set(paths)) != len(paths):
+        raise ValueError("Cada camada exportada em paralelo precisa de um arquivo próprio")
+    if not exporters:
+        return []
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(exporters))),
+                            thread_name_prefix="layer-export") as pool:
+        return list(pool.map(lambda exporter: exporter.export(), exporters))
@@ -0,0 +1,120 @@
+"""
+/***************************************************************************
+ Validador de Regras PostGis
+                                 A QGIS plugin
+ 2ºCGEO
+                              -------------------
+        begin                : 2025-07-16
+        git sha              : $Format:%H$
+        copyright            : (C) 2025 by Godinho, Alvarez, Perrut
+        email                : estevezcodando@gmail.com
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+"""
+import logging
+import logging.handlers
+import os
+import threading
+import time
+from collections import deque
+from typing import List, NamedTuple
+
+from .logger import LogLevel
+
+LEVEL_PREFIXES = {
+    LogLevel.INFO: "[INFO]",
+    LogLevel.WARNING: "[AVISO]",
+    LogLevel.CRITICAL: "[ERRO]",
+    LogLevel.SUCCESS: "[INFO]",
+}
+
+
+class LogRecord(NamedTuple):
+    """Mensagem de log; ``count`` > 1 quando repetições seguidas foram agrupadas."""
+    created: float
+    level: int
+    message: str
+    count: int = 1
+
+    def format(self) -> str:
+        text = f"{time.strftime('%H:%M:%S', time.localtime(self.created))} " \
+               f"{LEVEL_PREFIXES.get(self.level, '[INFO]')} {self.message}"
+        return f"{text} (x{self.count})" if self.count > 1 else text
+
+
+class LogBuffer:
+    """
+    Fila de mensagens de log entre quem registra e quem exibe.
+    Responsabilidade única: receber mensagens de qualquer thread sem custo
+    de interface e entregá-las em lotes, com repetições seguidas agrupadas.
+
+    A fila é limitada a ``capacity`` mensagens; se ninguém a esvaziar a
+    tempo, as mais antigas são descartadas e contadas em ``dropped``.
+    """
+
+    def __init__(self, capacity: int = 100000):
+        self._pending = deque(maxlen=capacity)
+        self._lock = threading.Lock()
+        self.dropped = 0
+
+    def append(self, message: str, level: int = LogLevel.INFO):
+        record = LogRecord(time.time(), int(level), message)
+        with self._lock:
+            if len(self._pending) == self._pending.maxlen:
+                self.dropped += 1
+            self._pending.append(record)
+
+    def drain(self) -> List[LogRecord]:
+        """Retira as mensagens pendentes, agrupando repetições seguidas."""
+        with self._lock:
+            if not self._pending:
+                return []
+            pending = list(self._pending)
+            self._pending.clear()
+
+        records = []
+        for record in pending:
+            if records and records[-1].level == record.level and records[-1].message == record.message:
+                last = records[-1]
+                records[-1] = last._replace(created=record.created, count=last.count + record.count)
+            else:
+                records.append(record)
+        return records
+
+
+class RotatingLogFile:
+    """
+    Arquivo de log com rotação por tamanho (``validador.log``,
+    ``validador.log.1``...), gravado em lotes.
+    """
+
+    def __init__(self, path: str, max_bytes: int = 5 * 1024 * 1024, backup_count: int = 3):
+        """
+        Args:
+            path: Arquivo de log
+            max_bytes: Tamanho a partir do qual o arquivo é rotacionado
+            backup_count: Quantidade de arquivos antigos mantidos
+        """
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self._handler = logging.handlers.RotatingFileHandler(
+            path, maxBytes=max_bytes, backupCount=backup_count, encoding='utf-8', delay=True
+        )
+        self._handler.setFormatter(logging.Formatter("%(message)s"))
+
+    def write(self, records: List[LogRecord]):
+        for record in records:
+            date = time.strftime('%Y-%m-%d ', time.localtime(record.created))
+            self._handler.emit(logging.makeLogRecord({'msg': date + record.format(), 'args': None}))
+        self._handler.flush()
+
+    def close(self):
+        self._handler.close()
@@ -0,0 +1,68 @@
+"""
+/***************************************************************************
+ Validador de Regras PostGis
+                                 A QGIS plugin
+ 2ºCGEO
+                              -------------------
+        begin                : 2025-07-16
+        git sha              : $Format:%H$
+        copyright            : (C) 2025 by Godinho, Alvarez, Perrut
+        email                : estevezcodando@gmail.com
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+"""
+import sys
+from enum import IntEnum
+from typing import Optional
+
+from .interfaces import ILogger
+
+
+class LogLevel(IntEnum):
+    """Níveis de log, com os mesmos valores de Qgis.MessageLevel."""
+    INFO = 0
+    WARNING = 1
+    CRITICAL = 2
+    SUCCESS = 3
+
+
+DEFAULT_TAG = "ValidadorRegras"
+
+_logger: Optional[ILogger] = None
+
+
+def set_logger(logger: Optional[ILogger]):
+    """Define o destino dos logs do núcleo (None volta à escolha automática)."""
+    global _logger
+    _logger = logger
+
+
+def get_logger() -> ILogger:
+    """
+    Retorna o destino dos logs do núcleo.
+
+    Sem definição explícita, usa o log de mensagens do QGIS se o QGIS já foi
+    carregado no processo e o módulo ``logging`` da biblioteca padrão caso
+    contrário; o QGIS nunca é importado só para registrar logs.
+    """
+    global _logger
+    if _logger is None:
+        if 'qgis.core' in sys.modules:
+            from ..infrastructure.qgis_logger import QgisMessageLogger
+            _logger = QgisMessageLogger()
+        else:
+            from ..infrastructure.stdlib_logger import StdlibLogger
+            _logger = StdlibLogger()
+    return _logger
+
+
+def log_message(message: str, level: int = LogLevel.INFO, tag: str = DEFAULT_TAG):
+    get_logger().log(message, level, tag)
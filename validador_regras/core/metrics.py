@@ -0,0 +1,262 @@
+"""
+/***************************************************************************
+ Validador de Regras PostGis
+                                 A QGIS plugin
+ 2ºCGEO
+                              -------------------
+        begin                : 2025-07-16
+        git sha              : $Format:%H$
+        copyright            : (C) 2025 by Godinho, Alvarez, Perrut
+        email                : estevezcodando@gmail.com
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+"""
+import bisect
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from .tracing import get_tracer
+
+# Limites (s) dos histogramas de latência: de consultas de catálogo a validações de horas
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0,
+                   300.0, 900.0, 3600.0)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _labels(names: Sequence[str], values: Sequence, extra: Tuple[str, str] = None) -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra is not None:
+        pairs.append(f'{extra[0]}="{extra[1]}"')
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value: float) -> str:
+    if value == float('inf'):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, registry: 'MetricsRegistry', name: str, help_text: str, label_names: Sequence[str]):
+        self._registry = registry
+        self.name = name
+        self.help = help_text
+        self.label_names = tuple(label_names)
+        self._values: Dict[tuple, object] = {}
+
+    def _key(self, labels: Dict[str, str]) -> tuple:
+        if set(labels) != set(self.label_names):
+            raise ValueError(f"{self.name} espera os rótulos {self.label_names}, recebeu {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.label_names)
+
+
+class Counter(_Metric):
+    """Contador crescente (linhas lidas, bytes recebidos...)."""
+
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._registry._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+            self._registry.generation += 1
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def _samples(self, openmetrics: bool) -> List[str]:
+        return [
+            f"{self.name}_total{_labels(self.label_names, key)} {_number(value)}"
+            for key, value in sorted(self._values.items())
+        ]
+
+
+class Histogram(_Metric):
+    """Histograma de latência com limites fixos (``le``), soma e contagem."""
+
+    kind = "histogram"
+
+    def __init__(self, registry, name, help_text, label_names, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(registry, name, help_text, label_names)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._registry._lock:
+            state = self._values.get(key)
+            if state is None:
+                # [contagem por faixa..., soma, contagem]
+                state = self._values[key] = [0] * (len(self.buckets) + 1) + [0.0, 0]
+            state[bisect.bisect_left(self.buckets, value)] += 1
+            state[-2] += value
+            state[-1] += 1
+            self._registry.generation += 1
+
+    @contextmanager
+    def time(self, **labels):
+        """Mede a duração do bloco ``with`` (também quando ele termina com erro)."""
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self.observe(time.monotonic() - started, **labels)
+
+    def count(self, **labels) -> int:
+        state = self._values.get(self._key(labels))
+        return state[-1] if state else 0
+
+    def _samples(self, openmetrics: bool) -> List[str]:
+        lines = []
+        for key, state in sorted(self._values.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), state):
+                cumulative += count
+                lines.append(
+                    f"{self.name}_bucket{_labels(self.label_names, key, ('le', _number(bound)))} {cumulative}"
+                )
+            lines.append(f"{self.name}_sum{_labels(self.label_names, key)} {repr(float(state[-2]))}")
+            lines.append(f"{self.name}_count{_labels(self.label_names, key)} {state[-1]}")
+        return lines
+
+
+class MetricsRegistry:
+    """
+    Registro de métricas do processo.
+    Responsabilidade única: acumular contadores e histogramas em memória,
+    de forma thread-safe, e exportá-los no formato texto do Prometheus (ou
+    OpenMetrics) para o coletor textfile do node exporter, sem abrir
+    nenhuma porta.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics: Dict[str, _Metric] = {}
+        # Incrementado a cada alteração: permite gravar o arquivo só quando muda
+        self.generation = 0
+
+    def _get(self, cls, name: str, help_text: str, label_names: Sequence[str], **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(self, name, help_text, label_names, **kwargs)
+            elif not isinstance(metric, cls) or metric.label_names != tuple(label_names):
+                raise ValueError(f"Métrica {name} já registrada com outro tipo ou rótulos")
+            return metric
+
+    def counter(self, name: str, help_text: str, label_names: Sequence[str] = ()) -> Counter:
+        return self._get(Counter, name, help_text, label_names)
+
+    def histogram(
+        self,
+        name: str,
+        help_text: str,
+        label_names: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS
+    ) -> Histogram:
+        return self._get(Histogram, name, help_text, label_names, buckets=buckets)
+
+    def render(self, openmetrics: bool = False) -> str:
+        """
+        Texto de exposição de todas as métricas.
+
+        Args:
+            openmetrics: Formato OpenMetrics (``# EOF`` ao final e contadores
+                declarados sem o sufixo ``_total``) em vez do formato texto do Prometheus
+        """
+        lines = []
+        with self._lock:
+            for name in sorted(self._metrics):
+                metric = self._metrics[name]
+                family = name if metric.kind != "counter" or openmetrics else f"{name}_total"
+                lines.append(f"# HELP {family} {_escape(metric.help)}")
+                lines.append(f"# TYPE {family} {metric.kind}")
+                lines.extend(metric._samples(openmetrics))
+        if openmetrics:
+            lines.append("# EOF")
+        return "\n".join(lines) + "\n"
+
+    def write_textfile(self, path: str, openmetrics: bool = False):
+        """
+        Grava as métricas em ``path`` de forma atômica (arquivo temporário e
+        rename), como exige o coletor textfile do node exporter (``*.prom``).
+        """
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        temporary = f"{path}.{os.getpid()}.tmp"
+        with open(temporary, "w", encoding="utf-8") as f:
+            f.write(self.render(openmetrics))
+        os.replace(temporary, path)
+
+    def reset(self):
+        with self._lock:
+            self._metrics.clear()
+            self.generation += 1
+
+
+_registry = MetricsRegistry()
+
+
+def get_registry() -> MetricsRegistry:
+    """Registro de métricas compartilhado pelo núcleo, pela interface e pela CLI."""
+    return _registry
+
+
+# Métricas do plugin
+STAGE_DURATION = _registry.histogram(
+    "validador_stage_duration_seconds",
+    "Duração de cada etapa (connect, catalog, queue, execute, fetch, export, render)",
+    ("stage",)
+)
+FUNCTION_DURATION = _registry.histogram(
+    "validador_function_duration_seconds",
+    "Duração total da execução de uma função ou regra, por desfecho",
+    ("outcome",)
+)
+POOL_WAIT = _registry.histogram(
+    "validador_pool_wait_seconds",
+    "Espera por uma conexão livre no pool",
+    ("pool",)
+)
+ROWS_FETCHED = _registry.counter(
+    "validador_rows_fetched",
+    "Linhas lidas do servidor",
+    ("source",)
+)
+BYTES_FETCHED = _registry.counter(
+    "validador_bytes_fetched",
+    "Bytes recebidos do servidor (exportações via COPY)",
+    ("source",)
+)
+
+
+@contextmanager
+def stage_timer(stage: str, **trace_args):
+    """
+    Mede a duração de uma etapa em ``validador_stage_duration_seconds`` e,
+    com o rastreamento ativo, registra o intervalo na linha do tempo.
+    """
+    with STAGE_DURATION.time(stage=stage), get_tracer().span(stage, "stage", **trace_args):
+        yield
+
+
+def record_stage(stage: str, started: float, finished: Optional[float] = None, **trace_args):
+    """Registra uma etapa já medida (instantes de ``time.monotonic``), como ``stage_timer``."""
+    finished = time.monotonic() if finished is None else finished
+    STAGE_DURATION.observe(finished - started, stage=stage)
+    get_tracer().complete(stage, "stage", started, finished, **trace_args)
@@ -0,0 +1,153 @@
+"""
+/***************************************************************************
+ Validador de Regras PostGis
+                                 A QGIS plugin
+ 2ºCGEO
+                              -------------------
+        begin                : 2025-07-16
+        git sha              : $Format:%H$
+        copyright            : (C) 2025 by Godinho, Alvarez, Perrut
+        email                : estevezcodando@gmail.com
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+"""
+import re
+import select
+from typing import Callable, Optional, Tuple
+
+from .dbapi import psycopg2
+
+# RAISE NOTICE 'progress: %/% %', feitos, total, 'descrição da regra';
+_PROGRESS_RE = re.compile(
+    r'^\s*(?:[A-Z]+:\s+)?progress(?:o)?\s*[:=]?\s*(\d+)\s*/\s*(\d+)\s*(.*?)\s*$',
+    re.IGNORECASE
+)
+
+
+def parse_progress(message: str) -> Optional[Tuple[int, int, str]]:
+    """
+    Interpreta uma mensagem do protocolo de progresso das funções de validação.
+
+    Formato: ``progress: <feitos>/<total> [descrição]`` (também aceita
+    ``progresso``), enviado com ``RAISE NOTICE``.
+
+    Returns:
+        (feitos, total, descrição) ou None se a mensagem não é de progresso
+    """
+    match = _PROGRESS_RE.match(message)
+    if not match:
+        return None
+    done, total = int(match.group(1)), int(match.group(2))
+    if total <= 0:
+        return None
+    return min(done, total), total, match.group(3)
+
+
+class _NoticeCursor:
+    """Cursor de uma NoticeSession: execute() espera o resultado tratando as mensagens."""
+
+    def __init__(self, session: 'NoticeSession', cursor):
+        self._session = session
+        self._cursor = cursor
+
+    def execute(self, query, params=None):
+        self._session._begin_if_needed()
+        self._cursor.execute(query, params)
+        self._session._wait()
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self._cursor.close()
+        return False
+
+
+class NoticeSession:
+    """
+    Conexão psycopg2 assíncrona com a interface de uma conexão síncrona.
+    Responsabilidade única: entregar as mensagens NOTICE do servidor enquanto
+    a consulta ainda executa (no modo síncrono o psycopg2 só as repassa ao
+    final), preservando cursor(), commit(), rollback() e transação implícita.
+    """
+
+    POLL_INTERVAL = 0.1
+
+    def __init__(self, conn, notice_callback: Optional[Callable[[str], None]] = None):
+        self._conn = conn
+        # Pode ser trocado a cada empréstimo da sessão pelo pool
+        self.notice_callback = notice_callback
+        self._in_transaction = False
+        self._wait()
+
+    def cursor(self):
+        return _NoticeCursor(self, self._conn.cursor())
+
+    def commit(self):
+        self._end_transaction("COMMIT")
+
+    def rollback(self):
+        self._end_transaction("ROLLBACK")
+
+    def __getattr__(self, name):
+        # get_backend_pid(), closed, close(), ...
+        return getattr(self._conn, name)
+
+    def _begin_if_needed(self):
+        if not self._in_transaction:
+            self._run_control("BEGIN")
+            self._in_transaction = True
+
+    def _end_transaction(self, command: str):
+        if self._in_transaction:
+            self._in_transaction = False
+            self._run_control(command)
+
+    def _run_control(self, command: str):
+        cur = self._conn.cursor()
+        try:
+            cur.execute(command)
+            self._wait()
+        finally:
+            cur.close()
+
+    def _drain_notices(self):
+        if not self._conn.notices:
+            return
+        notices = list(self._conn.notices)
+        del self._conn.notices[:]
+        if self.notice_callback is None:
+            return
+        for notice in notices:
+            self.notice_callback(notice.strip())
+
+    def _wait(self):
+        fd = self._conn.fileno()
+        while True:
+            try:
+                state = self._conn.poll()
+            finally:
+                self._drain_notices()
+
+            if state == psycopg2.extensions.POLL_OK:
+                return
+            if state == psycopg2.extensions.POLL_READ:
+                select.select([fd], [], [], self.POLL_INTERVAL)
+            elif state == psycopg2.extensions.POLL_WRITE:
+                select.select([], [fd], [], self.POLL_INTERVAL)
+            else:
+                raise psycopg2.OperationalError(f"Estado de poll inesperado: {state}")
@@ -0,0 +1,431 @@
+"""
+/***************************************************************************
+ Validador de Regras PostGis
+                                 A QGIS plugin
+ 2ºCGEO
+                              -------------------
+        begin                : 2025-07-16
+        git sha              : $Format:%H$
+        copyright            : (C) 2025 by Godinho, Alvarez, Perrut
+        email                : estevezcodando@gmail.com
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+"""
+import json
+import os
+import re
+import time
+from dataclasses import dataclass, field
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+
+from .dbapi import psycopg2
+from .function_executor import FunctionExecutor
+from .logger import log_message, LogLevel
+from .suite_runner import SuiteRunner
+
+# NOTICE do auto_explain com log_format = json: "duration: 1.234 ms  plan:\n{...}"
+_PLAN_RE = re.compile(r'duration:\s*([0-9.]+)\s*ms\s+plan:\s*(\{.*\})\s*$', re.DOTALL)
+_SPATIAL_PREDICATE_RE = re.compile(
+    r'\b(st_(?:intersects|contains|containsproperly|within|covers|coveredby|dwithin|touches|crosses|'
+    r'overlaps|equals|disjoint))\b|&&',
+    re.IGNORECASE
+)
+
+# Configuração do auto_explain na transação perfilada
+_AUTO_EXPLAIN_SETTINGS = (
+    ("auto_explain.log_min_duration", "0"),
+    ("auto_explain.log_analyze", "on"),
+    ("auto_explain.log_buffers", "on"),
+    ("auto_explain.log_timing", "on"),
+    ("auto_explain.log_nested_statements", "on"),
+    ("auto_explain.log_format", "json"),
+    ("auto_explain.log_level", "notice"),
+    ("client_min_messages", "notice"),
+)
+
+FLAG_SEQ_SCAN_GEOMETRY = "seq_scan_geometry"
+FLAG_SPATIAL_FILTER = "spatial_filter"
+
+
+@dataclass
+class PlanNode:
+    """Nó de um plano executado, com o tempo próprio (sem o dos filhos)."""
+    node_type: str
+    relation: Optional[str]
+    index_name: Optional[str]
+    total_time: float
+    self_time: float
+    rows: int
+    loops: int
+    # Index Cond / Recheck Cond / Hash Cond e Filter / Join Filter
+    index_condition: str
+    filter: str
+    depth: int
+    children: List['PlanNode'] = field(default_factory=list)
+
+    @property
+    def label(self) -> str:
+        label = self.node_type
+        if self.index_name:
+            label += f" usando {self.index_name}"
+        if self.relation:
+            label += f" em {self.relation}"
+        return label
+
+    @classmethod
+    def from_json(cls, plan: Dict, depth: int = 0) -> 'PlanNode':
+        loops = int(plan.get("Actual Loops", 1) or 1)
+        total = float(plan.get("Actual Total Time", 0.0) or 0.0) * loops
+        children = [cls.from_json(child, depth + 1) for child in plan.get("Plans", [])]
+        def conditions(*keys) -> str:
+            return " AND ".join(str(plan[key]) for key in keys if plan.get(key))
+
+        return cls(
+            node_type=plan.get("Node Type", "?"),
+            relation=plan.get("Relation Name"),
+            index_name=plan.get("Index Name"),
+            total_time=total,
+            self_time=max(0.0, total - sum(child.total_time for child in children)),
+            rows=int(plan.get("Actual Rows", 0) or 0) * loops,
+            loops=loops,
+            index_condition=conditions("Index Cond", "Recheck Cond", "Hash Cond"),
+            filter=conditions("Join Filter", "Filter"),
+            depth=depth,
+            children=children,
+        )
+
+    def walk(self) -> Iterator['PlanNode']:
+        yield self
+        for child in self.children:
+            yield from child.walk()
+
+
+@dataclass
+class StatementPlan:
+    """Plano de uma instrução executada (a chamada ou uma instrução interna da função)."""
+    query: str
+    duration: float
+    root: PlanNode
+
+    @property
+    def key(self) -> str:
+        """Texto normalizado, usado para comparar a mesma instrução entre execuções."""
+        return " ".join(self.query.split())
+
+    def shape(self) -> List[str]:
+        return [f"{node.depth}:{node.label}" for node in self.root.walk()]
+
+
+@dataclass
+class PlanFlag:
+    """Problema encontrado num nó do plano."""
+    kind: str
+    statement: int
+    node: PlanNode
+    detail: str
+
+
+class PlanProfile:
+    """
+    Perfil de uma execução: os planos de todas as instruções capturados
+    pelo auto_explain, os nós ordenados por tempo próprio e os problemas
+    apontados automaticamente.
+    """
+
+    def __init__(self, statements: List[StatementPlan], geometry_tables: Set[str] = None):
+        self.statements = sorted(statements, key=lambda statement: statement.duration, reverse=True)
+        self.geometry_tables = geometry_tables or set()
+        self.flags = self._find_flags()
+
+    def ranked_nodes(self, limit: int = 10) -> List[Tuple[int, PlanNode]]:
+        """(instrução, nó) com maior tempo próprio."""
+        nodes = [(index, node) for index, statement in enumerate(self.statements) for node in statement.root.walk()]
+        nodes.sort(key=lambda item: item[1].self_time, reverse=True)
+        return nodes[:limit]
+
+    def _find_flags(self) -> List[PlanFlag]:
+        flags = []
+        for index, statement in enumerate(self.statements):
+            for node in statement.root.walk():
+                if node.node_type == "Seq Scan" and node.relation in self.geometry_tables:
+                    detail = f"Seq Scan na tabela geométrica {node.relation}"
+                    if node.loops > 1:
+                        detail += f", repetido {node.loops} vezes (lado interno de junção sem índice)"
+                    flags.append(PlanFlag(FLAG_SEQ_SCAN_GEOMETRY, index, node, detail))
+                # Com o índice GiST, o && aparece na condição do índice e o ST_* fica só como recheck
+                match = _SPATIAL_PREDICATE_RE.search(node.filter)
+                if match and not _SPATIAL_PREDICATE_RE.search(node.index_condition):
+                    flags.append(PlanFlag(
+                        FLAG_SPATIAL_FILTER, index, node,
+                        f"{match.group(0)} avaliado como filtro em {node.label}, sem índice GiST "
+                        f"({node.rows} linha(s) em {node.loops} laço(s))"
+                    ))
+        return flags
+
+    def to_dict(self) -> Dict:
+        """Forma serializável e comparável entre execuções (ver ``diff``)."""
+        return {
+            'statements': [
+                {
+                    'query': statement.key,
+                    'duration_ms': round(statement.duration, 3),
+                    'shape': statement.shape(),
+                }
+                for statement in self.statements
+            ],
+            'flags': [
+                {'kind': flag.kind, 'statement': self.statements[flag.statement].key, 'detail': flag.detail}
+                for flag in self.flags
+            ],
+        }
+
+    def format_lines(
+        self,
+        top_nodes: int = 10,
+        top_statements: int = 3,
+        query_width: int = 120,
+        include_flags: bool = True
+    ) -> List[str]:
+        """Linhas do perfil para o log: nós mais custosos, árvores das instruções mais lentas e problemas."""
+        def short(query: str) -> str:
+            query = " ".join(query.split())
+            return query if len(query) <= query_width else query[:query_width - 3] + "..."
+
+        lines = [f"Perfil: {len(self.statements)} instrução(ões) com plano capturado."]
+        if self.statements:
+            lines.append("Nós com maior tempo próprio:")
+        for position, (index, node) in enumerate(self.ranked_nodes(top_nodes), start=1):
+            lines.append(
+                f"  {position}. {node.self_time:.1f} ms {node.label} "
+                f"({node.rows} linha(s), {node.loops} laço(s)) na instrução {index + 1}"
+            )
+        for index, statement in enumerate(self.statements[:top_statements]):
+            lines.append(f"Instrução {index + 1} ({statement.duration:.1f} ms): {short(statement.query)}")
+            for node in statement.root.walk():
+                lines.append(
+                    f"  {'  ' * node.depth}-> {node.label} "
+                    f"(total {node.total_time:.1f} ms, próprio {node.self_time:.1f} ms, {node.rows} linha(s))"
+                )
+        for flag in self.flags if include_flags else []:
+            lines.append(f"Problema na instrução {flag.statement + 1}: {flag.detail}")
+        return lines
+
+
+def diff_profiles(previous: Dict, current: Dict, slowdown: float = 1.5, min_delta_ms: float = 50.0) -> List[str]:
+    """
+    Compara dois perfis (``PlanProfile.to_dict``) da mesma função.
+
+    Aponta instruções cujo plano mudou de forma, que ficaram mais lentas que
+    ``slowdown`` vezes (e ao menos ``min_delta_ms``), que surgiram ou
+    sumiram, e problemas de plano novos.
+    """
+    before = {statement['query']: statement for statement in previous.get('statements', [])}
+    lines = []
+    for statement in current.get('statements', []):
+        query = statement['query']
+        label = query if len(query) <= 80 else query[:77] + "..."
+        old = before.pop(query, None)
+        if old is None:
+            lines.append(f"Nova instrução ({statement['duration_ms']:.1f} ms): {label}")
+            continue
+        if old['shape'] != statement['shape']:
+            removed = [node for node in old['shape'] if node not in statement['shape']]
+            added = [node for node in statement['shape'] if node not in old['shape']]
+            change = "; ".join(
+                part for part in (
+                    f"saiu {', '.join(node.split(':', 1)[1] for node in removed)}" if removed else "",
+                    f"entrou {', '.join(node.split(':', 1)[1] for node in added)}" if added else "",
+                ) if part
+            ) or "ordem dos nós alterada"
+            lines.append(f"Plano mudou ({change}): {label}")
+        delta = statement['duration_ms'] - old['duration_ms']
+        if delta >= min_delta_ms and statement['duration_ms'] >= old['duration_ms'] * slowdown:
+            lines.append(
+                f"Mais lenta: {old['duration_ms']:.1f} ms -> {statement['duration_ms']:.1f} ms: {label}"
+            )
+    for query in before:
+        lines.append(f"Instrução não executada desta vez: {query if len(query) <= 80 else query[:77] + '...'}")
+
+    old_flags = {(flag['kind'], flag['statement'], flag['detail']) for flag in previous.get('flags', [])}
+    for flag in current.get('flags', []):
+        if (flag['kind'], flag['statement'], flag['detail']) not in old_flags:
+            lines.append(f"Novo problema: {flag['detail']}")
+    return lines
+
+
+class ProfileStore:
+    """
+    Histórico de perfis por função em disco (um JSON por execução), para
+    comparar cada execução com a anterior.
+    """
+
+    def __init__(self, directory: str, keep: int = 20):
+        self.directory = directory
+        self.keep = keep
+
+    def _function_dir(self, schema_name: str, function_name: str) -> str:
+        return os.path.join(self.directory, f"{schema_name}.{function_name}")
+
+    def latest(self, schema_name: str, function_name: str) -> Optional[Dict]:
+        directory = self._function_dir(schema_name, function_name)
+        try:
+            names = sorted(name for name in os.listdir(directory) if name.endswith(".json"))
+        except OSError:
+            return None
+        for name in reversed(names):
+            try:
+                with open(os.path.join(directory, name), encoding="utf-8") as f:
+                    return json.load(f)
+            except (OSError, ValueError):
+                continue
+        return None
+
+    def save(self, schema_name: str, function_name: str, profile: Dict) -> str:
+        directory = self._function_dir(schema_name, function_name)
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"{time.strftime('%Y%m%dT%H%M%S')}_{int(time.time() * 1000) % 1000:03d}.json")
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(profile, f, ensure_ascii=False, indent=1)
+
+        names = sorted(name for name in os.listdir(directory) if name.endswith(".json"))
+        for name in names[:-self.keep] if self.keep else []:
+            try:
+                os.remove(os.path.join(directory, name))
+            except OSError:
+                pass
+        return path
+
+
+class ProfileExecutor(FunctionExecutor):
+    """
+    Execução de uma função com ``auto_explain`` (ANALYZE, BUFFERS e
+    instruções aninhadas) ativo na transação.
+
+    Os planos chegam como mensagens NOTICE em JSON e viram ``profile``; com
+    um ``ProfileStore``, o perfil é guardado e comparado com o da execução
+    anterior (``plan_diff``). O cache de resultados não é usado, e a sessão
+    não volta ao pool (o ``LOAD`` do auto_explain vale para a sessão).
+
+    ``auto_explain`` precisa estar carregável: superusuário, ou a biblioteca
+    em ``$libdir/plugins`` ou em ``session_preload_libraries``. O ANALYZE
+    mede cada nó e deixa a execução mais lenta.
+    """
+
+    def __init__(self, connection_info: Dict[str, str], schema_name: str, function_name: str,
+                 profile_store: Optional[ProfileStore] = None, **kwargs):
+        kwargs.pop('cache', None)
+        super().__init__(connection_info, schema_name, function_name, **kwargs)
+        self.profile_store = profile_store
+        self.profile: Optional[PlanProfile] = None
+        self.plan_diff: List[str] = []
+        self._plans: List[StatementPlan] = []
+        self._geometry_tables: Set[str] = set()
+
+    @property
+    def _discard_session(self) -> bool:
+        return True
+
+    def _cacheable(self) -> bool:
+        return False
+
+    def history_mode(self) -> str:
+        # O ANALYZE mede cada nó e deixa a execução mais lenta
+        return "profile"
+
+    def _load_auto_explain(self, conn):
+        with conn.cursor() as cur:
+            for library in ("auto_explain", "$libdir/plugins/auto_explain"):
+                cur.execute("SAVEPOINT validador_profile")
+                try:
+                    cur.execute(f"LOAD '{library}'")
+                    cur.execute("RELEASE SAVEPOINT validador_profile")
+                    break
+                except psycopg2.Error:
+                    cur.execute("ROLLBACK TO SAVEPOINT validador_profile")
+            else:
+                raise RuntimeError(
+                    "Não foi possível carregar o auto_explain: é preciso ser superusuário ou ter a biblioteca "
+                    "em $libdir/plugins ou session_preload_libraries"
+                )
+            for name, value in _AUTO_EXPLAIN_SETTINGS:
+                cur.execute("SELECT set_config(%s, %s, true)", (name, value))
+
+    def _before_execute(self, conn) -> bool:
+        self._load_auto_explain(conn)
+        return super()._before_execute(conn)
+
+    def _after_execute(self, conn):
+        super()._after_execute(conn)
+        with conn.cursor() as cur:
+            cur.execute("SAVEPOINT validador_profile")
+            try:
+                cur.execute("SELECT DISTINCT f_table_name::text FROM geometry_columns")
+                self._geometry_tables = {row[0] for row in cur.fetchall()}
+            except psycopg2.Error:
+                # Sem PostGIS no banco: não há tabelas geométricas a apontar
+                cur.execute("ROLLBACK TO SAVEPOINT validador_profile")
+                return
+            cur.execute("RELEASE SAVEPOINT validador_profile")
+
+    def _on_notice(self, message: str):
+        match = _PLAN_RE.search(message)
+        if match is None:
+            super()._on_notice(message)
+            return
+        try:
+            document = json.loads(match.group(2))
+        except ValueError:
+            return
+        if isinstance(document, list):
+            document = document[0] if document else {}
+        if "Plan" in document:
+            self._plans.append(StatementPlan(
+                document.get("Query Text", ""), float(match.group(1)), PlanNode.from_json(document["Plan"])
+            ))
+
+    def execute(self) -> bool:
+        success = super().execute()
+        # O plano do cursor da chamada chega no fim da transação
+        self.profile = PlanProfile(self._plans, self._geometry_tables)
+        if success and self.profile_store is not None and self._plans:
+            current = self.profile.to_dict()
+            try:
+                previous = self.profile_store.latest(self.schema_name, self.function_name)
+                if previous is not None:
+                    self.plan_diff = diff_profiles(previous, current)
+                self.profile_store.save(self.schema_name, self.function_name, current)
+            except OSError as e:
+                log_message(f"Não foi possível guardar o perfil de {self.function_name}: {e}", LogLevel.WARNING)
+        return success
+
+
+class ProfileSuiteRunner(SuiteRunner):
+    """Executa as funções em modo de perfil; os perfis ficam em ``profiles`` (pela chave do item)."""
+
+    def __init__(self, *args, profile_store: Optional[ProfileStore] = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.profile_store = profile_store
+        self.profiles: Dict[str, ProfileExecutor] = {}
+
+    def _create_executor(self, name: str) -> FunctionExecutor:
+        return ProfileExecutor(
+            self.connection_info, self.schema_name, name,
+            profile_store=self.profile_store,
+            statement_timeout=self.statement_timeout,
+            statement_stats=self.statement_stats,
+            history=self.history
+        )
+
+    def _run_executor(self, item, executor: FunctionExecutor) -> bool:
+        try:
+            return super()._run_executor(item, executor)
+        finally:
+            self.profiles[item.key] = executor
@@ -0,0 +1,376 @@
+"""
+/***************************************************************************
+ Validador de Regras PostGis
+                                 A QGIS plugin
+ 2ºCGEO
+                              -------------------
+        begin                : 2025-07-16
+        git sha              : $Format:%H$
+        copyright            : (C) 2025 by Godinho, Alvarez, Perrut
+        email                : estevezcodando@gmail.com
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+"""
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from .dbapi import psycopg2, sql
+from .logger import log_message, LogLevel
+from .tiled_execution import TilePlanner
+from .srid_harmonization import SridHarmonizer
+
+# Tipos de problema encontrados antes da execução
+ISSUE_MISSING_INDEX = "sem_indice_espacial"
+ISSUE_NEVER_ANALYZED = "sem_estatisticas"
+ISSUE_STALE_STATS = "estatisticas_antigas"
+ISSUE_BLOAT = "tuplas_mortas"
+ISSUE_SRID_MISMATCH = "srid_diferente"
+ISSUE_GEOMETRY_TYPE = "tipo_geometria"
+
+_HEALTH_SQL = """
+SELECT n.nspname, c.relname, a.attname,
+       EXISTS (
+           SELECT 1
+           FROM pg_index i
+           JOIN pg_class ic ON ic.oid = i.indexrelid
+           JOIN pg_am am ON am.oid = ic.relam
+           WHERE i.indrelid = c.oid
+             AND i.indisvalid
+             AND am.amname IN ('gist', 'spgist')
+             AND a.attnum = ANY(i.indkey::int2[])
+       ),
+       ARRAY(
+           -- Índices deixados inválidos por um CREATE INDEX CONCURRENTLY interrompido
+           SELECT ic.relname::text
+           FROM pg_index i
+           JOIN pg_class ic ON ic.oid = i.indexrelid
+           WHERE i.indrelid = c.oid
+             AND NOT i.indisvalid
+       ),
+       GREATEST(COALESCE(s.n_live_tup, c.reltuples::bigint), 0),
+       COALESCE(s.n_dead_tup, 0),
+       COALESCE(s.n_mod_since_analyze, 0),
+       GREATEST(s.last_analyze, s.last_autoanalyze),
+       pg_total_relation_size(c.oid)
+FROM unnest(%s::text[], %s::text[], %s::text[]) AS t(schema_name, table_name, geom_column)
+JOIN pg_namespace n ON n.nspname = t.schema_name
+JOIN pg_class c ON c.relnamespace = n.oid AND c.relname = t.table_name
+JOIN pg_attribute a ON a.attrelid = c.oid AND a.attname = t.geom_column
+LEFT JOIN pg_stat_user_tables s ON s.relid = c.oid
+ORDER BY n.nspname, c.relname
+"""
+
+
+@dataclass
+class TableHealth:
+    """
+    Situação de índice e estatísticas de uma tabela geométrica.
+    """
+    schema_name: str
+    table_name: str
+    geom_column: str
+    has_spatial_index: bool
+    invalid_indexes: List[str]
+    live_tuples: int
+    dead_tuples: int
+    modified_since_analyze: int
+    last_analyzed: Optional[datetime]
+    total_bytes: int
+
+    @property
+    def dead_ratio(self) -> float:
+        total = self.live_tuples + self.dead_tuples
+        return self.dead_tuples / total if total else 0.0
+
+
+@dataclass
+class PreflightIssue:
+    """
+    Problema encontrado numa tabela, com o impacto esperado e a correção.
+    """
+    schema_name: str
+    table_name: str
+    kind: str
+    detail: str
+    impact: str
+    level: LogLevel = LogLevel.WARNING
+    # Comando que corrige o problema (None: apenas recomendação)
+    fix_sql: Optional["sql.Composable"] = None
+    fix_label: str = ""
+    # Executado antes da correção, em comando separado (CONCURRENTLY não aceita lote)
+    prepare_sql: Optional["sql.Composable"] = None
+    # Desfaz uma correção interrompida (índice inválido deixado pelo CONCURRENTLY)
+    cleanup_sql: Optional["sql.Composable"] = None
+
+    @property
+    def table(self) -> str:
+        return f"{self.schema_name}.{self.table_name}"
+
+
+def _size(num_bytes: float) -> str:
+    for unit in ("B", "KB", "MB", "GB"):
+        if num_bytes < 1024:
+            return f"{num_bytes:.0f} {unit}"
+        num_bytes /= 1024
+    return f"{num_bytes:.1f} TB"
+
+
+class PreflightAdvisor:
+    """
+    Verificação das tabelas antes de uma execução longa.
+    Responsabilidade única: apontar colunas geométricas sem índice GiST,
+    estatísticas ausentes ou desatualizadas e excesso de tuplas mortas nas
+    tabelas base/alvo, e aplicar as correções seguras (CREATE INDEX
+    CONCURRENTLY e ANALYZE).
+    """
+
+    # Estatísticas desatualizadas: alterações desde o último ANALYZE
+    STALE_RATIO = 0.1
+    STALE_MIN_ROWS = 1000
+    # Tuplas mortas: fração da tabela e tamanho mínimo que justificam o aviso
+    BLOAT_RATIO = 0.2
+    BLOAT_MIN_BYTES = 8 * 1024 * 1024
+
+    def discover_function_tables(self, conn, schema_name: str, function_names: List[str]) -> List[Tuple[str, str, str]]:
+        """Tabelas geométricas base/alvo usadas pelas funções (ver TilePlanner.discover_tables)."""
+        planner = TilePlanner()
+        tables = set()
+        for function_name in function_names:
+            tables.update(planner.discover_tables(conn, schema_name, function_name))
+        return sorted(tables)
+
+    def discover_pairs(self, conn, schema_name: str, tables: List[Tuple[str, str, str]]) -> List[Tuple[str, str]]:
+        """Pares (base, alvo) das tabelas de regras cujas duas tabelas estão em ``tables``."""
+        names = {table for schema, table, _ in tables if schema == schema_name}
+        return [
+            (base, alvo) for base, alvo in SridHarmonizer().rule_pairs(conn, schema_name)
+            if base in names and alvo in names
+        ]
+
+    @staticmethod
+    def unit_pairs(units) -> List[Tuple[str, str]]:
+        """Pares (base, alvo) das regras do motor de regras."""
+        return sorted({(unit.rule.base, unit.rule.alvo) for unit in units})
+
+    @staticmethod
+    def unit_tables(units) -> List[Tuple[str, str, str]]:
+        """Tabelas geométricas lidas pelas regras do motor de regras."""
+        tables = set()
+        for unit in units:
+            tables.add((unit.schema_name, unit.rule.base, unit.base_geom[0]))
+            tables.add((unit.schema_name, unit.rule.alvo, unit.alvo_geom[0]))
+        return sorted(tables)
+
+    def table_health(self, conn, tables: List[Tuple[str, str, str]]) -> List[TableHealth]:
+        """
+        Lê índices, estatísticas e tamanho das tabelas numa única consulta.
+
+        Args:
+            conn: Conexão psycopg2
+            tables: Lista de (schema, tabela, coluna geométrica)
+        """
+        if not tables:
+            return []
+        with conn.cursor() as cur:
+            cur.execute(_HEALTH_SQL, (
+                [table[0] for table in tables],
+                [table[1] for table in tables],
+                [table[2] for table in tables],
+            ))
+            return [TableHealth(*row) for row in cur.fetchall()]
+
+    def inspect(self, conn, tables: List[Tuple[str, str, str]]) -> List[PreflightIssue]:
+        """
+        Verifica as tabelas e descreve o impacto esperado de cada problema.
+
+        Returns:
+            Problemas encontrados, na ordem das tabelas
+        """
+        issues = []
+        for health in self.table_health(conn, tables):
+            table = sql.SQL("{}.{}").format(sql.Identifier(health.schema_name), sql.Identifier(health.table_name))
+
+            if not health.has_spatial_index:
+                index_name = f"{health.table_name}_{health.geom_column}_gist_idx"[:63]
+                drop_index = sql.SQL("DROP INDEX CONCURRENTLY IF EXISTS {}.{}").format(
+                    sql.Identifier(health.schema_name), sql.Identifier(index_name)
+                )
+                # Um índice inválido de mesmo nome faria o IF NOT EXISTS ignorar a criação
+                invalid = index_name in health.invalid_indexes
+                issues.append(PreflightIssue(
+                    health.schema_name, health.table_name, ISSUE_MISSING_INDEX,
+                    f"coluna {health.geom_column} sem índice GiST"
+                    + (f" (índice {index_name} inválido, de uma criação interrompida)" if invalid else ""),
+                    f"cada busca espacial em {health.table_name} percorre as ~{health.live_tuples} linhas: "
+                    f"junções base/alvo passam a crescer com o produto dos tamanhos das tabelas",
+                    LogLevel.CRITICAL if health.live_tuples >= self.STALE_MIN_ROWS else LogLevel.WARNING,
+                    sql.SQL("CREATE INDEX CONCURRENTLY IF NOT EXISTS {} ON {} USING gist ({})").format(
+                        sql.Identifier(index_name), table, sql.Identifier(health.geom_column)
+                    ),
+                    f"recriar índice {index_name}" if invalid else f"criar índice {index_name}",
+                    prepare_sql=drop_index if invalid else None,
+                    cleanup_sql=drop_index
+                ))
+
+            if health.last_analyzed is None:
+                issues.append(PreflightIssue(
+                    health.schema_name, health.table_name, ISSUE_NEVER_ANALYZED,
+                    "tabela nunca analisada",
+                    "sem estatísticas o planejador usa seletividades padrão e pode escolher "
+                    "laços aninhados sobre conjuntos grandes",
+                    LogLevel.WARNING,
+                    sql.SQL("ANALYZE {}").format(table),
+                    "ANALYZE"
+                ))
+            elif health.modified_since_analyze >= max(self.STALE_MIN_ROWS, self.STALE_RATIO * health.live_tuples):
+                percent = 100 * health.modified_since_analyze / max(health.live_tuples, 1)
+                issues.append(PreflightIssue(
+                    health.schema_name, health.table_name, ISSUE_STALE_STATS,
+                    f"{health.modified_since_analyze} linha(s) alterada(s) desde o último ANALYZE "
+                    f"({percent:.0f}% da tabela, em {health.last_analyzed:%d/%m/%Y %H:%M})",
+                    "estimativas de linhas erradas levam a planos ruins (laços aninhados sobre "
+                    "conjuntos grandes)",
+                    LogLevel.WARNING,
+                    sql.SQL("ANALYZE {}").format(table),
+                    "ANALYZE"
+                ))
+
+            if health.dead_ratio >= self.BLOAT_RATIO and health.total_bytes * health.dead_ratio >= self.BLOAT_MIN_BYTES:
+                wasted = health.total_bytes * health.dead_ratio
+                issues.append(PreflightIssue(
+                    health.schema_name, health.table_name, ISSUE_BLOAT,
+                    f"{health.dead_ratio:.0%} de tuplas mortas ({health.dead_tuples} linha(s))",
+                    f"cerca de {_size(wasted)} de {_size(health.total_bytes)} lidos sem proveito a cada "
+                    f"varredura; execute VACUUM fora do horário de uso",
+                    LogLevel.INFO
+                ))
+
+        return issues
+
+    def inspect_pairs(
+        self,
+        conn,
+        schema_name: str,
+        pairs: List[Tuple[str, str]],
+        target_srid: Optional[int] = None
+    ) -> List[PreflightIssue]:
+        """
+        Verifica SRID e tipo de geometria dos pares base/alvo.
+
+        Cada tabela fora do SRID comum recebe uma correção: a coluna-sombra
+        transformada, indexada e mantida por trigger (SridHarmonizer).
+
+        Args:
+            conn: Conexão psycopg2
+            schema_name: Schema das tabelas
+            pairs: Pares (base, alvo)
+            target_srid: SRID comum; se None, o mais frequente entre as tabelas
+        """
+        harmonizer = SridHarmonizer()
+        mismatches = harmonizer.check(conn, schema_name, pairs)
+        target_srid = target_srid or harmonizer.target_srid(mismatches)
+
+        issues = []
+        shadowed = {}
+        for mismatch in mismatches:
+            for problem in mismatch.type_problems:
+                issues.append(PreflightIssue(
+                    schema_name, mismatch.base.table_name, ISSUE_GEOMETRY_TYPE,
+                    f"par {mismatch.base.table_name}/{mismatch.alvo.table_name}: {problem}",
+                    "predicados espaciais comparam apenas X/Y e tipos mistos podem gerar resultados "
+                    "inesperados; revise a regra ou restrinja o tipo da coluna",
+                    LogLevel.INFO
+                ))
+            if not mismatch.srid_mismatch:
+                continue
+            for info, other in ((mismatch.base, mismatch.alvo), (mismatch.alvo, mismatch.base)):
+                if info.srid == target_srid:
+                    continue
+                shadowed.setdefault(info, set()).add(other.table_name)
+
+        for info, others in shadowed.items():
+            issues.append(PreflightIssue(
+                info.schema_name, info.table_name, ISSUE_SRID_MISMATCH,
+                f"SRID {info.srid} diferente de {target_srid} (pares com {', '.join(sorted(others))})",
+                "ST_Transform em cada comparação impede o uso do índice GiST desta tabela nas junções; "
+                "a correção mantém uma coluna-sombra no SRID comum, indexada e atualizada por trigger",
+                LogLevel.WARNING,
+                harmonizer.shadow_sql(info, target_srid),
+                f"coluna-sombra SRID {target_srid}"
+            ))
+        return issues
+
+    def fix(
+        self,
+        connection_info: Dict[str, str],
+        issues: List[PreflightIssue],
+        max_workers: int = 4,
+        connection_service=None
+    ) -> List[Tuple[PreflightIssue, bool, str]]:
+        """
+        Aplica as correções disponíveis, em paralelo entre tabelas.
+
+        CREATE INDEX CONCURRENTLY não roda dentro de transação, por isso cada
+        tabela usa uma conexão própria em autocommit; na mesma tabela o índice
+        é criado antes do ANALYZE (os dois disputam o mesmo bloqueio).
+
+        Returns:
+            Lista de (problema, sucesso, mensagem)
+        """
+        if connection_service is None:
+            from .database_service import DatabaseConnectionService
+            connection_service = DatabaseConnectionService()
+
+        by_table: Dict[str, List[PreflightIssue]] = {}
+        for issue in issues:
+            if issue.fix_sql is not None:
+                by_table.setdefault(issue.table, []).append(issue)
+        if not by_table:
+            return []
+
+        def fix_table(table_issues: List[PreflightIssue]) -> List[Tuple[PreflightIssue, bool, str]]:
+            results = []
+            # Índice antes do ANALYZE
+            table_issues = sorted(table_issues, key=lambda issue: issue.kind != ISSUE_MISSING_INDEX)
+            try:
+                conn = connection_service.create_dbapi_connection(connection_info)
+            except Exception as e:
+                return [(issue, False, f"Falha ao conectar: {e}") for issue in table_issues]
+            try:
+                conn.autocommit = True
+                with conn.cursor() as cur:
+                    for issue in table_issues:
+                        try:
+                            if issue.prepare_sql is not None:
+                                cur.execute(issue.prepare_sql)
+                            cur.execute(issue.fix_sql)
+                            results.append((issue, True, f"{issue.table}: {issue.fix_label} concluído"))
+                        except psycopg2.Error as e:
+                            results.append((issue, False, f"{issue.table}: falha em {issue.fix_label}: {e}"))
+                            if issue.cleanup_sql is not None:
+                                try:
+                                    cur.execute(issue.cleanup_sql)
+                                except psycopg2.Error:
+                                    pass
+            finally:
+                conn.close()
+            return results
+
+        results = []
+        with ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix="preflight") as pool:
+            for table_results in pool.map(fix_table, by_table.values()):
+                results.extend(table_results)
+
+        for issue, success, message in results:
+            log_message(message, LogLevel.INFO if success else LogLevel.WARNING)
+        return results
@@ -0,0 +1,267 @@
+"""
+/***************************************************************************
+ Validador de Regras PostGis
+                                 A QGIS plugin
+ 2ºCGEO
+                              -------------------
+        begin                : 2025-07-16
+        git sha              : $Format:%H$
+        copyright            : (C) 2025 by Godinho, Alvarez, Perrut
+        email                : estevezcodando@gmail.com
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from .dbapi import sql
+from .logger import log_message, LogLevel
+
+# Impressão digital de uma função chamada sem argumentos:
+# - a sobrecarga exata (a que aceita a chamada sem argumentos), pela assinatura;
+# - o código de todas as funções e views do schema (auxiliares chamadas por ela);
+# - os contadores de modificação de todas as tabelas dos schemas que ela toca:
+#   o seu e os citados como qualificador ("schema.") nesse código.
+# Tabelas escritas pelas próprias validações não entram, senão toda execução
+# invalidaria a anterior.
+_FINGERPRINT_SQL = r"""
+WITH fn AS (
+    SELECT p.oid::regprocedure::text AS signature, p.prosrc, p.pronamespace
+    FROM pg_proc p
+    JOIN pg_namespace n ON n.oid = p.pronamespace
+    WHERE n.nspname = %s AND p.proname = %s AND p.pronargs = p.pronargdefaults
+), code AS (
+    SELECT p.oid::regprocedure::text AS name, p.prosrc AS src
+    FROM pg_proc p
+    WHERE p.pronamespace IN (SELECT pronamespace FROM fn)
+    UNION ALL
+    SELECT c.oid::regclass::text, pg_get_viewdef(c.oid)
+    FROM pg_class c
+    WHERE c.relnamespace IN (SELECT pronamespace FROM fn) AND c.relkind IN ('v', 'm')
+), schemas AS (
+    SELECT pronamespace AS oid FROM fn
+    UNION
+    SELECT n.oid
+    FROM pg_namespace n
+    JOIN code ON position(lower(n.nspname) || '.' IN lower(regexp_replace(code.src, '["\s]', '', 'g'))) > 0
+    WHERE n.nspname !~ '^pg_' AND n.nspname NOT IN ('information_schema', 'validador')
+)
+SELECT
+    (SELECT count(*) FROM fn),
+    (SELECT signature FROM fn LIMIT 1),
+    (SELECT md5(string_agg(name || ':' || md5(src), ',' ORDER BY name)) FROM code),
+    (SELECT stats_reset::text FROM pg_stat_database WHERE datname = current_database()),
+    (SELECT string_agg(
+                format('%%s.%%s:%%s:%%s:%%s:%%s', s.schemaname, s.relname,
+                       s.n_tup_ins, s.n_tup_upd, s.n_tup_del, pg_relation_filenode(s.relid)),
+                ',' ORDER BY s.schemaname, s.relname)
+       FROM pg_stat_user_tables s
+       JOIN pg_class c ON c.oid = s.relid
+      WHERE c.relnamespace IN (SELECT oid FROM schemas)
+        AND s.relname NOT LIKE 'aux\_revisao\_%%'),
+    (SELECT array_agg(DISTINCT lower(m[1]))
+       FROM fn, regexp_matches(fn.prosrc, '(aux_revisao_\w+)', 'gi') AS m)
+"""
+
+_TABLES_FINGERPRINT_SQL = """
+SELECT
+    (SELECT stats_reset::text FROM pg_stat_database WHERE datname = current_database()),
+    (SELECT string_agg(
+                format('%%s.%%s:%%s:%%s:%%s:%%s', s.schemaname, s.relname,
+                       s.n_tup_ins, s.n_tup_upd, s.n_tup_del, pg_relation_filenode(s.relid)),
+                ',' ORDER BY s.schemaname, s.relname)
+       FROM pg_stat_user_tables s
+       JOIN unnest(%s::text[], %s::text[]) AS t(schemaname, relname)
+         ON t.schemaname = s.schemaname AND t.relname = s.relname)
+"""
+
+
+class ResultCache:
+    """
+    Cache de resultados de execução de funções.
+    Responsabilidade única: guardar o desfecho (contagem, amostra, tempo) de
+    execuções já feitas sobre dados que não mudaram, com descarte LRU por
+    quantidade de entradas e por tamanho total.
+    """
+
+    def __init__(self, file_path: Optional[str] = None, max_entries: int = 256, max_bytes: int = 5 * 1024 * 1024):
+        self.file_path = file_path
+        self.max_entries = max(1, max_entries)
+        self.max_bytes = max(1, max_bytes)
+        self._entries: "OrderedDict[str, Dict]" = OrderedDict()
+        self._sizes: Dict[str, int] = {}
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+        self._load()
+
+    @staticmethod
+    def compute_key(conn, connection_info: Dict[str, str], schema_name: str, function_name: str) -> Optional[str]:
+        """
+        Calcula a chave de cache: assinatura e código da função, código das
+        funções e views do seu schema e contadores de modificação
+        (pg_stat_user_tables) das tabelas dos schemas que ela toca.
+
+        Sem chave (o cache não é usado) quando a chamada sem argumentos é
+        ambígua ou quando alguma tabela ``aux_revisao_*`` citada no código
+        da função não existe ou está vazia: a execução guardada não as
+        preencheria de novo.
+
+        A leitura é feita numa transação própria, encerrada ao final.
+
+        Returns:
+            Chave hexadecimal ou None
+        """
+        try:
+            with conn.cursor() as cur:
+                # Garante estatísticas atuais em vez do snapshot da transação
+                cur.execute("SELECT pg_stat_clear_snapshot()")
+                cur.execute(_FINGERPRINT_SQL, (schema_name, function_name))
+                overloads, signature, code, stats_reset, counters, review_tables = cur.fetchone()
+                if overloads != 1:
+                    return None
+                for table_name in review_tables or []:
+                    cur.execute("SELECT to_regclass(format('%%I.%%I', %s::text, %s::text))", (schema_name, table_name))
+                    if cur.fetchone()[0] is None:
+                        return None
+                    cur.execute(sql.SQL("SELECT EXISTS (SELECT 1 FROM {}.{})").format(
+                        sql.Identifier(schema_name), sql.Identifier(table_name)
+                    ))
+                    if not cur.fetchone()[0]:
+                        return None
+        finally:
+            conn.rollback()
+
+        identity = "|".join([
+            f"{connection_info.get('host', '')}:{connection_info.get('port', '')}/{connection_info.get('database', '')}",
+            signature,
+            code or "",
+            stats_reset or "",
+            counters or "",
+        ])
+        return hashlib.sha256(identity.encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def compute_tables_key(
+        conn,
+        connection_info: Dict[str, str],
+        identity: str,
+        tables: List[Tuple[str, str]]
+    ) -> str:
+        """
+        Calcula a chave de cache de uma unidade de validação que não é uma
+        função do banco: a identidade informada (por exemplo, o SQL gerado)
+        combinada com os contadores de modificação das tabelas lidas.
+
+        Args:
+            conn: Conexão psycopg2
+            connection_info: Informações da conexão
+            identity: Texto que muda quando a unidade muda
+            tables: Lista de (schema, tabela) lidas pela unidade
+
+        Returns:
+            Chave hexadecimal
+        """
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT pg_stat_clear_snapshot()")
+                cur.execute(
+                    _TABLES_FINGERPRINT_SQL,
+                    ([schema for schema, _ in tables], [table for _, table in tables])
+                )
+                stats_reset, counters = cur.fetchone()
+        finally:
+            conn.rollback()
+
+        identity = "|".join([
+            f"{connection_info.get('host', '')}:{connection_info.get('port', '')}/{connection_info.get('database', '')}",
+            identity,
+            stats_reset or "",
+            counters or "",
+        ])
+        return hashlib.sha256(identity.encode('utf-8')).hexdigest()
+
+    def get(self, key: str) -> Optional[Dict]:
+        """Retorna a entrada e a marca como usada recentemente."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def put(self, key: str, row_count: int, preview_rows: list, elapsed: Optional[float]):
+        """Guarda o desfecho de uma execução e descarta as entradas mais antigas."""
+        entry = {
+            'row_count': row_count,
+            'preview_rows': [[str(value) for value in row] for row in preview_rows],
+            'elapsed': elapsed,
+            'created_at': time.time(),
+        }
+        size = len(json.dumps(entry))
+        with self._lock:
+            self._discard(key)
+            self._entries[key] = entry
+            self._sizes[key] = size
+            self._total_bytes += size
+            self._evict()
+            self._save()
+
+    def invalidate(self, key: str):
+        with self._lock:
+            self._discard(key)
+            self._save()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._sizes.clear()
+            self._total_bytes = 0
+            self._save()
+
+    def _discard(self, key: str):
+        if key in self._entries:
+            del self._entries[key]
+            self._total_bytes -= self._sizes.pop(key, 0)
+
+    def _evict(self):
+        while self._entries and (len(self._entries) > self.max_entries or self._total_bytes > self.max_bytes):
+            oldest = next(iter(self._entries))
+            self._discard(oldest)
+
+    def _load(self):
+        if not self.file_path or not os.path.exists(self.file_path):
+            return
+        try:
+            with open(self.file_path, 'r') as f:
+                data = json.load(f)
+            for key, entry in data:
+                self._entries[key] = entry
+                self._sizes[key] = len(json.dumps(entry))
+                self._total_bytes += self._sizes[key]
+            self._evict()
+        except (OSError, ValueError) as e:
+            log_message(f"Cache de resultados ignorado ({self.file_path}): {e}", LogLevel.WARNING)
+
+    def _save(self):
+        if not self.file_path:
+            return
+        try:
+            os.makedirs(os.path.dirname(self.file_path), exist_ok=True)
+            tmp_path = f"{self.file_path}.tmp"
+            with open(tmp_path, 'w') as f:
+                json.dump(list(self._entries.items()), f)
+            os.replace(tmp_path, self.file_path)
+        except OSError as e:
+            log_message(f"Erro ao gravar cache de resultados: {e}", LogLevel.WARNING)
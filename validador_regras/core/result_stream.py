@@ -0,0 +1,70 @@
+"""
+/***************************************************************************
+ Validador de Regras PostGis
+                                 A QGIS plugin
+ 2ºCGEO
+                              -------------------
+        begin                : 2025-07-16
+        git sha              : $Format:%H$
+        copyright            : (C) 2025 by Godinho, Alvarez, Perrut
+        email                : estevezcodando@gmail.com
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+"""
+from typing import Iterator, List, Sequence, Union
+
+from .dbapi import sql
+
+DEFAULT_CHUNK_SIZE = 5000
+
+
+def stream_query(
+    conn,
+    query: Union[str, "sql.Composable"],
+    params: Sequence = None,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    cursor_name: str = "validador_stream"
+) -> Iterator[List[tuple]]:
+    """
+    Executa uma consulta através de um cursor no servidor e entrega o
+    resultado em blocos de tamanho fixo.
+
+    O cursor é declarado dentro da transação corrente da conexão e é fechado
+    pelo servidor no commit/rollback feito por quem chamou, de modo que no
+    máximo ``chunk_size`` linhas ficam em memória no cliente por vez.
+
+    Args:
+        conn: Conexão psycopg2 (fora de autocommit)
+        query: Consulta a ser executada
+        params: Parâmetros da consulta (binding do psycopg2)
+        chunk_size: Quantidade de linhas por bloco
+        cursor_name: Nome do cursor no servidor
+
+    Yields:
+        Listas de tuplas com até ``chunk_size`` linhas
+    """
+    if isinstance(query, str):
+        query = sql.SQL(query)
+
+    declare = sql.SQL("DECLARE {} NO SCROLL CURSOR FOR ").format(sql.Identifier(cursor_name)) + query
+    fetch = sql.SQL("FETCH FORWARD {} FROM {}").format(
+        sql.Literal(int(chunk_size)), sql.Identifier(cursor_name)
+    )
+
+    with conn.cursor() as cur:
+        cur.execute(declare, params)
+        while True:
+            cur.execute(fetch)
+            rows = cur.fetchall()
+            if not rows:
+                break
+            yield rows
+        cur.execute(sql.SQL("CLOSE {}").format(sql.Identifier(cursor_name)))
@@ -0,0 +1,749 @@
+"""
+/***************************************************************************
+ Validador de Regras PostGis
+                                 A QGIS plugin
+ 2ºCGEO
+                              -------------------
+        begin                : 2025-07-16
+        git sha              : $Format:%H$
+        copyright            : (C) 2025 by Godinho, Alvarez, Perrut
+        email                : estevezcodando@gmail.com
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+"""
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Tuple
+
+from .dbapi import sql
+from .logger import log_message, LogLevel
+
+from .interfaces import IValidationRule
+from .connection_config import ConnectionConfig
+from .batch_execution import BatchItemResult, BatchSummary
+from .function_executor import FunctionExecutor
+from .result_cache import ResultCache
+from .suite_runner import SuiteRunner
+from .tiled_execution import TilePlanner
+from .srid_harmonization import SridHarmonizer
+
+OUTPUT_PREFIX = "aux_revisao_"
+
+
+@dataclass(frozen=True)
+class RuleType:
+    """
+    Tipo de regra espacial (coluna ``rule_type``).
+
+    ``predicate`` relaciona uma feição da tabela base com uma da tabela
+    alvo; os campos ``{base}`` e ``{alvo}`` recebem as geometrias das duas,
+    já no mesmo SRID. Com ``required`` a feição base viola a regra quando
+    nenhuma feição alvo satisfaz o predicado; sem ele, quando alguma satisfaz.
+    """
+    description: str
+    predicate: str
+    required: bool
+
+
+RULE_TYPES: Dict[str, RuleType] = {
+    'E': RuleType("deve intersectar", "ST_Intersects({base}, {alvo})", required=True),
+    'O': RuleType("não pode intersectar", "ST_Intersects({base}, {alvo})", required=False),
+}
+
+
+def register_rule_type(code: str, rule_type: RuleType):
+    """Registra (ou substitui) o tipo de regra de um código de ``rule_type``."""
+    RULE_TYPES[code.upper()] = rule_type
+
+
+@dataclass
+class RuleEngineConfig:
+    """
+    Colunas das tabelas de feições usadas pelas regras.
+    """
+    # Coluna comparada com source_code/target_code
+    code_column: str = "codigo"
+    # Identificador gravado no resultado
+    id_column: str = "id"
+    # Coluna geométrica; None descobre pela tabela geometry_columns
+    geom_column: Optional[str] = None
+    rules_table_pattern: str = TilePlanner.RULES_TABLE_PATTERN
+
+
+@dataclass
+class SpatialRule:
+    """
+    Linha de uma tabela de regras (``spatial_rules*``).
+    """
+    rule_table: str
+    rule_type: str
+    base: str
+    alvo: str
+    source_code: Optional[str] = None
+    target_code: Optional[str] = None
+    attribute_rule: Optional[str] = None
+
+
+def _in_codes(column: "sql.Composable", count: int) -> "sql.Composable":
+    """
+    ``coluna IN (%s, ...)`` com um parâmetro por código. Cada literal é
+    convertido para o tipo da coluna (como no ``= %s`` de uma só regra); um
+    ``ANY(%s)`` com a lista seria ``text[]`` e falharia em colunas inteiras.
+    """
+    return sql.SQL("{} IN ({})").format(column, sql.SQL(", ").join([sql.Placeholder()] * count))
+
+
+def _attribute_condition(rule: SpatialRule) -> "sql.Composable":
+    # '%' literal (LIKE) não pode ser confundido com parâmetro
+    return sql.SQL("({})").format(sql.SQL(rule.attribute_rule.replace('%', '%%')))
+
+
+class RuleUnit(IValidationRule):
+    """
+    Unidade executável de uma regra da tabela de regras.
+    Responsabilidade única: gerar o SQL que grava em ``aux_revisao_<tipo>``
+    as feições base que violam a regra.
+
+    Cada unidade substitui apenas as suas linhas no resultado (coluna
+    ``rule_key``), de modo que pode ser executada, repetida e medida
+    isoladamente.
+    """
+
+    def __init__(
+        self,
+        schema_name: str,
+        rule: SpatialRule,
+        key: str,
+        base_geom: Tuple[str, int],
+        alvo_geom: Tuple[str, int],
+        config: RuleEngineConfig = None
+    ):
+        """
+        Args:
+            schema_name: Schema das tabelas de regras e de feições
+            rule: Linha da tabela de regras
+            key: Identificador único da regra (coluna ``rule_key``)
+            base_geom: (coluna geométrica, SRID) da tabela base
+            alvo_geom: (coluna geométrica, SRID) da tabela alvo
+            config: Colunas das tabelas de feições
+        """
+        self.schema_name = schema_name
+        self.rule = rule
+        self.key = key
+        self.base_geom = base_geom
+        self.alvo_geom = alvo_geom
+        self.config = config or RuleEngineConfig()
+        # SRID da tabela de saída, definido por RuleEngine.prepare()
+        self.output_srid = base_geom[1]
+
+    @property
+    def rule_type(self) -> RuleType:
+        return RULE_TYPES[self.rule.rule_type.upper()]
+
+    @property
+    def output_table(self) -> str:
+        return f"{OUTPUT_PREFIX}{self.rule.rule_type.lower()}"
+
+    @property
+    def rule_keys(self) -> List[str]:
+        """Valores de ``rule_key`` gravados pela unidade."""
+        return [self.key]
+
+    @property
+    def tables(self) -> List[Tuple[str, str]]:
+        """Tabelas de feições lidas pela regra."""
+        return list(dict.fromkeys([(self.schema_name, self.rule.base), (self.schema_name, self.rule.alvo)]))
+
+    def name(self) -> str:
+        return self.key
+
+    def description(self) -> str:
+        rule = self.rule
+        condition = f" quando {rule.attribute_rule}" if rule.attribute_rule else ""
+        return (
+            f"{rule.base} ({rule.source_code or '*'}) {self.rule_type.description} "
+            f"{rule.alvo} ({rule.target_code or '*'}){condition}"
+        )
+
+    def identity(self) -> str:
+        """Texto que muda quando a regra ou as colunas usadas mudam (chave de cache)."""
+        rule = self.rule
+        return "|".join(str(value) for value in (
+            self.key, rule.rule_type, rule.base, rule.source_code, rule.alvo, rule.target_code,
+            rule.attribute_rule, self.base_geom, self.alvo_geom, self.output_srid,
+            self.config.code_column, self.config.id_column
+        ))
+
+    def _envelope(self, srid: int, bbox) -> Tuple["sql.Composable", List]:
+        xmin, ymin, xmax, ymax, bbox_srid = bbox
+        envelope = sql.SQL("ST_Transform(ST_MakeEnvelope(%s, %s, %s, %s, %s), %s)")
+        return envelope, [xmin, ymin, xmax, ymax, bbox_srid, srid]
+
+    def _in_bbox(self, geom: "sql.Composable", srid: int, bbox) -> Tuple["sql.Composable", List]:
+        """
+        Convenção bbox: a feição pertence ao retângulo do seu ponto de referência,
+        com as bordas máximas excluídas (um ponto na borda comum fica num só tile).
+        """
+        xmin, ymin, xmax, ymax, bbox_srid = bbox
+        envelope, params = self._envelope(srid, bbox)
+        point = sql.SQL("ST_PointOnSurface({})").format(geom)
+        point_params = []
+        if srid != bbox_srid:
+            # Compara no SRID do retângulo, onde as bordas dos tiles são retas
+            point = sql.SQL("ST_Transform({}, %s)").format(point)
+            point_params = [bbox_srid]
+
+        checks = [sql.SQL("{} && {}").format(geom, envelope)]
+        for axis, operator, bound in (("X", ">=", xmin), ("X", "<", xmax), ("Y", ">=", ymin), ("Y", "<", ymax)):
+            checks.append(sql.SQL("ST_{}({}) {} %s").format(sql.SQL(axis), point, sql.SQL(operator)))
+            params = params + point_params + [bound]
+        return sql.SQL(" AND ").join(checks), params
+
+    def _predicate(self) -> "sql.Composable":
+        """Predicado do tipo de regra entre ``b`` e ``a``."""
+        base_column, base_srid = self.base_geom
+        alvo_column, alvo_srid = self.alvo_geom
+        base_geom = sql.Identifier(base_column)
+        if alvo_srid != base_srid:
+            # Converte a base, para que a busca na alvo use o índice espacial dela
+            base_expr = sql.SQL("ST_Transform(b.{}, {})").format(base_geom, sql.Literal(alvo_srid))
+        else:
+            base_expr = sql.SQL("b.{}").format(base_geom)
+        return sql.SQL(self.rule_type.predicate).format(
+            base=base_expr, alvo=sql.SQL("a.{}").format(sql.Identifier(alvo_column))
+        )
+
+    def _output_geom(self) -> "sql.Composable":
+        base_column, base_srid = self.base_geom
+        if self.output_srid != base_srid:
+            return sql.SQL("ST_Transform(b.{}, {})").format(sql.Identifier(base_column), sql.Literal(self.output_srid))
+        return sql.SQL("b.{}").format(sql.Identifier(base_column))
+
+    def build_delete(self, bbox=None) -> Tuple["sql.Composable", List]:
+        """Remove as linhas anteriores da regra (apenas as do retângulo, se informado)."""
+        query = sql.SQL("DELETE FROM {}.{} WHERE rule_key = ANY(%s)").format(
+            sql.Identifier(self.schema_name), sql.Identifier(self.output_table)
+        )
+        params = [self.rule_keys]
+        if bbox is not None:
+            condition, bbox_params = self._in_bbox(sql.Identifier("geom"), self.output_srid, bbox)
+            query += sql.SQL(" AND ") + condition
+            params += bbox_params
+        return query, params
+
+    def build_insert(self, bbox=None) -> Tuple["sql.Composable", List]:
+        """
+        Monta o INSERT ... SELECT das violações da regra.
+
+        ``attribute_rule`` é um trecho SQL da própria tabela de regras, aplicado
+        ao par base/alvo (apelidos ``b`` e ``a``); vem do mesmo banco que as
+        funções de validação e recebe a mesma confiança.
+
+        Args:
+            bbox: (xmin, ymin, xmax, ymax, srid) para validar apenas as feições
+                base que tocam o retângulo
+        """
+        rule = self.rule
+        config = self.config
+        base_geom = sql.SQL("b.{}").format(sql.Identifier(self.base_geom[0]))
+
+        pair_conditions = [self._predicate()]
+        params: List = []
+        if rule.target_code:
+            pair_conditions.insert(0, sql.SQL("a.{} = %s").format(sql.Identifier(config.code_column)))
+            params.append(rule.target_code)
+        if rule.attribute_rule:
+            pair_conditions.append(_attribute_condition(rule))
+
+        exists = sql.SQL("{} (SELECT 1 FROM {}.{} a WHERE {})").format(
+            sql.SQL("NOT EXISTS" if self.rule_type.required else "EXISTS"),
+            sql.Identifier(self.schema_name),
+            sql.Identifier(rule.alvo),
+            sql.SQL(" AND ").join(pair_conditions)
+        )
+
+        base_conditions = []
+        base_params: List = []
+        if rule.source_code:
+            base_conditions.append(sql.SQL("b.{} = %s").format(sql.Identifier(config.code_column)))
+            base_params.append(rule.source_code)
+        if bbox is not None:
+            condition, bbox_params = self._in_bbox(base_geom, self.base_geom[1], bbox)
+            base_conditions.append(condition)
+            base_params += bbox_params
+        base_conditions.append(exists)
+
+        query = sql.SQL(
+            "INSERT INTO {output} "
+            "(rule_key, rule_table, rule_type, base, source_code, alvo, target_code, feature_id, geom) "
+            "SELECT %s, %s, %s, %s, %s, %s, %s, b.{id}::text, {geom} "
+            "FROM {schema}.{base} b WHERE {conditions}"
+        ).format(
+            output=sql.SQL("{}.{}").format(sql.Identifier(self.schema_name), sql.Identifier(self.output_table)),
+            id=sql.Identifier(config.id_column),
+            geom=self._output_geom(),
+            schema=sql.Identifier(self.schema_name),
+            base=sql.Identifier(rule.base),
+            conditions=sql.SQL(" AND ").join(base_conditions)
+        )
+        values = [self.key, rule.rule_table, rule.rule_type, rule.base, rule.source_code, rule.alvo, rule.target_code]
+        return query, values + base_params + params
+
+    def build_select(self, bbox=None) -> Tuple["sql.Composable", List]:
+        """Lê as violações gravadas pela regra (resultado da execução)."""
+        query = sql.SQL("SELECT feature_id, rule_key FROM {}.{} WHERE rule_key = ANY(%s)").format(
+            sql.Identifier(self.schema_name), sql.Identifier(self.output_table)
+        )
+        params = [self.rule_keys]
+        if bbox is not None:
+            condition, bbox_params = self._in_bbox(sql.Identifier("geom"), self.output_srid, bbox)
+            query += sql.SQL(" AND ") + condition
+            params += bbox_params
+        return query + sql.SQL(" ORDER BY id"), params
+
+    def run(
+        self,
+        connection_config: ConnectionConfig,
+        log_callback=None,
+        progress_callback=None
+    ) -> bool:
+        connection_info = {
+            'name': connection_config.name,
+            'host': connection_config.host,
+            'port': connection_config.port,
+            'database': getattr(connection_config, "database", connection_config.name),
+            'username': connection_config.user,
+            'password': connection_config.password,
+        }
+        engine = RuleEngine(connection_info, self.schema_name, self.config)
+        try:
+            engine.prepare([self])
+        except Exception as e:
+            err = f"Erro ao preparar {self.output_table}: {e}"
+            if log_callback: log_callback(err, LogLevel.CRITICAL)
+            if progress_callback: progress_callback(0, "Erro")
+            return False
+
+        executor = engine.create_executor(self)
+        if progress_callback:
+            executor.progress_callback = lambda percent, done, total, label: progress_callback(percent, label)
+        success = executor.execute()
+
+        if success:
+            msg = f"Regra {self.key}: {executor.row_count} violação(ões) em {self.output_table}"
+            if log_callback: log_callback(msg, LogLevel.INFO)
+            if progress_callback: progress_callback(100, "Concluído")
+        else:
+            msg = f"Erro na regra {self.key}: {executor.error_message}"
+            if log_callback: log_callback(msg, LogLevel.CRITICAL)
+            if progress_callback: progress_callback(0, "Erro")
+        return success
+
+
+class RuleBatch(RuleUnit):
+    """
+    Conjunto de regras do mesmo tipo sobre o mesmo par base/alvo, avaliado
+    numa única junção espacial.
+    Responsabilidade única: percorrer cada feição base uma vez, buscar as
+    feições alvo candidatas uma vez e testar nelas as condições
+    (``target_code``/``attribute_rule``) de todas as regras do conjunto.
+
+    As linhas gravadas são as mesmas das regras executadas uma a uma,
+    com o ``rule_key`` de cada regra.
+    """
+
+    def __init__(self, units: List[RuleUnit]):
+        first = units[0]
+        super().__init__(
+            first.schema_name, first.rule, f"{first.rule.rule_type}:{first.rule.base}->{first.rule.alvo}",
+            first.base_geom, first.alvo_geom, first.config
+        )
+        self.units = list(units)
+        self.output_srid = first.output_srid
+
+    @property
+    def rule_keys(self) -> List[str]:
+        return [unit.key for unit in self.units]
+
+    def description(self) -> str:
+        rule = self.rule
+        return f"{len(self.units)} regra(s): {rule.base} {self.rule_type.description} {rule.alvo}"
+
+    def identity(self) -> str:
+        return "|".join([self.key, str(self.output_srid)] + [unit.identity() for unit in self.units])
+
+    def build_insert(self, bbox=None) -> Tuple["sql.Composable", List]:
+        """
+        Monta o INSERT ... SELECT das violações de todas as regras do conjunto.
+
+        Para cada feição base, uma subconsulta lateral percorre as feições alvo
+        que satisfazem o predicado espacial e agrega, com ``bool_or``, se cada
+        regra encontrou um par válido; a lista ``VALUES`` abre esse resultado
+        em uma linha por regra aplicável à feição.
+        """
+        rule = self.rule
+        code_column = sql.Identifier(self.config.code_column)
+        base_geom = sql.SQL("b.{}").format(sql.Identifier(self.base_geom[0]))
+
+        matches = []
+        match_params: List = []
+        for unit in self.units:
+            conditions = []
+            if unit.rule.target_code:
+                conditions.append(sql.SQL("a.{} = %s").format(code_column))
+                match_params.append(unit.rule.target_code)
+            if unit.rule.attribute_rule:
+                conditions.append(_attribute_condition(unit.rule))
+            matches.append(
+                sql.SQL("bool_or({})").format(sql.SQL(" AND ").join(conditions)) if conditions
+                else sql.SQL("count(*) > 0")
+            )
+
+        pair_conditions = [self._predicate()]
+        pair_params: List = []
+        target_codes = [unit.rule.target_code for unit in self.units]
+        if all(target_codes):
+            # Descarta logo as feições alvo que nenhuma regra considera
+            pair_conditions.insert(0, _in_codes(sql.SQL("a.{}").format(code_column), len(set(target_codes))))
+            pair_params += sorted(set(target_codes))
+
+        rows = []
+        row_params: List = []
+        for index, unit in enumerate(self.units):
+            applies = sql.SQL("b.{} = %s").format(code_column) if unit.rule.source_code else sql.SQL("true")
+            rows.append(sql.SQL("(%s, %s, %s, %s, {}, coalesce(m.{}, false))").format(
+                applies, sql.Identifier(f"m{index}")
+            ))
+            row_params += [unit.key, unit.rule.rule_table, unit.rule.source_code, unit.rule.target_code]
+            if unit.rule.source_code:
+                row_params.append(unit.rule.source_code)
+
+        base_conditions = []
+        base_params: List = []
+        source_codes = [unit.rule.source_code for unit in self.units]
+        if all(source_codes):
+            base_conditions.append(_in_codes(sql.SQL("b.{}").format(code_column), len(set(source_codes))))
+            base_params += sorted(set(source_codes))
+        if bbox is not None:
+            condition, bbox_params = self._in_bbox(base_geom, self.base_geom[1], bbox)
+            base_conditions.append(condition)
+            base_params += bbox_params
+
+        query = sql.SQL(
+            "INSERT INTO {output} "
+            "(rule_key, rule_table, rule_type, base, source_code, alvo, target_code, feature_id, geom) "
+            "SELECT r.rule_key, r.rule_table, %s, %s, r.source_code, %s, r.target_code, b.{id}::text, {geom} "
+            "FROM {schema}.{base} b "
+            "CROSS JOIN LATERAL (SELECT {matches} FROM {schema}.{alvo} a WHERE {pair}) m "
+            "JOIN LATERAL (VALUES {rows}) r(rule_key, rule_table, source_code, target_code, applies, matched) "
+            "ON r.applies AND {violation} "
+            "WHERE {conditions}"
+        ).format(
+            output=sql.SQL("{}.{}").format(sql.Identifier(self.schema_name), sql.Identifier(self.output_table)),
+            id=sql.Identifier(self.config.id_column),
+            geom=self._output_geom(),
+            schema=sql.Identifier(self.schema_name),
+            base=sql.Identifier(rule.base),
+            alvo=sql.Identifier(rule.alvo),
+            matches=sql.SQL(", ").join(
+                sql.SQL("{} AS {}").format(match, sql.Identifier(f"m{index}")) for index, match in enumerate(matches)
+            ),
+            pair=sql.SQL(" AND ").join(pair_conditions),
+            rows=sql.SQL(", ").join(rows),
+            violation=sql.SQL("NOT r.matched" if self.rule_type.required else "r.matched"),
+            conditions=sql.SQL(" AND ").join(base_conditions) if base_conditions else sql.SQL("true")
+        )
+        params = [rule.rule_type, rule.base, rule.alvo] + match_params + pair_params + row_params + base_params
+        return query, params
+
+
+class RuleExecutor(FunctionExecutor):
+    """
+    Executor de uma RuleUnit com os mesmos pool, cancelamento, tempo limite,
+    cache e leitura em blocos das funções de validação.
+
+    Na mesma transação: apaga as linhas anteriores da regra, grava as novas
+    violações e lê de volta as gravadas (o resultado da execução).
+    """
+
+    def __init__(self, connection_info: Dict[str, str], unit: RuleUnit, **kwargs):
+        super().__init__(connection_info, unit.schema_name, unit.key, **kwargs)
+        self.unit = unit
+
+    def _cacheable(self) -> bool:
+        return self.cache is not None and self.bbox is None
+
+    def _cache_key(self, conn) -> Optional[str]:
+        return ResultCache.compute_tables_key(conn, self.connection_info, self.unit.identity(), self.unit.tables)
+
+    def _before_execute(self, conn) -> bool:
+        with conn.cursor() as cur:
+            cur.execute(*self.unit.build_delete(self.bbox))
+            cur.execute(*self.unit.build_insert(self.bbox))
+        return True
+
+    def _build_query(self):
+        return self.unit.build_select(self.bbox)
+
+
+class RuleSuiteRunner(SuiteRunner):
+    """
+    Executa as RuleUnit de um motor de regras em paralelo, com tempo,
+    cache e novas tentativas por regra.
+    """
+
+    def __init__(self, engine: 'RuleEngine', units: List[RuleUnit], cache: Optional[ResultCache] = None, **kwargs):
+        self.engine = engine
+        self.units = {unit.key: unit for unit in units}
+        self.cache = cache
+        super().__init__(engine.connection_info, engine.schema_name, list(self.units), **kwargs)
+
+    def _create_executor(self, name: str) -> FunctionExecutor:
+        return self.engine.create_executor(
+            self.units[name], statement_timeout=self.statement_timeout, cache=self.cache,
+            statement_stats=self.statement_stats, history=self.history
+        )
+
+
+class RuleEngine:
+    """
+    Motor de regras da tabela relacional de regras.
+    Responsabilidade única: ler as tabelas ``spatial_rules*`` do schema e
+    transformar cada linha numa RuleUnit com o seu próprio SQL, em vez de
+    depender de uma função PL/pgSQL monolítica por tipo de regra.
+    """
+
+    def __init__(
+        self,
+        connection_info: Dict[str, str],
+        schema_name: str,
+        config: RuleEngineConfig = None,
+        connection_service=None
+    ):
+        if connection_service is None:
+            from .database_service import DatabaseConnectionService
+            connection_service = DatabaseConnectionService()
+        self.connection_info = connection_info
+        self.schema_name = schema_name
+        self.config = config or RuleEngineConfig()
+        self.connection_service = connection_service
+
+    def load_rules(self, conn) -> List[SpatialRule]:
+        """Lê as linhas de todas as tabelas de regras do schema."""
+        rules = []
+        with conn.cursor() as cur:
+            cur.execute(
+                """
+                SELECT table_name
+                FROM information_schema.tables
+                WHERE table_schema = %s AND table_name LIKE %s
+                ORDER BY table_name
+                """,
+                (self.schema_name, self.config.rules_table_pattern)
+            )
+            for (rule_table,) in cur.fetchall():
+                cur.execute(
+                    sql.SQL(
+                        "SELECT rule_type, base, alvo, source_code::text, target_code::text, attribute_rule "
+                        "FROM {}.{} ORDER BY rule_type, base, source_code, alvo, target_code, attribute_rule"
+                    ).format(sql.Identifier(self.schema_name), sql.Identifier(rule_table))
+                )
+                for rule_type, base, alvo, source_code, target_code, attribute_rule in cur.fetchall():
+                    if not rule_type or not base or not alvo:
+                        continue
+                    rules.append(SpatialRule(
+                        rule_table=rule_table,
+                        rule_type=rule_type.strip(),
+                        base=base,
+                        alvo=alvo,
+                        source_code=source_code or None,
+                        target_code=target_code or None,
+                        attribute_rule=(attribute_rule or "").strip() or None,
+                    ))
+        return rules
+
+    def _geometry_columns(self, conn) -> Tuple[Dict[str, Tuple[str, int]], Dict[Tuple[str, int], str]]:
+        """Coluna geométrica e SRID por tabela, e colunas-sombra por (tabela, SRID)."""
+        columns, shadows = SridHarmonizer().columns(conn, self.schema_name)
+        if self.config.geom_column is not None:
+            with conn.cursor() as cur:
+                cur.execute(
+                    "SELECT f_table_name, srid FROM geometry_columns "
+                    "WHERE f_table_schema = %s AND f_geometry_column = %s",
+                    (self.schema_name, self.config.geom_column)
+                )
+                return {table: (self.config.geom_column, srid) for table, srid in cur.fetchall()}, shadows
+        return {table: (info.column, info.srid) for table, info in columns.items()}, shadows
+
+    def _harmonized(self, rule: SpatialRule, geometry, shadows) -> Tuple[Tuple[str, int], Tuple[str, int]]:
+        """Troca a coluna de uma das tabelas pela sombra no SRID da outra, se houver."""
+        base_geom, alvo_geom = geometry[rule.base], geometry[rule.alvo]
+        if base_geom[1] != alvo_geom[1]:
+            if (rule.alvo, base_geom[1]) in shadows:
+                alvo_geom = (shadows[(rule.alvo, base_geom[1])], base_geom[1])
+            elif (rule.base, alvo_geom[1]) in shadows:
+                base_geom = (shadows[(rule.base, alvo_geom[1])], alvo_geom[1])
+        return base_geom, alvo_geom
+
+    def load_units(self) -> List[RuleUnit]:
+        """
+        Cria uma RuleUnit por linha das tabelas de regras.
+
+        Linhas com tipo de regra desconhecido ou tabelas sem coluna
+        geométrica são ignoradas, com aviso no log. Pares com SRIDs
+        diferentes usam a coluna-sombra no SRID da outra tabela, quando
+        existe (ver SridHarmonizer).
+        """
+        with self.connection_service.connection(self.connection_info) as conn:
+            rules = self.load_rules(conn)
+            geometry, shadows = self._geometry_columns(conn)
+
+        units = []
+        keys = set()
+        for rule in rules:
+            if rule.rule_type.upper() not in RULE_TYPES:
+                log_message(f"Tipo de regra desconhecido '{rule.rule_type}' em {rule.rule_table}", LogLevel.WARNING)
+                continue
+            missing = [table for table in (rule.base, rule.alvo) if table not in geometry]
+            if missing:
+                log_message(
+                    f"Regra de {rule.rule_table} ignorada: sem coluna geométrica em {', '.join(missing)}",
+                    LogLevel.WARNING
+                )
+                continue
+
+            key = f"{rule.rule_type}:{rule.base}({rule.source_code or '*'})->{rule.alvo}({rule.target_code or '*'})"
+            suffix = 2
+            unique_key = key
+            while unique_key in keys:
+                unique_key = f"{key}#{suffix}"
+                suffix += 1
+            keys.add(unique_key)
+            base_geom, alvo_geom = self._harmonized(rule, geometry, shadows)
+            units.append(RuleUnit(self.schema_name, rule, unique_key, base_geom, alvo_geom, self.config))
+        return units
+
+    @staticmethod
+    def batch_units(units: List[RuleUnit]) -> List[RuleUnit]:
+        """
+        Agrupa as regras do mesmo tipo sobre o mesmo par base/alvo num
+        RuleBatch, trocando N varreduras das tabelas por uma. Regras sem par
+        continuam como unidades isoladas.
+        """
+        groups: Dict[Tuple, List[RuleUnit]] = {}
+        for unit in units:
+            key = (unit.rule.rule_type.upper(), unit.rule.base, unit.rule.alvo, unit.base_geom, unit.alvo_geom)
+            groups.setdefault(key, []).append(unit)
+        return [group[0] if len(group) == 1 else RuleBatch(group) for group in groups.values()]
+
+    def prepare(self, units: List[RuleUnit]):
+        """
+        Cria as tabelas ``aux_revisao_<tipo>`` que faltam e define o SRID de
+        saída de cada unidade. Deve rodar antes das execuções em paralelo,
+        para que elas não disputem o CREATE TABLE.
+        """
+        by_table: Dict[str, List[RuleUnit]] = {}
+        for unit in units:
+            by_table.setdefault(unit.output_table, []).append(unit)
+
+        with self.connection_service.connection(self.connection_info) as conn:
+            with conn.cursor() as cur:
+                for table_name, table_units in by_table.items():
+                    srid = self._output_srid(cur, table_name)
+                    if srid is None:
+                        srid = table_units[0].base_geom[1]
+                        self._create_output(cur, table_name, srid)
+                    for unit in table_units:
+                        unit.output_srid = srid
+            conn.commit()
+
+    def _output_srid(self, cur, table_name: str) -> Optional[int]:
+        cur.execute(
+            """
+            SELECT srid FROM geometry_columns
+            WHERE f_table_schema = %s AND f_table_name = %s AND f_geometry_column = 'geom'
+            """,
+            (self.schema_name, table_name)
+        )
+        row = cur.fetchone()
+        return row[0] if row else None
+
+    def _create_output(self, cur, table_name: str, srid: int):
+        cur.execute(
+            sql.SQL(
+                """
+                CREATE TABLE IF NOT EXISTS {table} (
+                    id bigserial PRIMARY KEY,
+                    rule_key text NOT NULL,
+                    rule_table text,
+                    rule_type text,
+                    base text,
+                    source_code text,
+                    alvo text,
+                    target_code text,
+                    feature_id text,
+                    created_at timestamptz NOT NULL DEFAULT now(),
+                    geom geometry(Geometry, {srid})
+                );
+                CREATE INDEX IF NOT EXISTS {rule_index} ON {table} (rule_key);
+                CREATE INDEX IF NOT EXISTS {geom_index} ON {table} USING gist (geom);
+                """
+            ).format(
+                table=sql.SQL("{}.{}").format(sql.Identifier(self.schema_name), sql.Identifier(table_name)),
+                srid=sql.Literal(int(srid)),
+                rule_index=sql.Identifier(f"{table_name}_rule_key_idx"),
+                geom_index=sql.Identifier(f"{table_name}_geom_idx"),
+            )
+        )
+        log_message(f"Tabela de revisão {self.schema_name}.{table_name} criada", LogLevel.INFO)
+
+    def create_executor(self, unit: RuleUnit, **kwargs) -> RuleExecutor:
+        """Cria o executor de uma unidade (aceita os parâmetros de FunctionExecutor)."""
+        return RuleExecutor(self.connection_info, unit, connection_service=self.connection_service, **kwargs)
+
+    def run(
+        self,
+        units: Optional[List[RuleUnit]] = None,
+        max_workers: int = 4,
+        statement_timeout: Optional[int] = None,
+        retries: int = 0,
+        batch: bool = False,
+        cache: Optional[ResultCache] = None,
+        on_item_finished: Optional[Callable[[BatchItemResult], None]] = None
+    ) -> BatchSummary:
+        """
+        Executa as regras em paralelo, uma transação por regra.
+
+        Args:
+            units: Unidades a executar (padrão: todas as da tabela de regras)
+            max_workers: Regras executadas simultaneamente
+            statement_timeout: Tempo limite de cada regra em milissegundos
+            retries: Novas tentativas de uma regra após erro transitório
+            batch: Avalia numa só junção espacial as regras que compartilham
+                tipo e par base/alvo (uma linha do resumo por conjunto)
+            cache: Cache de resultados (regras cujas tabelas não mudaram não
+                são reexecutadas)
+            on_item_finished: Chamado ao fim de cada regra
+
+        Returns:
+            Resumo com uma linha por regra
+        """
+        units = self.load_units() if units is None else units
+        if batch:
+            units = self.batch_units(units)
+        self.prepare(units)
+        runner = RuleSuiteRunner(
+            self, units, cache=cache,
+            max_workers=max_workers,
+            statement_timeout=statement_timeout,
+            retries=retries,
+            on_item_finished=on_item_finished
+        )
+        return runner.run()
@@ -0,0 +1,50 @@
+"""
+/***************************************************************************
+ Validador de Regras PostGis
+                                 A QGIS plugin
+ 2ºCGEO
+                              -------------------
+        begin                : 2025-07-16
+        git sha              : $Format:%H$
+        copyright            : (C) 2025 by Godinho, Alvarez, Perrut
+        email                : estevezcodando@gmail.com
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+"""
+import sys
+from typing import Optional
+
+from .interfaces import ISettingsStore
+
+_settings: Optional[ISettingsStore] = None
+
+
+def set_settings(settings: Optional[ISettingsStore]):
+    """Define o armazenamento de configurações do núcleo (None volta à escolha automática)."""
+    global _settings
+    _settings = settings
+
+
+def get_settings() -> ISettingsStore:
+    """
+    Retorna o armazenamento de configurações do núcleo: QgsSettings se o QGIS
+    já foi carregado no processo, senão configurações em memória (valores
+    padrão).
+    """
+    global _settings
+    if _settings is None:
+        if 'qgis.core' in sys.modules:
+            from ..infrastructure.qgis_settings_store import QgisSettingsStore
+            _settings = QgisSettingsStore()
+        else:
+            from ..infrastructure.memory_settings_store import MemorySettingsStore
+            _settings = MemorySettingsStore()
+    return _settings
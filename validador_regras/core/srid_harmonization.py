@@ -0,0 +1,257 @@
+"""
+/***************************************************************************
+ Validador de Regras PostGis
+                                 A QGIS plugin
+ 2ºCGEO
+                              -------------------
+        begin                : 2025-07-16
+        git sha              : $Format:%H$
+        copyright            : (C) 2025 by Godinho, Alvarez, Perrut
+        email                : estevezcodando@gmail.com
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+"""
+import re
+from collections import Counter
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from .dbapi import sql
+
+# Colunas-sombra: <coluna geométrica>_srid<SRID>, mantidas por trigger
+SHADOW_SUFFIX = "_srid"
+SHADOW_COLUMN_REGEX = r"_srid[0-9]+$"
+_SHADOW_RE = re.compile(r"^(.+)_srid([0-9]+)$")
+
+
+def shadow_column_name(geom_column: str, srid: int) -> str:
+    """Nome da coluna-sombra de ``geom_column`` transformada para ``srid``."""
+    return f"{geom_column}{SHADOW_SUFFIX}{srid}"
+
+
+def _limit(name: str) -> str:
+    # Identificadores do PostgreSQL têm até 63 bytes
+    return name.encode('utf-8')[:63].decode('utf-8', 'ignore')
+
+
+@dataclass(frozen=True)
+class GeometryColumnInfo:
+    """
+    Coluna geométrica registrada em ``geometry_columns``.
+    """
+    schema_name: str
+    table_name: str
+    column: str
+    srid: int
+    geometry_type: str
+    dimension: int
+
+    @property
+    def typmod(self) -> str:
+        """Tipo com as dimensões, como em ``geometry(MultiPolygonZ, 31983)``."""
+        geometry_type = self.geometry_type.upper()
+        if self.dimension == 3 and not geometry_type.endswith('M'):
+            return f"{geometry_type}Z"
+        if self.dimension == 4:
+            return f"{geometry_type}ZM"
+        return geometry_type
+
+
+@dataclass
+class PairMismatch:
+    """
+    Par base/alvo cujas colunas geométricas não são comparáveis diretamente.
+    """
+    base: GeometryColumnInfo
+    alvo: GeometryColumnInfo
+
+    @property
+    def srid_mismatch(self) -> bool:
+        return self.base.srid != self.alvo.srid
+
+    @property
+    def type_problems(self) -> List[str]:
+        problems = []
+        if self.base.dimension != self.alvo.dimension:
+            problems.append(
+                f"dimensões diferentes ({self.base.table_name}: {self.base.dimension}D, "
+                f"{self.alvo.table_name}: {self.alvo.dimension}D)"
+            )
+        for info in (self.base, self.alvo):
+            if info.geometry_type.upper() in ('GEOMETRY', 'GEOMETRYCOLLECTION'):
+                problems.append(f"{info.table_name}.{info.column} aceita qualquer tipo de geometria")
+        return problems
+
+
+class SridHarmonizer:
+    """
+    Harmonização de SRID entre tabelas base/alvo.
+    Responsabilidade única: encontrar pares de regras com SRID ou tipo de
+    geometria incompatíveis e manter, na tabela fora do SRID comum, uma
+    coluna-sombra transformada, indexada e atualizada por trigger, para
+    que as junções usem o índice espacial num único SRID.
+    """
+
+    def columns(self, conn, schema_name: str) -> Tuple[Dict[str, GeometryColumnInfo], Dict[Tuple[str, int], str]]:
+        """
+        Lê as colunas geométricas do schema.
+
+        Returns:
+            (coluna principal por tabela, coluna-sombra por (tabela, SRID))
+        """
+        with conn.cursor() as cur:
+            cur.execute(
+                """
+                SELECT f_table_name, f_geometry_column, srid, type, coord_dimension
+                FROM geometry_columns
+                WHERE f_table_schema = %s
+                ORDER BY f_table_name, f_geometry_column
+                """,
+                (schema_name,)
+            )
+            rows = cur.fetchall()
+
+        columns = {}
+        shadows = {}
+        for table_name, column, srid, geometry_type, dimension in rows:
+            match = _SHADOW_RE.match(column)
+            if match and int(match.group(2)) == srid:
+                shadows[(table_name, srid)] = column
+                continue
+            columns.setdefault(
+                table_name, GeometryColumnInfo(schema_name, table_name, column, srid, geometry_type, dimension)
+            )
+        return columns, shadows
+
+    def rule_pairs(self, conn, schema_name: str, rules_table_pattern: str = "spatial_rules%") -> List[Tuple[str, str]]:
+        """Pares (base, alvo) distintos das tabelas de regras do schema."""
+        pairs = set()
+        with conn.cursor() as cur:
+            cur.execute(
+                """
+                SELECT table_name
+                FROM information_schema.tables
+                WHERE table_schema = %s AND table_name LIKE %s
+                """,
+                (schema_name, rules_table_pattern)
+            )
+            for (rule_table,) in cur.fetchall():
+                cur.execute(
+                    sql.SQL("SELECT DISTINCT base, alvo FROM {}.{} WHERE base IS NOT NULL AND alvo IS NOT NULL").format(
+                        sql.Identifier(schema_name), sql.Identifier(rule_table)
+                    )
+                )
+                pairs.update(cur.fetchall())
+        return sorted(pairs)
+
+    def check(self, conn, schema_name: str, pairs: Iterable[Tuple[str, str]]) -> List[PairMismatch]:
+        """
+        Verifica SRID e tipo de geometria de cada par base/alvo.
+
+        Pares já atendidos por uma coluna-sombra no SRID da outra tabela
+        não são apontados.
+        """
+        columns, shadows = self.columns(conn, schema_name)
+        mismatches = []
+        for base, alvo in pairs:
+            if base not in columns or alvo not in columns:
+                continue
+            mismatch = PairMismatch(columns[base], columns[alvo])
+            srid_pending = mismatch.srid_mismatch and not (
+                (alvo, mismatch.base.srid) in shadows or (base, mismatch.alvo.srid) in shadows
+            )
+            if srid_pending or mismatch.type_problems:
+                mismatches.append(mismatch)
+        return mismatches
+
+    @staticmethod
+    def target_srid(mismatches: List[PairMismatch]) -> Optional[int]:
+        """SRID comum: o mais frequente entre as tabelas dos pares incompatíveis."""
+        tables = {}
+        for mismatch in mismatches:
+            if mismatch.srid_mismatch:
+                for info in (mismatch.base, mismatch.alvo):
+                    tables[(info.schema_name, info.table_name)] = info.srid
+        if not tables:
+            return None
+        return Counter(tables.values()).most_common(1)[0][0]
+
+    def shadow_sql(self, info: GeometryColumnInfo, srid: int) -> "sql.Composed":
+        """
+        Cria (ou recria) a coluna-sombra de ``info`` no SRID informado.
+
+        A coluna é preenchida, indexada com GiST e mantida por um trigger
+        BEFORE INSERT/UPDATE; tudo roda numa transação, pois o ALTER TABLE já
+        bloqueia a tabela durante o preenchimento. Os triggers de usuário da
+        tabela (change_log do validador, auditoria, updated_at) ficam
+        desativados só durante o preenchimento: ele não altera dados, e
+        dispará-los marcaria a tabela inteira como alterada.
+        """
+        from .incremental_validation import CONTROL_SCHEMA
+
+        shadow = shadow_column_name(info.column, srid)
+        table = sql.SQL("{}.{}").format(sql.Identifier(info.schema_name), sql.Identifier(info.table_name))
+        function = sql.SQL("{}.{}").format(
+            sql.Identifier(CONTROL_SCHEMA),
+            sql.Identifier(_limit(f"sombra_{info.schema_name}_{info.table_name}_{shadow}"))
+        )
+        return sql.SQL(
+            """
+            CREATE SCHEMA IF NOT EXISTS {control};
+            ALTER TABLE {table} ADD COLUMN IF NOT EXISTS {shadow} geometry({typmod}, {srid});
+            DO $$
+            DECLARE
+                relation regclass := format('%I.%I', {schema_name}, {table_name})::regclass;
+                triggers text[];
+                modes "char"[];
+            BEGIN
+                SELECT array_agg(tgname::text), array_agg(tgenabled) INTO triggers, modes
+                FROM pg_trigger
+                WHERE tgrelid = relation AND NOT tgisinternal AND tgenabled <> 'D';
+                FOR i IN 1 .. coalesce(array_length(triggers, 1), 0) LOOP
+                    EXECUTE format('ALTER TABLE %s DISABLE TRIGGER %I', relation, triggers[i]);
+                END LOOP;
+                UPDATE {table} SET {shadow} = ST_Transform({geom}, {srid});
+                -- Reativa cada trigger no modo em que estava (ORIGIN, REPLICA ou ALWAYS)
+                FOR i IN 1 .. coalesce(array_length(triggers, 1), 0) LOOP
+                    EXECUTE format(
+                        'ALTER TABLE %s ENABLE %s TRIGGER %I', relation,
+                        CASE modes[i] WHEN 'R' THEN 'REPLICA' WHEN 'A' THEN 'ALWAYS' ELSE '' END, triggers[i]
+                    );
+                END LOOP;
+            END
+            $$;
+            CREATE INDEX IF NOT EXISTS {index} ON {table} USING gist ({shadow});
+            CREATE OR REPLACE FUNCTION {function}() RETURNS trigger
+            LANGUAGE plpgsql AS $$
+            BEGIN
+                NEW.{shadow} := ST_Transform(NEW.{geom}, {srid});
+                RETURN NEW;
+            END;
+            $$;
+            DROP TRIGGER IF EXISTS {trigger} ON {table};
+            CREATE TRIGGER {trigger} BEFORE INSERT OR UPDATE OF {geom} ON {table}
+                FOR EACH ROW EXECUTE FUNCTION {function}();
+            ANALYZE {table};
+            """
+        ).format(
+            control=sql.Identifier(CONTROL_SCHEMA),
+            table=table,
+            schema_name=sql.Literal(info.schema_name),
+            table_name=sql.Literal(info.table_name),
+            shadow=sql.Identifier(shadow),
+            typmod=sql.SQL(info.typmod),
+            srid=sql.Literal(int(srid)),
+            geom=sql.Identifier(info.column),
+            index=sql.Identifier(_limit(f"{info.table_name}_{shadow}_gist_idx")),
+            function=function,
+            trigger=sql.Identifier(_limit(f"validador_{shadow}")),
+        )
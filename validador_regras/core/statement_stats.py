@@ -0,0 +1,252 @@
+"""
+/***************************************************************************
+ Validador de Regras PostGis
+                                 A QGIS plugin
+ 2ºCGEO
+                              -------------------
+        begin                : 2025-07-16
+        git sha              : $Format:%H$
+        copyright            : (C) 2025 by Godinho, Alvarez, Perrut
+        email                : estevezcodando@gmail.com
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+"""
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+from .dbapi import psycopg2
+
+# Marca das consultas do próprio coletor, excluídas dos relatórios
+_MARKER = "/* validador:statement_stats */"
+
+
+@dataclass
+class StatementDelta:
+    """Custo de uma instrução entre dois instantâneos de ``pg_stat_statements``."""
+    queryid: int
+    query: str
+    calls: int
+    total_time: float
+    rows: int
+    shared_blks_hit: int
+    shared_blks_read: int
+
+    @property
+    def mean_time(self) -> float:
+        return self.total_time / self.calls if self.calls else 0.0
+
+
+@dataclass
+class TableIoDelta:
+    """Blocos lidos do disco e encontrados em cache de uma tabela (``pg_statio_user_tables``)."""
+    table: str
+    heap_blks_read: int
+    heap_blks_hit: int
+    idx_blks_read: int
+    idx_blks_hit: int
+
+    @property
+    def blocks(self) -> int:
+        return self.heap_blks_read + self.heap_blks_hit + self.idx_blks_read + self.idx_blks_hit
+
+
+@dataclass
+class StatementReport:
+    """Instruções e tabelas mais custosas de uma execução."""
+    statements: List[StatementDelta] = field(default_factory=list)
+    tables: List[TableIoDelta] = field(default_factory=list)
+    warnings: List[str] = field(default_factory=list)
+
+    def format_lines(self, query_width: int = 160) -> List[str]:
+        """Linhas do relatório para o log da execução."""
+        lines = list(self.warnings)
+        if self.statements:
+            lines.append("Instruções mais custosas (pg_stat_statements):")
+        for position, statement in enumerate(self.statements, start=1):
+            query = " ".join(statement.query.split())
+            if len(query) > query_width:
+                query = query[:query_width - 3] + "..."
+            lines.append(
+                f"  {position}. {statement.total_time:.1f} ms em {statement.calls} chamada(s) "
+                f"(média {statement.mean_time:.2f} ms, {statement.rows} linha(s), "
+                f"buffers: {statement.shared_blks_hit} em cache / {statement.shared_blks_read} lidos): {query}"
+            )
+        if self.tables:
+            lines.append("Tabelas mais acessadas (pg_statio_user_tables, blocos em cache / lidos):")
+        for table in self.tables:
+            lines.append(
+                f"  {table.table}: tabela {table.heap_blks_hit} / {table.heap_blks_read}, "
+                f"índices {table.idx_blks_hit} / {table.idx_blks_read}"
+            )
+        return lines
+
+    def to_dict(self) -> Dict:
+        return {
+            'statements': [
+                {
+                    'queryid': s.queryid, 'query': s.query, 'calls': s.calls,
+                    'total_time_ms': round(s.total_time, 3), 'mean_time_ms': round(s.mean_time, 3),
+                    'rows': s.rows, 'shared_blks_hit': s.shared_blks_hit, 'shared_blks_read': s.shared_blks_read,
+                }
+                for s in self.statements
+            ],
+            'tables': [
+                {
+                    'table': t.table, 'heap_blks_read': t.heap_blks_read, 'heap_blks_hit': t.heap_blks_hit,
+                    'idx_blks_read': t.idx_blks_read, 'idx_blks_hit': t.idx_blks_hit,
+                }
+                for t in self.tables
+            ],
+            'warnings': list(self.warnings),
+        }
+
+
+@dataclass
+class StatsSnapshot:
+    statements: Dict[int, Tuple] = field(default_factory=dict)
+    tables: Dict[str, Tuple] = field(default_factory=dict)
+    warnings: List[str] = field(default_factory=list)
+
+
+class StatementStatsCollector:
+    """
+    Instantâneos de ``pg_stat_statements`` e ``pg_statio_user_tables``.
+    Responsabilidade única: medir, por diferença entre o antes e o depois de
+    uma execução, quais instruções (inclusive as de dentro do corpo
+    PL/pgSQL) e quais tabelas consumiram tempo e I/O.
+
+    ``pg_stat_statements`` não separa por sessão: os números são do usuário
+    da conexão no banco atual, e execuções simultâneas do mesmo usuário
+    entram na conta. As instruções internas das funções só são registradas
+    com ``pg_stat_statements.track = 'all'``; o coletor tenta ativá-lo na
+    transação (exige superusuário) e avisa no relatório quando não consegue.
+
+    As leituras usam SAVEPOINT, de modo que a falta da extensão ou de
+    permissão não aborta a transação da execução.
+    """
+
+    def __init__(self, top_n: int = 10):
+        self.top_n = top_n
+
+    def _query(self, conn, query: str, params=None) -> Optional[list]:
+        """Executa a consulta num SAVEPOINT; None se ela falhar."""
+        with conn.cursor() as cur:
+            cur.execute("SAVEPOINT validador_statement_stats")
+            try:
+                cur.execute(query, params)
+                rows = cur.fetchall() if cur.description else []
+            except psycopg2.Error:
+                cur.execute("ROLLBACK TO SAVEPOINT validador_statement_stats")
+                return None
+            cur.execute("RELEASE SAVEPOINT validador_statement_stats")
+            return rows
+
+    def _statement_columns(self, conn) -> Optional[Tuple[str, bool]]:
+        """(coluna de tempo total, há coluna toplevel) conforme a versão; None sem a extensão."""
+        rows = self._query(conn, f"{_MARKER} SELECT extversion FROM pg_extension WHERE extname = 'pg_stat_statements'")
+        if not rows:
+            return None
+        version = conn.server_version
+        return ("total_exec_time" if version >= 130000 else "total_time"), version >= 140000
+
+    def enable_tracking(self, conn) -> List[str]:
+        """Ativa ``track = 'all'`` na transação, se possível; devolve avisos."""
+        rows = self._query(conn, f"{_MARKER} SELECT current_setting('pg_stat_statements.track', true)")
+        if rows and rows[0][0] == 'all':
+            return []
+        if self._query(conn, "SET LOCAL pg_stat_statements.track = 'all'") is not None:
+            return []
+        return [
+            "pg_stat_statements.track não é 'all': as instruções de dentro das funções não são registradas "
+            "(ajuste no postgresql.conf ou execute como superusuário)."
+        ]
+
+    def snapshot(self, conn) -> StatsSnapshot:
+        """Lê os contadores atuais do usuário da conexão no banco atual."""
+        snapshot = StatsSnapshot()
+        columns = self._statement_columns(conn)
+        if columns is None:
+            snapshot.warnings.append("Extensão pg_stat_statements não instalada no banco: relatório de instruções indisponível.")
+        else:
+            time_column, has_toplevel = columns
+            inner = "AND NOT s.toplevel" if has_toplevel else ""
+            rows = self._query(
+                conn,
+                f"""
+                {_MARKER}
+                SELECT s.queryid, s.query, s.calls, s.{time_column}, s.rows, s.shared_blks_hit, s.shared_blks_read
+                FROM pg_stat_statements s
+                WHERE s.userid = (SELECT oid FROM pg_roles WHERE rolname = current_user)
+                  AND s.dbid = (SELECT oid FROM pg_database WHERE datname = current_database())
+                  AND s.query NOT LIKE %s {inner}
+                """,
+                (f"%{_MARKER}%",)
+            )
+            if rows is None:
+                snapshot.warnings.append(
+                    "Não foi possível ler pg_stat_statements (a biblioteca precisa estar em shared_preload_libraries)."
+                )
+            else:
+                snapshot.statements = {row[0]: row[1:] for row in rows if row[0] is not None}
+
+        rows = self._query(
+            conn,
+            f"""
+            {_MARKER}
+            SELECT schemaname || '.' || relname,
+                   COALESCE(heap_blks_read, 0), COALESCE(heap_blks_hit, 0),
+                   COALESCE(idx_blks_read, 0), COALESCE(idx_blks_hit, 0)
+            FROM pg_statio_user_tables
+            """
+        )
+        snapshot.tables = {row[0]: row[1:] for row in rows or []}
+        return snapshot
+
+    def begin(self, conn) -> StatsSnapshot:
+        """Instantâneo inicial, na transação da execução (com ``track = 'all'`` se possível)."""
+        warnings = self.enable_tracking(conn)
+        snapshot = self.snapshot(conn)
+        snapshot.warnings = warnings + snapshot.warnings
+        return snapshot
+
+    def finish(self, conn, before: StatsSnapshot) -> StatementReport:
+        """
+        Instantâneo final e relatório; chamado depois do commit da execução,
+        pois ``pg_statio_*`` só recebe o I/O de transações encerradas (e pode
+        chegar com até cerca de um segundo de atraso).
+        """
+        self._query(conn, f"{_MARKER} SELECT pg_stat_clear_snapshot()")
+        return self.report(before, self.snapshot(conn))
+
+    def report(self, before: StatsSnapshot, after: StatsSnapshot) -> StatementReport:
+        """Diferença entre dois instantâneos: as ``top_n`` instruções e tabelas mais custosas."""
+        statements = []
+        for queryid, (query, calls, total, rows, hit, read) in after.statements.items():
+            _, calls0, total0, rows0, hit0, read0 = before.statements.get(queryid, (None, 0, 0.0, 0, 0, 0))
+            # Contadores zerados (pg_stat_statements_reset) entre os instantâneos: vale o valor atual
+            if calls < calls0:
+                calls0, total0, rows0, hit0, read0 = 0, 0.0, 0, 0, 0
+            if calls > calls0:
+                statements.append(StatementDelta(
+                    queryid, query, calls - calls0, float(total - total0), rows - rows0, hit - hit0, read - read0
+                ))
+        statements.sort(key=lambda s: s.total_time, reverse=True)
+
+        tables = []
+        for name, counters in after.tables.items():
+            previous = before.tables.get(name, (0, 0, 0, 0))
+            delta = TableIoDelta(name, *(max(0, now - then) for now, then in zip(counters, previous)))
+            if delta.blocks:
+                tables.append(delta)
+        tables.sort(key=lambda t: (t.heap_blks_read + t.idx_blks_read, t.blocks), reverse=True)
+
+        warnings = list(dict.fromkeys(before.warnings + after.warnings))
+        return StatementReport(statements[:self.top_n], tables[:self.top_n], warnings)
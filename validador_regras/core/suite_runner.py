@@ -0,0 +1,204 @@
+"""
+/***************************************************************************
+ Validador de Regras PostGis
+                                 A QGIS plugin
+ 2ºCGEO
+                              -------------------
+        begin                : 2025-07-16
+        git sha              : $Format:%H$
+        copyright            : (C) 2025 by Godinho, Alvarez, Perrut
+        email                : estevezcodando@gmail.com
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import Callable, Dict, List, Optional, Tuple, Union
+
+from .backend_cancellation import cancel_backend
+from .batch_execution import (
+    BatchItemResult, BatchSummary, batch_items,
+    STATUS_RUNNING, STATUS_SUCCESS, STATUS_ERROR, STATUS_CANCELLED
+)
+from .function_executor import FunctionExecutor
+from .logger import log_message, LogLevel
+
+
+def count_findings(rows: list) -> int:
+    """
+    Conta as linhas que apontam inconsistências: as que têm algum valor
+    verdadeiro. Funções que retornam void, NULL, 0 ou false quando não
+    encontram problemas não geram achados.
+    """
+    return sum(1 for row in rows if any(row))
+
+
+class SuiteRunner:
+    """
+    Executor de um conjunto de funções de validação fora do QGIS.
+    Responsabilidade única: rodar as funções em paralelo numa pool de threads
+    (sem Qt nem gerenciador de tasks), para uso na linha de comando.
+    """
+
+    def __init__(
+        self,
+        connection_info: Dict[str, str],
+        schema_name: str,
+        function_names: List[Union[str, Tuple[str, str]]],
+        max_workers: int = 4,
+        statement_timeout: Optional[int] = None,
+        on_item_finished: Optional[Callable[[BatchItemResult], None]] = None,
+        notice_callback: Optional[Callable[[str, str], None]] = None,
+        retries: int = 0,
+        statement_stats=None,
+        history=None
+    ):
+        """
+        Args:
+            connection_info: Informações da conexão
+            schema_name: Schema das funções
+            function_names: Funções a executar, na ordem do resumo: nomes
+                ou pares (nome, argumentos de identidade) para sobrecargas
+            max_workers: Execuções simultâneas
+            statement_timeout: Tempo limite de cada função em milissegundos
+            on_item_finished: Chamado (na thread da execução) ao fim de cada função
+            notice_callback: Recebe (função, mensagem) das mensagens NOTICE
+            retries: Novas tentativas de uma função que falhou por erro de
+                conexão, deadlock ou serialização
+            statement_stats: StatementStatsCollector para relatar as
+                instruções mais custosas de cada função (execuções simultâneas
+                do mesmo usuário se misturam nos números)
+            history: ExecutionHistory onde cada execução é registrada
+        """
+        self.connection_info = connection_info
+        self.schema_name = schema_name
+        self.max_workers = max(1, max_workers)
+        self.statement_timeout = statement_timeout
+        self.on_item_finished = on_item_finished
+        self.notice_callback = notice_callback
+        self.retries = max(0, retries)
+        self.statement_stats = statement_stats
+        self.history = history
+        # Por item (nome e argumentos): sobrecargas de mesmo nome têm itens próprios
+        self.items = {item.key: item for item in batch_items(function_names)}
+        self.interrupted = False
+        self._cancelled = False
+        self._running: Dict[str, FunctionExecutor] = {}
+        self._lock = threading.Lock()
+
+    def run(self) -> BatchSummary:
+        """
+        Executa as funções e aguarda todas terminarem.
+
+        Um Ctrl+C durante a espera cancela as execuções no servidor e
+        marca ``interrupted``; o resumo é devolvido mesmo assim.
+        """
+        started = time.monotonic()
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="validador") as pool:
+            futures = [pool.submit(self._execute, item) for item in self.items.values()]
+            try:
+                wait(futures)
+            except KeyboardInterrupt:
+                self.interrupted = True
+                self.cancel()
+                wait(futures)
+
+        for future in futures:
+            # Erros inesperados fora do executor
+            future.result()
+
+        return BatchSummary(
+            schema_name=self.schema_name,
+            items=list(self.items.values()),
+            elapsed=time.monotonic() - started
+        )
+
+    def cancel(self):
+        """Cancela as funções pendentes e interrompe no servidor as que estão executando."""
+        self._cancelled = True
+        with self._lock:
+            pids = [executor.backend_pid for executor in self._running.values()]
+
+        threads = [
+            threading.Thread(target=cancel_backend, args=(self.connection_info, pid), daemon=True)
+            for pid in pids if pid is not None
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    def _create_executor(self, name: str) -> FunctionExecutor:
+        """Cria o executor de um item; subclasses executam outras unidades."""
+        return FunctionExecutor(
+            self.connection_info,
+            self.schema_name,
+            name,
+            statement_timeout=self.statement_timeout,
+            statement_stats=self.statement_stats,
+            history=self.history
+        )
+
+    def _execute(self, item: BatchItemResult):
+        if self._cancelled:
+            item.status = STATUS_CANCELLED
+            return
+
+        item.status = STATUS_RUNNING
+        item.started_at = time.monotonic()
+        while True:
+            item.attempts += 1
+            item.findings = 0
+            executor = self._create_executor(item.function_name)
+            success = self._run_executor(item, executor)
+            if success or self._cancelled or item.attempts > self.retries or not executor.transient_error:
+                break
+            log_message(
+                f"Nova tentativa de {self.schema_name}.{item.function_name} "
+                f"({item.attempts}/{self.retries}): {executor.error_message}",
+                LogLevel.WARNING
+            )
+
+        item.finished_at = time.monotonic()
+        item.row_count = executor.row_count
+        item.cache_hit = executor.cache_hit
+        item.statement_report = executor.statement_report
+        item.regression = executor.regression
+        if success:
+            item.status = STATUS_SUCCESS
+        elif self._cancelled:
+            item.status = STATUS_CANCELLED
+        else:
+            item.status = STATUS_ERROR
+            item.timed_out = executor.timed_out
+            item.error_message = executor.error_message or "Erro desconhecido"
+
+        if self.on_item_finished is not None:
+            self.on_item_finished(item)
+
+    def _run_executor(self, item: BatchItemResult, executor: FunctionExecutor) -> bool:
+        executor.is_canceled = lambda: self._cancelled
+        if self.notice_callback is not None:
+            executor.notice_callback = lambda message: self.notice_callback(item.function_name, message)
+
+        def consume(offset: int, rows: list):
+            item.findings += count_findings(rows)
+
+        executor.add_chunk_consumer(consume)
+
+        with self._lock:
+            self._running[item.key] = executor
+        try:
+            return executor.execute()
+        finally:
+            with self._lock:
+                self._running.pop(item.key, None)
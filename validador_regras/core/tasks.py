@@ -0,0 +1,469 @@
+"""
+/***************************************************************************
+ Validador de Regras PostGis
+                                 A QGIS plugin
+ 2ºCGEO
+                              -------------------
+        begin                : 2025-07-16
+        git sha              : $Format:%H$
+        copyright            : (C) 2025 by Godinho, Alvarez, Perrut
+        email                : estevezcodando@gmail.com
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+"""
+import threading
+import time
+from typing import Dict, List, Optional
+
+from qgis.core import QgsTask
+from PyQt5.QtCore import QObject, QTimer, pyqtSignal
+
+
+# Classes que dependem do QGIS/Qt. O restante do núcleo não importa este
+# módulo, de modo que pode ser usado fora do QGIS (ver cli.py).
+from .logger import log_message, LogLevel
+from .backend_cancellation import cancel_backend
+from .catalog_cache import CatalogService
+from .csv_export import CsvExporter, list_review_tables
+from .database_service import DatabaseConnectionService, FunctionService
+from .function_executor import FunctionExecutor
+from .incremental_validation import IncrementalExecutor
+from .layer_export import LayerExporter, export_layers
+from .metrics import STAGE_DURATION
+from .plan_profile import ProfileExecutor
+from .preflight import PreflightAdvisor, PreflightIssue
+from .tiled_execution import TilePlanner
+from .tracing import get_tracer
+
+
+class BackendCanceller(QObject):
+    """
+    Executa ``cancel_backend`` numa thread própria.
+    Responsabilidade única: confirmar o cancelamento no servidor sem depender
+    de vagas no gerenciador de tasks do QGIS (que podem estar todas ocupadas
+    pelas próprias execuções a cancelar).
+    """
+
+    # (confirmado pelo servidor, mensagem)
+    finished = pyqtSignal(bool, str)
+
+    def __init__(self, connection_info: Dict[str, str], pid: int, parent=None):
+        super().__init__(parent)
+        self.connection_info = connection_info
+        self.pid = pid
+        self.confirmed = None
+        self.message = None
+
+    @property
+    def is_pending(self) -> bool:
+        return self.confirmed is None
+
+    def start(self):
+        threading.Thread(target=self._run, name=f"cancel-backend-{self.pid}", daemon=True).start()
+
+    def _run(self):
+        try:
+            confirmed, message = cancel_backend(self.connection_info, self.pid)
+        except Exception as e:
+            confirmed, message = False, f"Erro ao cancelar backend {self.pid}: {e}"
+
+        log_message(message, LogLevel.INFO if confirmed else LogLevel.CRITICAL)
+        self.confirmed = confirmed
+        self.message = message
+        # Emitido fora da thread principal: entregue por conexão enfileirada
+        self.finished.emit(confirmed, message)
+
+
+class FunctionExecutionTask(QgsTask):
+    """
+    Task para execução de funções em background.
+    Responsabilidade única: executar funções sem bloquear a interface.
+    
+    A execução em si fica a cargo de um ``FunctionExecutor`` (classe em
+    ``executor_class``), cujos atributos (``row_count``, ``preview_rows``,
+    ``error_message``, ``elapsed``...) ficam acessíveis pela própria task.
+    Cada bloco lido também sai pelo sinal ``chunkReady`` (na thread da
+    interface); consumidores registrados com ``add_chunk_consumer`` rodam na
+    thread da task.
+    
+    Progresso: mensagens ``RAISE NOTICE 'progress: %/% %', feitos, total,
+    descrição`` emitidas pela função são capturadas enquanto ela executa e
+    alimentam ``setProgress`` e o sinal ``ruleProgress``; as demais mensagens
+    NOTICE saem pelo sinal ``noticeReceived``. Funções que não emitem nada
+    continuam funcionando, apenas sem progresso determinado.
+    
+    Cancelamento: ``cancel()`` interrompe a consulta no servidor
+    (``pg_cancel_backend``/``pg_terminate_backend`` pelo PID registrado em
+    ``backend_pid``) através de ``server_canceller``, cujo sinal ``finished``
+    informa quando o servidor confirmou que a consulta terminou.
+    """
+    
+    PREVIEW_LIMIT = FunctionExecutor.PREVIEW_LIMIT
+    executor_class = FunctionExecutor
+    
+    # (índice da primeira linha do bloco, linhas do bloco)
+    chunkReady = pyqtSignal(int, list)
+    # (feitos, total, descrição da regra)
+    ruleProgress = pyqtSignal(int, int, str)
+    noticeReceived = pyqtSignal(str)
+    
+    def __init__(self, connection_info: Dict[str, str], schema_name: str, function_name: str, **kwargs):
+        """
+        Args:
+            connection_info: Informações da conexão
+            schema_name: Schema da função
+            function_name: Nome da função
+            **kwargs: Demais argumentos de ``executor_class`` (parameters,
+                chunk_size, bbox, statement_timeout, cache, force_refresh...)
+        """
+        super().__init__(f"Executando função {schema_name}.{function_name}", QgsTask.CanCancel)
+        self.server_canceller = None
+        self.created_at = time.monotonic()
+        self.executor = self.executor_class(connection_info, schema_name, function_name, **kwargs)
+        self.executor.is_canceled = self.isCanceled
+        self.executor.notice_callback = self.noticeReceived.emit
+        self.executor.progress_callback = self._on_progress
+        self.executor.add_chunk_consumer(self.chunkReady.emit)
+    
+    def __getattr__(self, name):
+        # Estado da execução: row_count, preview_rows, error_message, elapsed...
+        executor = self.__dict__.get('executor')
+        if executor is None:
+            raise AttributeError(name)
+        return getattr(executor, name)
+    
+    @property
+    def server_cancel_pending(self) -> bool:
+        """True enquanto o servidor não confirmou o cancelamento pedido."""
+        return self.server_canceller is not None and self.server_canceller.is_pending
+    
+    def cancel(self):
+        """
+        Cancela a task e, se a consulta já estiver no servidor, interrompe o
+        backend por uma conexão de controle separada.
+        """
+        super().cancel()
+        pid = self.executor.backend_pid
+        if pid is not None and self.server_canceller is None:
+            self.server_canceller = BackendCanceller(self.executor.connection_info, pid)
+            # Inicia no próximo ciclo de eventos para que quem chamou cancel()
+            # possa conectar-se ao sinal finished antes da confirmação
+            QTimer.singleShot(0, self.server_canceller.start)
+    
+    def run(self) -> bool:
+        # Espera por uma vaga no gerenciador de tasks do QGIS
+        started = time.monotonic()
+        STAGE_DURATION.observe(started - self.created_at, stage="queue")
+        get_tracer().async_span("queue", "task", self.created_at, started, task=self.description())
+        with get_tracer().span(self.description(), "task"):
+            return self.executor.execute()
+    
+    def _on_progress(self, percent: int, done: int, total: int, label: str):
+        self.setProgress(percent)
+        self.ruleProgress.emit(done, total, label)
+    
+    def finished(self, result: bool):
+        """
+        Callback chamado quando a task termina.
+        
+        Args:
+            result: True se executada com sucesso, False caso contrário
+        """
+        if result:
+            log_message(
+                f"Task de execução da função {self.schema_name}.{self.function_name} concluída",
+                LogLevel.INFO
+            )
+        else:
+            log_message(
+                f"Task de execução da função {self.schema_name}.{self.function_name} falhou: {self.error_message}",
+                LogLevel.CRITICAL
+            )
+
+
+class IncrementalExecutionTask(FunctionExecutionTask):
+    """
+    Task de validação incremental (ver ``IncrementalExecutor``).
+    Expõe ``full_run``, ``region``, ``change_count`` e ``purged`` do executor.
+    """
+
+    executor_class = IncrementalExecutor
+
+    def __init__(self, connection_info: Dict[str, str], schema_name: str, function_name: str, **kwargs):
+        super().__init__(connection_info, schema_name, function_name, **kwargs)
+        self.setDescription(f"Validação incremental de {schema_name}.{function_name}")
+
+
+class ProfileExecutionTask(FunctionExecutionTask):
+    """
+    Task de execução com perfil de planos (ver ``ProfileExecutor``).
+    Expõe ``profile`` e ``plan_diff`` do executor.
+    """
+
+    executor_class = ProfileExecutor
+
+    def __init__(self, connection_info: Dict[str, str], schema_name: str, function_name: str, **kwargs):
+        super().__init__(connection_info, schema_name, function_name, **kwargs)
+        self.setDescription(f"Perfil de execução de {schema_name}.{function_name}")
+
+
+class TilePlanningTask(QgsTask):
+    """
+    Task para calcular a grade de tiles em background.
+    """
+
+    def __init__(self, connection_info: Dict[str, str], schema_name: str, function_name: str, planner: TilePlanner):
+        super().__init__(f"Planejando tiles de {schema_name}.{function_name}", QgsTask.CanCancel)
+        self.connection_info = connection_info
+        self.schema_name = schema_name
+        self.function_name = function_name
+        self.planner = planner
+        self.plan = None
+        self.error_message = None
+
+    def run(self) -> bool:
+        try:
+            connection_service = DatabaseConnectionService()
+            with connection_service.connection(self.connection_info) as conn:
+                functions = FunctionService(connection_service).list_functions(conn, self.schema_name)
+                if not any(f['name'] == self.function_name and f['region_aware'] for f in functions):
+                    # Cada tile passa a área como primeiro argumento (geometry DEFAULT NULL)
+                    self.error_message = "A função não recebe a área de validação e não pode ser executada por tiles"
+                    return False
+                tables = self.planner.discover_tables(conn, self.schema_name, self.function_name)
+                if not tables:
+                    self.error_message = "Nenhuma tabela geométrica base/alvo encontrada para a função"
+                    return False
+                self.plan = self.planner.plan(conn, tables)
+
+            if self.plan is None:
+                self.error_message = "As tabelas base/alvo não têm feições"
+                return False
+            return True
+
+        except Exception as e:
+            self.error_message = str(e)
+            log_message(
+                f"Erro ao planejar tiles de {self.schema_name}.{self.function_name}: {e}",
+                LogLevel.CRITICAL
+            )
+            return False
+
+
+class PreflightTask(QgsTask):
+    """
+    Task da verificação prévia das tabelas base/alvo (índices, estatísticas e SRID).
+    """
+
+    def __init__(
+        self,
+        connection_info: Dict[str, str],
+        schema_name: str,
+        function_names: List[str],
+        advisor: PreflightAdvisor = None
+    ):
+        super().__init__(f"Verificando tabelas de {schema_name}", QgsTask.CanCancel)
+        self.connection_info = connection_info
+        self.schema_name = schema_name
+        self.function_names = list(function_names)
+        self.advisor = advisor or PreflightAdvisor()
+        self.tables = []
+        self.issues = []
+        self.error_message = None
+
+    def run(self) -> bool:
+        try:
+            with DatabaseConnectionService().connection(self.connection_info) as conn:
+                self.tables = self.advisor.discover_function_tables(conn, self.schema_name, self.function_names)
+                self.issues = self.advisor.inspect(conn, self.tables)
+                pairs = self.advisor.discover_pairs(conn, self.schema_name, self.tables)
+                self.issues += self.advisor.inspect_pairs(conn, self.schema_name, pairs)
+            return True
+        except Exception as e:
+            self.error_message = str(e)
+            log_message(f"Erro na verificação prévia de {self.schema_name}: {e}", LogLevel.WARNING)
+            return False
+
+
+class PreflightFixTask(QgsTask):
+    """
+    Task que cria os índices e executa os ANALYZE apontados pela verificação prévia.
+    """
+
+    def __init__(
+        self,
+        connection_info: Dict[str, str],
+        issues: List[PreflightIssue],
+        max_workers: int = 4,
+        advisor: PreflightAdvisor = None
+    ):
+        super().__init__("Corrigindo índices e estatísticas", QgsTask.Flags())
+        self.connection_info = connection_info
+        self.issues = list(issues)
+        self.max_workers = max_workers
+        self.advisor = advisor or PreflightAdvisor()
+        self.results = []
+        self.error_message = None
+
+    def run(self) -> bool:
+        try:
+            self.results = self.advisor.fix(self.connection_info, self.issues, self.max_workers)
+            return True
+        except Exception as e:
+            self.error_message = str(e)
+            return False
+
+
+class ReviewTablesTask(QgsTask):
+    """
+    Task que lista as tabelas de revisão (``aux_revisao_*``) de um schema.
+    """
+
+    def __init__(self, connection_info: Dict[str, str], schema_name: str):
+        super().__init__(f"Listando tabelas de revisão de {schema_name}", QgsTask.CanCancel)
+        self.connection_info = connection_info
+        self.schema_name = schema_name
+        self.tables = []
+        self.error_message = None
+
+    def run(self) -> bool:
+        try:
+            with DatabaseConnectionService().connection(self.connection_info) as conn:
+                self.tables = list_review_tables(conn, self.schema_name)
+            return True
+        except Exception as e:
+            self.error_message = str(e)
+            return False
+
+
+class CsvExportTask(QgsTask):
+    """
+    Task de exportação de uma tabela de revisão para CSV (ver ``CsvExporter``).
+
+    O sinal ``exportProgress`` (bytes recebidos, linhas escritas, linhas
+    estimadas) é entregue na thread da interface; ``cancel()`` interrompe o
+    COPY no servidor e remove o arquivo parcial.
+    """
+
+    # (bytes, linhas, linhas estimadas)
+    exportProgress = pyqtSignal(int, int, int)
+
+    def __init__(self, connection_info: Dict[str, str], schema_name: str, table_name: str, file_path: str, **kwargs):
+        """
+        Args:
+            connection_info: Informações da conexão
+            schema_name: Schema da tabela
+            table_name: Tabela a exportar
+            file_path: Arquivo de destino
+            **kwargs: Demais argumentos de ``CsvExporter`` (compression, compression_level)
+        """
+        super().__init__(f"Exportando {schema_name}.{table_name}", QgsTask.CanCancel)
+        self.exporter = CsvExporter(connection_info, schema_name, table_name, file_path, **kwargs)
+        self.exporter.is_canceled = self.isCanceled
+        self.exporter.progress_callback = self._on_progress
+
+    def __getattr__(self, name):
+        # Estado da exportação: rows_written, bytes_read, error_message, elapsed...
+        exporter = self.__dict__.get('exporter')
+        if exporter is None:
+            raise AttributeError(name)
+        return getattr(exporter, name)
+
+    def run(self) -> bool:
+        return self.exporter.export()
+
+    def _on_progress(self, num_bytes: int, rows: int, estimated: int):
+        if estimated > 0:
+            self.setProgress(min(99.0, 100.0 * rows / estimated))
+        self.exportProgress.emit(num_bytes, rows, estimated)
+
+
+class LayerExportTask(QgsTask):
+    """
+    Task de exportação de camadas de erro para GeoPackage/GeoParquet
+    (ver ``LayerExporter``), várias em paralelo.
+
+    O sinal ``exportProgress`` (linhas gravadas, linhas estimadas) soma as
+    camadas e é entregue na thread da interface; ``cancel()`` interrompe as
+    exportações no próximo bloco e remove os arquivos parciais.
+    """
+
+    # (linhas, linhas estimadas)
+    exportProgress = pyqtSignal(int, int)
+
+    def __init__(self, exporters: List[LayerExporter], max_workers: int = 4):
+        super().__init__(f"Exportando {len(exporters)} camada(s)", QgsTask.CanCancel)
+        self.exporters = list(exporters)
+        self.max_workers = max_workers
+        self.results = []
+        self.error_message = None
+        self._lock = threading.Lock()
+        for exporter in self.exporters:
+            exporter.is_canceled = self.isCanceled
+            exporter.progress_callback = self._on_progress
+
+    def run(self) -> bool:
+        try:
+            self.results = export_layers(self.exporters, self.max_workers)
+        except Exception as e:
+            self.error_message = str(e)
+            return False
+        return all(self.results)
+
+    def _on_progress(self, rows: int, estimated: int):
+        # Chamado pelas threads das exportações
+        with self._lock:
+            done = sum(exporter.rows_written for exporter in self.exporters)
+            total = sum(exporter.estimated_rows for exporter in self.exporters)
+            if total > 0:
+                self.setProgress(min(99.0, 100.0 * done / total))
+            self.exportProgress.emit(done, total)
+
+
+class CatalogRefreshTask(QgsTask):
+    """
+    Task de leitura/revalidação do catálogo em segundo plano.
+    Com ``schema_name`` lê as funções do schema; sem ele, os schemas.
+    """
+
+    def __init__(
+        self,
+        catalog_service: CatalogService,
+        connection_info: Dict[str, str],
+        schema_name: Optional[str] = None,
+        timeout: float = None
+    ):
+        target = f"funções de {schema_name}" if schema_name else "schemas"
+        super().__init__(f"Atualizando {target} ({connection_info.get('name')})", QgsTask.CanCancel)
+        self.catalog_service = catalog_service
+        self.connection_info = connection_info
+        self.schema_name = schema_name
+        self.timeout = timeout
+        self.items = None
+        self.changed = False
+        self.error_message = None
+        self.created_at = time.monotonic()
+
+    def run(self) -> bool:
+        get_tracer().async_span("queue", "task", self.created_at, task=self.description())
+        try:
+            if self.schema_name is None:
+                self.items, self.changed = self.catalog_service.refresh_schemas(
+                    self.connection_info, self.timeout
+                )
+            else:
+                self.items, self.changed = self.catalog_service.refresh_functions(
+                    self.connection_info, self.schema_name, self.timeout
+                )
+            return True
+        except Exception as e:
+            self.error_message = str(e)
+            return False
@@ -0,0 +1,268 @@
+"""
+/***************************************************************************
+ Validador de Regras PostGis
+                                 A QGIS plugin
+ 2ºCGEO
+                              -------------------
+        begin                : 2025-07-16
+        git sha              : $Format:%H$
+        copyright            : (C) 2025 by Godinho, Alvarez, Perrut
+        email                : estevezcodando@gmail.com
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+"""
+import math
+from dataclasses import dataclass, field
+from typing import List, Optional, Tuple
+
+from . import lazy_getattr
+from .dbapi import sql
+from .logger import log_message, LogLevel
+from .srid_harmonization import SHADOW_COLUMN_REGEX
+
+
+@dataclass
+class Tile:
+    """
+    Retângulo de execução de uma validação por tiles.
+    """
+    xmin: float
+    ymin: float
+    xmax: float
+    ymax: float
+    depth: int = 0
+
+    def split(self) -> List['Tile']:
+        """Divide o tile em quatro quadrantes."""
+        xmid = (self.xmin + self.xmax) / 2
+        ymid = (self.ymin + self.ymax) / 2
+        depth = self.depth + 1
+        return [
+            Tile(self.xmin, self.ymin, xmid, ymid, depth),
+            Tile(xmid, self.ymin, self.xmax, ymid, depth),
+            Tile(self.xmin, ymid, xmid, self.ymax, depth),
+            Tile(xmid, ymid, self.xmax, self.ymax, depth),
+        ]
+
+    def label(self) -> str:
+        return f"[{self.xmin:.4f}, {self.ymin:.4f}, {self.xmax:.4f}, {self.ymax:.4f}]"
+
+
+@dataclass
+class TilePlan:
+    """
+    Grade de tiles calculada para uma validação.
+    """
+    srid: int
+    tiles: List[Tile] = field(default_factory=list)
+    tables: List[Tuple[str, str, str]] = field(default_factory=list)
+    feature_count: int = 0
+    # Feições fora de todos os tiles no momento do planejamento
+    uncovered_features: int = 0
+
+
+class TilePlanner:
+    """
+    Calcula a grade de tiles de uma validação.
+    Responsabilidade única: derivar extensão, SRID e densidade das tabelas
+    base/alvo e dividi-las em tiles com quantidade de feições semelhante.
+    """
+
+    RULES_TABLE_PATTERN = "spatial_rules%"
+
+    def __init__(self, target_features_per_tile: int = 50000, max_tiles: int = 256):
+        self.target_features_per_tile = max(1, target_features_per_tile)
+        self.max_tiles = max(1, max_tiles)
+
+    def discover_tables(self, conn, schema_name: str, function_name: str) -> List[Tuple[str, str, str]]:
+        """
+        Descobre as tabelas geométricas usadas por uma validação.
+
+        Usa as colunas base/alvo das tabelas de regras do schema
+        (``spatial_rules*``); se não houver, procura no código da função os
+        nomes das tabelas geométricas do schema. Colunas-sombra
+        (``<geom>_srid<SRID>``) não entram.
+
+        Returns:
+            Lista de (schema, tabela, coluna geométrica)
+        """
+        with conn.cursor() as cur:
+            cur.execute(
+                """
+                SELECT table_name
+                FROM information_schema.tables
+                WHERE table_schema = %s AND table_name LIKE %s
+                ORDER BY table_name
+                """,
+                (schema_name, self.RULES_TABLE_PATTERN)
+            )
+            rule_tables = [row[0] for row in cur.fetchall()]
+
+            names = set()
+            for rule_table in rule_tables:
+                cur.execute(
+                    sql.SQL("SELECT DISTINCT base FROM {0}.{1} UNION SELECT DISTINCT alvo FROM {0}.{1}").format(
+                        sql.Identifier(schema_name), sql.Identifier(rule_table)
+                    )
+                )
+                names.update(row[0] for row in cur.fetchall() if row[0])
+
+            if names:
+                cur.execute(
+                    """
+                    SELECT f_table_schema, f_table_name, f_geometry_column
+                    FROM geometry_columns
+                    WHERE f_table_schema = %s AND f_table_name = ANY(%s)
+                      AND f_geometry_column !~ %s
+                    """,
+                    (schema_name, list(names), SHADOW_COLUMN_REGEX)
+                )
+            else:
+                cur.execute(
+                    """
+                    SELECT g.f_table_schema, g.f_table_name, g.f_geometry_column
+                    FROM geometry_columns g
+                    JOIN pg_proc p ON p.proname = %s
+                    JOIN pg_namespace n ON n.oid = p.pronamespace AND n.nspname = %s
+                    WHERE g.f_table_schema = %s
+                      AND position(lower(g.f_table_name) IN lower(p.prosrc)) > 0
+                      AND g.f_geometry_column !~ %s
+                    """,
+                    (function_name, schema_name, schema_name, SHADOW_COLUMN_REGEX)
+                )
+            return sorted(set(cur.fetchall()))
+
+    def plan(self, conn, tables: List[Tuple[str, str, str]]) -> Optional[TilePlan]:
+        """
+        Calcula a grade a partir da extensão exata (ST_Extent) e da contagem
+        das tabelas.
+
+        A extensão é lida dos dados, não de ST_EstimatedExtent: a estimativa
+        vem da amostra do último ANALYZE e deixa de fora as feições extremas ou
+        inseridas depois dele, que não cairiam em nenhum tile. Tabelas em outro
+        SRID entram transformadas para o SRID da grade. Montada a grade, as
+        feições fora dela são contadas em ``uncovered_features`` (deve ser zero).
+
+        Args:
+            conn: Conexão psycopg2
+            tables: Lista de (schema, tabela, coluna geométrica)
+
+        Returns:
+            TilePlan ou None se as tabelas não têm feições
+        """
+        xmin = ymin = math.inf
+        xmax = ymax = -math.inf
+        srid = None
+        features = 0
+        sources = []
+
+        with conn.cursor() as cur:
+            for schema_name, table_name, geom_column in tables:
+                cur.execute("SELECT Find_SRID(%s, %s, %s)", (schema_name, table_name, geom_column))
+                table_srid = cur.fetchone()[0]
+                geom = sql.Identifier(geom_column)
+                if srid is None:
+                    srid = table_srid
+                elif table_srid != srid:
+                    log_message(
+                        f"{schema_name}.{table_name} usa SRID {table_srid}, diferente de {srid}; "
+                        f"a extensão é transformada para o SRID {srid}",
+                        LogLevel.WARNING
+                    )
+                    geom = sql.SQL("ST_Transform({}, {})").format(geom, sql.Literal(srid))
+                source = sql.SQL("{}.{}").format(sql.Identifier(schema_name), sql.Identifier(table_name))
+                sources.append((source, geom, sql.Identifier(geom_column)))
+
+                cur.execute(
+                    sql.SQL(
+                        "SELECT ST_XMin(e), ST_YMin(e), ST_XMax(e), ST_YMax(e), n "
+                        "FROM (SELECT ST_Extent({}) AS e, count({}) AS n FROM {}) s"
+                    ).format(geom, sql.Identifier(geom_column), source)
+                )
+                row = cur.fetchone()
+                if row[0] is None:
+                    log_message(f"{schema_name}.{table_name} não tem feições", LogLevel.WARNING)
+                    continue
+
+                xmin, ymin = min(xmin, row[0]), min(ymin, row[1])
+                xmax, ymax = max(xmax, row[2]), max(ymax, row[3])
+                features += row[4]
+
+            if not features:
+                return None
+
+            # As bordas máximas dos tiles são excluídas: folga para a feição no limite da extensão
+            margin = 1e-9 * max(xmax - xmin, ymax - ymin, 1.0)
+            plan = TilePlan(srid=srid, tables=list(tables), feature_count=features)
+            plan.tiles = self._grid(Tile(xmin, ymin, xmax + margin, ymax + margin), features)
+
+            # Soma dos tiles x total: feições (não vazias) cujo retângulo não cabe na grade
+            for source, geom, column in sources:
+                cur.execute(
+                    sql.SQL(
+                        "SELECT count(*) FROM {} WHERE NOT ST_IsEmpty({column}) "
+                        "AND NOT ({geom} @ ST_MakeEnvelope(%s, %s, %s, %s, %s))"
+                    ).format(source, column=column, geom=geom),
+                    (xmin, ymin, xmax + margin, ymax + margin, srid)
+                )
+                plan.uncovered_features += cur.fetchone()[0]
+
+        if plan.uncovered_features:
+            log_message(
+                f"{plan.uncovered_features} feição(ões) fora da grade de tiles (inseridas durante o "
+                f"planejamento?): não serão validadas nesta execução",
+                LogLevel.WARNING
+            )
+        return plan
+
+    def _grid(self, extent: Tile, features: int) -> List[Tile]:
+        count = min(self.max_tiles, max(1, math.ceil(features / self.target_features_per_tile)))
+        width = max(extent.xmax - extent.xmin, 1e-9)
+        height = max(extent.ymax - extent.ymin, 1e-9)
+
+        # Mantém os tiles aproximadamente quadrados, sem passar de ``count`` tiles
+        cols = min(count, max(1, round(math.sqrt(count * width / height))))
+        rows = max(1, count // cols)
+        step_x = width / cols
+        step_y = height / rows
+
+        tiles = []
+        for row in range(rows):
+            for col in range(cols):
+                tiles.append(Tile(
+                    extent.xmin + col * step_x,
+                    extent.ymin + row * step_y,
+                    extent.xmin + (col + 1) * step_x if col < cols - 1 else extent.xmax,
+                    extent.ymin + (row + 1) * step_y if row < rows - 1 else extent.ymax,
+                ))
+        return tiles
+
+
+@dataclass
+class TiledExecutionSummary:
+    """
+    Resumo de uma execução por tiles.
+    """
+    schema_name: str
+    function_name: str
+    tiles_total: int = 0
+    tiles_succeeded: int = 0
+    tiles_failed: int = 0
+    tiles_split: int = 0
+    row_count: int = 0
+    preview_rows: List[tuple] = field(default_factory=list)
+    errors: List[str] = field(default_factory=list)
+    cancelled: bool = False
+    elapsed: float = 0.0
+
+
+# Classes que dependem do QGIS/Qt, carregadas só quando pedidas
+__getattr__ = lazy_getattr(__name__, {'TilePlanningTask': '.tasks', 'TiledExecutionController': '.controllers'})
@@ -0,0 +1,172 @@
+"""
+/***************************************************************************
+ Validador de Regras PostGis
+                                 A QGIS plugin
+ 2ºCGEO
+                              -------------------
+        begin                : 2025-07-16
+        git sha              : $Format:%H$
+        copyright            : (C) 2025 by Godinho, Alvarez, Perrut
+        email                : estevezcodando@gmail.com
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+"""
+import itertools
+import json
+import os
+import threading
+import time
+from collections import deque
+from typing import Dict, Optional
+
+
+def _now() -> float:
+    # Mesmo relógio das métricas (time.monotonic), em microssegundos
+    return time.monotonic() * 1e6
+
+
+class _Span:
+    """Intervalo em andamento; registrado ao sair do bloco ``with``."""
+
+    __slots__ = ('_tracer', '_name', '_category', '_args', '_started')
+
+    def __init__(self, tracer: 'Tracer', name: str, category: str, args: Dict):
+        self._tracer = tracer
+        self._name = name
+        self._category = category
+        self._args = args
+        self._started = None
+
+    def __enter__(self):
+        self._started = _now()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if self._tracer.enabled:
+            if exc_type is not None:
+                self._args['error'] = exc_type.__name__
+            self._tracer._complete_us(self._name, self._category, self._started, _now(), self._args)
+        return False
+
+
+class Tracer:
+    """
+    Gravador de intervalos no formato Chrome Trace Event (JSON), aberto no
+    ``chrome://tracing`` e no Perfetto (ui.perfetto.dev).
+    Responsabilidade única: registrar, de qualquer thread, o que aconteceu e
+    quando (abertura do diálogo, catálogo, fila de tasks, execução,
+    tratamento do resultado, exibição do log), para ver numa só linha do
+    tempo a intercalação das threads, as esperas na fila e os travamentos
+    da thread da interface.
+
+    Desativado, ``span`` custa só a leitura do relógio. Os eventos ficam em
+    memória (no máximo ``max_events``; os mais antigos são descartados e
+    contados em ``dropped``) até ``write``.
+    """
+
+    def __init__(self, max_events: int = 500000):
+        self.enabled = False
+        self.dropped = 0
+        self._events = deque(maxlen=max_events)
+        self._lock = threading.Lock()
+        self._named_threads = set()
+        self._ids = itertools.count(1)
+        self._pid = os.getpid()
+
+    def enable(self):
+        self.enabled = True
+
+    def disable(self):
+        self.enabled = False
+
+    def clear(self):
+        with self._lock:
+            self._events.clear()
+            self._named_threads.clear()
+            self.dropped = 0
+
+    def _append(self, event: Dict):
+        tid = threading.get_native_id()
+        event['pid'] = self._pid
+        event['tid'] = tid
+        with self._lock:
+            if tid not in self._named_threads:
+                # Nome da thread na linha do tempo (MainThread é a da interface)
+                self._named_threads.add(tid)
+                self._events.append({
+                    'name': 'thread_name', 'ph': 'M', 'pid': self._pid, 'tid': tid,
+                    'args': {'name': threading.current_thread().name},
+                })
+            if len(self._events) == self._events.maxlen:
+                self.dropped += 1
+            self._events.append(event)
+
+    def _complete_us(self, name: str, category: str, started: float, finished: float, args: Dict):
+        self._append({
+            'name': name, 'cat': category, 'ph': 'X',
+            'ts': started, 'dur': max(0.0, finished - started), 'args': args,
+        })
+
+    def span(self, name: str, category: str = "plugin", **args) -> _Span:
+        """
+        Intervalo do bloco ``with`` na thread atual.
+
+        Args:
+            name: Nome exibido na linha do tempo
+            category: Categoria (filtro do visualizador): stage, task, function, ui...
+            **args: Detalhes exibidos ao selecionar o intervalo
+        """
+        return _Span(self, name, category, args)
+
+    def complete(self, name: str, category: str, started: float, finished: Optional[float] = None, **args):
+        """Registra um intervalo já medido na thread atual (instantes de ``time.monotonic``)."""
+        if self.enabled:
+            finished = time.monotonic() if finished is None else finished
+            self._complete_us(name, category, started * 1e6, finished * 1e6, args)
+
+    def async_span(self, name: str, category: str, started: float, finished: Optional[float] = None, **args):
+        """
+        Registra um intervalo que começa numa thread e termina noutra (a
+        espera de uma task na fila do gerenciador), numa trilha própria.
+        """
+        if not self.enabled:
+            return
+        finished = time.monotonic() if finished is None else finished
+        event_id = next(self._ids)
+        self._append({'name': name, 'cat': category, 'ph': 'b', 'id': event_id, 'ts': started * 1e6, 'args': args})
+        self._append({'name': name, 'cat': category, 'ph': 'e', 'id': event_id, 'ts': finished * 1e6})
+
+    def instant(self, name: str, category: str = "plugin", **args):
+        """Marca um instante na thread atual."""
+        if self.enabled:
+            self._append({'name': name, 'cat': category, 'ph': 'i', 's': 't', 'ts': _now(), 'args': args})
+
+    def write(self, path: str):
+        """Grava os eventos registrados até agora em ``path`` (de forma atômica)."""
+        with self._lock:
+            events = list(self._events)
+            dropped = self.dropped
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        temporary = f"{path}.{os.getpid()}.tmp"
+        with open(temporary, "w", encoding="utf-8") as f:
+            json.dump(
+                {'traceEvents': events, 'displayTimeUnit': 'ms', 'otherData': {'dropped_events': dropped}},
+                f, ensure_ascii=False, separators=(",", ":")
+            )
+        os.replace(temporary, path)
+
+
+_tracer = Tracer()
+
+
+def get_tracer() -> Tracer:
+    """Gravador de intervalos compartilhado pelo núcleo, pela interface e pela CLI."""
+    return _tracer
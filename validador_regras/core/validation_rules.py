@@ -19,8 +19,8 @@
  *                                                                         *
  ***************************************************************************/
 """
-import psycopg2
-from qgis.core import QgsMessageLog, Qgis
+from .dbapi import psycopg2
+from .logger import log_message, LogLevel
 
 from .interfaces import IValidationRule
 from .connection_config import ConnectionConfig
@@ -48,7 +48,7 @@ class DiscoverMuvdFunctionsRule(IValidationRule):
     ) -> bool:
         # 1. Log de início
         start_msg = f"Iniciando verificação de funções em 'muvd' para '{connection_config.name}'..."
-        if log_callback: log_callback(start_msg, Qgis.Info)
+        if log_callback: log_callback(start_msg, LogLevel.INFO)
 
         # 2. Monta string de conexão, usando atributo .database se existir
         dbname = getattr(connection_config, "database", connection_config.name)
@@ -71,8 +71,8 @@ class DiscoverMuvdFunctionsRule(IValidationRule):
                     )
                     if not cur.fetchone():
                         msg = "Schema 'muvd' não encontrado."
-                        QgsMessageLog.logMessage(msg, "ValidationRules", Qgis.Critical)
-                        if log_callback: log_callback(msg, Qgis.Critical)
+                        log_message(msg, LogLevel.CRITICAL, "ValidationRules")
+                        if log_callback: log_callback(msg, LogLevel.CRITICAL)
                         if progress_callback: progress_callback(0, "Schema não existe")
                         return False
 
@@ -89,8 +89,8 @@ class DiscoverMuvdFunctionsRule(IValidationRule):
             # 5. Trata caso sem funções
             if not self.last_functions:
                 msg = "Nenhuma função encontrada em 'muvd'."
-                QgsMessageLog.logMessage(msg, "ValidationRules", Qgis.Critical)
-                if log_callback: log_callback(msg, Qgis.Critical)
+                log_message(msg, LogLevel.CRITICAL, "ValidationRules")
+                if log_callback: log_callback(msg, LogLevel.CRITICAL)
                 if progress_callback: progress_callback(0, "Sem funções")
                 return False
 
@@ -99,26 +99,26 @@ class DiscoverMuvdFunctionsRule(IValidationRule):
             for idx, fn in enumerate(self.last_functions, start=1):
                 percent = int(idx * 100 / total)
                 if progress_callback: progress_callback(percent, fn)
-                if log_callback: log_callback(f"{idx}/{total}: função '{fn}' encontrada.", Qgis.Info)
+                if log_callback: log_callback(f"{idx}/{total}: função '{fn}' encontrada.", LogLevel.INFO)
 
             # 7. Conclusão com sucesso
             ok_msg = f"Listagem concluída: {total} funções encontradas em 'muvd'."
-            QgsMessageLog.logMessage(ok_msg, "ValidationRules", Qgis.Info)
-            if log_callback: log_callback(ok_msg, Qgis.Info)
+            log_message(ok_msg, LogLevel.INFO, "ValidationRules")
+            if log_callback: log_callback(ok_msg, LogLevel.INFO)
             if progress_callback: progress_callback(100, "Concluído")
             return True
 
         except psycopg2.OperationalError as e:
             err = f"Erro de conexão ao verificar 'muvd': {e}"
-            QgsMessageLog.logMessage(err, "ValidationRules", Qgis.Critical)
-            if log_callback: log_callback(err, Qgis.Critical)
+            log_message(err, LogLevel.CRITICAL, "ValidationRules")
+            if log_callback: log_callback(err, LogLevel.CRITICAL)
             if progress_callback: progress_callback(0, "Erro de Conexão")
             return False
 
         except Exception as e:
             err = f"Erro inesperado ao verificar funções MUVD: {e}"
-            QgsMessageLog.logMessage(err, "ValidationRules", Qgis.Critical)
-            if log_callback: log_callback(err, Qgis.Critical)
+            log_message(err, LogLevel.CRITICAL, "ValidationRules")
+            if log_callback: log_callback(err, LogLevel.CRITICAL)
             if progress_callback: progress_callback(0, "Erro Inesperado")
             return False
 
@@ -163,21 +163,21 @@ class ExecuteMuvdFunctionRule(IValidationRule):
 
             success = True
             msg = f"Função '{self.function_name}' executada com sucesso. Retorno: {result}"  
-            QgsMessageLog.logMessage(msg, "ValidationRules", Qgis.Info)
+            log_message(msg, LogLevel.INFO, "ValidationRules")
             if log_callback: log_callback(msg)
             if progress_callback: progress_callback(100, "Concluído")
             return success
 
         except psycopg2.OperationalError as e:
             err = f"Erro de conexão ao executar '{self.function_name}': {e}"
-            QgsMessageLog.logMessage(err, "ValidationRules", Qgis.Critical)
+            log_message(err, LogLevel.CRITICAL, "ValidationRules")
             if log_callback: log_callback(err)
             if progress_callback: progress_callback(0, "Erro de Conexão")
             return False
 
         except Exception as e:
             err = f"Erro ao executar '{self.function_name}': {e}"
-            QgsMessageLog.logMessage(err, "ValidationRules", Qgis.Critical)
+            log_message(err, LogLevel.CRITICAL, "ValidationRules")
             if log_callback: log_callback(err)
             if progress_callback: progress_callback(0, "Erro Inesperado")
             return False
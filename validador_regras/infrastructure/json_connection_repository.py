@@ -1,7 +1,7 @@
 import json
 from typing import List, Optional
-from qgis.core import QgsMessageLog, Qgis
 
+from ..core.logger import log_message, LogLevel
 from ..core.interfaces import IConnectionRepository
 from ..core.connection_config import ConnectionConfig
 
@@ -18,7 +18,10 @@ class JsonConnectionRepository(IConnectionRepository):
         except FileNotFoundError:
             return []
         except json.JSONDecodeError:
-            QgsMessageLog.logMessage(f'Erro ao decodificar JSON do arquivo de conexões: {self.file_path}', 'ConnectionManager', Qgis.Warning)
+            log_message(
+                f'Erro ao decodificar JSON do arquivo de conexões: {self.file_path}',
+                LogLevel.WARNING, 'ConnectionManager'
+            )
             return []
 
     def _save_connections(self):
@@ -0,0 +1,26 @@
+from typing import Dict, List
+
+from ..core.interfaces import ISettingsStore
+
+
+class MemorySettingsStore(ISettingsStore):
+    """Configurações em memória (processos sem QGIS: valores padrão ou definidos no código)."""
+
+    def __init__(self, values: Dict[str, object] = None):
+        self._values = dict(values or {})
+
+    def value(self, key: str, default=None):
+        return self._values.get(key, default)
+
+    def set_value(self, key: str, value):
+        self._values[key] = value
+
+    def child_groups(self, group: str) -> List[str]:
+        prefix = group.rstrip('/') + '/'
+        groups = []
+        for key in self._values:
+            if key.startswith(prefix):
+                rest = key[len(prefix):]
+                if '/' in rest:
+                    groups.append(rest.split('/', 1)[0])
+        return list(dict.fromkeys(groups))
@@ -1,6 +1,6 @@
 import psycopg2
-from qgis.core import QgsMessageLog, Qgis
 
+from ..core.logger import log_message, LogLevel
 from ..core.interfaces import IConnectionTester
 from ..core.connection_config import ConnectionConfig
 
@@ -9,13 +9,22 @@ class Psycopg2ConnectionTester(IConnectionTester):
         try:
             conn_str = f"host={config.host} port={config.port} user={config.user} password={config.password} dbname=postgres"
             with psycopg2.connect(conn_str, connect_timeout=5) as conn:
-                QgsMessageLog.logMessage(f"Conexão com \"{config.name}\" testada com sucesso.", "ConnectionManager", Qgis.Info)
+                log_message(
+                    f"Conexão com \"{config.name}\" testada com sucesso.",
+                    LogLevel.INFO, "ConnectionManager"
+                )
                 return True
         except psycopg2.OperationalError as e:
-            QgsMessageLog.logMessage(f"Erro ao testar conexão com \"{config.name}\": {e}", "ConnectionManager", Qgis.Critical)
+            log_message(
+                f"Erro ao testar conexão com \"{config.name}\": {e}",
+                LogLevel.CRITICAL, "ConnectionManager"
+            )
             return False
         except Exception as e:
-            QgsMessageLog.logMessage(f"Erro inesperado ao testar conexão com \"{config.name}\": {e}", "ConnectionManager", Qgis.Critical)
+            log_message(
+                f"Erro inesperado ao testar conexão com \"{config.name}\": {e}",
+                LogLevel.CRITICAL, "ConnectionManager"
+            )
             return False
 
 
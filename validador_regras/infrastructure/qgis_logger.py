@@ -0,0 +1,8 @@
+from qgis.core import QgsMessageLog, Qgis
+
+from ..core.interfaces import ILogger
+
+
+class QgisMessageLogger(ILogger):
+    def log(self, message: str, level: int, tag: str):
+        QgsMessageLog.logMessage(message, tag, Qgis.MessageLevel(int(level)))
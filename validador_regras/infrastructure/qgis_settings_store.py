@@ -0,0 +1,34 @@
+import threading
+from typing import List
+
+from qgis.core import QgsSettings
+
+from ..core.interfaces import ISettingsStore
+
+
+class QgisSettingsStore(ISettingsStore):
+    def __init__(self):
+        # Um QgsSettings por thread: o store é compartilhado pelo processo e
+        # beginGroup/endGroup alteram o estado do objeto
+        self._local = threading.local()
+
+    @property
+    def _settings(self) -> QgsSettings:
+        settings = getattr(self._local, 'settings', None)
+        if settings is None:
+            settings = self._local.settings = QgsSettings()
+        return settings
+
+    def value(self, key: str, default=None):
+        return self._settings.value(key, default)
+
+    def set_value(self, key: str, value):
+        self._settings.setValue(key, value)
+
+    def child_groups(self, group: str) -> List[str]:
+        settings = self._settings
+        settings.beginGroup(group)
+        try:
+            return settings.childGroups()
+        finally:
+            settings.endGroup()
@@ -0,0 +1,11 @@
+import logging
+
+from ..core.interfaces import ILogger
+
+# LogLevel (valores de Qgis.MessageLevel) -> nível do módulo logging
+_LEVELS = {0: logging.INFO, 1: logging.WARNING, 2: logging.ERROR, 3: logging.INFO}
+
+
+class StdlibLogger(ILogger):
+    def log(self, message: str, level: int, tag: str):
+        logging.getLogger(tag).log(_LEVELS.get(int(level), logging.INFO), message)
@@ -26,6 +26,8 @@ from qgis.core import QgsMessageLog, Qgis
 import os.path
 
 from .ui.main_dialog import MainDialog
+from .core.connection_pool import close_all_pools
+from .core.tracing import get_tracer
 import resources_rc
 
 class ValidadorRegrasPlugin:
@@ -167,6 +169,9 @@ class ValidadorRegrasPlugin:
             self.main_dialog.close()
             self.main_dialog = None
         
+        # Fecha as conexões mantidas pelos pools
+        close_all_pools()
+        
         QgsMessageLog.logMessage(
             "Plugin Validador de Regras PostGIS descarregado.", 
             "ValidadorRegras", 
@@ -178,12 +183,13 @@ class ValidadorRegrasPlugin:
         Executa o plugin.
         """
         try:
-            # Cria o diálogo se não existir
-            if self.main_dialog is None:
-                self.main_dialog = MainDialog()
-            
-            # Mostra o diálogo
-            self.main_dialog.show()
+            with get_tracer().span("dialog_open", "ui", created=self.main_dialog is None):
+                # Cria o diálogo se não existir
+                if self.main_dialog is None:
+                    self.main_dialog = MainDialog()
+                
+                # Mostra o diálogo
+                self.main_dialog.show()
             
             # Traz para frente
             self.main_dialog.raise_()
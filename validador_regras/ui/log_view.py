@@ -0,0 +1,108 @@
+"""
+/***************************************************************************
+ Validador de Regras PostGis
+                                 A QGIS plugin
+ 2ºCGEO
+                              -------------------
+        begin                : 2025-07-16
+        git sha              : $Format:%H$
+        copyright            : (C) 2025 by Godinho, Alvarez, Perrut
+        email                : estevezcodando@gmail.com
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+"""
+from typing import List
+
+from PyQt5.QtCore import QAbstractListModel, QModelIndex, QSortFilterProxyModel, Qt
+from PyQt5.QtGui import QBrush, QColor
+
+from ..core.log_buffer import LogRecord
+from ..core.logger import LogLevel
+
+
+class LogListModel(QAbstractListModel):
+    """
+    Modelo das mensagens do log, limitado a ``capacity`` linhas.
+    Responsabilidade única: guardar as últimas mensagens e formatar apenas as
+    linhas que a view pede (as visíveis), de modo que o custo de exibição não
+    cresce com o tamanho do log.
+    """
+
+    LevelRole = Qt.UserRole + 1
+
+    _COLORS = {
+        LogLevel.WARNING: QColor(176, 112, 0),
+        LogLevel.CRITICAL: QColor(192, 0, 0),
+    }
+
+    def __init__(self, capacity: int = 100000, parent=None):
+        super().__init__(parent)
+        self.capacity = capacity
+        self._records: List[LogRecord] = []
+
+    def rowCount(self, parent=QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self._records)
+
+    def data(self, index: QModelIndex, role: int = Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        record = self._records[index.row()]
+        if role == Qt.DisplayRole:
+            return record.format()
+        if role == Qt.ForegroundRole and record.level in self._COLORS:
+            return QBrush(self._COLORS[record.level])
+        if role == self.LevelRole:
+            return record.level
+        return None
+
+    def append_records(self, records: List[LogRecord]):
+        """Acrescenta um lote de mensagens, descartando as mais antigas além da capacidade."""
+        if not records:
+            return
+        records = records[-self.capacity:]
+        overflow = len(self._records) + len(records) - self.capacity
+        if overflow > 0:
+            self.beginRemoveRows(QModelIndex(), 0, overflow - 1)
+            del self._records[:overflow]
+            self.endRemoveRows()
+
+        first = len(self._records)
+        self.beginInsertRows(QModelIndex(), first, first + len(records) - 1)
+        self._records.extend(records)
+        self.endInsertRows()
+
+    def clear(self):
+        self.beginResetModel()
+        self._records = []
+        self.endResetModel()
+
+
+class LogLevelFilterModel(QSortFilterProxyModel):
+    """Mostra apenas as mensagens a partir de um nível (INFO, AVISO ou ERRO)."""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._minimum_level = LogLevel.INFO
+
+    def set_minimum_level(self, level: int):
+        self._minimum_level = level
+        self.invalidateFilter()
+
+    def filterAcceptsRow(self, source_row: int, source_parent: QModelIndex) -> bool:
+        if self._minimum_level <= LogLevel.INFO:
+            return True
+        level = self.sourceModel().index(source_row, 0, source_parent).data(LogListModel.LevelRole)
+        # SUCCESS é informativo
+        return level != LogLevel.SUCCESS and level >= self._minimum_level
+
+    def visible_text(self) -> str:
+        """Texto das linhas que passam pelo filtro, uma por linha."""
+        return "\n".join(self.index(row, 0).data() for row in range(self.rowCount()))
@@ -20,16 +20,34 @@
  ***************************************************************************/
 """
 import os
-from typing import Dict, List, Optional
-from PyQt5.QtWidgets import QDialog, QMessageBox, QApplication
+import sqlite3
+import time
+from typing import Dict, List, Optional, Tuple
+from PyQt5.QtWidgets import QDialog, QMessageBox, QApplication, QListWidgetItem, QFileDialog, QInputDialog
 from PyQt5.QtCore import QTimer, QDateTime, Qt
 from PyQt5 import uic
-from qgis.core import QgsMessageLog, Qgis, QgsApplication
+from qgis.core import QgsMessageLog, Qgis, QgsApplication, QgsSettings
 
 from .manage_connections_dialog import ManageConnectionsDialog
-from ..core.database_service import (
-    DatabaseConnectionService, SchemaService, FunctionService, FunctionExecutionTask
+from .log_view import LogListModel, LogLevelFilterModel
+from ..core.database_service import DatabaseConnectionService, SchemaService, FunctionService
+from ..core.tiled_execution import TilePlanner
+from ..core.result_cache import ResultCache
+from ..core.catalog_cache import CatalogCache, CatalogService
+from ..core.tasks import (
+    FunctionExecutionTask, IncrementalExecutionTask, TilePlanningTask, CatalogRefreshTask,
+    PreflightTask, PreflightFixTask, ReviewTablesTask, CsvExportTask, LayerExportTask, ProfileExecutionTask
 )
+from ..core.csv_export import zstd_available
+from ..core.layer_export import FORMAT_GPKG, FORMAT_PARQUET, LayerExporter, format_available
+from ..core.controllers import BatchExecutionController, TiledExecutionController
+from ..core.logger import LogLevel
+from ..core.log_buffer import LogBuffer, LogRecord, RotatingLogFile
+from ..core.metrics import get_registry, stage_timer
+from ..core.tracing import get_tracer
+from ..core.execution_history import ExecutionHistory
+from ..core.plan_profile import ProfileStore
+from ..core.statement_stats import StatementStatsCollector
 from PyQt5.QtGui import QIcon
 import resources_rc
 
@@ -39,6 +57,28 @@ class MainDialog(QDialog):
     Responsabilidade única: interface principal para execução de funções.
     """
     
+    BATCH_CONCURRENCY_KEY = "validador_regras/batch_max_concurrent"
+    TILE_TIME_BUDGET_KEY = "validador_regras/tile_time_budget_s"
+    TILE_TARGET_FEATURES_KEY = "validador_regras/tile_target_features"
+    INCREMENTAL_DISTANCE_KEY = "validador_regras/incremental_neighbour_distance"
+    PREFLIGHT_KEY = "validador_regras/preflight_enabled"
+    STATEMENT_STATS_KEY = "validador_regras/statement_stats_enabled"
+    STATEMENT_STATS_TOP_KEY = "validador_regras/statement_stats_top"
+    PLAN_PROFILE_KEY = "validador_regras/plan_profile_enabled"
+    LOG_LEVEL_KEY = "validador_regras/log_minimum_level"
+    LOG_FILE_KEY = "validador_regras/log_file_enabled"
+    # Linhas mantidas na view e intervalo de atualização do log (ms)
+    LOG_CAPACITY = 100000
+    LOG_FLUSH_INTERVAL = 100
+    # Arquivo .prom lido pelo coletor textfile do node exporter (vazio desativa)
+    METRICS_FILE_KEY = "validador_regras/metrics_textfile"
+    METRICS_INTERVAL = 15000
+    # Linha do tempo (Chrome Trace / Perfetto) gravada ao fim de cada execução (vazio desativa)
+    TRACE_FILE_KEY = "validador_regras/trace_file"
+    # Histórico SQLite das execuções (vazio desativa) e fator de lentidão que caracteriza regressão
+    HISTORY_FILE_KEY = "validador_regras/history_file"
+    REGRESSION_FACTOR_KEY = "validador_regras/regression_factor"
+    
     def __init__(self, parent=None):
         super().__init__(parent)
         
@@ -51,16 +91,70 @@ class MainDialog(QDialog):
         self.connection_service = DatabaseConnectionService()
         self.schema_service = SchemaService(self.connection_service)
         self.function_service = FunctionService(self.connection_service)
+        self.result_cache = ResultCache(
+            os.path.join(QgsApplication.qgisSettingsDirPath(), 'validador_regras', 'result_cache.json')
+        )
+        self.catalog_cache = CatalogCache(
+            os.path.join(QgsApplication.qgisSettingsDirPath(), 'validador_regras', 'catalog_cache.json')
+        )
+        self.catalog_service = CatalogService(
+            self.connection_service, self.schema_service, self.function_service, self.catalog_cache
+        )
         
         # Estado interno
         self.current_connection = None
         self.current_task = None
+        self.current_batch = None
+        self.current_tiled = None
+        self.planning_task = None
+        self.preflight_task = None
+        self.export_task = None
         self.start_time = None
+        self._awaiting_server_cancel = False
+        self._last_rule_label = None
+        # Última leitura de catálogo pedida por tipo ('schemas', 'functions')
+        self._catalog_requests = {}
         
         # Configura timer
         self.timer = QTimer(self)
         self.timer.timeout.connect(self._update_timer)
         
+        # Mensagens de log são acumuladas e exibidas em lotes
+        self.log_buffer = LogBuffer(self.LOG_CAPACITY)
+        self.log_file = None
+        self._log_dropped = 0
+        self.log_timer = QTimer(self)
+        self.log_timer.setInterval(self.LOG_FLUSH_INTERVAL)
+        self.log_timer.timeout.connect(self._flush_log)
+        
+        # Métricas de desempenho gravadas periodicamente em disco
+        self.metrics_path = QgsSettings().value(
+            self.METRICS_FILE_KEY,
+            os.path.join(QgsApplication.qgisSettingsDirPath(), 'validador_regras', 'metrics', 'validador_regras.prom')
+        )
+        self._metrics_generation = None
+        self.metrics_timer = QTimer(self)
+        self.metrics_timer.setInterval(self.METRICS_INTERVAL)
+        self.metrics_timer.timeout.connect(self._write_metrics)
+        if self.metrics_path:
+            self.metrics_timer.start()
+        
+        self.history = None
+        history_path = QgsSettings().value(
+            self.HISTORY_FILE_KEY, os.path.join(QgsApplication.qgisSettingsDirPath(), 'validador_regras', 'history.sqlite')
+        )
+        if history_path:
+            try:
+                self.history = ExecutionHistory(
+                    history_path, regression_factor=float(QgsSettings().value(self.REGRESSION_FACTOR_KEY, 3.0))
+                )
+            except (sqlite3.Error, OSError) as e:
+                QgsMessageLog.logMessage(f"Histórico de execuções desativado: {e}", "ValidadorRegras", Qgis.Warning)
+        
+        self.trace_path = QgsSettings().value(self.TRACE_FILE_KEY, "")
+        if self.trace_path:
+            get_tracer().enable()
+        
         # Configura interface
         self._setup_ui()
         
@@ -76,7 +170,34 @@ class MainDialog(QDialog):
         self.btnStop.setEnabled(False)
         self.progressBar.setVisible(False)
         
+        # Configura modo lote
+        self.lstFunctions.setVisible(False)
+        self.spnConcurrency.setValue(
+            int(QgsSettings().value(self.BATCH_CONCURRENCY_KEY, self.spnConcurrency.value()))
+        )
+        self.spnConcurrency.setEnabled(False)
+        self.chkPreflight.setChecked(
+            str(QgsSettings().value(self.PREFLIGHT_KEY, True)).lower() in ('true', '1')
+        )
+        self.chkStatementStats.setChecked(
+            str(QgsSettings().value(self.STATEMENT_STATS_KEY, False)).lower() in ('true', '1')
+        )
+        self.chkPlanProfile.setChecked(
+            str(QgsSettings().value(self.PLAN_PROFILE_KEY, False)).lower() in ('true', '1')
+        )
+        
         # Configura logs
+        self.log_model = LogListModel(self.LOG_CAPACITY, self)
+        self.log_filter = LogLevelFilterModel(self)
+        self.log_filter.setSourceModel(self.log_model)
+        self.lstLogs.setModel(self.log_filter)
+        self.cmbLogLevel.setCurrentIndex(int(QgsSettings().value(self.LOG_LEVEL_KEY, 0)))
+        self.log_filter.set_minimum_level(self.cmbLogLevel.currentIndex())
+        if str(QgsSettings().value(self.LOG_FILE_KEY, True)).lower() in ('true', '1'):
+            self.log_file = RotatingLogFile(
+                os.path.join(QgsApplication.qgisSettingsDirPath(), 'validador_regras', 'logs', 'validador.log')
+            )
+        self.log_timer.start()
         
         # Log inicial
         self._log("Plugin Validador de Regras PostGIS iniciado.", Qgis.Info)
@@ -91,12 +212,28 @@ class MainDialog(QDialog):
         self.cmbSchema.currentIndexChanged.connect(self._on_schema_changed)
         self.cmbFunction.currentIndexChanged.connect(self._on_function_changed)
         
+        # Modo lote
+        self.chkBatchMode.toggled.connect(self._on_batch_mode_toggled)
+        self.chkTiledMode.toggled.connect(self._on_tiled_mode_toggled)
+        self.chkIncrementalMode.toggled.connect(self._on_incremental_mode_toggled)
+        self.spnConcurrency.valueChanged.connect(self._on_concurrency_changed)
+        self.chkPreflight.toggled.connect(
+            lambda checked: QgsSettings().setValue(self.PREFLIGHT_KEY, checked)
+        )
+        self.chkStatementStats.toggled.connect(
+            lambda checked: QgsSettings().setValue(self.STATEMENT_STATS_KEY, checked)
+        )
+        self.chkPlanProfile.toggled.connect(
+            lambda checked: QgsSettings().setValue(self.PLAN_PROFILE_KEY, checked)
+        )
+        
         # Execução
         self.btnPlay.clicked.connect(self._execute_function)
         self.btnStop.clicked.connect(self._stop_execution)
         
         # Logs
         self.btnClearLog.clicked.connect(self._clear_log)
+        self.cmbLogLevel.currentIndexChanged.connect(self._on_log_level_changed)
         self.btnCopyLog.clicked.connect(self._copy_log)
         self.btnExportCsv.clicked.connect(self._export_csv)
         self.btnTutorial.clicked.connect(self._open_tutorial)
@@ -129,11 +266,13 @@ class MainDialog(QDialog):
         
         if current_data is None:
             self.current_connection = None
+            self._cancel_catalog_requests()
             self._clear_connection_info()
             self._clear_schemas()
             return
         
         self.current_connection = current_data
+        self.connection_service.warm_up(current_data)
         self._update_connection_info()
         self._load_schemas()
     
@@ -151,27 +290,47 @@ class MainDialog(QDialog):
         self.lblHostValue.setText("N/A")
     
     def _load_schemas(self):
-        """Carrega os schemas da conexão atual."""
+        """
+        Carrega os schemas da conexão atual em segundo plano.
+        
+        Se houver lista em cache, ela é exibida de imediato e apenas
+        revalidada; a resposta da task substitui a lista só se mudou.
+        """
+        self._cancel_catalog_requests()
         if not self.current_connection:
             self._clear_schemas()
             return
         
-        self._log(f"Carregando schemas da conexão '{self.current_connection['name']}'...", Qgis.Info)
+        cached = self.catalog_cache.get_schemas(self.current_connection)
+        if cached is not None:
+            self._populate_schemas(cached[1])
+        else:
+            self._clear_schemas()
+            self._log(f"Carregando schemas da conexão '{self.current_connection['name']}'...", Qgis.Info)
+        self._request_catalog()
+    
+    def _populate_schemas(self, schemas: List[str], keep_selection: bool = False):
+        """
+        Preenche a lista de schemas.
         
-        schemas = self.schema_service.get_schemas(self.current_connection)
+        Args:
+            schemas: Nomes dos schemas
+            keep_selection: Mantém o schema selecionado (revalidação do cache)
+        """
+        previous = self.cmbSchema.currentData() if keep_selection else None
         
+        self.cmbSchema.blockSignals(True)
         self.cmbSchema.clear()
         self.cmbSchema.addItem("Selecione um schema", None)
-        
         for schema in schemas:
             self.cmbSchema.addItem(schema, schema)
+        self.cmbSchema.setCurrentIndex(max(self.cmbSchema.findData(previous), 0) if previous else 0)
+        self.cmbSchema.blockSignals(False)
         
-        if schemas:
-            self._log(f"Carregados {len(schemas)} schemas.", Qgis.Info)
-        else:
-            self._log("Nenhum schema encontrado ou erro ao carregar schemas.", Qgis.Warning)
-        
-        self._clear_functions()
+        if not keep_selection:
+            self._clear_functions()
+        elif self.cmbSchema.currentData() != previous:
+            self._on_schema_changed()
     
     def _clear_schemas(self):
         """Limpa a lista de schemas."""
@@ -184,6 +343,9 @@ class MainDialog(QDialog):
         schema_name = self.cmbSchema.currentData()
         
         if schema_name is None:
+            request = self._catalog_requests.pop('functions', None)
+            if request is not None:
+                request.cancel()
             self._clear_functions()
             return
         
@@ -191,35 +353,136 @@ class MainDialog(QDialog):
     
     def _load_functions(self, schema_name: str):
         """
-        Carrega as funções do schema selecionado, filtrando as que não possuem parâmetros.
+        Carrega em segundo plano as funções do schema selecionado, filtrando
+        as que não possuem parâmetros. Como os schemas, usa o cache de
+        catálogo e revalida a lista.
         """
         if not self.current_connection:
             self._clear_functions()
             return
         
-        self._log(f"Carregando funções do schema '{schema_name}'...", Qgis.Info)
+        cached = self.catalog_cache.get_functions(self.current_connection, schema_name)
+        if cached is not None:
+            self._populate_functions(cached[1])
+        else:
+            self._clear_functions()
+            self._log(f"Carregando funções do schema '{schema_name}'...", Qgis.Info)
+        self._request_catalog(schema_name)
+    
+    def _populate_functions(self, functions: List[Dict], keep_selection: bool = False):
+        """
+        Preenche a lista de funções (combo e lista do modo lote).
         
-        # get_functions já retorna apenas funções sem parâmetros
-        functions = self.function_service.get_functions(self.current_connection, schema_name)
+        Args:
+            functions: Funções retornadas por FunctionService
+            keep_selection: Mantém a função selecionada e as marcadas no modo lote
+        """
+        previous = self.cmbFunction.currentData() if keep_selection else None
+        checked = set(self._checked_batch_functions()) if keep_selection else set()
         
+        self.cmbFunction.blockSignals(keep_selection)
         self.cmbFunction.clear()
+        self.lstFunctions.clear()
         if functions:
             for function in functions:
-                display_name = f"{function['name']} -> {function['return_type']}"
+                display_name = f"{function['name']}({function['signature']}) -> {function['return_type']}"
+                if function['region_aware']:
+                    display_name += " [área]"
                 self.cmbFunction.addItem(display_name, function)
-            self._log(f"Carregadas {len(functions)} funções sem parâmetros.", Qgis.Info)
+                if previous and function['oid'] == previous['oid']:
+                    self.cmbFunction.setCurrentIndex(self.cmbFunction.count() - 1)
+                
+                item = QListWidgetItem(display_name)
+                item.setData(Qt.UserRole, function)
+                item.setFlags(item.flags() | Qt.ItemIsUserCheckable)
+                checked_key = (function['name'], function['signature'])
+                item.setCheckState(Qt.Checked if checked_key in checked else Qt.Unchecked)
+                self.lstFunctions.addItem(item)
         else:
             self.cmbFunction.addItem("Nenhuma função sem parâmetros encontrada", None)
-            self._log("Nenhuma função sem parâmetros encontrada ou erro ao carregar funções.", Qgis.Warning)
+        self.cmbFunction.blockSignals(False)
+        # A atualização pode chegar durante uma execução (Play desabilitado)
+        self._update_region_modes_enabled(executing=not self.btnPlay.isEnabled())
+    
+    def _request_catalog(self, schema_name: Optional[str] = None):
+        """
+        Lê em segundo plano os schemas da conexão atual (ou as funções do
+        schema). Uma nova requisição do mesmo tipo torna a anterior obsoleta:
+        sua resposta é descartada.
+        """
+        kind = 'schemas' if schema_name is None else 'functions'
+        previous = self._catalog_requests.pop(kind, None)
+        if previous is not None:
+            previous.cancel()
+        
+        timeout = self.connection_service.catalog_timeout(self.current_connection)
+        task = CatalogRefreshTask(self.catalog_service, self.current_connection, schema_name, timeout)
+        task.taskCompleted.connect(lambda: self._on_catalog_loaded(kind, task))
+        task.taskTerminated.connect(lambda: self._on_catalog_loaded(kind, task))
+        self._catalog_requests[kind] = task
+        QgsApplication.taskManager().addTask(task)
+        
+        # Se a task não responder a tempo (ex.: servidor fora do ar), a
+        # requisição é abandonada e a interface segue com o que tem
+        QTimer.singleShot(int(timeout * 1000), lambda: self._on_catalog_timeout(kind, task))
+    
+    def _cancel_catalog_requests(self):
+        """Abandona as leituras de catálogo pendentes (troca de conexão)."""
+        for task in self._catalog_requests.values():
+            task.cancel()
+        self._catalog_requests.clear()
+    
+    def _on_catalog_timeout(self, kind: str, task: CatalogRefreshTask):
+        if self._catalog_requests.get(kind) is not task:
+            return
+        del self._catalog_requests[kind]
+        task.cancel()
+        
+        target = "schemas" if task.schema_name is None else f"funções do schema '{task.schema_name}'"
+        self._log(
+            f"Tempo esgotado ({task.timeout:.0f}s) ao carregar {target} da conexão "
+            f"'{task.connection_info['name']}'.", Qgis.Warning
+        )
+        if kind == 'functions' and self.cmbFunction.currentData() is None:
+            self.cmbFunction.setItemText(0, "Tempo esgotado ao carregar funções")
+    
+    def _on_catalog_loaded(self, kind: str, task: CatalogRefreshTask):
+        """Aplica a resposta da leitura de catálogo, se ainda for a mais recente."""
+        if self._catalog_requests.get(kind) is not task:
+            # Resposta obsoleta: conexão/schema trocados ou tempo esgotado
+            return
+        del self._catalog_requests[kind]
+        
+        target = "schemas" if task.schema_name is None else f"funções do schema '{task.schema_name}'"
+        if task.error_message:
+            self._log(f"Erro ao carregar {target}: {task.error_message}", Qgis.Critical)
+            return
+        if not task.changed:
+            return
+        
+        if task.schema_name is None:
+            self._populate_schemas(task.items, keep_selection=True)
+            if task.items:
+                self._log(f"Carregados {len(task.items)} schemas.", Qgis.Info)
+            else:
+                self._log("Nenhum schema encontrado.", Qgis.Warning)
+        elif task.schema_name == self.cmbSchema.currentData():
+            self._populate_functions(task.items, keep_selection=True)
+            if task.items:
+                self._log(f"Carregadas {len(task.items)} funções sem parâmetros.", Qgis.Info)
+            else:
+                self._log("Nenhuma função sem parâmetros encontrada.", Qgis.Warning)
     
     def _clear_functions(self):
         """Limpa a lista de funções."""
         self.cmbFunction.clear()
         self.cmbFunction.addItem("Selecione uma função", None)
+        self.lstFunctions.clear()
     
     def _on_function_changed(self):
         """Callback para mudança de função."""
         function_data = self.cmbFunction.currentData()
+        self._update_region_modes_enabled()
         
         if function_data is None:
             return
@@ -227,6 +490,68 @@ class MainDialog(QDialog):
         # Aqui poderia carregar parâmetros da função se necessário
         self._log(f"Função '{function_data['name']}' selecionada.", Qgis.Info)
     
+    def _on_batch_mode_toggled(self, checked: bool):
+        """Alterna entre execução de uma função e execução em lote."""
+        if checked:
+            self.chkTiledMode.setChecked(False)
+            self.chkIncrementalMode.setChecked(False)
+        self.lstFunctions.setVisible(checked)
+        self.spnConcurrency.setEnabled(checked or self.chkTiledMode.isChecked())
+        self.cmbFunction.setEnabled(not checked)
+        self._update_statement_stats_enabled()
+    
+    def _update_statement_stats_enabled(self, executing: bool = False):
+        """Os perfis valem só para a execução de uma função (sem lote ou tiles; o de planos, nem incremental)."""
+        single = not executing and not self.chkBatchMode.isChecked() and not self.chkTiledMode.isChecked()
+        self.chkStatementStats.setEnabled(single)
+        self.chkPlanProfile.setEnabled(single and not self.chkIncrementalMode.isChecked())
+    
+    def _current_function_region_aware(self) -> bool:
+        function_data = self.cmbFunction.currentData()
+        return bool(function_data and function_data.get('region_aware'))
+    
+    def _update_region_modes_enabled(self, executing: bool = False):
+        """
+        As execuções por tiles e incremental passam a área como primeiro
+        argumento: só valem para funções com área de validação (``region_aware``).
+        """
+        region_aware = self._current_function_region_aware()
+        tooltip = "" if region_aware else "Disponível só para funções com área de validação (geometry DEFAULT NULL) [área]"
+        for checkbox in (self.chkTiledMode, self.chkIncrementalMode):
+            if not region_aware:
+                checkbox.setChecked(False)
+            checkbox.setEnabled(not executing and region_aware)
+            checkbox.setToolTip(tooltip)
+    
+    def _on_tiled_mode_toggled(self, checked: bool):
+        """Alterna a execução da função selecionada por tiles."""
+        if checked:
+            self.chkBatchMode.setChecked(False)
+            self.chkIncrementalMode.setChecked(False)
+        self.spnConcurrency.setEnabled(checked or self.chkBatchMode.isChecked())
+        self._update_statement_stats_enabled()
+    
+    def _on_incremental_mode_toggled(self, checked: bool):
+        """Alterna a validação incremental (apenas feições alteradas)."""
+        if checked:
+            self.chkBatchMode.setChecked(False)
+            self.chkTiledMode.setChecked(False)
+        self._update_statement_stats_enabled()
+    
+    def _on_concurrency_changed(self, value: int):
+        """Persiste o limite de execuções simultâneas do modo lote."""
+        QgsSettings().setValue(self.BATCH_CONCURRENCY_KEY, value)
+    
+    def _checked_batch_functions(self) -> List[Tuple[str, str]]:
+        """Retorna (nome, argumentos) das funções marcadas na lista do modo lote."""
+        functions = []
+        for row in range(self.lstFunctions.count()):
+            item = self.lstFunctions.item(row)
+            if item.checkState() == Qt.Checked:
+                function = item.data(Qt.UserRole)
+                functions.append((function['name'], function['signature']))
+        return functions
+    
     def _execute_function(self):
         """Executa a função selecionada."""
         # Validações
@@ -239,6 +564,10 @@ class MainDialog(QDialog):
             QMessageBox.warning(self, "Aviso", "Selecione um schema antes de executar.")
             return
         
+        if self.chkBatchMode.isChecked():
+            self._execute_batch(schema_name)
+            return
+        
         function_data = self.cmbFunction.currentData()
         if not function_data:
             QMessageBox.warning(self, "Aviso", "Selecione uma função antes de executar.")
@@ -246,8 +575,7 @@ class MainDialog(QDialog):
         
         function_name = function_data['name']
         
-        # Como get_functions já filtra, não precisamos verificar parâmetros aqui novamente
-        # Apenas confirmamos que a função selecionada é válida para execução
+        # get_functions já filtra: todos os argumentos da função têm valor padrão
 
         # Confirma execução
         reply = QMessageBox.question(
@@ -261,26 +589,203 @@ class MainDialog(QDialog):
         if reply != QMessageBox.Yes:
             return
         
+        if (self.chkTiledMode.isChecked() or self.chkIncrementalMode.isChecked()) and not function_data['region_aware']:
+            QMessageBox.warning(
+                self, "Aviso",
+                f"A função '{function_name}' não recebe a área de validação (primeiro parâmetro "
+                "geometry DEFAULT NULL) e não pode ser executada por tiles nem de forma incremental."
+            )
+            return
+        
         # Inicia execução
-        self._start_execution(schema_name, function_name)
+        if self.chkTiledMode.isChecked():
+            start = lambda: self._start_tiled_planning(schema_name, function_name)
+        else:
+            start = lambda: self._start_execution(schema_name, function_name)
+        self._run_preflight(schema_name, [function_name], start)
+    
+    def _execute_batch(self, schema_name: str):
+        """Valida e confirma a execução em lote das funções marcadas."""
+        functions = self._checked_batch_functions()
+        if not functions:
+            QMessageBox.warning(self, "Aviso", "Marque ao menos uma função para executar em lote.")
+            return
+        
+        reply = QMessageBox.question(
+            self,
+            "Confirmar Execução em Lote",
+            f"Executar {len(functions)} função(ões) de '{schema_name}' "
+            f"com até {self.spnConcurrency.value()} execução(ões) simultânea(s)?",
+            QMessageBox.Yes | QMessageBox.No,
+            QMessageBox.No
+        )
+        
+        if reply != QMessageBox.Yes:
+            return
+        
+        self._run_preflight(
+            schema_name, list(dict.fromkeys(name for name, _ in functions)),
+            lambda: self._start_batch_execution(schema_name, functions)
+        )
+    
+    def _run_preflight(self, schema_name: str, function_names: List[str], start):
+        """
+        Verifica as tabelas base/alvo das funções antes de executá-las.
+        
+        Args:
+            schema_name: Schema das funções
+            function_names: Funções que serão executadas
+            start: Inicia a execução (chamado ao fim da verificação)
+        """
+        self._flush_log()
+        self.log_model.clear()
+        if not self.chkPreflight.isChecked():
+            start()
+            return
+        
+        self._set_execution_state(True)
+        self._log("Verificando índices espaciais e estatísticas das tabelas base/alvo...", Qgis.Info)
+        
+        task = PreflightTask(self.current_connection, schema_name, function_names)
+        task.taskCompleted.connect(lambda: self._on_preflight_finished(task, start))
+        task.taskTerminated.connect(lambda: self._on_preflight_finished(task, start))
+        self.preflight_task = task
+        QgsApplication.taskManager().addTask(task)
+        
+        self.start_time = QDateTime.currentDateTime()
+        self.timer.start(1000)
+        self.progressBar.setVisible(True)
+        self.progressBar.setRange(0, 0)
+        self.lblStatus.setText("Verificando tabelas...")
+    
+    def _on_preflight_finished(self, task: PreflightTask, start):
+        """Mostra os problemas encontrados e decide se corrige, executa ou desiste."""
+        if self.preflight_task is not task:
+            # Cancelada pelo usuário
+            return
+        self.preflight_task = None
+        
+        if task.error_message:
+            self._log(f"Verificação prévia não concluída: {task.error_message}", Qgis.Warning)
+            self._continue_after_preflight(start)
+            return
+        
+        if not task.issues:
+            self._log(f"{len(task.tables)} tabela(s) verificada(s), nenhum problema encontrado.", Qgis.Info)
+            self._continue_after_preflight(start)
+            return
+        
+        levels = {LogLevel.INFO: Qgis.Info, LogLevel.WARNING: Qgis.Warning, LogLevel.CRITICAL: Qgis.Critical}
+        for issue in task.issues:
+            self._log(f"{issue.table}: {issue.detail}. Impacto: {issue.impact}.", levels.get(issue.level, Qgis.Warning))
+        
+        fixable = [issue for issue in task.issues if issue.fix_sql is not None]
+        box = QMessageBox(self)
+        box.setIcon(QMessageBox.Warning)
+        box.setWindowTitle("Verificação das tabelas")
+        box.setText(
+            f"{len(task.issues)} problema(s) em {len({issue.table for issue in task.issues})} tabela(s) "
+            f"podem deixar a validação muito mais lenta (detalhes no log)."
+        )
+        fix_button = None
+        if fixable:
+            box.setInformativeText(
+                "Corrigir cria os índices com CREATE INDEX CONCURRENTLY (sem bloquear a edição), "
+                "atualiza as estatísticas com ANALYZE e cria colunas-sombra no SRID comum "
+                "para pares com SRIDs diferentes antes de executar."
+            )
+            fix_button = box.addButton(f"Corrigir ({len(fixable)}) e executar", QMessageBox.AcceptRole)
+        run_button = box.addButton("Executar assim mesmo", QMessageBox.DestructiveRole)
+        box.addButton(QMessageBox.Cancel)
+        box.exec_()
+        
+        clicked = box.clickedButton()
+        if fix_button is not None and clicked is fix_button:
+            self._start_preflight_fix(fixable, start)
+        elif clicked is run_button:
+            self._continue_after_preflight(start)
+        else:
+            self._log("Execução cancelada após a verificação das tabelas.", Qgis.Warning)
+            self._finish_execution()
+    
+    def _start_preflight_fix(self, issues, start):
+        """Aplica as correções em paralelo e executa ao final."""
+        self._log(f"Aplicando {len(issues)} correção(ões)...", Qgis.Info)
+        self.lblStatus.setText("Criando índices e atualizando estatísticas...")
+        
+        task = PreflightFixTask(self.current_connection, issues, self.spnConcurrency.value())
+        task.taskCompleted.connect(lambda: self._on_preflight_fix_finished(task, start))
+        task.taskTerminated.connect(lambda: self._on_preflight_fix_finished(task, start))
+        self.preflight_task = task
+        QgsApplication.taskManager().addTask(task)
+    
+    def _on_preflight_fix_finished(self, task: PreflightFixTask, start):
+        """Registra o resultado das correções e inicia a execução."""
+        if self.preflight_task is not task:
+            return
+        self.preflight_task = None
+        
+        if task.error_message:
+            self._log(f"Erro ao aplicar as correções: {task.error_message}", Qgis.Critical)
+        for issue, success, message in task.results:
+            self._log(message, Qgis.Info if success else Qgis.Warning)
+        self._continue_after_preflight(start)
+    
+    def _continue_after_preflight(self, start):
+        """Libera a interface da verificação e inicia a execução."""
+        # As rotinas de início reabilitam o estado de execução (e o cursor de espera)
+        self._set_execution_state(False)
+        start()
     
     def _start_execution(self, schema_name: str, function_name: str):
         """Inicia a execução da função em background."""
         # Desabilita controles
         self._set_execution_state(True)
         
-        # Limpa logs anteriores
-        self.txtLogs.clear()
         self._log(f"Iniciando execução de {schema_name}.{function_name}...", Qgis.Info)
         
+        # Perfis de instruções e de planos: a função precisa executar de fato (sem cache)
+        statement_stats = None
+        if self.chkStatementStats.isChecked():
+            statement_stats = StatementStatsCollector(int(QgsSettings().value(self.STATEMENT_STATS_TOP_KEY, 10)))
+        
         # Cria e inicia task
-        self.current_task = FunctionExecutionTask(
-            self.current_connection, 
-            schema_name, 
-            function_name
-        )
+        if self.chkIncrementalMode.isChecked():
+            self.current_task = IncrementalExecutionTask(
+                self.current_connection,
+                schema_name,
+                function_name,
+                neighbour_distance=float(QgsSettings().value(self.INCREMENTAL_DISTANCE_KEY, 0.0)),
+                statement_stats=statement_stats,
+                history=self.history
+            )
+        elif self.chkPlanProfile.isChecked():
+            self.current_task = ProfileExecutionTask(
+                self.current_connection,
+                schema_name,
+                function_name,
+                profile_store=ProfileStore(
+                    os.path.join(QgsApplication.qgisSettingsDirPath(), 'validador_regras', 'profiles')
+                ),
+                statement_stats=statement_stats,
+                history=self.history
+            )
+        else:
+            self.current_task = FunctionExecutionTask(
+                self.current_connection, 
+                schema_name, 
+                function_name,
+                cache=self.result_cache,
+                force_refresh=self.chkForceRefresh.isChecked() or statement_stats is not None,
+                statement_stats=statement_stats,
+                history=self.history
+            )
         
         # Conecta sinais da task
+        self.current_task.chunkReady.connect(self._on_task_chunk)
+        self.current_task.progressChanged.connect(self._on_task_progress)
+        self.current_task.ruleProgress.connect(self._on_rule_progress)
+        self.current_task.noticeReceived.connect(self._on_task_notice)
         self.current_task.taskCompleted.connect(self._on_task_completed)
         self.current_task.taskTerminated.connect(self._on_task_terminated)
         
@@ -296,42 +801,376 @@ class MainDialog(QDialog):
         self.progressBar.setRange(0, 0)  # Progresso indeterminado
         self.lblStatus.setText("Executando...")
     
+    def _start_batch_execution(self, schema_name: str, functions: List[Tuple[str, str]]):
+        """Inicia a execução em lote das funções (nome, argumentos) em background."""
+        self._set_execution_state(True)
+        
+        self._log(
+            f"Iniciando lote de {len(functions)} função(ões) em '{schema_name}' "
+            f"({self.spnConcurrency.value()} simultânea(s))...",
+            Qgis.Info
+        )
+        
+        self.current_batch = BatchExecutionController(
+            self.current_connection,
+            schema_name,
+            functions,
+            self.spnConcurrency.value(),
+            cache=self.result_cache,
+            force_refresh=self.chkForceRefresh.isChecked(),
+            history=self.history,
+            parent=self
+        )
+        self.current_batch.itemStarted.connect(self._on_batch_item_started)
+        self.current_batch.itemFinished.connect(self._on_batch_item_finished)
+        self.current_batch.batchFinished.connect(self._on_batch_finished)
+        
+        self.start_time = QDateTime.currentDateTime()
+        self.timer.start(1000)
+        
+        self.progressBar.setVisible(True)
+        self.progressBar.setRange(0, len(functions))
+        self.progressBar.setValue(0)
+        self.lblStatus.setText(f"Lote: 0/{len(functions)} concluída(s)")
+        
+        self.current_batch.start()
+    
+    def _on_batch_item_started(self, item):
+        """Callback para início de uma função do lote."""
+        self._log(f"[{item.key}] executando...", Qgis.Info)
+    
+    def _on_batch_item_finished(self, item):
+        """Callback para término de uma função do lote."""
+        elapsed = f"{item.elapsed:.1f}s" if item.elapsed is not None else "-"
+        if item.error_message:
+            self._log(f"[{item.key}] {item.status} em {elapsed}: {item.error_message}", Qgis.Critical)
+        else:
+            self._log(
+                f"[{item.key}] {item.status} em {elapsed} ({item.row_count} registro(s))"
+            f"{' [cache]' if item.cache_hit else ''}.",
+                Qgis.Info
+            )
+        if item.regression is not None:
+            self._log(f"[{item.key}] muito mais lenta que o habitual: {item.regression.format()}", Qgis.Warning)
+        
+        if self.current_batch:
+            done = self.current_batch.completed_count
+            total = len(self.current_batch.items)
+            self.progressBar.setValue(done)
+            self.lblStatus.setText(f"Lote: {done}/{total} concluída(s)")
+    
+    def _on_batch_finished(self, summary):
+        """Callback para término do lote, com resumo agregado."""
+        level = Qgis.Warning if summary.failed or summary.cancelled else Qgis.Info
+        self._log("Resumo do lote:", level)
+        for line in summary.format_lines():
+            self._log(line, level)
+        
+        self._finish_execution()
+    
+    def _start_tiled_planning(self, schema_name: str, function_name: str):
+        """Calcula a grade de tiles em background antes da execução."""
+        self._set_execution_state(True)
+        
+        self._log(f"Calculando grade de tiles para {schema_name}.{function_name}...", Qgis.Info)
+        
+        settings = QgsSettings()
+        planner = TilePlanner(
+            target_features_per_tile=int(settings.value(self.TILE_TARGET_FEATURES_KEY, 50000))
+        )
+        self.planning_task = TilePlanningTask(self.current_connection, schema_name, function_name, planner)
+        self.planning_task.taskCompleted.connect(self._on_tile_planning_completed)
+        self.planning_task.taskTerminated.connect(self._on_tile_planning_terminated)
+        QgsApplication.taskManager().addTask(self.planning_task)
+        
+        self.start_time = QDateTime.currentDateTime()
+        self.timer.start(1000)
+        
+        self.progressBar.setVisible(True)
+        self.progressBar.setRange(0, 0)
+        self.lblStatus.setText("Planejando tiles...")
+    
+    def _on_tile_planning_terminated(self):
+        """Callback para falha no cálculo da grade de tiles."""
+        if self.planning_task is None:
+            return
+        
+        error_msg = self.planning_task.error_message or "Erro desconhecido"
+        self._log(f"Erro ao planejar tiles: {error_msg}", Qgis.Critical)
+        self._finish_execution()
+    
+    def _on_tile_planning_completed(self):
+        """Callback para grade de tiles calculada: inicia a execução por tiles."""
+        task = self.planning_task
+        self.planning_task = None
+        if task is None:
+            return
+        
+        plan = task.plan
+        tables = ", ".join(f"{schema}.{table}" for schema, table, _ in plan.tables)
+        self._log(
+            f"Grade com {len(plan.tiles)} tile(s) sobre {tables} "
+            f"({plan.feature_count} feições, SRID {plan.srid}).",
+            Qgis.Info
+        )
+        if plan.uncovered_features:
+            self._log(
+                f"{plan.uncovered_features} feição(ões) fora da grade não serão validadas nesta execução.",
+                Qgis.Warning
+            )
+        
+        self.current_tiled = TiledExecutionController(
+            self.current_connection,
+            task.schema_name,
+            task.function_name,
+            plan,
+            self.spnConcurrency.value(),
+            time_budget=float(QgsSettings().value(self.TILE_TIME_BUDGET_KEY, 300)),
+            parent=self
+        )
+        self.current_tiled.tileFinished.connect(self._on_tile_finished)
+        self.current_tiled.executionFinished.connect(self._on_tiled_finished)
+        
+        self.progressBar.setRange(0, len(plan.tiles))
+        self.progressBar.setValue(0)
+        self.lblStatus.setText(f"Tiles: 0/{len(plan.tiles)}")
+        
+        self.current_tiled.start()
+    
+    def _on_tile_finished(self, tile, success: bool):
+        """Callback para término de um tile."""
+        if not self.current_tiled:
+            return
+        
+        summary = self.current_tiled.summary
+        done = self.current_tiled.completed_count
+        self.progressBar.setRange(0, summary.tiles_total)
+        self.progressBar.setValue(done)
+        self.lblStatus.setText(f"Tiles: {done}/{summary.tiles_total}")
+        if not success and summary.errors:
+            self._log(summary.errors[-1], Qgis.Warning)
+    
+    def _on_tiled_finished(self, summary):
+        """Callback para término da execução por tiles."""
+        level = Qgis.Warning if summary.tiles_failed or summary.cancelled else Qgis.Info
+        self._log(
+            f"Execução por tiles finalizada em {summary.elapsed:.1f}s: "
+            f"{summary.tiles_succeeded}/{summary.tiles_total} tile(s) com sucesso, "
+            f"{summary.tiles_split} subdividido(s), {summary.tiles_failed} com erro.",
+            level
+        )
+        self._log(f"Retornou {summary.row_count} registro(s).", Qgis.Info)
+        for i, row in enumerate(summary.preview_rows):
+            self._log(f"  Linha {i+1}: {row}", Qgis.Info)
+        
+        self._finish_execution()
+    
     def _stop_execution(self):
         """Para a execução atual."""
+        if self.current_tiled and self.current_tiled.is_running:
+            self._log("Execução por tiles cancelada pelo usuário.", Qgis.Warning)
+            self.current_tiled.cancel()
+            return
+        
+        if self.planning_task:
+            self.planning_task.cancel()
+            self._log("Planejamento de tiles cancelado pelo usuário.", Qgis.Warning)
+            self._finish_execution()
+            return
+        
+        if self.export_task:
+            # O COPY é interrompido pela própria task; o arquivo parcial é removido
+            self.export_task.cancel()
+            self._log("Exportação cancelada pelo usuário.", Qgis.Warning)
+            self._finish_execution()
+            return
+        
+        if self.preflight_task:
+            # CREATE INDEX CONCURRENTLY em andamento termina no servidor
+            self.preflight_task.cancel()
+            self._log("Verificação das tabelas cancelada pelo usuário.", Qgis.Warning)
+            self._finish_execution()
+            return
+        
+        if self.current_batch and self.current_batch.is_running:
+            self._log("Execução em lote cancelada pelo usuário.", Qgis.Warning)
+            # O resumo do lote chega por batchFinished e finaliza a interface
+            self.current_batch.cancel()
+            return
+        
         if self.current_task:
             self.current_task.cancel()
             self._log("Execução cancelada pelo usuário.", Qgis.Warning)
+            if self._await_server_cancel(self.current_task):
+                return
         
         self._finish_execution()
     
+    def _await_server_cancel(self, task) -> bool:
+        """
+        Aguarda a confirmação do servidor de que a consulta foi interrompida.
+        
+        Returns:
+            True se há cancelamento pendente no servidor (a interface será
+            finalizada por _on_server_cancel_finished)
+        """
+        canceller = task.server_canceller
+        if canceller is None:
+            return False
+        
+        if not self._awaiting_server_cancel:
+            self._awaiting_server_cancel = True
+            canceller.finished.connect(self._on_server_cancel_finished)
+            self._log("Aguardando confirmação do cancelamento no servidor...", Qgis.Warning)
+            self.lblStatus.setText("Cancelando...")
+            self.btnStop.setEnabled(False)
+            
+            # A confirmação pode ter chegado antes da conexão ao sinal
+            if not canceller.is_pending:
+                self._on_server_cancel_finished(canceller.confirmed, canceller.message)
+        return True
+    
+    def _on_server_cancel_finished(self, confirmed: bool, message: str):
+        """Callback para confirmação (ou falha) do cancelamento no servidor."""
+        if not self._awaiting_server_cancel:
+            return
+        
+        self._log(message, Qgis.Warning if confirmed else Qgis.Critical)
+        self._log(
+            "Execução interrompida." if confirmed
+            else "Não foi possível confirmar a interrupção da consulta no servidor.",
+            Qgis.Warning if confirmed else Qgis.Critical
+        )
+        self._finish_execution()
+    
+    def _on_task_progress(self, progress: float):
+        """
+        Callback para progresso informado pela função (protocolo NOTICE).
+        Até a primeira mensagem a barra fica indeterminada.
+        """
+        if self.progressBar.maximum() == 0:
+            self.progressBar.setRange(0, 100)
+        self.progressBar.setValue(int(progress))
+    
+    def _on_rule_progress(self, done: int, total: int, label: str):
+        """Callback para sub-progresso por regra enviado pela função."""
+        if label and label != self._last_rule_label:
+            self._last_rule_label = label
+            self._log(f"  {label} ({done}/{total})", Qgis.Info)
+        self.lblStatus.setText(f"Executando... {done}/{total}")
+    
+    def _on_task_notice(self, message: str):
+        """Callback para mensagens NOTICE da função que não são de progresso."""
+        self._log(f"[servidor] {message}", Qgis.Info)
+    
+    def _on_task_chunk(self, offset: int, rows: list):
+        """
+        Callback para cada bloco de resultado lido pela task.
+        """
+        if not self.current_task:
+            return
+        
+        # Só há o que informar quando o resultado ocupa mais de um bloco
+        if offset > 0 or len(rows) >= self.current_task.chunk_size:
+            self._log(f"Recebidos {offset + len(rows)} registro(s)...", Qgis.Info)
+    
     def _on_task_completed(self):
         """
         Callback para task completada com sucesso.
         """
-        if self.current_task and self.current_task.result:
-            # QgsProviderConnection.executeSql retorna um QgsResult, que é iterável
-            # Precisamos consumir o resultado para saber o número de linhas
-            result_list = list(self.current_task.result) # Converte para lista para poder contar e iterar novamente
-            result_count = len(result_list)
+        with get_tracer().span("result", "ui", rows=self.current_task.row_count if self.current_task else 0):
+            self._handle_task_result()
+        self._finish_execution()
+    
+    def _handle_task_result(self):
+        """Registra no log o resultado da task concluída."""
+        if isinstance(self.current_task, IncrementalExecutionTask):
+            self._log_incremental_outcome(self.current_task)
+        
+        if self.current_task and self.current_task.cache_hit:
+            self._log("Dados e função inalterados desde a última execução: resultado obtido do cache.", Qgis.Info)
+        
+        if self.current_task and self.current_task.row_count:
+            result_count = self.current_task.row_count
             self._log(f"Função executada com sucesso. Retornou {result_count} registro(s).", Qgis.Info)
             
-            # Mostra resultado se houver
-            if result_count > 0:
-                self._log("Resultado:", Qgis.Info)
-                for i, row in enumerate(result_list[:10]):  # Mostra apenas os primeiros 10
-                    self._log(f"  Linha {i+1}: {row}", Qgis.Info)
-                
-                if result_count > 10:
-                    self._log(f"  ... e mais {result_count - 10} linha(s)", Qgis.Info)
+            # Mostra apenas a amostra guardada pela task
+            self._log("Resultado:", Qgis.Info)
+            for i, row in enumerate(self.current_task.preview_rows):
+                self._log(f"  Linha {i+1}: {row}", Qgis.Info)
+            
+            remaining = result_count - len(self.current_task.preview_rows)
+            if remaining > 0:
+                self._log(f"  ... e mais {remaining} linha(s)", Qgis.Info)
         else:
             self._log("Função executada, mas não retornou dados ou houve erro interno.", Qgis.Info)
         
-        self._finish_execution()
+        if self.current_task and self.current_task.statement_report is not None:
+            for line in self.current_task.statement_report.format_lines():
+                self._log(line, Qgis.Info)
+        
+        if isinstance(self.current_task, ProfileExecutionTask):
+            self._log_plan_profile(self.current_task)
+        
+        if self.current_task:
+            self._log_runtime_history(self.current_task)
+    
+    def _log_runtime_history(self, task: FunctionExecutionTask):
+        """Registra no log os tempos típicos da função e se esta execução foi uma regressão."""
+        if task.regression is not None:
+            self._log(
+                f"Execução de {task.function_name} muito mais lenta que o habitual: {task.regression.format()}",
+                Qgis.Warning
+            )
+        elif self.history is not None and not task.cache_hit:
+            stats = self.history.runtime_stats(
+                self.history.connection_key(task.connection_info), task.schema_name, task.function_name,
+                task.history_mode()
+            )
+            if stats is not None and stats.count > 1:
+                self._log(f"Histórico de {task.function_name}: {stats.format()}.", Qgis.Info)
+    
+    def _log_plan_profile(self, task: ProfileExecutionTask):
+        """Registra no log o perfil de planos e as mudanças em relação à execução anterior."""
+        if task.profile is None:
+            return
+        for line in task.profile.format_lines(include_flags=False):
+            self._log(line, Qgis.Info)
+        for flag in task.profile.flags:
+            self._log(f"Instrução {flag.statement + 1}: {flag.detail}", Qgis.Warning)
+        if task.plan_diff:
+            self._log("Mudanças em relação ao perfil anterior:", Qgis.Info)
+        for line in task.plan_diff:
+            self._log(f"  {line}", Qgis.Warning)
+    
+    def _log_incremental_outcome(self, task: IncrementalExecutionTask):
+        """Registra no log o que a validação incremental revalidou."""
+        if task.full_run:
+            self._log("Primeira execução incremental: validação completa realizada e rastreamento ativado.", Qgis.Info)
+        elif task.region is None:
+            self._log("Nenhuma feição alterada desde a última validação.", Qgis.Info)
+        else:
+            removed = sum(task.purged.values())
+            self._log(
+                f"Revalidada a área de {task.change_count} alteração(ões); "
+                f"{removed} erro(s) anterior(es) substituído(s) em {len(task.purged)} tabela(s) aux_revisao_*.",
+                Qgis.Info
+            )
     
     def _on_task_terminated(self):
         """
         Callback para task terminada com erro.
         """
+        if self.current_task is None:
+            return
+        
+        if self.current_task.isCanceled():
+            # Com cancelamento no servidor, a interface espera a confirmação
+            if not self._await_server_cancel(self.current_task):
+                self._log("Execução cancelada.", Qgis.Warning)
+                self._finish_execution()
+            return
+        
         error_msg = "Erro desconhecido"
         if self.current_task and self.current_task.error_message:
             error_msg = self.current_task.error_message
@@ -356,7 +1195,17 @@ class MainDialog(QDialog):
         self._set_execution_state(False)
         
         # Limpa task
+        self._awaiting_server_cancel = False
+        self._last_rule_label = None
         self.current_task = None
+        self.current_batch = None
+        self.current_tiled = None
+        self.planning_task = None
+        self.preflight_task = None
+        self.export_task = None
+        
+        if self.trace_path:
+            self._write_trace()
     
     def _set_execution_state(self, executing: bool):
         """
@@ -366,8 +1215,18 @@ class MainDialog(QDialog):
         self.cmbSelectDatabase.setEnabled(not executing)
         self.btnCreateConnection.setEnabled(not executing)
         self.cmbSchema.setEnabled(not executing)
-        self.cmbFunction.setEnabled(not executing)
+        self.cmbFunction.setEnabled(not executing and not self.chkBatchMode.isChecked())
         self.btnPlay.setEnabled(not executing)
+        self.chkBatchMode.setEnabled(not executing)
+        self._update_region_modes_enabled(executing)
+        self.chkForceRefresh.setEnabled(not executing)
+        self.chkPreflight.setEnabled(not executing)
+        self._update_statement_stats_enabled(executing)
+        self.btnExportCsv.setEnabled(not executing)
+        self.lstFunctions.setEnabled(not executing)
+        self.spnConcurrency.setEnabled(
+            not executing and (self.chkBatchMode.isChecked() or self.chkTiledMode.isChecked())
+        )
         
         # Botão stop
         self.btnStop.setEnabled(executing)
@@ -401,50 +1260,273 @@ class MainDialog(QDialog):
         """
         Adiciona uma mensagem ao log.
         
+        A mensagem só é exibida (e enviada ao log do QGIS e ao arquivo) no
+        próximo _flush_log, junto com as demais do intervalo.
+        
         Args:
             message: Mensagem a ser logada
             level: Nível da mensagem
         """
-        # Adiciona timestamp
-        timestamp = QDateTime.currentDateTime().toString("hh:mm:ss")
+        self.log_buffer.append(message, int(level))
+    
+    def _flush_log(self):
+        """
+        Exibe as mensagens acumuladas desde a última atualização.
+        Repetições seguidas aparecem uma vez, com a contagem.
+        """
+        records = self.log_buffer.drain()
+        dropped = self.log_buffer.dropped - self._log_dropped
+        if not records and not dropped:
+            return
         
-        # Define prefixo baseado no nível
-        if level == Qgis.Critical:
-            prefix = "[ERRO]"
-        elif level == Qgis.Warning:
-            prefix = "[AVISO]"
-        else:
-            prefix = "[INFO]"
+        if dropped:
+            self._log_dropped = self.log_buffer.dropped
+            records.insert(0, LogRecord(time.time(), LogLevel.WARNING, f"{dropped} mensagem(ns) de log descartada(s)."))
         
-        formatted_message = f"{timestamp} {prefix} {message}"
+        with stage_timer("render"):
+            scrollbar = self.lstLogs.verticalScrollBar()
+            at_bottom = scrollbar.value() >= scrollbar.maximum()
+            self.log_model.append_records(records)
+            if at_bottom:
+                self.lstLogs.scrollToBottom()
         
-        # Adiciona ao widget de log
-        self.txtLogs.append(formatted_message)
+        # Log do QGIS: uma mensagem por nível a cada lote
+        by_level = {}
+        for record in records:
+            by_level.setdefault(record.level, []).append(record.format())
+        for level, lines in by_level.items():
+            QgsMessageLog.logMessage("\n".join(lines), "ValidadorRegras", Qgis.MessageLevel(level))
         
-        # Adiciona ao log do QGIS
-        QgsMessageLog.logMessage(message, "ValidadorRegras", level)
+        if self.log_file is not None:
+            try:
+                self.log_file.write(records)
+            except OSError as e:
+                self.log_file = None
+                QgsMessageLog.logMessage(f"Arquivo de log desativado: {e}", "ValidadorRegras", Qgis.Warning)
+    
+    def _write_metrics(self):
+        """Grava as métricas no arquivo .prom quando mudaram desde a última gravação."""
+        registry = get_registry()
+        if registry.generation == self._metrics_generation:
+            return
+        try:
+            registry.write_textfile(self.metrics_path)
+            self._metrics_generation = registry.generation
+        except OSError as e:
+            self.metrics_timer.stop()
+            self._log(f"Gravação das métricas em {self.metrics_path} desativada: {e}", Qgis.Warning)
+    
+    def _write_trace(self):
+        """Grava a linha do tempo registrada até agora (abrir em ui.perfetto.dev ou chrome://tracing)."""
+        try:
+            get_tracer().write(self.trace_path)
+        except OSError as e:
+            self.trace_path = ""
+            get_tracer().disable()
+            self._log(f"Gravação da linha do tempo desativada: {e}", Qgis.Warning)
+    
+    def _on_log_level_changed(self, index: int):
+        """Filtra o log pelo nível mínimo escolhido (0 = todas, 1 = avisos, 2 = erros)."""
+        self.log_filter.set_minimum_level(index)
+        QgsSettings().setValue(self.LOG_LEVEL_KEY, index)
+        self.lstLogs.scrollToBottom()
     
     def _clear_log(self):
         """
         Limpa o log.
         """
-        self.txtLogs.clear()
+        self._flush_log()
+        self.log_model.clear()
         self._log("Log limpo.", Qgis.Info)
     
     def _copy_log(self):
         """
-        Copia o log para a área de transferência.
+        Copia o log para a área de transferência (as linhas selecionadas ou,
+        sem seleção, todas as linhas exibidas pelo filtro).
         """
-        self.txtLogs.selectAll()
-        self.txtLogs.copy()
+        self._flush_log()
+        rows = sorted(index.row() for index in self.lstLogs.selectionModel().selectedIndexes())
+        if rows:
+            text = "\n".join(self.log_filter.index(row, 0).data() for row in rows)
+        else:
+            text = self.log_filter.visible_text()
+        QApplication.clipboard().setText(text)
         self._log("Log copiado para a área de transferência.", Qgis.Info)
     
     def _export_csv(self):
         """
-        Exporta dados para CSV (funcionalidade futura).
+        Exporta tabelas de revisão (aux_revisao_*) do schema selecionado para
+        CSV, GeoPackage ou GeoParquet. Primeiro lista as tabelas em background;
+        a escolha e a exportação seguem em _on_review_tables_listed.
         """
-        self._log("Funcionalidade de exportação CSV não implementada.", Qgis.Info)
-        QMessageBox.information(self, "Info", "Funcionalidade de exportação CSV será implementada em versão futura.")
+        schema_name = self.cmbSchema.currentText()
+        if not self.current_connection or not schema_name:
+            QMessageBox.warning(self, "Aviso", "Selecione uma conexão e um schema.")
+            return
+        
+        self._set_execution_state(True)
+        self.lblStatus.setText("Listando tabelas de revisão...")
+        
+        task = ReviewTablesTask(self.current_connection, schema_name)
+        task.taskCompleted.connect(lambda: self._on_review_tables_listed(task))
+        task.taskTerminated.connect(lambda: self._on_review_tables_listed(task))
+        self.export_task = task
+        QgsApplication.taskManager().addTask(task)
+    
+    def _on_review_tables_listed(self, task: ReviewTablesTask):
+        """Pede a(s) tabela(s) e o arquivo de destino e inicia a exportação."""
+        if self.export_task is not task:
+            # Cancelada pelo usuário
+            return
+        self._finish_execution()
+        
+        if task.error_message:
+            self._log(f"Erro ao listar as tabelas de revisão: {task.error_message}", Qgis.Critical)
+            return
+        if not task.tables:
+            QMessageBox.information(
+                self, "Exportar", f"Nenhuma tabela aux_revisao_* encontrada em {task.schema_name}."
+            )
+            return
+        
+        labels = [f"{table} (~{rows} linha(s))" for table, rows in task.tables]
+        all_label = f"Todas as {len(task.tables)} tabelas (um arquivo por tabela)"
+        choices = labels + ([all_label] if len(task.tables) > 1 else [])
+        label, ok = QInputDialog.getItem(self, "Exportar", "Tabela de revisão:", choices, 0, False)
+        if not ok:
+            return
+        export_all = label == all_label
+        tables = [table for table, _ in task.tables] if export_all else [task.tables[labels.index(label)][0]]
+        
+        # Várias tabelas só nos formatos de camada, exportadas em paralelo
+        filters = []
+        if not export_all:
+            filters += ["CSV (*.csv)", "CSV compactado com gzip (*.csv.gz)"]
+            if zstd_available():
+                filters.append("CSV compactado com zstd (*.csv.zst)")
+        if format_available(FORMAT_GPKG):
+            filters.append("GeoPackage (*.gpkg)")
+        if format_available(FORMAT_PARQUET):
+            filters.append("GeoParquet (*.parquet)")
+        if not filters:
+            QMessageBox.information(self, "Exportar", "Exportar várias tabelas requer o GDAL ou o pacote pyarrow.")
+            return
+        
+        title = "Exportar (o nome indica apenas a pasta)" if export_all else "Exportar"
+        default_name = task.schema_name if export_all else tables[0]
+        first_extension = filters[0][filters[0].index("*") + 1:-1]
+        file_path, selected_filter = QFileDialog.getSaveFileName(
+            self, title, f"{default_name}{first_extension}", ";;".join(filters)
+        )
+        if not file_path:
+            return
+        # Acrescenta a extensão do filtro escolhido quando o usuário não a digitou
+        extension = selected_filter[selected_filter.index("*") + 1:-1]
+        if not file_path.lower().endswith(extension):
+            for known in ('.csv.gz', '.csv.zst', '.csv', '.gpkg', '.parquet'):
+                if file_path.lower().endswith(known):
+                    file_path = file_path[:-len(known)]
+                    break
+            file_path += extension
+        
+        if extension in ('.gpkg', '.parquet'):
+            if export_all:
+                directory = os.path.dirname(file_path)
+                paths = [os.path.join(directory, f"{table}{extension}") for table in tables]
+            else:
+                paths = [file_path]
+            self._start_layer_export(task.schema_name, tables, paths)
+        else:
+            self._start_csv_export(task.schema_name, tables[0], file_path)
+    
+    def _start_csv_export(self, schema_name: str, table_name: str, file_path: str):
+        """Inicia a exportação da tabela em background."""
+        self._set_execution_state(True)
+        self._log(f"Exportando {schema_name}.{table_name} para {file_path}...", Qgis.Info)
+        
+        task = CsvExportTask(self.current_connection, schema_name, table_name, file_path)
+        task.exportProgress.connect(self._on_export_progress)
+        task.taskCompleted.connect(lambda: self._on_csv_export_finished(task))
+        task.taskTerminated.connect(lambda: self._on_csv_export_finished(task))
+        self.export_task = task
+        QgsApplication.taskManager().addTask(task)
+        
+        self.start_time = QDateTime.currentDateTime()
+        self.timer.start(1000)
+        self.progressBar.setVisible(True)
+        self.progressBar.setRange(0, 0)
+        self.lblStatus.setText("Exportando...")
+    
+    def _on_export_progress(self, num_bytes: int, rows: int, estimated: int):
+        """Callback de progresso da exportação: linhas e megabytes recebidos."""
+        if estimated > 0:
+            if self.progressBar.maximum() == 0:
+                self.progressBar.setRange(0, 100)
+            self.progressBar.setValue(min(99, int(100 * rows / estimated)))
+        self.lblStatus.setText(f"Exportando... {rows} linha(s), {num_bytes / 1048576:.1f} MB")
+    
+    def _start_layer_export(self, schema_name: str, tables: List[str], paths: List[str]):
+        """Inicia a exportação das tabelas para GeoPackage/GeoParquet, em paralelo."""
+        self._set_execution_state(True)
+        self._log(f"Exportando {len(tables)} tabela(s) de {schema_name}...", Qgis.Info)
+        
+        exporters = [
+            LayerExporter(self.current_connection, schema_name, table, path, connection_service=self.connection_service)
+            for table, path in zip(tables, paths)
+        ]
+        task = LayerExportTask(exporters, self.spnConcurrency.value())
+        task.exportProgress.connect(self._on_layer_export_progress)
+        task.taskCompleted.connect(lambda: self._on_layer_export_finished(task))
+        task.taskTerminated.connect(lambda: self._on_layer_export_finished(task))
+        self.export_task = task
+        QgsApplication.taskManager().addTask(task)
+        
+        self.start_time = QDateTime.currentDateTime()
+        self.timer.start(1000)
+        self.progressBar.setVisible(True)
+        self.progressBar.setRange(0, 0)
+        self.lblStatus.setText("Exportando...")
+    
+    def _on_layer_export_progress(self, rows: int, estimated: int):
+        """Callback de progresso da exportação de camadas (todas somadas)."""
+        if estimated > 0:
+            if self.progressBar.maximum() == 0:
+                self.progressBar.setRange(0, 100)
+            self.progressBar.setValue(min(99, int(100 * rows / estimated)))
+        self.lblStatus.setText(f"Exportando... {rows} feição(ões)")
+    
+    def _on_layer_export_finished(self, task: LayerExportTask):
+        """Callback para o fim da exportação de camadas."""
+        if self.export_task is not task:
+            return
+        
+        if task.error_message:
+            self._log(f"Exportação não concluída: {task.error_message}", Qgis.Critical)
+        for exporter in task.exporters:
+            if exporter.error_message:
+                self._log(f"{exporter.source}: {exporter.error_message}", Qgis.Critical)
+            elif exporter.elapsed is not None:
+                self._log(
+                    f"{exporter.rows_written} feição(ões) de {exporter.source} exportada(s) para "
+                    f"{exporter.file_path} ({exporter.elapsed:.1f}s).",
+                    Qgis.Info
+                )
+        self._finish_execution()
+    
+    def _on_csv_export_finished(self, task: CsvExportTask):
+        """Callback para o fim da exportação."""
+        if self.export_task is not task:
+            return
+        
+        if task.error_message:
+            self._log(f"Exportação não concluída: {task.error_message}", Qgis.Critical)
+        else:
+            self._log(
+                f"{task.rows_written} linha(s) exportada(s) para {task.file_path} "
+                f"({task.bytes_read / 1048576:.1f} MB em {task.elapsed:.1f}s).",
+                Qgis.Info
+            )
+        self._finish_execution()
     
     def _open_tutorial(self):
         """
@@ -458,9 +1540,17 @@ class MainDialog(QDialog):
         Callback para fechamento do diálogo.
         """
         # Para execução se estiver rodando
-        if self.current_task:
+        if (self.current_task or self.current_batch or self.current_tiled or self.planning_task
+                or self.preflight_task or self.export_task):
             self._stop_execution()
         
+        self._cancel_catalog_requests()
+        # O diálogo é reaproveitado ao reabrir o plugin: os timers continuam
+        self._flush_log()
+        if self.metrics_path:
+            self._write_metrics()
+        if self.trace_path:
+            self._write_trace()
         super().closeEvent(event)
 
 